@@ -0,0 +1,88 @@
+"""
+Compare the greedy and optimal compressors on the location scripts of a rom.
+
+Usage: python benchmarks/compressbench.py ct.sfc
+
+ctrando must be importable: install it, or set PYTHONPATH=src when running
+from a checkout.
+
+Every distinct location script is decompressed from the rom and recompressed
+in both modes.  Reports the total compressed size and time of each mode.
+"""
+import argparse
+import pathlib
+import time
+
+from ctrando.common import ctenums, ctrom
+from ctrando.compression import ctcompression
+from ctrando.locations import locationevent
+
+
+def get_location_scripts(rom: bytes) -> dict[int, bytes]:
+    """Get the decompressed script at each distinct location script pointer."""
+    scripts: dict[int, bytes] = {}
+    for loc_id in ctenums.LocID:
+        ptr = locationevent.get_loc_event_ptr(rom, loc_id)
+        if ptr in scripts:
+            continue
+        try:
+            scripts[ptr] = bytes(ctcompression.decompress(rom, ptr))
+        except (ValueError, IndexError):
+            # Unused locations can point at garbage.
+            continue
+
+    return scripts
+
+
+def time_compression(
+        sources: list[bytes], optimal: bool
+) -> tuple[list[bytes], float]:
+    start = time.perf_counter()
+    results = [bytes(ctcompression.compress(source, optimal=optimal))
+               for source in sources]
+    return results, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare greedy and optimal CT compression."
+    )
+    parser.add_argument("rom", type=pathlib.Path,
+                        help="Path of vanilla Chrono Trigger (USA) rom")
+    args = parser.parse_args()
+
+    if not ctcompression.HAS_C_COMPRESSION:
+        print("The C compression library is not built.  Only the greedy "
+              "mode is available.")
+        return
+
+    ct_rom = ctrom.CTRom.from_file(str(args.rom))
+    rom = bytes(ct_rom.getbuffer())
+    scripts = get_location_scripts(rom)
+    sources = list(scripts.values())
+    source_size = sum(len(source) for source in sources)
+    vanilla_size = sum(ctcompression.get_compressed_length(rom, ptr)
+                       for ptr in scripts)
+
+    print(f"{len(sources)} scripts, {source_size} bytes decompressed, "
+          f"{vanilla_size} bytes compressed on the rom")
+    print(f"{'mode':<8} {'size':>8} {'ratio':>7} {'seconds':>8}")
+
+    sizes: dict[str, int] = {}
+    for name, optimal in (("greedy", False), ("optimal", True)):
+        results, duration = time_compression(sources, optimal)
+        for source, result in zip(sources, results):
+            if bytes(ctcompression.decompress(result, 0)) != source:
+                raise ValueError(f"{name} compression does not round trip")
+
+        sizes[name] = sum(len(result) for result in results)
+        print(f"{name:<8} {sizes[name]:>8} "
+              f"{sizes[name]/source_size:>7.3f} {duration:>8.3f}")
+
+    saved = sizes["greedy"] - sizes["optimal"]
+    print(f"optimal saves {saved} bytes "
+          f"({saved/sizes['greedy']:.1%} of greedy)")
+
+
+if __name__ == "__main__":
+    main()
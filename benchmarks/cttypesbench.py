@@ -0,0 +1,258 @@
+"""
+Compare generated BytesProp accessors with the generic byteops path.
+
+Usage: python benchmarks/cttypesbench.py [--records N] [--seed S]
+
+ctrando must be importable: install it, or set PYTHONPATH=src when running
+from a checkout.
+
+Random records are made for every sized BinaryData class.  Every BytesProp is
+first checked against byteops.get_masked_range/set_masked_range with the
+property's filters, including the errors raised for bad values.  Then reading
+every property, writing every property back, and reading a whole record with
+to_dict are timed both ways.
+"""
+import argparse
+import importlib
+import random
+import time
+import typing
+
+from ctrando.common import byteops, cttypes
+
+# Modules with the BinaryData classes used by rebalance and scaling.
+_MODULES = (
+    "ctrando.attacks.animationscript",
+    "ctrando.attacks.cttechtypes",
+    "ctrando.characters.ctpcstats",
+    "ctrando.common.cttechtypes",
+    "ctrando.enemyai.enemyaitypes",
+    "ctrando.items.itemdata_new",
+    "ctrando.locations.locationtypes",
+    "ctrando.overworlds.overworld",
+    "ctrando.postrando.gameoptions",
+    "ctrando.treasures.treasuretypes",
+)
+
+
+def reference_get(prop: cttypes.BytesProp, obj: cttypes.BinaryData):
+    """Get a BytesProp the way it was done before accessors were generated."""
+    val = byteops.get_masked_range(obj, prop._start_idx, prop._num_bytes,
+                                   prop._mask, prop._byteorder,
+                                   prop._is_signed)
+    val = prop._output_filter(obj, val)
+    return prop._ret_type(val)
+
+
+def reference_set(prop: cttypes.BytesProp, obj: cttypes.BinaryData, val):
+    """Set a BytesProp the way it was done before accessors were generated."""
+    val = int(val)
+    val = prop._input_filter(obj, val)
+    byteops.set_masked_range(obj, prop._start_idx, prop._num_bytes,
+                             prop._mask, val, prop._byteorder,
+                             prop._is_signed)
+
+
+def get_binary_data_classes() -> list[typing.Type[cttypes.BinaryData]]:
+    """Get every sized BinaryData class with BytesProps in _MODULES."""
+    for name in _MODULES:
+        importlib.import_module(name)
+
+    classes: list[typing.Type[cttypes.BinaryData]] = []
+    to_visit = [cttypes.BinaryData]
+    while to_visit:
+        cls = to_visit.pop()
+        to_visit.extend(cls.__subclasses__())
+        # TestBin's filter prints when it clamps.
+        if not cls.SIZE or cls is cttypes.TestBin:
+            continue
+        if cls._BYTES_PROPS and cls.__module__ in _MODULES:
+            classes.append(cls)
+
+    return sorted(classes, key=lambda cls: (cls.__module__, cls.__qualname__))
+
+
+def _make_records(cls: typing.Type[cttypes.BinaryData], num_records: int,
+                  rng: random.Random) -> list[cttypes.BinaryData]:
+    records = []
+    for _ in range(num_records):
+        data = cls()
+        data[:] = rng.randbytes(cls.SIZE)
+        # Keep ids which subclasses validate (e.g. command ids).
+        data[0] = cls()[0]
+        records.append(data)
+    return records
+
+
+def _call(func, *args) -> tuple[bool, typing.Any]:
+    try:
+        return True, func(*args)
+    except (ValueError, TypeError, IndexError) as exc:
+        return False, (type(exc), str(exc))
+
+
+def check_class(cls: typing.Type[cttypes.BinaryData],
+                records: list[cttypes.BinaryData],
+                rng: random.Random) -> int:
+    """
+    Check every BytesProp of cls on records.  Returns the number of checks.
+    Raises ValueError on the first difference.
+    """
+    num_checks = 0
+    for name, prop in cls._BYTES_PROPS.items():
+        max_val = prop._mask >> byteops.get_minimal_shift(prop._mask)
+        for record in records:
+            expected = _call(reference_get, prop, record)
+            result = _call(getattr, record, name)
+            if expected != result or type(expected[1]) is not type(result[1]):
+                raise ValueError(f"{cls.__qualname__}.{name} get: "
+                                 f"{expected} != {result}")
+
+            for val in (rng.randrange(-max_val - 2, 2*max_val + 2),
+                        rng.randrange(0, max_val + 1)):
+                expected_data, data = record.get_copy(), record.get_copy()
+                expected = _call(reference_set, prop, expected_data, val)
+                result = _call(setattr, data, name, val)
+                # Compare as bytes.  Some classes have their own __eq__.
+                if (expected[0], bytes(expected_data)) != \
+                        (result[0], bytes(data)) or \
+                        (not expected[0] and expected != result):
+                    raise ValueError(f"{cls.__qualname__}.{name} set {val}: "
+                                     f"{expected} != {result}")
+            num_checks += 3
+
+    for record in records:
+        expected_dict = _call(
+            lambda obj: {name: reference_get(prop, obj)
+                         for name, prop in cls._BYTES_PROPS.items()},
+            record
+        )
+        if expected_dict != _call(cls.to_dict, record):
+            raise ValueError(f"{cls.__qualname__}.to_dict differs")
+        if expected_dict[0]:
+            def reference_from_dict(values: dict[str, typing.Any]):
+                ret = cls()
+                for name, val in values.items():
+                    reference_set(cls._BYTES_PROPS[name], ret, val)
+                return bytes(ret)
+
+            if _call(reference_from_dict, expected_dict[1]) != \
+                    _call(lambda x: bytes(cls.from_dict(x)), expected_dict[1]):
+                raise ValueError(f"{cls.__qualname__}.from_dict differs")
+        num_checks += 1
+
+    return num_checks
+
+
+def _get_timed_props(
+        cls: typing.Type[cttypes.BinaryData],
+        records: list[cttypes.BinaryData]
+) -> list[tuple[str, cttypes.BytesProp]]:
+    """
+    Get the properties which can be read from every record and have the
+    value written back.  Filters make some values unreadable or unwritable.
+    """
+    props = []
+    for name, prop in cls._BYTES_PROPS.items():
+        try:
+            for record in records:
+                setattr(record.get_copy(), name, getattr(record, name))
+        except ValueError:
+            continue
+        props.append((name, prop))
+    return props
+
+
+def time_class(cls: typing.Type[cttypes.BinaryData],
+               records: list[cttypes.BinaryData],
+               repeat: int) -> dict[str, tuple[float, float]]:
+    """Time each operation on records as (reference, generated) seconds."""
+    props = _get_timed_props(cls, records)
+    values = [[prop.fget(record) for _, prop in props] for record in records]
+    times: dict[str, tuple[float, float]] = {}
+
+    def best_of(func) -> float:
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            best = min(best, time.perf_counter() - start)
+        return best
+
+    def ref_get():
+        for record in records:
+            for _, prop in props:
+                reference_get(prop, record)
+
+    def new_get():
+        for record in records:
+            for name, _ in props:
+                getattr(record, name)
+
+    def ref_set():
+        for record, record_values in zip(records, values):
+            for (_, prop), val in zip(props, record_values):
+                reference_set(prop, record, val)
+
+    def new_set():
+        for record, record_values in zip(records, values):
+            for (name, _), val in zip(props, record_values):
+                setattr(record, name, val)
+
+    times["get"] = (best_of(ref_get), best_of(new_get))
+    times["set"] = (best_of(ref_set), best_of(new_set))
+
+    if len(props) == len(cls._BYTES_PROPS):
+        def ref_dict():
+            for record in records:
+                {name: reference_get(prop, record) for name, prop in props}
+
+        def new_dict():
+            for record in records:
+                record.to_dict()
+
+        times["to_dict"] = (best_of(ref_dict), best_of(new_dict))
+
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare generated and generic BytesProp accessors."
+    )
+    parser.add_argument("--records", type=int, default=200,
+                        help="Random records per class")
+    parser.add_argument("--repeat", type=int, default=5,
+                        help="Timing runs per operation (best is kept)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    classes = get_binary_data_classes()
+    class_records = {cls: _make_records(cls, args.records, rng)
+                     for cls in classes}
+
+    num_checks = sum(check_class(cls, records, rng)
+                     for cls, records in class_records.items())
+    num_props = sum(len(cls._BYTES_PROPS) for cls in classes)
+    print(f"{len(classes)} classes, {num_props} properties, "
+          f"{num_checks} checks match byteops")
+
+    totals: dict[str, list[float]] = {}
+    print(f"{'class':<32} {'op':<8} {'byteops':>9} {'generated':>9} "
+          f"{'speedup':>7}")
+    for cls, records in class_records.items():
+        for op, (ref, new) in time_class(cls, records, args.repeat).items():
+            total = totals.setdefault(op, [0.0, 0.0])
+            total[0] += ref
+            total[1] += new
+            print(f"{cls.__qualname__:<32} {op:<8} {ref:>9.5f} {new:>9.5f} "
+                  f"{ref/new:>6.2f}x")
+
+    for op, (ref, new) in totals.items():
+        print(f"{'total':<32} {op:<8} {ref:>9.5f} {new:>9.5f} "
+              f"{ref/new:>6.2f}x")
+
+
+if __name__ == "__main__":
+    main()
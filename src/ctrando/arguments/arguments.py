@@ -41,6 +41,12 @@ class KeyListType(enum.StrEnum):
     BOSSES = "bosses"
 
 
+class OutputFormat(enum.StrEnum):
+    ROM = "rom"
+    BPS = "bps"
+    IPS = "ips"
+
+
 @dataclass()
 class PresetData:
     name: str
@@ -81,6 +87,15 @@ class GeneralOptions:
     options_file: typing.Optional[Path] = None
     list_keys: typing.Optional[KeyListType] = None
     preset: typing.Optional[str] = None
+    batch: typing.Optional[int] = None
+    seed_list: typing.Optional[Path] = None
+    jobs: typing.Optional[int] = None
+    cache_directory: typing.Optional[Path] = None
+    use_cache: bool = True
+    trace_file: typing.Optional[Path] = None
+    trace_summary_file: typing.Optional[Path] = None
+    optimal_compression: bool = False
+    output_format: OutputFormat = OutputFormat.ROM
 
     @classmethod
     def add_group_to_parser(cls, parser: argparse.ArgumentParser):
@@ -140,6 +155,84 @@ class GeneralOptions:
                       "Valid types: spots, items, bosses, boss_spots.")
         )
 
+        general_group.add_argument(
+            "--batch",
+            action="store", type=int,
+            default=argparse.SUPPRESS,
+            help=("Generate this many seeds with the same settings.  Seeds are "
+                  "derived from --seed (random if not given).")
+        )
+
+        general_group.add_argument(
+            "--seed-list",
+            action="store", type=Path,
+            default=argparse.SUPPRESS,
+            help="Generate one seed for each line of this file."
+        )
+
+        general_group.add_argument(
+            "--jobs",
+            action="store", type=int,
+            default=argparse.SUPPRESS,
+            help=("Number of processes to use with --batch or --seed-list, "
+                  "and for applying the openworld scripts when they are not "
+                  "cached.  Defaults to the number of CPUs for batches and "
+                  "to 1 otherwise.")
+        )
+
+        general_group.add_argument(
+            "--cache-dir",
+            action="store", type=Path,
+            dest="cache_directory",
+            default=argparse.SUPPRESS,
+            help=("Directory for caching the base-patched rom between runs.  "
+                  "Defaults to CTRANDO_CACHE_DIR or the user cache directory.")
+        )
+
+        general_group.add_argument(
+            "--no-cache",
+            action="store_false",
+            dest="use_cache",
+            default=argparse.SUPPRESS,
+            help="Do not read or write the base-patched rom cache."
+        )
+
+        general_group.add_argument(
+            "--trace-file",
+            action="store", type=Path,
+            default=argparse.SUPPRESS,
+            help=("Write a trace of where generation time was spent to this "
+                  "file.  Open it with chrome://tracing or Perfetto.  Not allowed "
+                  "with --batch or --seed-list.")
+        )
+
+        general_group.add_argument(
+            "--trace-summary",
+            action="store", type=Path,
+            dest="trace_summary_file",
+            default=argparse.SUPPRESS,
+            help=("Write a JSON summary of the time spent in each phase of "
+                  "generation and of event counts to this file.  Not allowed with "
+                  "--batch or --seed-list.")
+        )
+
+        general_group.add_argument(
+            "--optimal-compression",
+            action="store_true",
+            default=argparse.SUPPRESS,
+            help=("Compress scripts and other rewritten data as small as "
+                  "possible.  Slower, but leaves more free space in the "
+                  "expanded rom.")
+        )
+
+        argumenttypes.add_str_enum_to_group(
+            general_group, "--output-format",
+            OutputFormat,
+            help_str=("Write the randomized rom (rom, the default) or a patch "
+                      "against the input rom (bps or ips).  Patches are a few "
+                      "hundred KiB instead of 6 MiB.")
+        )
+
 
     @classmethod
     def extract_from_namespace(cls, namespace: argparse.Namespace) -> typing.Self:
@@ -176,15 +269,62 @@ class GeneralOptions:
         else:
             list_keys = None
 
+        batch = getattr(namespace, "batch", None)
+        if batch is not None and batch < 1:
+            raise ValueError("Batch size must be positive")
+
+        seed_list = getattr(namespace, "seed_list", None)
+        if seed_list is not None and not seed_list.is_file():
+            raise ValueError("Seed list file does not exist")
+
+        if batch is not None and seed_list is not None:
+            raise ValueError("Only one of --batch and --seed-list may be given")
+
+        jobs = getattr(namespace, "jobs", None)
+        if jobs is not None and jobs < 1:
+            raise ValueError("Number of jobs must be positive")
+
+        cache_directory = getattr(namespace, "cache_directory", None)
+        use_cache = getattr(namespace, "use_cache", True)
+        trace_file = getattr(namespace, "trace_file", None)
+        trace_summary_file = getattr(namespace, "trace_summary_file", None)
+        if (batch is not None or seed_list is not None) and \
+                (trace_file is not None or trace_summary_file is not None):
+            raise ValueError(
+                "--trace-file and --trace-summary can not be used with "
+                "--batch or --seed-list"
+            )
+        optimal_compression = getattr(namespace, "optimal_compression", False)
+        output_format = getattr(namespace, "output_format", OutputFormat.ROM)
+
         return cls(
             input_file=input_file,
             output_directory=output_directory,
             seed=seed,
             options_file=options_file,
             list_keys=list_keys,
-            preset=preset
+            preset=preset,
+            batch=batch,
+            seed_list=seed_list,
+            jobs=jobs,
+            cache_directory=cache_directory,
+            use_cache=use_cache,
+            trace_file=trace_file,
+            trace_summary_file=trace_summary_file,
+            optimal_compression=optimal_compression,
+            output_format=output_format
         )
 
+    def get_cache_directory(self) -> typing.Optional[Path]:
+        """Get the prepatch cache directory, or None if caching is off."""
+        if not self.use_cache:
+            return None
+        if self.cache_directory is not None:
+            return self.cache_directory
+
+        from ctrando.common import prepatchcache
+        return prepatchcache.get_default_cache_directory()
+
 
 
 class Settings:
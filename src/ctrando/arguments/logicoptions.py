@@ -1,5 +1,6 @@
 import argparse
 from collections.abc import Iterable, Sequence
+import enum
 import functools
 import typing
 from ctrando.arguments import argumenttypes, shopoptions
@@ -62,6 +63,18 @@ def reward_to_str(reward: RewardType) -> str:
     raise ValueError
 
 
+class KeyItemFillScheme(enum.StrEnum):
+    """
+    How key items are placed.
+      - WEIGHTED_DECAY places the forced spots at random and retries until the
+        fill is beatable.
+      - ASSUMED places every item assuming the unplaced ones are owned, so
+        every fill is beatable.
+    """
+    WEIGHTED_DECAY = "weighted_decay"
+    ASSUMED = "assumed"
+
+
 class LogicOptions:
     _default_incentive_factor: typing.ClassVar[float] = 5.0
     _default_decay_factor: typing.ClassVar[float] = 0.7
@@ -122,13 +135,15 @@ class LogicOptions:
     _default_starter_rewards: typing.ClassVar[tuple[RewardType,...]] = (ScriptReward.EPOCH,)
     _default_out_of_logic_starter_rewards: typing.ClassVar[tuple[RewardType, ...]] = tuple()
     _default_min_flight_depth = 0
+    _default_key_item_fill: typing.ClassVar[KeyItemFillScheme] = KeyItemFillScheme.WEIGHTED_DECAY
 
     attr_names: typing.ClassVar[tuple[str, ...]] = (
         "additional_key_items", "forced_spots", "loose_key_items", "incentive_spots",
         "incentive_factor", "excluded_spots", "decay_factor",
         "hard_lavos_end_boss", "starter_rewards", "out_of_logic_starter_rewards",
         "force_early_flight", "boats_of_time", "jets_of_time", "min_flight_depth",
-        "lock_gates", "disable_element_locks", "block_zenan_600", "block_zenan_1000"
+        "lock_gates", "disable_element_locks", "block_zenan_600", "block_zenan_1000",
+        "key_item_fill"
     )
     name: typing.ClassVar[str] = "Logic Options"
     description: typing.ClassVar[str] = "Options for the distribution of key items"
@@ -151,7 +166,8 @@ class LogicOptions:
             lock_gates: bool = False,
             disable_element_locks: bool = False,
             block_zenan_600: bool = False,
-            block_zenan_1000: bool = False
+            block_zenan_1000: bool = False,
+            key_item_fill: KeyItemFillScheme = _default_key_item_fill
     ):
         self.additional_key_items = sorted(additional_key_items)
         self.forced_spots = forced_spots
@@ -171,6 +187,7 @@ class LogicOptions:
         self.disable_element_locks = disable_element_locks
         self.block_zenan_600 = block_zenan_600
         self.block_zenan_1000 = block_zenan_1000
+        self.key_item_fill = key_item_fill
 
 
     @classmethod
@@ -261,7 +278,11 @@ class LogicOptions:
             ),
             "block_zenan_1000": argumenttypes.FlagArg(
                 "Prevent overworld travel across Zenan Bridge in 1000"
-            )
+            ),
+            "key_item_fill": argumenttypes.arg_from_enum(
+                KeyItemFillScheme, cls._default_key_item_fill,
+                "Method used to place key items"
+            ),
 
         }
 
@@ -373,6 +394,11 @@ class LogicOptions:
                 argumenttypes.attr_name_to_arg_name(arg), group
             )
 
+        argumenttypes.add_str_enum_to_group(
+            group, "--key-item-fill", KeyItemFillScheme,
+            help_str="Method used to place key items",
+        )
+
 
     @ classmethod
     def extract_from_namespace(cls, namespace: argparse.Namespace):
@@ -1,12 +1,29 @@
-"""Module to apply all of the event modifications in the openworld package."""
+"""
+Module to apply all of the event modifications in the openworld package.
+
+Importing every module of the openworld package takes a noticeable part of
+startup, and most runs never apply the mods (they come from the prepatch
+cache).  The generated openworld_manifest lists the module and location of
+every EventMod so that a module is only imported when its location is
+modified.  Regenerate it with ``python -m ctrando.base.apply_openworld`` after
+adding a mod or changing its location.
+"""
+from __future__ import annotations
+
+import ast
+import concurrent.futures
+import functools
 import importlib
+import importlib.resources
 import pkgutil
+from collections.abc import Iterable
 from typing import Type
+import warnings
 
-from ctrando.common import randostate
-from ctrando.locations import locationevent
+from ctrando.common import ctenums, ctrom, tracing
+from ctrando.locations import locationevent, scriptcache, scriptmanager
 
-from ctrando.base import openworld
+from ctrando.base import openworld, openworld_manifest
 # from ctrando.base import basepatch, chesttext, apply_openworld_ow
 # from ctrando.recruits import guardiaprison, leenesquare, manoriacathedral, starter,\
 #     queenschamber, frogsburrow, protodome, northcape, deathpeak, \
@@ -14,93 +31,240 @@ from ctrando.base import openworld
 # from ctrando.items import itemdata
 
 
-# Register all openworld
-_mod_classes: list[Type[locationevent.LocEventMod]] = []
-for _, name, __ in pkgutil.walk_packages(openworld.__path__):
-    if 'flycheck' in name:
-        continue
+def _get_mod_names() -> list[str]:
+    """Names of the openworld modules in the order mods are applied."""
+    return [
+        name for _, name, __ in pkgutil.iter_modules(openworld.__path__)
+        if 'flycheck' not in name
+    ]
+
+
+def _read_mod_loc_name(mod_name: str) -> str:
+    """Read the name of the LocID an openworld module modifies from its source."""
+    source = importlib.resources.files(openworld).joinpath(f"{mod_name}.py")
+    tree = ast.parse(source.read_text(encoding="utf-8"))
+
+    for node in tree.body:
+        if isinstance(node, ast.ClassDef) and node.name == "EventMod":
+            for stmt in node.body:
+                if (
+                        isinstance(stmt, ast.Assign) and
+                        len(stmt.targets) == 1 and
+                        isinstance(stmt.targets[0], ast.Name) and
+                        stmt.targets[0].id == "loc_id" and
+                        isinstance(stmt.value, ast.Attribute)
+                ):
+                    return stmt.value.attr
+
+    # Not a plain ctenums.LocID.NAME assignment.  Import to find out.
+    module = importlib.import_module(f"ctrando.base.openworld.{mod_name}")
+    if not hasattr(module, 'EventMod'):
+        raise AttributeError(f'{module.__name__} has no EventMod')
+    return module.EventMod.loc_id.name
+
+
+def build_manifest() -> tuple[tuple[str, str], ...]:
+    """Get (module name, LocID name) of every openworld mod from the sources."""
+    return tuple(
+        (mod_name, _read_mod_loc_name(mod_name))
+        for mod_name in _get_mod_names()
+    )
+
 
-    module = importlib.import_module('ctrando.base.openworld.'+name)
+@functools.cache
+def _get_manifest() -> tuple[tuple[str, str], ...]:
+    manifest = openworld_manifest.MANIFEST
+    if [mod_name for mod_name, _ in manifest] != _get_mod_names():
+        warnings.warn(
+            "The openworld manifest is out of date.  Regenerate it with "
+            "python -m ctrando.base.apply_openworld"
+        )
+        manifest = build_manifest()
+
+    return manifest
+
+
+@functools.cache
+def _get_loc_mod_names() -> dict[ctenums.LocID, list[str]]:
+    loc_mod_names: dict[ctenums.LocID, list[str]] = {}
+    for mod_name, loc_name in _get_manifest():
+        loc_mod_names.setdefault(ctenums.LocID[loc_name], []).append(mod_name)
+
+    return loc_mod_names
+
+
+@functools.cache
+def _import_mod_class(mod_name: str) -> Type[locationevent.LocEventMod]:
+    module = importlib.import_module(f"ctrando.base.openworld.{mod_name}")
 
     if not hasattr(module, 'EventMod'):
         raise AttributeError(f'{module.__name__} has no EventMod')
 
-    _mod_class = module.EventMod
-    if not issubclass(_mod_class, locationevent.LocEventMod):
+    mod_class = module.EventMod
+    if not issubclass(mod_class, locationevent.LocEventMod):
         raise TypeError(f'{module.__name__}.EventMod is not a LocEventMod')
 
-    _mod_classes.append(_mod_class)
+    return mod_class
+
+
+def _get_checked_mod_class(
+        mod_name: str, loc_id: ctenums.LocID
+) -> Type[locationevent.LocEventMod]:
+    mod_class = _import_mod_class(mod_name)
+    if mod_class.loc_id != loc_id:
+        raise ValueError(
+            f"{mod_class.__module__}.EventMod modifies {mod_class.loc_id} "
+            f"but the openworld manifest says {loc_id}"
+        )
+    return mod_class
+
+
+def get_modified_locations() -> list[ctenums.LocID]:
+    """Get the locations which have openworld mods, without importing them."""
+    return list(_get_loc_mod_names())
+
 
+def get_mod_classes(
+        loc_id: ctenums.LocID
+) -> list[Type[locationevent.LocEventMod]]:
+    """Get the openworld mods of a location, importing them if needed."""
+    return [
+        _get_checked_mod_class(mod_name, loc_id)
+        for mod_name in _get_loc_mod_names().get(loc_id, [])
+    ]
 
-def apply_openworld(script_manager: randostate.ScriptManager):
-    """Apply the openworld LocEventMods to the randomizer state."""
-    for mod_class in _mod_classes:
-        event = script_manager[mod_class.loc_id]
-        mod_class.modify(event)
+
+# Script manager of a worker process in a parallel apply.
+_worker_script_manager: scriptmanager.ScriptManager | None = None
+
+
+def _init_worker(rom_bytes: bytes,
+                 script_cache: scriptcache.ScriptCache | None):
+    global _worker_script_manager
+    _worker_script_manager = scriptmanager.ScriptManager(
+        ctrom.CTRom(rom_bytes, ignore_checksum=True)
+    )
+    _worker_script_manager.set_script_cache(script_cache)
+
+
+def _apply_loc_mods_in_worker(
+        loc_id: ctenums.LocID,
+        mod_names: list[str]
+) -> tuple[bytes, bytes | None]:
+    """
+    Read loc_id's script and apply its mods.  Returns the parsed bytes of the
+    modified script and the fingerprint of the script as read.
+    """
+    script_manager = _worker_script_manager
+    if script_manager is None:
+        raise ValueError("Openworld worker was not initialized")
+
+    script = script_manager[loc_id]
+    for mod_name in mod_names:
+        _get_checked_mod_class(mod_name, loc_id).modify(script)
+
+    ret = (script.get_parsed_bytes(),
+           script_manager.get_rom_fingerprint(loc_id))
+    del script_manager[loc_id]
+
+    return ret
+
+
+def _apply_openworld_parallel(
+        script_manager: scriptmanager.ScriptManager,
+        loc_mod_names: dict[ctenums.LocID, list[str]],
+        jobs: int
+):
+    """
+    Apply the mods of each location in a process pool.  Each worker reads
+    the script from a copy of the rom, so locations must not be loaded in
+    script_manager yet.
+    """
+    rom_bytes = bytes(script_manager.get_ctrom().getbuffer())
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=jobs, initializer=_init_worker,
+        initargs=(rom_bytes, script_manager.get_script_cache())
+    ) as executor:
+        futures = {
+            loc_id: executor.submit(_apply_loc_mods_in_worker, loc_id, mod_names)
+            for loc_id, mod_names in loc_mod_names.items()
+        }
+
+        # Merge in submission order so that the result does not depend on
+        # which worker finishes first.
+        for loc_id, future in futures.items():
+            parsed_bytes, rom_fingerprint = future.result()
+            script_manager.set_rom_script(
+                loc_id,
+                locationevent.LocationEvent.from_parsed_bytes(parsed_bytes),
+                rom_fingerprint
+            )
+
+
+@tracing.traced("apply_openworld")
+def apply_openworld(
+        script_manager: scriptmanager.ScriptManager,
+        loc_ids: Iterable[ctenums.LocID] | None = None,
+        jobs: int | None = None
+):
+    """
+    Apply the openworld LocEventMods to the randomizer state.  If loc_ids is
+    given, only the mods of those locations are applied (and imported).
+
+    If jobs is more than 1, locations whose scripts are not loaded yet are
+    modified in that many worker processes.  A mod only changes the script
+    of its own location, so the result is the same as applying them here.
+    """
+    if loc_ids is not None:
+        loc_ids = set(loc_ids)
+
+    parallel_mod_names: dict[ctenums.LocID, list[str]] = {}
+    for mod_name, loc_name in _get_manifest():
+        loc_id = ctenums.LocID[loc_name]
+        if loc_ids is not None and loc_id not in loc_ids:
+            continue
+
+        if jobs is not None and jobs > 1 and \
+                not script_manager.is_loaded(loc_id):
+            parallel_mod_names.setdefault(loc_id, []).append(mod_name)
+            continue
+
+        mod_class = _get_checked_mod_class(mod_name, loc_id)
+        with tracing.span(mod_name, loc_id=loc_id):
+            event = script_manager[loc_id]
+            mod_class.modify(event)
+
+    if parallel_mod_names:
+        _apply_openworld_parallel(script_manager, parallel_mod_names, jobs)
+
+
+def write_manifest():
+    """Regenerate openworld_manifest.py from the openworld sources."""
+    lines = [
+        '"""',
+        'Module and location of every openworld EventMod, in application order.',
+        '',
+        'Generated by ``python -m ctrando.base.apply_openworld``.  Do not edit.',
+        '"""',
+        '',
+        'MANIFEST: tuple[tuple[str, str], ...] = (',
+    ]
+    lines.extend(
+        f'    ("{mod_name}", "{loc_name}"),'
+        for mod_name, loc_name in build_manifest()
+    )
+    lines.append(')')
+
+    path = importlib.resources.files("ctrando.base").joinpath(
+        "openworld_manifest.py"
+    )
+    with open(path, "w", encoding="utf-8", newline="\n") as outfile:
+        outfile.write("\n".join(lines) + "\n")
 
 
 def main():
-    # ct_rom = ctrom.CTRom.from_file('./ct.sfc')
-    # ct_rom.make_exhirom()
-    # basepatch.mark_initial_free_space(ct_rom)
-    # basepatch.patch_blackbird(ct_rom)
-    # item_db = itemdata.ItemDB.from_rom((ct_rom.getbuffer()))
-    # item_db[ctenums.ItemID.PENDANT_CHARGE].set_name_from_str(" PendantChg")
-    # item_db[ctenums.ItemID.PENDANT_CHARGE].set_desc_from_str(
-    #     "The Pendant begins to glow..."
-    # )
-    # chesttext.apply_chest_text_hack(ct_rom, item_db)
-    # basepatch.patch_timegauge_alt(ct_rom)
-    # basepatch.patch_progressive_items(ct_rom)
-    #
-    # script_manager = randostate.ScriptManager(ct_rom)
-    # ow_manager = randostate.OWManager(ct_rom)
-    # apply_openworld(script_manager)
-    # apply_openworld_ow.update_all_overworlds(ow_manager)
-    #
-    # exit_dict = locationtypes.get_exit_dict_from_ctrom(ct_rom)
-    # del exit_dict[ctenums.LocID.LAB_32_EAST][1]
-    #
-    # starter.assign_pc_to_spot(ctenums.CharID.AYLA, script_manager)
-    # guardiaprison.assign_pc_to_spot(ctenums.CharID.MAGUS, script_manager)
-    # leenesquare.assign_pc_to_spot(ctenums.CharID.ROBO, script_manager)
-    # manoriacathedral.assign_pc_to_spot(ctenums.CharID.MAGUS,
-    #                                    script_manager)
-    # queenschamber.assign_pc_to_spot(ctenums.CharID.ROBO, script_manager)
-    # dactylnest.assign_pc_to_spot(ctenums.CharID.CRONO, script_manager)
-    # # frogsburrow.assign_pc_to_spot(ctenums.CharID.MARLE, script_manager)
-    # # protodome.assign_pc_to_spot(ctenums.CharID.CRONO, script_manager)
-    # # northcape.assign_pc_to_spot(ctenums.CharID.FROG, script_manager)
-    # deathpeak.assign_pc_to_spot(ctenums.CharID.MAGUS, script_manager)
-    #
-    # script_manager.write_all_scripts_to_ctrom()
-    # ow_manager.write_all_overworlds_to_ctrom()
-    # locationtypes.write_exit_dict_to_ctrom(ct_rom, exit_dict)
-    #
-    # basepatch.alter_event_or_operation(ct_rom)
-    # basepatch.set_storyline_thresholds(ct_rom)
-    # item_db.write_to_ctrom(ct_rom)
-    #
-    # ct_rom.seek(0x01FFFF)
-    # ct_rom.write(b'\x01')
-    #
-    # ct_rom.seek(0x02E1F0)  # Always active/wait on first name
-    # ct_rom.write(b'\xEA\xEA')
-    #
-    # # Eventually find a better place for location changes to live.
-    # # Shard music changes
-    # LD = locationtypes.LocationData
-    #
-    # locs = (ctenums.LocID.GUARDIA_BASEMENT, ctenums.LocID.GUARDIA_REAR_STORAGE)
-    # for loc_id in locs:
-    #     data = LD.read_from_ctrom(ct_rom, loc_id)
-    #     data.music = 0xFF
-    #     data.write_to_ctrom(ct_rom, loc_id)
-    #
-    #
-    # with open('./ct-mod.sfc', 'wb') as outfile:
-    #     outfile.write(ct_rom.getbuffer())
-    pass
+    write_manifest()
+
 
 if __name__ == '__main__':
     main()
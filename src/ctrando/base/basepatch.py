@@ -2167,15 +2167,23 @@ def move_scripts_to_slow_rom(
         list(range(0xE7, 0xEC)) +
         list(range(0x140, 0x143))
     )
+    decompress_buffer = ctcompression.get_decompress_buffer()
     for script_id in range(513):
         if script_id in bad_script_ids:
             continue
         ptr_st = 0x3CF9F0 + 3*script_id
-        ptr = int.from_bytes(vanilla_ct_rom.getbuffer()[ptr_st: ptr_st+3], "little")
-        ptr = byteops.to_file_ptr(ptr)
 
-        script = locationevent.LocationEvent.from_rom(vanilla_ct_rom.getbuffer(), ptr)
-        length = ctcompression.get_compressed_length(vanilla_ct_rom.getbuffer(), ptr)
+        # The view must be released before writing to the rom.
+        with vanilla_ct_rom.getbuffer() as rom:
+            ptr = int.from_bytes(rom[ptr_st: ptr_st+3], "little")
+            ptr = byteops.to_file_ptr(ptr)
+
+            script_len, length = ctcompression.decompress_into(
+                rom, ptr, decompress_buffer
+            )
+            script = locationevent.LocationEvent(
+                decompress_buffer[:script_len], rom
+            )
 
         vanilla_ct_rom.space_manager.mark_block(
             (ptr, ptr+length), mark_free
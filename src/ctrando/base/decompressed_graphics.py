@@ -244,14 +244,16 @@ def add_decompressed_gfx_packets(ct_rom: ctrom.CTRom):
     ct_rom.seek(gfx_ptr_st + 7*3)
 
     packet_dict: dict[int, bytes] = {}
+    decompress_buffer = ctcompression.get_decompress_buffer()
 
     for packet_id in range(7, 0xF8):
         ptr = int.from_bytes(ct_rom.read(3), "little")
         ptr = byteops.to_file_ptr(ptr)
 
-        compr_len = ctcompression.get_compressed_length(ct_rom.getbuffer(), ptr)
-        packet = ctcompression.decompress(ct_rom.getbuffer(), ptr)
-        packet_dict[packet_id] = packet
+        packet_len, compr_len = ctcompression.decompress_into(
+            ct_rom.getbuffer(), ptr, decompress_buffer
+        )
+        packet_dict[packet_id] = bytes(decompress_buffer[:packet_len])
 
         ct_rom.space_manager.mark_block(
             (ptr, ptr+compr_len),
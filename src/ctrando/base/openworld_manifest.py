@@ -0,0 +1,278 @@
+"""
+Module and location of every openworld EventMod, in application order.
+
+Generated by ``python -m ctrando.base.apply_openworld``.  Do not edit.
+"""
+
+MANIFEST: tuple[tuple[str, str], ...] = (
+    ("algettyentrance", "ALGETTY_ENTRANCE"),
+    ("algettyinn", "ALGETTY_INN"),
+    ("algettytsunami", "ALGETTY_TSUNAMI"),
+    ("ancienttyranotraps", "ANCIENT_TYRANO_LAIR_TRAPS"),
+    ("apocalypseepoch", "APOCALYPSE_EPOCH"),
+    ("apocalypselavos", "APOLCALYPSE_LAVOS"),
+    ("arrisdome", "ARRIS_DOME"),
+    ("arrisdomeauxconsole", "ARRIS_DOME_AUXILIARY_CONSOLE"),
+    ("arrisdomecommand", "ARRIS_DOME_COMMAND"),
+    ("arrisdomefoodstorage", "ARRIS_DOME_FOOD_LOCKER"),
+    ("arrisdomeguardian", "ARRIS_DOME_GUARDIAN_CHAMBER"),
+    ("arrisdomelowercommons", "ARRIS_DOME_LOWER_COMMONS"),
+    ("arrisdomerafters", "ARRIS_DOME_RAFTERS"),
+    ("arrisdomesealedroom", "ARRIS_DOME_SEALED_ROOM"),
+    ("bangordome", "BANGOR_DOME"),
+    ("beastnest", "BEAST_NEST"),
+    ("bekklerslab", "BEKKLERS_LAB"),
+    ("blackbirdaccessshaft", "BLACKBIRD_ACCESS_SHAFT"),
+    ("blackbirdarmory1", "BLACKBIRD_ARMORY_1"),
+    ("blackbirdarmory2", "BLACKBIRD_ARMORY_2"),
+    ("blackbirdarmory3", "BLACKBIRD_ARMORY_3"),
+    ("blackbirdbarracks", "BLACKBIRD_BARRACKS"),
+    ("blackbirdcell", "BLACKBIRD_CELL"),
+    ("blackbirdducts", "BLACKBIRD_DUCTS"),
+    ("blackbirdforwardhalls", "BLACKBIRD_FORWARD_HALLS"),
+    ("blackbirdinventory", "BLACKBIRD_INVENTORY"),
+    ("blackbirdleftport", "BLACKBIRD_LEFT_PORT"),
+    ("blackbirdleftwing", "BLACKBIRD_LEFT_WING"),
+    ("blackbirdlounge", "BLACKBIRD_LOUNGE"),
+    ("blackbirdrearhalls", "BLACKBIRD_REAR_HALLS"),
+    ("blackbirdrightportal", "BLACKBIRD_RIGHT_PORT"),
+    ("blackbirdscaffolding", "BLACKBIRD_SCAFFOLDING"),
+    ("blackbirdstorage", "BLACKBIRD_STORAGE"),
+    ("blackbirdtreasury", "BLACKBIRD_TREASURY"),
+    ("blackbirdwingaccess", "BLACKBIRD_WING_ACCESS"),
+    ("blackomen1fentrance", "BLACK_OMEN_1F_ENTRANCE"),
+    ("blackomen1fpanels", "BLACK_OMEN_1F_DEFENSE_CORRIDOR"),
+    ("blackomen98fpanels", "BLACK_OMEN_98F_OMEGA_DEFENSE"),
+    ("blackomen99fzeal", "BLACK_OMEN_ZEAL"),
+    ("blackomencelestialgate", "BLACK_OMEN_CELESTIAL_GATE"),
+    ("blackomenelderspawn", "BLACK_OMEN_ELDER_SPAWN"),
+    ("blackomenemporium", "BLACK_OMEN_47F_EMPORIUM"),
+    ("blackomenentrance", "BLACK_OMEN_ENTRANCE"),
+    ("blackomengigamutant", "BLACK_OMEN_GIGA_MUTANT"),
+    ("blackomenlowerteleporters", "BLACK_OMEN_LOWER_TELEPORTERS"),
+    ("blackomenomegadefense", "BLACK_OMEN_98F_OMEGA_DEFENSE"),
+    ("blackomenplatform", "BLACK_OMEN_PLATFORM"),
+    ("blackomenroyalteleporterlower", "BLACK_OMEN_ROYAL_TELEPORTER_LOWER"),
+    ("blackomenroyalteleporterupper", "BLACK_OMEN_ROYAL_TELEPORTER_UPPER"),
+    ("blackomenterramutant", "BLACK_OMEN_TERRA_MUTANT"),
+    ("blackomenupperteleporters", "BLACK_OMEN_UPPER_TELEPORTERS"),
+    ("castlemagusentrance", "MAGUS_CASTLE_ENTRANCE"),
+    ("castlemagusexterior", "MAGUS_CASTLE_EXTERIOR"),
+    ("castlemagushalldoppelgangers", "MAGUS_CASTLE_DOPPLEGANGER_CORRIDOR"),
+    ("chiefshut", "IOKA_CHIEFS_HUT"),
+    ("chorascafe", "CHORAS_CAFE"),
+    ("chorascarpenter600", "CHORAS_600_CARPENTER_RESIDENCE_1F"),
+    ("chorascarpentershouse1000", "CHORAS_CARPENTER_1000"),
+    ("chorasinn1000", "CHORAS_INN_1000"),
+    ("chorasinn600", "CHORAS_600_INN"),
+    ("courtroomkingstrial", "KINGS_TRIAL"),
+    ("courtroomlobby", "COURTROOM_LOBBY"),
+    ("cronoskitchen", "CRONOS_KITCHEN"),
+    ("cronosroom", "CRONOS_ROOM"),
+    ("cursedwoods", "CURSED_WOODS"),
+    ("dactyllower", "DACTYL_NEST_LOWER"),
+    ("dactylsummit", "DACTYL_NEST_SUMMIT"),
+    ("dactylupper", "DACTYL_NEST_UPPER"),
+    ("darkagesportal", "DARK_AGES_PORTAL"),
+    ("deathpeakentrance", "DEATH_PEAK_ENTRANCE"),
+    ("deathpeakguardianspawn", "DEATH_PEAK_GUARDIAN_SPAWN"),
+    ("deathpeaksummit", "DEATH_PEAK_SUMMIT"),
+    ("denadorocaveofmasamune", "DENADORO_CAVE_OF_MASAMUNE"),
+    ("denadoroentrance", "DENADORO_ENTRANCE"),
+    ("denadoromasacaveexterior", "DENADORO_CAVE_OF_MASAMUNE_EXTERIOR"),
+    ("denadoromtnvista", "DENADORO_MTN_VISTA"),
+    ("denadoronorthface", "DENADORO_NORTH_FACE"),
+    ("denadorowestface", "DENADORO_WEST_FACE"),
+    ("dorinoinn", "DORINO_INN"),
+    ("endoftime", "END_OF_TIME"),
+    ("enhasa", "ENHASA"),
+    ("enhasabalthasarstudy", "ENHASA_NU_ROOM"),
+    ("eotepochhangar", "END_OF_TIME_EPOCH"),
+    ("factorycraneroom", "FACTORY_RUINS_CRANE_ROOM"),
+    ("factoryentrance", "FACTORY_RUINS_ENTRANCE"),
+    ("factorypowercore", "FACTORY_RUINS_POWER_CORE"),
+    ("factorysecuritycenter", "FACTORY_RUINS_SECURITY_CENTER"),
+    ("fionasforest", "FIONA_FOREST"),
+    ("fionasforestcampfire", "FIONA_FOREST_CAMPFIRE"),
+    ("fionasshrine", "FIONAS_SHRINE"),
+    ("fionasvilla", "FIONAS_VILLA"),
+    ("flyingepoch", "FLYING_EPOCH"),
+    ("forestmaze", "FOREST_MAZE"),
+    ("forestruins", "FOREST_RUINS"),
+    ("frogsburrow", "FROGS_BURROW"),
+    ("gatoexhibit", "GATO_EXHIBIT"),
+    ("genodomeconveyor", "GENO_DOME_CONVEYOR"),
+    ("genodomeentrance", "GENO_DOME_ENTRANCE"),
+    ("genodomelabs", "GENO_DOME_LABS"),
+    ("genodomelongcorridor", "GENO_DOME_LONG_CORRIDOR"),
+    ("genodomemainframe", "GENO_DOME_MAINFRAME"),
+    ("genodomewastedisposal", "GENO_DOME_WASTE_DISPOSAL"),
+    ("giantsclawcaverns", "GIANTS_CLAW_CAVERNS"),
+    ("giantsclawlairentrance", "GIANTS_CLAW_LAIR_ENTRANCE"),
+    ("giantsclawlasttyrano", "GIANTS_CLAW_TYRANO"),
+    ("giantsclawthrone", "GIANTS_CLAW_LAIR_THRONEROOM"),
+    ("guardiabarracks1000", "GUARDIA_BARRACKS_1000"),
+    ("guardiabasement", "GUARDIA_BASEMENT"),
+    ("guardiacourttower", "GUARDIA_LAWGIVERS_TOWER"),
+    ("guardiaforest1000", "GUARDIA_FOREST_1000"),
+    ("guardiaforest600", "GUARDIA_FOREST_600"),
+    ("guardiaforestdeadend", "GUARDIA_FOREST_DEAD_END"),
+    ("guardiakingstower1000", "GUARDIA_KINGS_TOWER_1000"),
+    ("guardiakingstower600", "GUARDIA_KINGS_TOWER_600"),
+    ("guardiakitchen1000", "GUARDIA_KITCHEN_1000"),
+    ("guardiakitchen600", "GUARDIA_KITCHEN_600"),
+    ("guardiaqueenschamber600", "QUEENS_ROOM_600"),
+    ("guardiarearstorage", "GUARDIA_REAR_STORAGE"),
+    ("guardiathrone1000", "GUARDIA_THRONEROOM_1000"),
+    ("guardiathrone600", "GUARDIA_THRONEROOM_600"),
+    ("hallofmammonm", "ZEAL_PALACE_HALL_OF_MAMMON"),
+    ("heckrancavepassageways", "HECKRAN_CAVE_PASSAGEWAYS"),
+    ("heckranentrance", "HECKRAN_CAVE_ENTRANCE"),
+    ("heckranundergroundriver", "HECKRAN_CAVE_UNDERGROUND_RIVER"),
+    ("herosgrave", "NORTHERN_RUINS_HEROS_GRAVE"),
+    ("huntingrange", "HUNTING_RANGE"),
+    ("iokasweetwaterhut", "IOKA_SWEETWATER_HUT"),
+    ("iokatradingpost", "IOKA_TRADING_POST"),
+    ("kajar", "KAJAR"),
+    ("kajarbalthasarstudy", "KAJAR_ROCK_ROOM"),
+    ("kajarmagiclab", "KAJAR_MAGIC_LAB"),
+    ("keepersdome", "KEEPERS_DOME"),
+    ("keepersdomecorridor", "KEEPERS_DOME_CORRIDOR"),
+    ("keepersdomehangar", "KEEPERS_DOME_HANGAR"),
+    ("lab32east", "LAB_32_EAST"),
+    ("lab32west", "LAB_32_WEST"),
+    ("lairruinsportal", "LAIR_RUINS_PORTAL"),
+    ("landbridge_enhasa_n", "LAND_BRIDGE_ENHASA_N"),
+    ("larasroom", "LARAS_ROOM"),
+    ("larubaruins", "LARUBA_RUINS"),
+    ("lastvillagecommons", "LAST_VILLAGE_COMMONS"),
+    ("lastvillageemptyhut", "LAST_VILLAGE_EMPTY_HUT"),
+    ("lastvillageshop", "LAST_VILLAGE_SHOP"),
+    ("lavos", "LAVOS"),
+    ("lavostunnel", "LAVOS_TUNNEL"),
+    ("leenesquare", "LEENE_SQUARE"),
+    ("loadscreen", "LOAD_SCREEN"),
+    ("luccasroom", "LUCCAS_ROOM"),
+    ("luccasworkshop", "LUCCAS_WORKSHOP"),
+    ("magiccaveexterior", "MAGIC_CAVE_EXTERIOR"),
+    ("magiccaveexterioropen", "MAGIC_CAVE_EXTERIOR_OPEN"),
+    ("magiccaveinterior", "MAGIC_CAVE_INTERIOR"),
+    ("maguscastlechamberguillotines", "MAGUS_CASTLE_GUILLOTINES"),
+    ("maguscastlechamberpits", "MAGUS_CASTLE_PITS"),
+    ("maguscastledungeon", "MAGUS_CASTLE_DUNGEON"),
+    ("maguscastleexterior", "MAGUS_CASTLE_EXTERIOR"),
+    ("maguscastlegrandstairwell", "MAGUS_CASTLE_GRAND_STAIRWAY"),
+    ("maguscastlehallaggression", "MAGUS_CASTLE_HALL_AGGRESSION"),
+    ("maguscastlehallapprehension", "MAGUS_CASTLE_HALL_APPREHENSION"),
+    ("maguscastlehalldeceit", "MAGUS_CASTLE_HALL_DECEIT"),
+    ("maguscastleinnersanctum", "MAGUS_CASTLE_INNER_SANCTUM"),
+    ("maguscastlepits", "MAGUS_CASTLE_PITS"),
+    ("maguscastlethronedefense", "MAGUS_CASTLE_OZZIE"),
+    ("maguscastlethronemagic", "MAGUS_CASTLE_FLEA"),
+    ("maguscastlethronestrength", "MAGUS_CASTLE_SLASH"),
+    ("manoriacommand", "MANORIA_COMMAND"),
+    ("manoriaconfinement", "MANORIA_CONFINEMENT"),
+    ("manoriahq", "MANORIA_HEADQUARTERS"),
+    ("manoriakitchen", "MANORIA_KITCHEN"),
+    ("manoriamainhall", "MANORIA_MAIN_HALL"),
+    ("manoriaroyalguardhall", "MANORIA_ROYAL_GUARD_HALL"),
+    ("manoriasanctuary", "MANORIA_SANCTUARY"),
+    ("manoriashineante", "MANORIA_SHRINE_ANTECHAMBER"),
+    ("manoriashrine", "MANORIA_SHRINE"),
+    ("manoriastorage", "MANORIA_STORAGE"),
+    ("medinaportal", "MEDINA_PORTAL"),
+    ("medinasquare", "MEDINA_SQUARE"),
+    ("melchoirskitchen", "MELCHIORS_KITCHEN"),
+    ("millennialfair", "MILLENNIAL_FAIR"),
+    ("mtwoeosummit", "MT_WOE_SUMMIT"),
+    ("mtwoeuppereastface", "MT_WOE_UPPER_EASTERN_FACE"),
+    ("mysticmtnbase", "MYSTIC_MTN_BASE"),
+    ("mysticmtngulch", "MYSTIC_MTN_GULCH"),
+    ("mysticmtnportal", "MYSTIC_MTN_PORTAL"),
+    ("northcape", "NORTH_CAPE"),
+    ("northernruinsantechamber", "NORTHERN_RUINS_ANTECHAMBER"),
+    ("northernruinsbackroom", "NORTHERN_RUINS_BACK_ROOM"),
+    ("northernruinsbasement", "NORTHERN_RUINS_BASEMENT"),
+    ("northernruinslanding", "NORTHERN_RUINS_LANDING"),
+    ("oceanpalaceb20landing", "OCEAN_PALACE_B20_LANDING"),
+    ("oceanpalaceb3landing", "OCEAN_PALACE_B3_LANDING"),
+    ("oceanpalaceeastlift", "OCEAN_PALACE_EASTERN_ACCESS_LIFT"),
+    ("oceanpalaceentrance", "OCEAN_PALACE_ENTRANCE"),
+    ("oceanpalaceforwardarea", "OCEAN_PALACE_FORWARD_AREA"),
+    ("oceanpalacegrandstairwell", "OCEAN_PALACE_GRAND_STAIRWELL"),
+    ("oceanpalacepiazza", "OCEAN_PALACE_PIAZZA"),
+    ("oceanpalaceregalantechamber", "OCEAN_PALACE_REGAL_ANTECHAMBER"),
+    ("oceanpalacesecurityesplanade", "OCEAN_PALACE_SECURITY_ESPLANADE"),
+    ("oceanpalacesecuritypool", "OCEAN_PALACE_SECURITY_POOL"),
+    ("oceanpalacesiderooms", "OCEAN_PALACE_SIDE_ROOMS"),
+    ("oceanpalacethroneroom", "OCEAN_PALACE_THRONE"),
+    ("oceanpalacewestlift", "OCEAN_PALACE_WESTERN_ACCESS_LIFT"),
+    ("ozziesfortchains", "OZZIES_FORT_HALL_DISREGARD"),
+    ("ozziesfortentrance", "OZZIES_FORT_ENTRANCE"),
+    ("ozziesfortflea", "OZZIES_FORT_FLEA_PLUS"),
+    ("ozziesfortguillotine", "OZZIES_FORT_GUILLOTINE"),
+    ("ozziesfortguillotines", "OZZIES_FORT_GUILLOTINE"),
+    ("ozziesfortlaststand", "OZZIES_FORT_LAST_STAND"),
+    ("ozziesfortslash", "OZZIES_FORT_SUPER_SLASH"),
+    ("ozziesfortthrone", "OZZIES_FORT_THRONE_INCOMPETENCE"),
+    ("porreelder", "PORRE_ELDER"),
+    ("porreinn600", "PORRE_INN_600"),
+    ("porremarket600", "PORRE_MARKET_600"),
+    ("porremayor1f", "PORRE_MAYOR_1F"),
+    ("porremayor2f", "PORRE_MAYOR_2F"),
+    ("porreticketoffice", "PORRE_TICKET_OFFICE"),
+    ("prehistoriccanyon", "PREHISTORIC_CANYON"),
+    ("prisoncatwalks", "PRISON_CATWALKS"),
+    ("prisoncells", "PRISON_CELLS"),
+    ("prisonexterior", "PRISON_EXTERIOR"),
+    ("prisonstairwells", "PRISON_STAIRWELLS"),
+    ("prisonsupervisor", "PRISON_SUPERVISORS_OFFICE"),
+    ("prisontorturestorage", "PRISON_TORTURE_STORAGE_ROOM"),
+    ("protodome", "PROTO_DOME"),
+    ("protodomeportal", "PROTO_DOME_PORTAL"),
+    ("rebornepoch", "REBORN_EPOCH"),
+    ("reptiteazalaroom", "REPTITE_LAIR_AZALA_ROOM"),
+    ("reptiteburrowb1", "REPTITE_LAIR_WEEVIL_BURROWS_B1"),
+    ("reptiteburrowb2", "REPTITE_LAIR_WEEVIL_BURROWS_B2"),
+    ("reptitelair1f", "REPTITE_LAIR_1F"),
+    ("reptitelair2f", "REPTITE_LAIR_2F"),
+    ("reptitelaircommons", "REPTITE_LAIR_COMMONS"),
+    ("sewersb1", "SEWERS_B1"),
+    ("skyway_enhasa_n", "SKYWAY_ENHASA_N"),
+    ("skyway_enhasa_s", "SKYWAY_ENHASA_S"),
+    ("skyway_kajar", "SKYWAY_KAJAR"),
+    ("snailstop", "SNAIL_STOP"),
+    ("specialpurpose", "SPECIAL_PURPOSE_AREA"),
+    ("spekkio", "SPEKKIO"),
+    ("sunkeep2300", "SUN_KEEP_2300"),
+    ("sunkeep600", "SUN_KEEP_600"),
+    ("sunkeeplastvillage", "SUN_KEEP_LAST_VILLAGE"),
+    ("sunkeepprehistory", "SUN_KEEP_65MBC"),
+    ("sunkeeppresent", "SUN_KEEP_1000"),
+    ("sunkendesertb1", "SUNKEN_DESERT_PARASITES"),
+    ("sunkendesertb2", "SUNKEN_DESERT_DEVOURER"),
+    ("sunpalace", "SUN_PALACE"),
+    ("tatashouse1f", "TATAS_HOUSE_1F"),
+    ("telepodexhibit", "TELEPOD_EXHIBIT"),
+    ("tranndome", "TRANN_DOME"),
+    ("tranndomesealedroom", "TRANN_DOME_SEALED_ROOM"),
+    ("truceinn1000", "TRUCE_INN_1000"),
+    ("truceinn6002f", "TRUCE_INN_600_2F"),
+    ("trucemarket1000", "TRUCE_MARKET"),
+    ("trucemayor2f", "TRUCE_MAYOR_2F"),
+    ("truceportal", "TRUCE_CANYON_PORTAL"),
+    ("truceticketoffice", "TRUCE_TICKET_OFFICE"),
+    ("tyranolairantechambers", "TYRANO_LAIR_ANTECHAMBERS"),
+    ("tyranolairentrance", "TYRANO_LAIR_ENTRANCE"),
+    ("tyranolairkeep", "TYRANO_LAIR_KEEP"),
+    ("tyranolairmaincell", "TYRANO_LAIR_MAIN_CELL"),
+    ("tyranolairstorage", "TYRANO_LAIR_STORAGE"),
+    ("tyranolairthroneroom", "TYRANO_LAIR_THRONEROOM"),
+    ("westcape", "WEST_CAPE"),
+    ("zealpalace", "ZEAL_PALACE"),
+    ("zealpalaceregalhall", "ZEAL_PALACE_REGAL_HALL"),
+    ("zealpalacethronenight", "ZEAL_PALACE_THRONE_NIGHT"),
+    ("zealschalasroom", "ZEAL_PALACE_SCHALAS_ROOM"),
+    ("zealteleporters", "ZEAL_TELEPORTERS"),
+    ("zenanbridge600", "ZENAN_BRIDGE_600"),
+)
@@ -0,0 +1,345 @@
+"""Generate many seeds with the same settings."""
+import collections
+import concurrent.futures
+from concurrent.futures.process import BrokenProcessPool
+import contextlib
+import copy
+import dataclasses
+import io
+import json
+import os
+import pathlib
+import random
+import tempfile
+import time
+import traceback
+import typing
+from typing import Callable
+
+from ctrando import randomizer
+from ctrando.arguments import arguments
+from ctrando.common import ctrom, tracing
+
+
+@dataclasses.dataclass
+class SeedResult:
+    """Outcome of generating a single seed in a batch."""
+    seed: str
+    rom_path: pathlib.Path | None = None
+    spoiler_path: pathlib.Path | None = None
+    config_time: float | None = None
+    rom_time: float | None = None
+    total_time: float | None = None
+    error: str | None = None
+
+    def to_jsonable(self) -> dict:
+        ret_dict = dataclasses.asdict(self)
+        for key in ("rom_path", "spoiler_path"):
+            if ret_dict[key] is not None:
+                ret_dict[key] = str(ret_dict[key])
+        return ret_dict
+
+
+@dataclasses.dataclass
+class _BatchState:
+    """State shared by every seed in a batch.  Built once, then given to workers."""
+    settings: arguments.Settings
+    vanilla_image: ctrom.RomImage
+    cache_directory: pathlib.Path
+    output_directory: pathlib.Path
+
+
+_worker_state: _BatchState | None = None
+
+
+def get_batch_seeds(general_options: arguments.GeneralOptions) -> list[str]:
+    """
+    Get the list of seeds to generate from --seed-list or --batch.
+    """
+    if general_options.seed_list is not None:
+        lines = general_options.seed_list.read_text().splitlines()
+        seeds = [line.strip() for line in lines if line.strip()]
+        if not seeds:
+            raise ValueError("Seed list is empty")
+        return seeds
+
+    if general_options.batch is None:
+        return [general_options.seed]
+
+    base_seed = general_options.seed
+    if base_seed is None:
+        base_seed = "".join(random.choices("0123456789ABCDEF", k=16))
+
+    width = len(str(general_options.batch - 1))
+    return [
+        f"{base_seed}-{index:0{width}d}" for index in range(general_options.batch)
+    ]
+
+
+def _get_seed_file_stem(seed: str) -> str:
+    """Make a seed safe to use in a file name."""
+    return "".join(
+        char if char.isalnum() or char in "-_" else "_"
+        for char in seed
+    )
+
+
+def get_seed_file_stems(seeds: list[str]) -> list[str]:
+    """
+    Get a distinct file stem for each seed.  Seeds whose safe names collide
+    (ignoring case, for case-insensitive file systems) get their index in
+    seeds appended.
+    """
+    stems = [_get_seed_file_stem(seed) for seed in seeds]
+    counts = collections.Counter(stem.lower() for stem in stems)
+    used: set[str] = set()
+    ret: list[str] = []
+    for index, stem in enumerate(stems):
+        if counts[stem.lower()] > 1:
+            stem = f"{stem}-{index}"
+            while stem.lower() in used or counts[stem.lower()]:
+                stem += "_"
+        used.add(stem.lower())
+        ret.append(stem)
+
+    return ret
+
+
+def _init_worker(state: _BatchState):
+    global _worker_state
+    _worker_state = state
+    # Forked workers would keep recording into a copy of the parent's tracer
+    # which is never written.
+    tracing.disable()
+
+
+def _generate_seed(seed: str, stem: str) -> SeedResult:
+    """
+    Generate one seed using the shared batch state.  Output file names are
+    made from stem.
+    """
+    state = _worker_state
+    if state is None:
+        raise ValueError("Batch worker was not initialized")
+
+    result = SeedResult(seed)
+    start = time.time()
+    try:
+        settings = copy.deepcopy(state.settings)
+        settings.general_options.seed = seed
+
+        # The generation code reports progress on stdout.  Many seeds at once
+        # would just interleave, so keep it quiet.
+        with contextlib.redirect_stdout(io.StringIO()):
+            config = randomizer.get_random_config(
+                settings, state.vanilla_image.fork()
+            )
+            config_done = time.time()
+            result.config_time = config_done - start
+
+            out_rom = randomizer.get_ctrom_from_config(
+                state.vanilla_image.fork(), settings, config,
+                make_tf_friendly=True,
+                cache_directory=state.cache_directory
+            )
+            result.rom_time = time.time() - config_done
+
+        result.rom_path = randomizer.write_output_rom(
+            out_rom, state.vanilla_image.getbuffer(),
+            settings.general_options.output_format,
+            state.output_directory / f"ct-mod-{stem}"
+        )
+
+        spoiler_path = state.output_directory / f"ct-mod-{stem}-spoilers.txt"
+        randomizer.write_spoilers(settings, config, spoiler_path)
+        result.spoiler_path = spoiler_path
+    except Exception:  # Record the failure and keep the rest of the batch going.
+        result.error = traceback.format_exc()
+
+    result.total_time = time.time() - start
+    return result
+
+
+def _get_future_result(
+        future: concurrent.futures.Future,
+        seed: str
+) -> SeedResult:
+    try:
+        return future.result()
+    except Exception:  # Failures outside _generate_seed's own try.
+        return SeedResult(seed, error=traceback.format_exc())
+
+
+def _run_seeds_isolated(
+        seed_stems: list[tuple[str, str]],
+        jobs: int,
+        state: _BatchState,
+        report: Callable[[SeedResult], typing.Any],
+        generate_seed: Callable[[str, str], SeedResult]
+):
+    """
+    Run each seed in a pool of its own, at most jobs at a time.  A worker
+    which dies then only fails its own seed.
+    """
+    pending = list(seed_stems)
+    running: dict[concurrent.futures.Future,
+                  tuple[str, concurrent.futures.ProcessPoolExecutor]] = {}
+    try:
+        while pending or running:
+            while pending and len(running) < jobs:
+                seed, stem = pending.pop(0)
+                executor = concurrent.futures.ProcessPoolExecutor(
+                    max_workers=1, initializer=_init_worker, initargs=(state,)
+                )
+                running[executor.submit(generate_seed, seed, stem)] = \
+                    (seed, executor)
+
+            done, _ = concurrent.futures.wait(
+                running, return_when=concurrent.futures.FIRST_COMPLETED
+            )
+            for future in done:
+                seed, executor = running.pop(future)
+                executor.shutdown()
+                report(_get_future_result(future, seed))
+    finally:
+        for _, executor in running.values():
+            executor.shutdown(cancel_futures=True)
+
+
+def run_seeds(
+        seeds: list[str],
+        stems: list[str],
+        jobs: int,
+        state: _BatchState,
+        report: Callable[[SeedResult], typing.Any],
+        generate_seed: Callable[[str, str], SeedResult] = _generate_seed
+):
+    """
+    Generate each seed with generate_seed(seed, stem) and report its result.
+
+    With more than one job the seeds run in a process pool.  If a worker
+    dies, the pool is broken and every seed without a result fails with
+    BrokenProcessPool.  Those seeds are then run again, each in a pool of
+    its own, so only the seed which kills its worker is reported as failed.
+    """
+    if jobs == 1:
+        _init_worker(state)
+        for seed, stem in zip(seeds, stems):
+            report(generate_seed(seed, stem))
+        return
+
+    broken: list[tuple[str, str]] = []
+    with concurrent.futures.ProcessPoolExecutor(
+            max_workers=jobs,
+            initializer=_init_worker,
+            initargs=(state,)
+    ) as executor:
+        future_seeds = {
+            executor.submit(generate_seed, seed, stem): (seed, stem)
+            for seed, stem in zip(seeds, stems)
+        }
+        for future in concurrent.futures.as_completed(future_seeds):
+            if isinstance(future.exception(), BrokenProcessPool):
+                broken.append(future_seeds[future])
+            else:
+                report(_get_future_result(future, future_seeds[future][0]))
+
+    if broken:
+        print(f"A worker died.  Retrying {len(broken)} seeds in separate "
+              f"processes.")
+        # Keep the requested order for the retries.
+        order = {seed_stem: index
+                 for index, seed_stem in enumerate(zip(seeds, stems))}
+        broken.sort(key=lambda x: order[x])
+        _run_seeds_isolated(broken, jobs, state, report, generate_seed)
+
+
+def write_manifest(
+        results: list[SeedResult],
+        total_time: float,
+        path: pathlib.Path
+):
+    """Write a json summary of the batch."""
+    failures = [result.seed for result in results if result.error is not None]
+    manifest = {
+        "num_seeds": len(results),
+        "num_failures": len(failures),
+        "failed_seeds": failures,
+        "total_time": total_time,
+        "seeds": [result.to_jsonable() for result in results]
+    }
+
+    with open(path, "w") as outfile:
+        json.dump(manifest, outfile, indent=2)
+
+
+def run_batch(
+        settings: arguments.Settings,
+        seeds: list[str],
+        jobs: int | None = None,
+) -> list[SeedResult]:
+    """
+    Generate a rom and spoiler log for each seed with the given settings.
+
+    The vanilla rom is read and the settings-free patches and openworld
+    scripts are applied (or loaded from the prepatch cache) once.  Seeds are
+    then generated in a process pool with each worker starting from that
+    shared state.
+    """
+    general_options = settings.general_options
+    if general_options.input_file is None:
+        raise ValueError("No input rom specified")
+
+    output_directory = general_options.output_directory
+    if output_directory is None:
+        output_directory = general_options.input_file.parent
+    output_directory.mkdir(parents=True, exist_ok=True)
+
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+    jobs = min(jobs, len(seeds))
+
+    batch_start = time.time()
+    vanilla_rom = ctrom.CTRom.from_file(str(general_options.input_file))
+
+    # Workers get the base-patched state through the prepatch cache.  Use a
+    # throwaway cache if the real one is turned off.
+    with contextlib.ExitStack() as stack:
+        cache_directory = general_options.get_cache_directory()
+        if cache_directory is None:
+            cache_directory = pathlib.Path(
+                stack.enter_context(tempfile.TemporaryDirectory())
+            )
+
+        print("Preparing Base Patch...", end="")
+        a = time.time()
+        randomizer.get_prepatched_state(vanilla_rom, cache_directory, jobs)
+        b = time.time()
+        print(f"({b-a})")
+
+        state = _BatchState(
+            settings, vanilla_rom.get_image(), cache_directory,
+            output_directory
+        )
+
+        results: list[SeedResult] = []
+
+        def report(result: SeedResult):
+            results.append(result)
+            status = "ok" if result.error is None else "FAILED"
+            time_str = "" if result.total_time is None \
+                else f" ({result.total_time:.2f})"
+            print(f"[{len(results)}/{len(seeds)}] {result.seed}: {status}"
+                  f"{time_str}")
+
+        run_seeds(seeds, get_seed_file_stems(seeds), jobs, state, report)
+
+    # Keep the manifest in the order the seeds were requested.
+    seed_order = {seed: index for index, seed in enumerate(seeds)}
+    results.sort(key=lambda x: seed_order[x.seed])
+
+    manifest_path = output_directory / "batch-manifest.json"
+    write_manifest(results, time.time() - batch_start, manifest_path)
+    print(f"Wrote manifest to {manifest_path}")
+
+    return results
@@ -4,7 +4,8 @@ import typing
 
 from ctrando.base import openworldutils as owu
 from ctrando.bosses import bossrandoutils as bru, bosstypes
-from ctrando.locations.eventcommand import EventCommand as EC, FuncSync as FS, get_command, Operation as OP
+from ctrando.locations.eventcommand import EventCommand as EC, FuncSync as FS, get_command, \
+    get_command_length, Operation as OP
 from ctrando.locations.locationevent import FunctionID as FID, LocationEvent
 from ctrando.locations.eventfunction import EventFunction as EF
 from ctrando.objectives import objectivetypes as oty
@@ -682,7 +683,7 @@ def assign_black_omen_giga_mutant_boss(
         EC.call_obj_function(0xD, FID.ARBITRARY_0, 3, FS.CONT),
         script.get_function_start(0xA, FID.ACTIVATE)
     )
-    pos += len(get_command(script.data, pos))
+    pos += get_command_length(script.data, pos)
     script.insert_commands(new_cmds.get_bytearray(), pos)
 
 
@@ -2,12 +2,16 @@
 Static scaling for bosses.
 """
 import copy
+import typing
 
 from ctrando.bosses import bosstypes
-from ctrando.common import ctenums
+from ctrando.common import ctenums, romtable
 from ctrando.enemyai import enemyaitypes as aity, enemyaimanager as aim
 from ctrando.enemydata import enemystats
 
+if typing.TYPE_CHECKING:
+    import numpy
+
 
 def modify_hp_checks(ai_script: aity.EnemyAIScript, scale_factor: float):
     """
@@ -50,6 +54,10 @@ def scale_boss_hp(
         bosstypes.BossID.LAVOS_CORE
     ]
     boss_ids = list(bosstypes.BossID)
+    stat_arrays = enemystats.get_stat_arrays(enemy_data)
+    # Parts in the order they are scaled.  A part in several bosses is scaled
+    # once for each.
+    scaled_part_ids: list[ctenums.EnemyID] = []
     for boss_id in bosstypes.BossID:
         if boss_id in midboss_ids and not include_midbosses:
             continue
@@ -70,13 +78,41 @@ def scale_boss_hp(
         scheme = bosstypes.get_default_scheme(boss_id)
         part_ids: set[ctenums.EnemyID] = {part.enemy_id for part in scheme.parts}
         for part_id in part_ids:
-            hp = round(enemy_data[part_id].hp*scale_factor)
-            hp = sorted([1, hp, 0x7FFF])[1]
-            enemy_data[part_id].hp = hp
+            if stat_arrays is None:
+                hp = round(enemy_data[part_id].hp*scale_factor)
+                hp = sorted([1, hp, 0x7FFF])[1]
+                enemy_data[part_id].hp = hp
+            else:
+                if part_id not in enemy_data:
+                    raise KeyError(part_id)
+                scaled_part_ids.append(part_id)
 
             ai_script = ai_manager.script_dict[part_id]
             modify_hp_checks(ai_script, scale_factor)
 
+    if scaled_part_ids:
+        _scale_hp_array(stat_arrays[1], scaled_part_ids, scale_factor)
+
+
+def _scale_hp_array(
+        stats: "numpy.ndarray",
+        part_ids: list[ctenums.EnemyID],
+        scale_factor: float
+):
+    """
+    Scale the hp of each part in the stat records once per time it appears
+    in part_ids.  rint rounds halves to even like round, so this matches
+    scaling the EnemyStats one at a time.
+    """
+    np = romtable.np
+    part_ids_arr, counts = np.unique(np.array(part_ids, dtype=np.intp),
+                                     return_counts=True)
+    for num_scaled in range(counts.max()):
+        ids = part_ids_arr[counts > num_scaled]
+        stats["hp"][ids] = np.clip(
+            np.rint(stats["hp"][ids]*scale_factor), 1, 0x7FFF
+        )
+
 
 def _get_block_with_cond(
         ai_script: list[aity.EnemyAIScriptBlock],
@@ -1,8 +1,9 @@
 """Module for setting character stats."""
 from dataclasses import dataclass
 
-from ctrando.common import ctenums
+from ctrando.common import ctenums, romtable
 from ctrando.characters import ctpcstats
+from ctrando.enemydata import enemystats
 from ctrando.enemydata.enemystats import EnemyStats
 
 def fill_vanilla_tp_gaps(pc_stat_man: ctpcstats.PCStatsManager):
@@ -35,11 +36,27 @@ def scale_tp(pc_stat_man: ctpcstats.PCStatsManager,
              scale_factor: float):
     """Scale TP gain by altering required tp to gain a tech level."""
     if abs(scale_factor) < 0.25:
+        stat_arrays = enemystats.get_stat_arrays(enemy_data_dict)
+        if stat_arrays is not None:
+            enemy_ids, _, rewards = stat_arrays
+            rewards["tp"][enemy_ids] = 0
+            return
+
         for enemy_id, stats in enemy_data_dict.items():
             stats.tp = 0
     else:
         for char_id in ctenums.CharID:
             tp_thresh = pc_stat_man.pc_stat_dict[char_id].tp_thresholds
+            if romtable.HAS_NUMPY:
+                # rint rounds halves to even like round.
+                new_tp_reqs = romtable.np.rint(
+                    tp_thresh.get_array()/scale_factor
+                )
+                # Out of range values are left for set_threshold to reject.
+                if ((new_tp_reqs >= 0) & (new_tp_reqs <= 0xFFFF)).all():
+                    tp_thresh.get_array()[:] = new_tp_reqs
+                    continue
+
             for tech_level in range(8):
                 tp_req = tp_thresh.get_threshold(tech_level)
                 new_tp_req = round(tp_req/scale_factor)
@@ -8,7 +8,10 @@ from enum import auto
 from typing import Optional
 
 from ctrando.items import itemdata
-from ctrando.common import ctenums, ctrom, cttypes as ctt
+from ctrando.common import ctenums, ctrom, cttypes as ctt, romtable
+
+if typing.TYPE_CHECKING:
+    import numpy
 
 
 class PCStat(ctenums.StrIntEnum):
@@ -226,6 +229,13 @@ class TPThresholds(ctt.BinaryData):
         new_thresh_b = new_thresh.to_bytes(2, 'little')
         self[tech_level * 2:tech_level * 2 + 2] = new_thresh_b
 
+    def get_array(self) -> numpy.ndarray:
+        """
+        Get the thresholds as an array indexed by tech level.  Changing the
+        array changes the thresholds.  Raises ValueError without NumPy.
+        """
+        return romtable.get_word_array(self)
+
     def __str__(self):
         return ' '.join(f'{self.get_threshold(i):04X}' for i in range(8))
 
@@ -249,6 +259,13 @@ class XPThreshholds(ctt.BinaryData):
         """
         self[2 * level: 2 * level + 2] = xp_amount.to_bytes(2, 'little')
 
+    def get_array(self) -> numpy.ndarray:
+        """
+        Get the xp for each level as an array indexed by level.  Changing the
+        array changes the thresholds.  Raises ValueError without NumPy.
+        """
+        return romtable.get_word_array(self)
+
     def get_cum_xp_for_level(self, level: int) -> int:
         """
         Get XP needed to go from 1 to level.
@@ -4,7 +4,10 @@ Module for basic operations on a Chrono Trigger ROM.
 import enum
 import hashlib
 import io
+import mmap
+import os
 import pathlib
+import tempfile
 import typing
 
 from ctrando.common import freespace
@@ -43,6 +46,22 @@ class CTRom(freespace.FSRom):
 
         return cls(rom_bytes, ignore_checksum)
 
+    def get_image(self) -> "RomImage":
+        """
+        Get a read-only snapshot of the rom (contents, free space, and
+        offset registry).  This copies the rom once.  Every fork of the
+        snapshot after that is free.
+        """
+        return RomImage(self.getbuffer(), self.space_manager,
+                        self.offset_registry)
+
+    def fork(self) -> "ForkedCTRom":
+        """
+        Get an independent copy of this rom.  Use get_image() instead when
+        the same state is forked more than once.
+        """
+        return self.get_image().fork()
+
     @staticmethod
     def validate_ct_rom_file(filename: str) -> bool:
         with open(filename, "rb") as infile:
@@ -320,6 +339,227 @@ class CTRom(freespace.FSRom):
             # print(f'Wrote {len(payload):04X} bytes to {addr:06X}')
 
 
+def _get_anonymous_file() -> typing.BinaryIO:
+    if hasattr(os, "memfd_create"):
+        return open(os.memfd_create("ctrom"), "w+b")
+    return tempfile.TemporaryFile()
+
+
+class RomImage:
+    """
+    Read-only snapshot of a CTRom which can be forked cheaply.
+
+    The contents are stored once in an anonymous file.  Each fork maps the
+    file copy-on-write, so forks share the image's memory and the operating
+    system copies a page only when a fork writes to it.  Forking does not
+    copy the rom, and the free space is copied without deepcopy.
+    """
+    def __init__(
+            self,
+            rom: typing.ByteString,
+            space_manager: freespace.FreeSpace | None = None,
+            offset_registry: dict[str, int] | None = None
+    ):
+        if space_manager is None:
+            # Same as a new CTRom: everything is in use.
+            space_manager = freespace.FreeSpace(len(rom), False)
+        if offset_registry is None:
+            offset_registry = {}
+
+        self._file = _get_anonymous_file()
+        self._file.write(rom)
+        self._file.flush()
+        self._map = mmap.mmap(self._file.fileno(), len(rom),
+                              access=mmap.ACCESS_READ)
+
+        self._space_manager = space_manager.copy()
+        self._offset_registry = dict(offset_registry)
+
+    def __len__(self) -> int:
+        return len(self._map)
+
+    def getbuffer(self) -> memoryview:
+        """Get a read-only view of the image's contents."""
+        return memoryview(self._map)
+
+    def __reduce__(self):
+        return (RomImage,
+                (self._map[:], self._space_manager, self._offset_registry))
+
+    def fork(self) -> "ForkedCTRom":
+        """Get a new rom with the image's contents."""
+        return ForkedCTRom(self)
+
+    def is_image_of(self, ct_rom: "ForkedCTRom") -> bool:
+        """
+        Whether ct_rom is a fork of this image which has not been changed.
+        A fork which has handed out getbuffer() counts as changed.
+        """
+        return (
+                ct_rom._image is self and
+                ct_rom.space_manager == self._space_manager and
+                ct_rom.offset_registry == self._offset_registry
+        )
+
+
+class ForkedCTRom(CTRom):
+    """
+    CTRom whose contents are a copy-on-write mapping of a RomImage.
+
+    It behaves like any other CTRom.  Every BytesIO method which touches the
+    buffer works on the mapping instead, and getbuffer() is a writable view
+    of the mapping.  Writes which extend the rom copy it to private memory.
+
+    Pickling (and so copy.deepcopy) gives a plain CTRom.
+    """
+    def __init__(self, image: RomImage):
+        # No CTRom.__init__.  The image was checked when it was made.
+        io.BytesIO.__init__(self)
+        self._image: RomImage | None = image
+        self._map = mmap.mmap(image._file.fileno(), len(image),
+                              access=mmap.ACCESS_COPY)
+        self._pos = 0
+        self.space_manager = image._space_manager.copy()
+        self.offset_registry = dict(image._offset_registry)
+
+    def __getstate__(self):
+        # The same state as BytesIO, so it can be set on a plain CTRom.
+        state = self.__dict__.copy()
+        for key in ("_image", "_map", "_pos"):
+            del state[key]
+        return self.getvalue(), self._pos, state
+
+    def __setstate__(self, state):
+        raise TypeError("ForkedCTRom can not be unpickled.  Use CTRom.")
+
+    def __reduce_ex__(self, protocol):
+        return _new_ctrom, (), self.__getstate__()
+
+    def get_image(self) -> RomImage:
+        if self._image is not None and self._image.is_image_of(self):
+            return self._image
+        return super().get_image()
+
+    def _resize(self, size: int):
+        """Move the contents to private memory of the given size."""
+        new_map = mmap.mmap(-1, size)
+        keep = min(size, len(self._map))
+        new_map[:keep] = self._map[:keep]
+        try:
+            self._map.close()
+        except BufferError:
+            new_map.close()
+            raise BufferError(
+                "Existing exports of data: object cannot be re-sized"
+            ) from None
+        self._map = new_map
+
+    def _write_raw(self, payload) -> int:
+        self._image = None
+        data = memoryview(payload).cast("B")
+        end = self._pos + len(data)
+        if end > len(self._map):
+            self._resize(end)
+        self._map[self._pos:end] = data
+        self._pos = end
+        return len(data)
+
+    def seek(self, pos: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            if pos < 0:
+                raise ValueError(f"negative seek value {pos}")
+        elif whence == io.SEEK_CUR:
+            pos += self._pos
+        elif whence == io.SEEK_END:
+            pos += len(self._map)
+        else:
+            raise ValueError(f"invalid whence ({whence}, should be 0, 1 or 2)")
+
+        self._pos = max(pos, 0)
+        return self._pos
+
+    def tell(self) -> int:
+        return self._pos
+
+    def read(self, size: int | None = -1) -> bytes:
+        start = min(self._pos, len(self._map))
+        if size is None or size < 0:
+            end = len(self._map)
+        else:
+            end = min(start + size, len(self._map))
+        self._pos = max(self._pos, end)
+        return self._map[start:end]
+
+    read1 = read
+
+    def readinto(self, buffer) -> int:
+        view = memoryview(buffer).cast("B")
+        data = self.read(len(view))
+        view[:len(data)] = data
+        return len(data)
+
+    readinto1 = readinto
+
+    def readline(self, size: int | None = -1) -> bytes:
+        start = min(self._pos, len(self._map))
+        end = self._map.find(b"\n", start)
+        end = len(self._map) if end < 0 else end + 1
+        if size is not None and size >= 0:
+            end = min(end, start + size)
+        self._pos = max(self._pos, end)
+        return self._map[start:end]
+
+    def readlines(self, hint: int | None = -1) -> list[bytes]:
+        lines: list[bytes] = []
+        total = 0
+        for line in self:
+            lines.append(line)
+            total += len(line)
+            if hint is not None and 0 < hint <= total:
+                break
+        return lines
+
+    def __iter__(self):
+        if self._map.closed:
+            raise ValueError("I/O operation on closed file.")
+        return self
+
+    def __next__(self) -> bytes:
+        line = self.readline()
+        if not line:
+            raise StopIteration
+        return line
+
+    def writelines(self, lines: typing.Iterable[bytes]):
+        for line in lines:
+            self.write(line)
+
+    def truncate(self, size: int | None = None) -> int:
+        if size is None:
+            size = self._pos
+        if size < len(self._map):
+            self._image = None
+            self._resize(size)
+        return size
+
+    def getbuffer(self) -> memoryview:
+        # Writes through the view can not be seen.  Assume there are some.
+        self._image = None
+        return memoryview(self._map)
+
+    def getvalue(self) -> bytes:
+        return self._map[:]
+
+    def close(self):
+        self._map.close()
+        io.BytesIO.close(self)
+
+
+def _new_ctrom() -> CTRom:
+    # An empty CTRom for unpickling into.
+    return CTRom.__new__(CTRom)
+
+
 def main():
     pass
 
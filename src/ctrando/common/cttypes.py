@@ -2,31 +2,52 @@
 Experimental module exploring better ways to represent binary data on ROM.
 """
 import abc
-import inspect
 import typing
 from typing import Optional
 
 from ctrando.common import byteops, ctenums, ctrom
 from ctrando.compression import ctcompression
 
+if typing.TYPE_CHECKING:
+    from ctrando.common import writeplanner
+
 ValFilter = typing.Callable[[typing.Any, int], int]
 # IntBase = typing.TypeVar('IntBase', bound=typing.Union[bool, int])
 IntBase = typing.Union[typing.Type[int], typing.Type[bool]]
 ByteOrder = typing.Literal['big', 'little']
 
 
+def _identity_filter(obj: typing.Any, val: int) -> int:
+    """The default filter.  Generated accessors leave out calls to it."""
+    return val
+
+
+def _compile_accessor(name: str, lines: list[str],
+                      namespace: dict[str, typing.Any],
+                      filename: str) -> typing.Callable:
+    """Compile a function with body lines and constants from namespace."""
+    source = '\n    '.join(lines)
+    exec(compile(source, filename, 'exec'), namespace)
+    return namespace[name]
+
+
 class BytesProp(property):
     """
     Implement masked byte getter/setters as an extension of property.  This
     allows for inspection of these types of properties.
+
+    The getter and setter are generated for the exact range, mask, and
+    filters of the property.  They do the same work as
+    byteops.get_masked_range/set_masked_range, but the shifts and masks are
+    constants, full masks are skipped, and default filters are not called.
     """
     def __init__(self, start_idx: int, num_bytes: int = 1,
                  mask: Optional[int] = None,
                  byteorder: ByteOrder = 'little',
                  is_signed: bool = False,
                  ret_type: IntBase = int,
-                 input_filter: ValFilter = lambda self, val: val,
-                 output_filter: ValFilter = lambda self, val: val):
+                 input_filter: ValFilter = _identity_filter,
+                 output_filter: ValFilter = _identity_filter):
         """
         Constructs a property for getting/setting a masked range in BinaryData.
 
@@ -48,12 +69,19 @@ class BytesProp(property):
 
         if mask is None:
             mask = (1 << 8*num_bytes) - 1
+        # Some callers pass a truthy non-bool here.
+        is_signed = bool(is_signed)
 
         # Store some state for fun (and the __str__ method)
         # Private because changing them won't change the underlying get/setter.
         self._start_idx = start_idx
         self._num_bytes = num_bytes
         self._mask = mask
+        self._byteorder = byteorder
+        self._is_signed = is_signed
+        self._ret_type = ret_type
+        self._input_filter = input_filter
+        self._output_filter = output_filter
 
         getter = self._make_getter(start_idx, num_bytes, mask, byteorder,
                                    is_signed, ret_type, output_filter)
@@ -69,15 +97,32 @@ class BytesProp(property):
         """
         Construct the getter function for a BytesProp.
         """
+        end = start_idx + num_bytes
+        shift = byteops.get_minimal_shift(mask)
+        lines = [
+            'def getter(obj):',
+            f'val = int.from_bytes(obj[{start_idx}:{end}], {byteorder!r})'
+        ]
+        if mask != (1 << 8*num_bytes) - 1:
+            lines.append(f'val = (val & {mask:#X}) >> {shift}')
+        if is_signed:
+            max_shift = byteops.get_maximal_shift(mask)
+            lines.append(f'if val & {1 << (max_shift-1):#X}:')
+            lines.append(f'    val -= {1 << max_shift:#X}')
+
+        if output_filter is not _identity_filter:
+            lines.append('val = output_filter(obj, val)')
+            lines.append('return ret_type(val)')
+        elif ret_type is int:
+            lines.append('return val')
+        else:
+            lines.append('return ret_type(val)')
 
-        def getter(obj):
-            val = byteops.get_masked_range(obj, start_idx,
-                                           num_bytes, mask, byteorder,
-                                           is_signed)
-            val = output_filter(obj, val)
-            return ret_type(val)
-
-        return getter
+        namespace = {'output_filter': output_filter, 'ret_type': ret_type}
+        return _compile_accessor(
+            'getter', lines, namespace,
+            f'<BytesProp getter {start_idx}:{end} {mask:#X}>'
+        )
 
     @staticmethod
     def _make_setter(start_idx: int, num_bytes: int, mask: int,
@@ -86,13 +131,53 @@ class BytesProp(property):
         """
         Construct the setter function for a BytesProp.
         """
-        def setter(obj, val):
-            val = int(val)
-            val = input_filter(obj, val)
-            byteops.set_masked_range(obj, start_idx, num_bytes,
-                                     mask, val, byteorder, is_signed)
+        end = start_idx + num_bytes
+        shift = byteops.get_minimal_shift(mask)
+        max_val = mask >> shift
+        min_val = 0
+        if is_signed:
+            max_val = max_val >> 1
+            min_val -= max_val + 1
+
+        # Same message as byteops.set_masked_range
+        error_message = (
+            f'Value must be in range({min_val:0{2*num_bytes}}, '
+            f'{max_val+1:0{2*num_bytes}X})'
+        )
+        full_mask = (1 << (num_bytes*8)) - 1
+        inv_mask = full_mask - mask
+
+        lines = ['def setter(obj, val):', 'val = int(val)']
+        if input_filter is not _identity_filter:
+            lines.append('val = input_filter(obj, val)')
+        lines.append('if val not in valid_range:')
+        lines.append('    raise ValueError(error_message)')
+
+        if mask == full_mask and not is_signed:
+            lines.append(
+                f'obj[{start_idx}:{end}] = '
+                f'val.to_bytes({num_bytes}, {byteorder!r})'
+            )
+        else:
+            lines.append(
+                f'cur_val = int.from_bytes(obj[{start_idx}:{end}], '
+                f'{byteorder!r}) & {inv_mask:#X}'
+            )
+            lines.append(f'cur_val |= val << {shift}')
+            lines.append(
+                f'obj[{start_idx}:{end}] = cur_val.to_bytes('
+                f'{num_bytes}, {byteorder!r}, signed={is_signed})'
+            )
 
-        return setter
+        namespace = {
+            'input_filter': input_filter,
+            'valid_range': range(min_val, max_val+1),
+            'error_message': error_message
+        }
+        return _compile_accessor(
+            'setter', lines, namespace,
+            f'<BytesProp setter {start_idx}:{end} {mask:#X}>'
+        )
 
     def __str__(self):
         """
@@ -113,8 +198,8 @@ def bytes_prop(start_idx: int, num_bytes: int = 1,
                byteorder: ByteOrder = 'little',
                is_signed: bool = False,
                ret_type: IntBase = int,
-               input_filter: ValFilter = lambda self, val: val,
-               output_filter: ValFilter = lambda self, val: val):
+               input_filter: ValFilter = _identity_filter,
+               output_filter: ValFilter = _identity_filter):
     return BytesProp(start_idx, num_bytes, mask, byteorder, is_signed,
                      ret_type, input_filter, output_filter)
 
@@ -124,8 +209,8 @@ def byte_prop(index: int,
               byteorder: ByteOrder = 'little',
               is_signed: bool = False,
               ret_type: IntBase = int,
-              input_filter: ValFilter = lambda self, val: val,
-              output_filter: ValFilter = lambda self, val: val):
+              input_filter: ValFilter = _identity_filter,
+              output_filter: ValFilter = _identity_filter):
     """
     Special case of a bytes_prop that uses only one byte.
     """
@@ -351,12 +436,23 @@ class CompressedAbsPtrTableRW:
     def read_data_from_ctrom(self,
                              ct_rom: ctrom.CTRom,
                              size: int | None = None,
-                             record_index: int = 0) -> bytes:
-        """Reads a data record from the CTRom."""
+                             record_index: int = 0,
+                             decompress_buffer: bytearray | None = None
+                             ) -> bytes:
+        """
+        Reads a data record from the CTRom.  Readers of many records can pass
+        the same decompress_buffer each time.
+        """
         ptr = self._get_ptr(ct_rom, record_index)
 
         # print(f'ptr: {ptr:06X}')
-        data = ctcompression.decompress(ct_rom.getbuffer(), ptr)
+        if decompress_buffer is None:
+            data = ctcompression.decompress(ct_rom.getbuffer(), ptr)
+        else:
+            data_len, _ = ctcompression.decompress_into(
+                ct_rom.getbuffer(), ptr, decompress_buffer
+            )
+            data = decompress_buffer[:data_len]
         if size is not None and len(data) != size:
             raise ValueError(f"Expected {size} bytes, read {len(data)}")
 
@@ -404,6 +500,31 @@ class CompressedAbsPtrTableRW:
         new_rom_ptr_b = int.to_bytes(byteops.to_rom_ptr(new_ptr), 3, 'little')
         ct_rom.write(new_rom_ptr_b, mark_used)
 
+    def plan_data_write(self,
+                        ct_rom: ctrom.CTRom,
+                        data: typing.ByteString,
+                        record_index: int,
+                        planner: 'writeplanner.WritePlanner',
+                        free_existing: bool = True):
+        """
+        Add a data record to a write plan.  The record is compressed with the
+        plan's other compressed blobs, and the pointer is set when the planner
+        writes.
+        """
+        if free_existing:
+            self.free_data_on_ct_rom(ct_rom, None, record_index)
+
+        ptr_addr = self._get_ptr_addr(ct_rom, record_index)
+
+        def set_ptr(ct_rom: ctrom.CTRom, new_ptr: int):
+            ct_rom.seek(ptr_addr)
+            new_rom_ptr_b = int.to_bytes(byteops.to_rom_ptr(new_ptr), 3,
+                                         'little')
+            ct_rom.write(new_rom_ptr_b,
+                         ctrom.freespace.FSWriteType.MARK_USED)
+
+        planner.add_compressed(data, set_ptr, 0)
+
 T = typing.TypeVar('T', bound='BinaryData')
 
 
@@ -417,21 +538,76 @@ class BinaryData(bytearray):
     SIZE: typing.Optional[int] = None
     ROM_RW: typing.Optional[RomRW] = None
 
-    @classmethod
-    def get_bytesprops(cls):
+    # BytesProps of the class by name, in definition order with base classes
+    # first.  Filled in as each subclass is created.
+    _BYTES_PROPS: typing.ClassVar[dict[str, BytesProp]] = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        props: dict[str, BytesProp] = {}
+        for base in reversed(cls.__mro__):
+            for name, value in vars(base).items():
+                if isinstance(value, BytesProp):
+                    props[name] = value
+                else:
+                    # Overridden by something which is not a BytesProp
+                    props.pop(name, None)
+
+        cls._BYTES_PROPS = props
+        cls._to_dict = cls._make_to_dict(props)
+
+    @staticmethod
+    def _make_to_dict(
+            props: dict[str, BytesProp]
+    ) -> typing.Callable[[typing.Any], dict[str, typing.Any]]:
         """
-        Dummy classmethod for inspecting BytesProp objects just to show how it
-        can be done.
+        Generate a function which calls every getter in one dict display
+        instead of looping over the properties.
         """
-        def is_bytesprop(x):
-            return isinstance(x, BytesProp)
+        namespace = {f'get_{ind}': prop.fget
+                     for ind, prop in enumerate(props.values())}
+        lines = ['def to_dict(obj):', 'return {']
+        lines.extend(f'    {name!r}: get_{ind}(obj),'
+                     for ind, name in enumerate(props))
+        lines.append('}')
+        return _compile_accessor('to_dict', lines, namespace,
+                                 '<BinaryData to_dict>')
+
+    def _to_dict(self) -> dict[str, typing.Any]:
+        return {}
 
-        bytes_props = [
-            name for (name, value)
-            in inspect.getmembers(cls, is_bytesprop)
-        ]
+    @classmethod
+    def get_bytesprops(cls) -> list[str]:
+        """Get the names of this class's BytesProps in sorted order."""
+        return sorted(cls._BYTES_PROPS)
+
+    def to_dict(self) -> dict[str, typing.Any]:
+        """Get the value of every BytesProp, in definition order."""
+        return self._to_dict()
+
+    def update_from_dict(self, values: typing.Mapping[str, typing.Any]):
+        """
+        Set the BytesProps named in values, in the order of values.  Raises
+        KeyError if a name is not a BytesProp of this class.
+        """
+        props = self._BYTES_PROPS
+        for name, val in values.items():
+            if name not in props:
+                raise KeyError(
+                    f'{type(self).__name__} has no BytesProp {name}'
+                )
+            props[name].fset(self, val)
 
-        return bytes_props
+    @classmethod
+    def from_dict(cls: typing.Type[T],
+                  values: typing.Mapping[str, typing.Any]) -> T:
+        """
+        Make a default instance with the BytesProps in values set.  The
+        inverse of to_dict.
+        """
+        ret = cls()
+        ret.update_from_dict(values)
+        return ret
 
     @classmethod
     def read_from_ctrom(cls: typing.Type[T], ct_rom: ctrom.CTRom, record_num: int = 0,
@@ -4,10 +4,23 @@ Implement Distribution objects.
 A Distribtution is just a collection of (weight, value_list) pairs.
 When generating a random item from the distribution, pick a pair based on
 the weights, then return a random element of the pair's value_list.
+
+A WeightedSampler is the same thing, but its weights can change after it is
+made, e.g. to remove items as they are chosen.
+
+RNG compatibility: Both draw one rng.random() to choose a pair and then use
+rng.choice() on its value_list.  This is the same as Distribution always
+did, so seeds made before either class changed draw the same numbers.
+Distribution picks the same pair as before.  WeightedSampler adds weights in
+a different order than a linear scan.  It can pick a neighbouring pair when
+the draw is within rounding error of the boundary between them.  That only
+happens when the partial sums of the weights are not exact (e.g. they are
+not integers), and it happens to about one draw in 10^16.
 """
 
 from __future__ import annotations
 
+import bisect
 import copy
 import itertools
 from collections.abc import Iterable, Sequence
@@ -51,6 +64,7 @@ class Distribution(typing.Generic[T]):
 
         self.__total_weight = 0
         self.weight_object_pairs: list[typing.Tuple[WeightType, list[T]]] = []
+        self._cumulative_weights: list[WeightType] = []
 
         self.set_weight_object_pairs(list(weight_object_pairs))
 
@@ -94,14 +108,12 @@ class Distribution(typing.Generic[T]):
         """
         target = rng.random()*self.__total_weight
 
-        cum_weight = 0
-        for weight, obj in self.weight_object_pairs:
-            cum_weight += weight
-
-            if cum_weight > target:
-                return rng.choice(obj)
+        # First pair whose cumulative weight exceeds the target.
+        ind = bisect.bisect_right(self._cumulative_weights, target)
+        if ind == len(self.weight_object_pairs):
+            raise ValueError('No choice made.')
 
-        raise ValueError('No choice made.')
+        return rng.choice(self.weight_object_pairs[ind][1])
 
     def get_all_items_multiplicity(self) -> list[T]:
         ret = list()
@@ -130,6 +142,9 @@ class Distribution(typing.Generic[T]):
         cleaned_pairs = self._handle_weight_object_pairs(new_pairs)
         self.weight_object_pairs = cleaned_pairs
         self.__total_weight = sum(x[0] for x in cleaned_pairs)
+        self._cumulative_weights = list(
+            itertools.accumulate(x[0] for x in cleaned_pairs)
+        )
 
         if self.__total_weight == 0:
             raise ZeroWeightException
@@ -158,6 +173,131 @@ class Distribution(typing.Generic[T]):
         return Distribution[T](*new_pairs)
 
 
+class WeightedSampler(typing.Generic[T]):
+    """
+    A Distribution whose weights can be changed.  Choosing an item and
+    changing a weight both take O(log n) time for n pairs.
+
+    Pairs are referred to by their index in the pairs given.  Unlike a
+    Distribution, pairs with zero weight are kept so that they can be given
+    weight later.
+    """
+    def __init__(
+            self,
+            *weight_object_pairs: typing.Tuple[WeightType, ObjType],
+    ):
+        self._objects: list[list[T]] = []
+        weights: list[WeightType] = []
+        for weight, obj in weight_object_pairs:
+            if not isinstance(obj, list):
+                obj = [obj]
+            self._objects.append(list(obj))
+            weights.append(weight if obj else 0)
+
+        # Sum tree.  Leaves start at _size and each node holds the sum of its
+        # two children.  Sums are recomputed rather than adjusted by the
+        # change, so they do not drift as weights are changed.
+        self._size = 1
+        while self._size < len(weights):
+            self._size *= 2
+
+        self._tree: list[WeightType] = [0]*(2*self._size)
+        self._tree[self._size:self._size+len(weights)] = weights
+        for node in range(self._size-1, 0, -1):
+            self._tree[node] = self._tree[2*node] + self._tree[2*node+1]
+
+        # Value -> indices of the pairs holding it.  Made on first removal.
+        self._value_indices: dict[T, list[int]] | None = None
+
+    def __len__(self):
+        return len(self._objects)
+
+    def get_total_weight(self) -> float:
+        return self._tree[1]
+
+    def get_weight(self, index: int) -> WeightType:
+        return self._tree[self._size + index]
+
+    def get_objects(self, index: int) -> list[T]:
+        return list(self._objects[index])
+
+    def set_weight(self, index: int, weight: WeightType):
+        if not 0 <= index < len(self._objects):
+            raise IndexError(index)
+
+        node = self._size + index
+        self._tree[node] = weight
+        node //= 2
+        while node:
+            self._tree[node] = self._tree[2*node] + self._tree[2*node+1]
+            node //= 2
+
+    def _find_index(self, target: float) -> int:
+        """
+        Get the index of the first pair whose cumulative weight exceeds
+        target, which should be in [0, total weight).
+        """
+        if self._tree[1] <= 0:
+            raise ZeroWeightException
+
+        node = 1
+        while node < self._size:
+            left = 2*node
+            # Rounding can leave the target past the sum of the right child.
+            # Never move into a subtree with no weight.
+            if target < self._tree[left] or self._tree[left+1] <= 0:
+                node = left
+            else:
+                target -= self._tree[left]
+                node = left + 1
+
+        return node - self._size
+
+    def get_random_item(self, rng: RNGType) -> T:
+        """
+        Get a random item.  This draws random numbers exactly like
+        Distribution.get_random_item.
+        """
+        target = rng.random()*self._tree[1]
+        index = self._find_index(target)
+        return rng.choice(self._objects[index])
+
+    def remove_values(
+            self, remove_values: Iterable[T],
+            remove_weight: bool = True
+    ):
+        """
+        Remove the given values, like Distribution.get_restricted_distribution
+        but in place.  By default removes weight proportional to the values
+        removed.
+        """
+        if self._value_indices is None:
+            self._value_indices = {}
+            for index, objects in enumerate(self._objects):
+                for value in objects:
+                    self._value_indices.setdefault(value, []).append(index)
+
+        remove_values = set(remove_values)
+        indices = sorted(set(
+            index for value in remove_values
+            for index in self._value_indices.get(value, ())
+        ))
+        for index in indices:
+            vals = self._objects[index]
+            trimmed_vals = [x for x in vals if x not in remove_values]
+            if len(trimmed_vals) == len(vals):
+                continue
+
+            weight = self.get_weight(index)
+            if remove_weight:
+                weight = weight*(len(trimmed_vals)/len(vals))
+            if not trimmed_vals:
+                weight = 0
+
+            self._objects[index] = trimmed_vals
+            self.set_weight(index, weight)
+
+
 class DistributionGenerator(typing.Generic[T]):
     def __init__(self, symbol_dict: dict[str, Sequence[T]]):
         """
@@ -1,9 +1,11 @@
 from __future__ import annotations
+import bisect
+from dataclasses import dataclass
 from enum import Enum
 from io import BytesIO
-from typing import Tuple
+from typing import Iterator, Tuple
 
-from ctrando.common import byteops
+from ctrando.common import byteops, tracing
 
 
 class FreeSpaceError(Exception):
@@ -16,12 +18,98 @@ class FSWriteType(Enum):
     NO_MARK = 2
 
 
+_BANK_SIZE = 0x10000
+
+
+def _get_bank_pieces(start: int, end: int) -> Iterator[Tuple[int, int]]:
+    """Split [start, end) into pieces which do not cross a bank boundary."""
+    while start < end:
+        piece_end = min(end, (start & 0xFF0000) + _BANK_SIZE)
+        yield start, piece_end
+        start = piece_end
+
+
+@dataclass
+class FreeSpaceStats:
+    """
+    Summary of the free space.  Data can not cross a bank boundary, so block
+    sizes are measured per bank.
+    """
+    num_free_blocks: int
+    total_free: int
+    largest_free_block: int
+    bank_free: dict[int, int]
+    bank_largest: dict[int, int]
+
+    @property
+    def fragmentation(self) -> float:
+        """
+        1 - largest/total.  0 when all free space is in one block, close to 1
+        when it is split into many small blocks.
+        """
+        if self.total_free == 0:
+            return 0.0
+        return 1 - self.largest_free_block/self.total_free
+
+
 class FreeSpace():
+    """
+    Keeps track of which bytes of a buffer are free.
+
+    Free space is kept as sorted arrays of maximal free intervals.  Each bank
+    additionally has a list of its free pieces ordered by (size, start) so
+    that banks without enough room are skipped and best-fit is a bisection.
+    """
     def __init__(self, num_bytes, is_free):
 
         self.num_bytes = num_bytes
-        self.markers = [0, self.num_bytes]
-        self.first_free = is_free
+
+        # Free intervals [start, end).  Sorted, disjoint, and never adjacent.
+        self._starts: list[int] = []
+        self._ends: list[int] = []
+
+        # bank -> sorted list of (size, start) of the bank's free pieces
+        self._bank_index: dict[int, list[Tuple[int, int]]] = {}
+
+        if is_free and num_bytes > 0:
+            self._insert_intervals(0, 0, [(0, num_bytes)])
+
+    def __eq__(self, other):
+        if not isinstance(other, FreeSpace):
+            return NotImplemented
+        return (self.num_bytes == other.num_bytes and
+                self._starts == other._starts and
+                self._ends == other._ends)
+
+    def copy(self) -> FreeSpace:
+        """Get an independent copy.  Much cheaper than copy.deepcopy."""
+        ret = FreeSpace.__new__(FreeSpace)
+        ret.num_bytes = self.num_bytes
+        ret._starts = self._starts.copy()
+        ret._ends = self._ends.copy()
+        ret._bank_index = {
+            bank: pieces.copy() for bank, pieces in self._bank_index.items()
+        }
+        return ret
+
+    def _insert_intervals(self, lo: int, hi: int,
+                          intervals: list[Tuple[int, int]]):
+        """Replace the free intervals [lo, hi) with the given ones."""
+        for ind in range(lo, hi):
+            for start, end in _get_bank_pieces(self._starts[ind],
+                                               self._ends[ind]):
+                pieces = self._bank_index[start >> 16]
+                del pieces[bisect.bisect_left(pieces, (end-start, start))]
+
+        self._starts[lo:hi] = [start for start, _ in intervals]
+        self._ends[lo:hi] = [end for _, end in intervals]
+
+        for interval in intervals:
+            for start, end in _get_bank_pieces(*interval):
+                bisect.insort(
+                    self._bank_index.setdefault(start >> 16, []),
+                    (end-start, start)
+                )
 
     # Mark a block of the buffer as free/not free depending on is_free.
     # block is a half-open interval [block[0], block[1]) as is Python's way.
@@ -45,196 +133,204 @@ class FreeSpace():
 
         # If the block to mark goes past the end of the file, extend?
         # This should probably throw an error.
-        if block[1] > self.markers[-1]:
+        if block[1] > self.num_bytes:
             print('Warning: block [%6.6X, %6.6X) exceeds EOF. Truncating.'
                   % (block[0], block[1]))
-            block = (block[0], self.markers[-1])
+            block = (block[0], self.num_bytes)
 
         if block[0] < 0:
             print('Warning: block [%6.6X, %6.6X) preceeds 0. Truncating.'
                   % (block[0], block[1]))
             block = (0, block[1])
 
-        left_blk = self.__search(0, len(self.markers)-2, block[0])
-        right_blk = self.__search(0, len(self.markers)-2, block[1])
-
-        lc = (left_blk % 2 == 0)
-        rc = (right_blk % 2 == 0)
-
-        left_type = (lc == (self.first_free == is_free))
-        right_type = (rc == (self.first_free == is_free))
-
-        if left_type:
-            # If the left_type matches the type we're marking, then the left
-            # endpoint of the block we found will be the start of a block
-            start = left_blk
-        elif block[0] == self.markers[left_blk]:
-            # If the left_type doesn't match, but we're starting at its
-            # leftmost point, then we're just extending the previous matching
-            # block.
-            if left_blk != 0:  # Unless we're already at the start.
-                start = left_blk-1
-            else:
-                # When at the start, theen just start at the beginning
-                start = 0
-
-                # Now the first block's type changes to is_free
-                self.first_free = is_free
-        else:
-            # cut a block
-            self.markers.insert(left_blk+1, block[0])
-            start = left_blk+1
-            right_blk += 1
-
-        if right_type:
-            # If the right_type matches, then just extend that block
-            end = right_blk+1
-        elif block[1] == self.markers[right_blk+1]:
-            # If it doesn't match, but it's at the very end of the block,
-            # then extend through the next matching block.
-            if right_blk+2 == len(self.markers):  # Unless we're at the end_grp
-                end = right_blk+1
-            else:
-                end = right_blk+2
+        start, end = block
+        starts, ends = self._starts, self._ends
+
+        if is_free:
+            # Merge with every free interval which overlaps or touches.
+            lo = bisect.bisect_left(ends, start)
+            hi = bisect.bisect_right(starts, end)
+            if lo < hi:
+                start = min(start, starts[lo])
+                end = max(end, ends[hi-1])
+            new_intervals = [(start, end)]
         else:
-            # cut the block
-            self.markers.insert(right_blk+1, block[1])
-            end = right_blk+1
-
-        # delete all markers between the start and the end (not inclusive)
-        if end > start+1:
-            del self.markers[start+1:end]
+            # Cut the block out of every free interval which overlaps.
+            lo = bisect.bisect_right(ends, start)
+            hi = bisect.bisect_left(starts, end)
+            if lo == hi:
+                return
+            new_intervals = []
+            if starts[lo] < start:
+                new_intervals.append((starts[lo], start))
+            if ends[hi-1] > end:
+                new_intervals.append((end, ends[hi-1]))
+
+        self._insert_intervals(lo, hi, new_intervals)
     # End of mark_block
 
     def is_block_free(self, block) -> bool:
-        left = block[0]
-        right = block[1]
+        ind = bisect.bisect_right(self._starts, block[0]) - 1
+        return ind >= 0 and self._ends[ind] >= block[1]
 
-        left_ind = self.__search(0, len(self.markers)-2, left)
-        right_ind = self.__search(0, len(self.markers)-2, right)
+    def extend_end_marker(self, new_end, is_free):
+        old_end = self.num_bytes
+        self.num_bytes = max(old_end, new_end)
 
-        left_parity = left_ind % 2 == 0
-        left_free = left_parity == (self.first_free is True)
+        if is_free and new_end > old_end:
+            self.mark_block((old_end, new_end), FSWriteType.MARK_FREE)
 
-        return (left_ind == right_ind) and left_free
+    def _get_first_fit_in_bank(self, size: int, bank: int,
+                               hint: int) -> int | None:
+        bank_start = bank << 16
+        bank_end = bank_start + _BANK_SIZE
+        lower = max(hint, bank_start)
 
-    def extend_end_marker(self, new_end, is_free):
-        last_free = self.__is_free(len(self.markers)-2)
+        ind = bisect.bisect_right(self._starts, lower) - 1
+        if ind < 0 or self._ends[ind] <= lower:
+            ind += 1
 
-        # print(f"{new_end:06X}, {is_free}")
-        if last_free == is_free:
-            self.markers[-1] = new_end
-        else:
-            self.markers.append(new_end)
+        while ind < len(self._starts) and self._starts[ind] < bank_end:
+            block_st = max(self._starts[ind], lower)
+            if min(self._ends[ind], bank_end) - block_st >= size:
+                return block_st
+            ind += 1
 
-    def __is_free(self, ind):
-        return ((ind % 2 == 0) == self.first_free)
+        return None
 
     # First fit.  Location must be after hint
+    @tracing.traced("freespace.get_free_addr")
     def get_free_addr(self, size, hint=0):
-        # block associated with its left marker, so search to len-2
-        ind = self.__search(0, len(self.markers)-2, hint)
-
-        # print(f"Searching for {size} free bytes.")
-        if self.__is_free(ind) and (self.markers[ind+1]-hint > 0):
-            return hint
-        else:
-            if not self.__is_free(ind):
-                ind += 1
-
-            start = ind
-            ret = None
-            for x in range(start, len(self.markers)-1, 2):
-                # print(f"({self.markers[x]}, {self.markers[x+1]})")
-                # print(f"Size: {self.markers[x+1]-self.markers[x]}")
-
-                block_st = self.markers[x]
-                block_end = self.markers[x+1]
-                next_bank = (block_st & 0xFF0000) + 0x010000
-
-                true_block_end = min(block_end, next_bank)
-                if true_block_end - block_st >= size:
-                    ret = block_st
-                    break
-
-                # If the block ends before the next bank starts, then
-                # block_end == true_block_end, and this if won't trigger.
-                # Otherwise, true_block_end is the start of the next bank, and
-                # we're trying to fit at the start of the next bank.
-                if block_end - true_block_end >= size:
-                    ret = true_block_end  # == next bank start
-                    break
-
-            if ret is None:
-                # print("Error: Not enough free space.")
-                # print(f"size: {size:06X}, hint: {hint:06X}")
-                raise FreeSpaceError(
-                    f'Not Enough Free Space.  Size: {size:06X}, '
-                    f'hint: {hint:06X}'
-                )
+        for bank in range(hint >> 16, ((self.num_bytes - 1) >> 16) + 1):
+            pieces = self._bank_index.get(bank)
+            if not pieces or pieces[-1][0] < size:
+                continue
+
+            addr = self._get_first_fit_in_bank(size, bank, hint)
+            if addr is not None:
+                return addr
+
+        raise FreeSpaceError(
+            f'Not Enough Free Space.  Size: {size:06X}, '
+            f'hint: {hint:06X}'
+        )
+
+    # Smallest block which fits.  Location must be after hint and, if given,
+    # in the given bank.
+    @tracing.traced("freespace.get_best_fit_addr")
+    def get_best_fit_addr(self, size, hint=0, bank: int | None = None):
+        hint_bank = hint >> 16
+        best = None
+
+        for cur_bank, pieces in self._bank_index.items():
+            if cur_bank < hint_bank or (bank is not None and cur_bank != bank):
+                continue
+
+            ind = bisect.bisect_left(pieces, (size, -1))
+            if cur_bank == hint_bank:
+                # Pieces may be cut by the hint, so the order by size is
+                # not the order by usable size.
+                for piece_size, piece_st in pieces[ind:]:
+                    usable_st = max(piece_st, hint)
+                    usable_size = piece_st + piece_size - usable_st
+                    if usable_size >= size and \
+                            (best is None or (usable_size, usable_st) < best):
+                        best = (usable_size, usable_st)
+            elif ind < len(pieces) and (best is None or pieces[ind] < best):
+                best = pieces[ind]
+
+        if best is None:
+            raise FreeSpaceError(
+                f'Not Enough Free Space.  Size: {size:06X}, '
+                f'hint: {hint:06X}'
+            )
 
-            return ret
+        return best[1]
 
     # Sometimes data needs the same bank, so
+    @tracing.traced("freespace.get_same_bank_free_addrs")
     def get_same_bank_free_addrs(self, sizes: list[int],
                                  hint: int = 0) -> list[int]:
-
+        """
+        Find addresses in a single bank for blocks of the given sizes.  The
+        first bank (at or after hint) which fits all of them is used.
+        Nothing is marked.
+        """
         if not sizes:
             return []
 
-        tries = [0 for x in sizes]
-        perm = tuple(i for i in range(len(sizes)))
-
-        # going to assign in sorted order.
-        # Should discard heavily used blocks more quickly.
-        # Save the permutation to recover the original order
-        sort_sizes, perm = zip(*sorted(zip(sizes, perm), reverse=True))
-
-        start = hint
-
-        while True:
-            tries[0] = self.get_free_addr(sort_sizes[0], start)
-            self.mark_block((tries[0], tries[0]+sort_sizes[0]),
-                            FSWriteType.MARK_USED)
-
-            first_bank = (tries[0] >> 16) << 16
-
-            success = True
-
-            for i in range(1, len(sort_sizes)):
-                tries[i] = self.get_free_addr(sort_sizes[i], first_bank)
-                this_bank = (tries[i] >> 16) << 16
-
-                if this_bank != first_bank:
-                    success = False
-                    start = this_bank
-
-                    # undo previous markings
-                    for j in range(0, i):
-                        self.mark_block((tries[j], tries[j]+sort_sizes[j]),
-                                        FSWriteType.MARK_FREE)
-                else:
-                    # Mark and proceed to next
-                    self.mark_block((tries[i], tries[i]+sort_sizes[i]),
-                                    FSWriteType.MARK_USED)
-
-            if success:
-                break
-
-        # Undo markings.  This is sort of ugly.  It would be nice to separate
-        # the buffer from the freespace checker so that we can copy the
-        # freespace checker and mess with that while finding addresses.
-        for i in range(len(tries)):
-            self.mark_block((tries[i], tries[i]+sort_sizes[i]),
-                            FSWriteType.MARK_FREE)
-
-        perm, tries_tuple = zip(*sorted(zip(perm, tries)))
-
-        return list(tries_tuple)
+        # Assign largest first.  Heavily used blocks are discarded faster.
+        order = sorted(range(len(sizes)), key=lambda i: (sizes[i], i),
+                       reverse=True)
+        total_size = sum(sizes)
+
+        for bank in range(hint >> 16, ((self.num_bytes - 1) >> 16) + 1):
+            pieces = self._bank_index.get(bank)
+            if not pieces or pieces[-1][0] < sizes[order[0]] or \
+                    sum(piece_size for piece_size, _ in pieces) < total_size:
+                continue
+
+            addrs = self._fit_in_bank(sizes, order, bank, hint)
+            if addrs is not None:
+                return addrs
+
+        raise FreeSpaceError(
+            f'Not Enough Free Space in one bank.  Sizes: '
+            f'{", ".join(f"{size:06X}" for size in sizes)}, hint: {hint:06X}'
+        )
+
+    def _fit_in_bank(self, sizes: list[int], order: list[int],
+                     bank: int, hint: int) -> list[int] | None:
+        """First fit the sizes (in the given order) into a copy of a bank."""
+        bank_start = bank << 16
+        bank_end = bank_start + _BANK_SIZE
+        lower = max(hint, bank_start)
+
+        ind = bisect.bisect_right(self._starts, lower) - 1
+        if ind < 0 or self._ends[ind] <= lower:
+            ind += 1
+
+        blocks = []
+        while ind < len(self._starts) and self._starts[ind] < bank_end:
+            blocks.append([max(self._starts[ind], lower),
+                           min(self._ends[ind], bank_end)])
+            ind += 1
+
+        addrs = [0 for _ in sizes]
+        for size_ind in order:
+            size = sizes[size_ind]
+            for block in blocks:
+                if block[1] - block[0] >= size:
+                    addrs[size_ind] = block[0]
+                    block[0] += size
+                    break
+            else:
+                return None
+
+        return addrs
+
+    def get_stats(self) -> FreeSpaceStats:
+        """Get statistics describing the free space's fragmentation."""
+        bank_free = {
+            bank: sum(piece_size for piece_size, _ in pieces)
+            for bank, pieces in self._bank_index.items() if pieces
+        }
+        bank_largest = {
+            bank: pieces[-1][0]
+            for bank, pieces in self._bank_index.items() if pieces
+        }
+
+        return FreeSpaceStats(
+            num_free_blocks=sum(
+                len(pieces) for pieces in self._bank_index.values()
+            ),
+            total_free=sum(bank_free.values()),
+            largest_free_block=max(bank_largest.values(), default=0),
+            bank_free=bank_free,
+            bank_largest=bank_largest
+        )
 
     # Mark a file with Anskiy's .txt patch format
-    # Duplicates much code.  Consider adding patching functionality into
-    # this file.
     def mark_blocks_txt_obj(self, patch_obj):
         p = patch_obj
 
@@ -299,45 +395,16 @@ class FreeSpace():
     def print_blocks(self):
 
         print('Free blocks: ')
-
-        if self.first_free is True:
-            start = 0
-        else:
-            start = 1
-
-        for x in range(start, len(self.markers)-1, 2):
-            print('[%6.6X, %6.6X)\t %X bytes'
-                  % (self.markers[x], self.markers[x+1],
-                     (self.markers[x+1]-self.markers[x])))
+        for start, end in zip(self._starts, self._ends):
+            print('[%6.6X, %6.6X)\t %X bytes' % (start, end, end-start))
 
         print('Used blocks: ')
+        used_starts = [0] + self._ends
+        used_ends = self._starts + [self.num_bytes]
+        for start, end in zip(used_starts, used_ends):
+            if start < end:
+                print('[%6.6X, %6.6X)\t %X bytes' % (start, end, end-start))
 
-        if self.first_free is True:
-            start = 1
-        else:
-            start = 0
-
-        for x in range(start, len(self.markers)-1, 2):
-            print('[%6.6X, %6.6X)\t %X bytes'
-                  % (self.markers[x], self.markers[x+1],
-                     (self.markers[x+1]-self.markers[x])))
-
-    # Find the index of an address in the block map
-    def __search(self, start_ind, end_ind, addr):
-        search_ind = (start_ind+end_ind)//2
-
-        left = self.markers[search_ind]
-        right = self.markers[search_ind+1]
-
-        if left <= addr < right:
-            return search_ind
-        elif addr >= right:
-            if start_ind == len(self.markers)-1:
-                return len(self.markers)-2
-            else:
-                return self.__search(search_ind+1, end_ind, addr)
-        else:
-            return self.__search(start_ind, search_ind-1, addr)
 
 
 class FSRom(BytesIO):
@@ -434,11 +501,17 @@ class FSRom(BytesIO):
                     'Error: Write extended buffer with NO_MARK set'
                 )
             else:
-                spaceman.extend_end_marker(end, write_mark)
+                spaceman.extend_end_marker(
+                    end, write_mark == FSWriteType.MARK_FREE
+                )
 
         spaceman.mark_block((start, end), write_mark)
 
         self.seek(start)
+        return self._write_raw(payload)
+
+    def _write_raw(self, payload) -> int:
+        """Write payload at the current position without marking anything."""
         return BytesIO.write(self, payload)
 
     # writes data to the buffer and marks the space as no longer free.
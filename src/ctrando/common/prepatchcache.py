@@ -0,0 +1,215 @@
+"""
+On-disk cache of the settings-free patched rom and openworld post-config.
+
+Applying the base patches and the openworld scripts gives the same result for
+every seed, so the result is pickled and reused.  Entries are addressed by a
+hash of the input rom and of the whole package, so editing any module (or
+rebuilding the compression extension) invalidates the cache automatically.
+"""
+import contextlib
+import hashlib
+import importlib.util
+from importlib.resources import files
+import io
+import os
+import pathlib
+import pickle
+import sys
+import tempfile
+import typing
+
+if typing.TYPE_CHECKING:
+    from ctrando.common import ctrom, randostate
+
+
+# The compiled extension, which may be installed outside the package tree.
+_EXTENSION_NAME = "ctrando.compression.ctcompress"
+
+_source_hash: str | None = None
+
+
+def get_default_cache_directory() -> pathlib.Path:
+    """
+    Get the cache directory to use when none is given.  CTRANDO_CACHE_DIR
+    overrides the platform default.
+    """
+    if "CTRANDO_CACHE_DIR" in os.environ:
+        return pathlib.Path(os.environ["CTRANDO_CACHE_DIR"])
+
+    if sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA", pathlib.Path.home() / "AppData" / "Local")
+    else:
+        base = os.environ.get("XDG_CACHE_HOME", pathlib.Path.home() / ".cache")
+
+    return pathlib.Path(base) / "ctrando"
+
+
+def _hash_resource(hasher, resource, rel_name: str):
+    if resource.is_dir():
+        if resource.name == "__pycache__":
+            return
+        for child in sorted(resource.iterdir(), key=lambda x: x.name):
+            _hash_resource(hasher, child, f"{rel_name}/{child.name}")
+    elif resource.is_file():
+        hasher.update(rel_name.encode("utf-8"))
+        hasher.update(b"\x00")
+        hasher.update(resource.read_bytes())
+        hasher.update(b"\x00")
+
+
+def get_source_hash() -> str:
+    """
+    Hash every file of the package and the compression extension.  Patches,
+    openworld mods and the pickled classes are spread over most of the
+    package, so all of it is hashed rather than a list which can go stale.
+    """
+    global _source_hash
+    if _source_hash is None:
+        hasher = hashlib.sha256()
+        hasher.update(f"{sys.version_info.major}.{sys.version_info.minor}".encode())
+        _hash_resource(hasher, files("ctrando"), "ctrando")
+
+        spec = importlib.util.find_spec(_EXTENSION_NAME)
+        if spec is not None and spec.origin is not None:
+            _hash_resource(hasher, pathlib.Path(spec.origin), _EXTENSION_NAME)
+        _source_hash = hasher.hexdigest()
+
+    return _source_hash
+
+
+def get_cache_key(rom: typing.ByteString) -> str:
+    """Get the cache key for prepatching the given rom."""
+    hasher = hashlib.sha256()
+    hasher.update(rom)
+    hasher.update(get_source_hash().encode("ascii"))
+    return hasher.hexdigest()
+
+
+def _get_entry_path(cache_directory: pathlib.Path, key: str) -> pathlib.Path:
+    return cache_directory / f"prepatch-{key}.pickle"
+
+
+# The post-config refers to the rom from many places.  It is pickled on its
+# own with the rom replaced by this persistent id, and the rom is stored as a
+# RomImage.  Loading forks the image and gives the fork to the post-config.
+_ROM_ID = "ct_rom"
+
+# Entries loaded or stored by this process: key -> (rom image, pickled
+# post-config).  Repeated loads (a batch) fork the same image.
+_entries: dict[str, tuple["ctrom.RomImage", bytes]] = {}
+
+
+class _PostConfigPickler(pickle.Pickler):
+    def __init__(self, file: typing.BinaryIO, ct_rom: "ctrom.CTRom"):
+        super().__init__(file)
+        self._ct_rom = ct_rom
+
+    def persistent_id(self, obj):
+        if obj is self._ct_rom:
+            return _ROM_ID
+        return None
+
+
+class _PostConfigUnpickler(pickle.Unpickler):
+    def __init__(self, file: typing.BinaryIO, ct_rom: "ctrom.CTRom"):
+        super().__init__(file)
+        self._ct_rom = ct_rom
+
+    def persistent_load(self, pid):
+        if pid != _ROM_ID:
+            raise pickle.UnpicklingError(f"Unknown persistent id {pid}")
+        return self._ct_rom
+
+
+def _load_entry(
+        cache_directory: pathlib.Path,
+        key: str
+) -> tuple["ctrom.RomImage", bytes] | None:
+    if key in _entries:
+        return _entries[key]
+
+    path = _get_entry_path(cache_directory, key)
+    try:
+        with open(path, "rb") as infile:
+            rom_image, post_config_bytes = pickle.load(infile)
+    except FileNotFoundError:
+        return None
+    except (OSError, EOFError, pickle.PickleError, AttributeError,
+            ImportError, TypeError, ValueError):
+        # Unreadable or stale entry.  It will be overwritten.
+        return None
+
+    if not isinstance(post_config_bytes, bytes):
+        return None
+
+    _entries[key] = (rom_image, post_config_bytes)
+    return _entries[key]
+
+
+def load(
+        cache_directory: pathlib.Path,
+        key: str
+) -> tuple["ctrom.CTRom", "randostate.PostConfigState"] | None:
+    """
+    Load a cached (rom, post-config) pair.  Returns None if there is no
+    usable entry.  The post-config's managers refer to the returned rom,
+    which is a fork of the cached rom image.
+    """
+    entry = _load_entry(cache_directory, key)
+    if entry is None:
+        return None
+
+    rom_image, post_config_bytes = entry
+    try:
+        ct_rom = rom_image.fork()
+        post_config = _PostConfigUnpickler(
+            io.BytesIO(post_config_bytes), ct_rom
+        ).load()
+    except (EOFError, pickle.PickleError, AttributeError, ImportError,
+            TypeError, ValueError):
+        del _entries[key]
+        return None
+
+    return ct_rom, post_config
+
+
+@contextlib.contextmanager
+def open_atomic(path: pathlib.Path) -> typing.Iterator[typing.BinaryIO]:
+    """
+    Open a temporary file for binary writing which replaces path once the
+    block finishes.  Concurrent runs never see a partial file.
+    """
+    fd, temp_name = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as outfile:
+            yield outfile
+        os.replace(temp_name, path)
+    except BaseException:
+        os.unlink(temp_name)
+        raise
+
+
+def store(
+        cache_directory: pathlib.Path,
+        key: str,
+        ct_rom: "ctrom.CTRom",
+        post_config: "randostate.PostConfigState"
+):
+    """
+    Store a (rom, post-config) pair.  The post-config's references to the
+    rom are kept so that they point to the rom given by load().  Failure to
+    write the cache is not an error.
+    """
+    buf = io.BytesIO()
+    _PostConfigPickler(buf, ct_rom).dump(post_config)
+    entry = (ct_rom.get_image(), buf.getvalue())
+    _entries[key] = entry
+
+    path = _get_entry_path(cache_directory, key)
+    try:
+        cache_directory.mkdir(parents=True, exist_ok=True)
+        with open_atomic(path) as outfile:
+            # noinspection PyTypeChecker
+            pickle.dump(entry, outfile)
+    except OSError:
+        pass
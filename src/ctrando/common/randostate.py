@@ -11,7 +11,7 @@ from ctrando.logic import logictypes
 from ctrando.base import basepatch
 from ctrando.items import itemdata
 from ctrando.characters import ctpcstats
-from ctrando.common import ctenums, ctrom, memory
+from ctrando.common import ctenums, ctrom, memory, writeplanner
 from ctrando.locations import locationevent, locationtypes
 from ctrando.locations.eventcommand import EventCommand as EC
 from ctrando.locations.eventfunction import EventFunction as EF
@@ -21,7 +21,7 @@ from ctrando.overworlds import overworld, owexitdata
 from ctrando.overworlds.owmanager import OWManager
 from ctrando.recruits import recruitassign
 from ctrando.treasures import treasuretypes as ttypes
-from ctrando.entranceshuffler import regionmap
+from ctrando.entranceshuffler import logicanalysis, regionmap
 from ctrando.encounters import encountertypes
 
 
@@ -81,6 +81,8 @@ class ConfigState:
     enemy_assign_dict: dict[ctenums.EnemyID, ctenums.EnemyID]
     animation_script_manager: animationscript.AnimationScriptManager
     omen_elevator_data: encountertypes.OmenElevatorData
+    # Set once the key items and map are final.
+    logic_analysis: logicanalysis.LogicAnalysis | None = None
 
     @classmethod
     def get_default_config_from_ctrom(cls, ct_rom: ctrom.CTRom):
@@ -202,7 +204,8 @@ class PostConfigState:
                    treasure_data_dict, enemy_sprite_dict, enemy_ai_manager,
                    enemy_attack_manager)
 
-    def write_to_ctrom(self, ct_rom: ctrom.CTRom, clean: bool = False):
+    def write_to_ctrom(self, ct_rom: ctrom.CTRom, clean: bool = False,
+                       optimal_compression: bool = False):
         locationtypes.write_exit_dict_to_ctrom(ct_rom, self.loc_exit_dict)
         for tid, treasure in self.treasure_data_dict.items():
             if (
@@ -218,10 +221,14 @@ class PostConfigState:
 
         self.enemy_attack_manager.write_to_ctrom(ct_rom)
 
-        self.enemy_ai_manager.write_to_ct_rom(ct_rom)
-        self.overworld_manager.write_all_overworlds_to_ctrom()
+        # AI scripts, battle messages, exit names and location scripts are
+        # collected and placed together.
+        planner = writeplanner.WritePlanner(optimal_compression)
+        self.enemy_ai_manager.write_to_ct_rom(ct_rom, planner)
+        self.overworld_manager.write_all_overworlds_to_ctrom(planner)
+        self.script_manager.write_all_scripts_to_ctrom(planner)
+        planner.write_to_ctrom(ct_rom)
 
-        self.script_manager.write_all_scripts_to_ctrom()
         for enemy_id, enemy_sprite in self.enemy_sprite_dict.items():
             enemy_sprite.write_to_ctrom(ct_rom, enemy_id)
 
@@ -0,0 +1,274 @@
+"""
+Write a randomized rom as a patch against the vanilla rom.
+
+A seed is a few hundred KiB of changes to a 6 MiB rom, so shipping the
+changes is much cheaper than shipping the rom.  Two formats are supported:
+
+- BPS, which can describe any target and checks the source, target, and
+  patch with CRC32s.
+- IPS, which every patcher reads, but which can only address the first
+  16 MiB and can not shrink a file.
+
+Unchanged pages are skipped with one comparison each, and changed bytes in
+the other pages are found by comparing them as big integers.  Both are done
+in C.
+"""
+import re
+import typing
+import zlib
+
+
+# Unchanged gaps shorter than this are included in a changed range.  A new
+# range costs more than a few bytes of patch.
+_MAX_GAP = 8
+_CHANGED_RE = re.compile(
+    rb"[^\x00]+(?:\x00{1,%d}[^\x00]+)*" % (_MAX_GAP - 1)
+)
+
+_PAGE_SIZE = 0x1000
+
+# Runs of one byte at least this long are stored as runs.
+_MIN_RUN = 16
+_RUN_RE = re.compile(rb"(.)\1{%d,}" % (_MIN_RUN - 1), re.DOTALL)
+
+
+def _get_changed_pages(
+        source: typing.ByteString,
+        target: typing.ByteString,
+        size: int
+) -> typing.Iterator[tuple[int, int]]:
+    """Get the [start, end) of the spans of whole pages which differ."""
+    span_start = None
+    for start in range(0, size, _PAGE_SIZE):
+        end = min(start + _PAGE_SIZE, size)
+        if bytes(source[start:end]) != bytes(target[start:end]):
+            if span_start is None:
+                span_start = start
+        elif span_start is not None:
+            yield span_start, start
+            span_start = None
+
+    if span_start is not None:
+        yield span_start, size
+
+
+def get_changed_ranges(
+        source: typing.ByteString,
+        target: typing.ByteString
+) -> list[tuple[int, int]]:
+    """
+    Get the [start, end) ranges of target which differ from source.  All of
+    target past the end of source counts as changed.
+    """
+    common = min(len(source), len(target))
+    ranges: list[tuple[int, int]] = []
+
+    def add_range(start: int, end: int):
+        if ranges and start - ranges[-1][1] < _MAX_GAP:
+            ranges[-1] = (ranges[-1][0], end)
+        else:
+            ranges.append((start, end))
+
+    # Most pages are unchanged.  Only look for changed bytes in the others.
+    for span_start, span_end in _get_changed_pages(source, target, common):
+        diff = (
+            int.from_bytes(source[span_start:span_end], "big") ^
+            int.from_bytes(target[span_start:span_end], "big")
+        ).to_bytes(span_end - span_start, "big")
+        for match in _CHANGED_RE.finditer(diff):
+            add_range(span_start + match.start(), span_start + match.end())
+
+    if len(target) > common:
+        add_range(common, len(target))
+
+    return ranges
+
+
+def _get_runs(data: typing.ByteString) -> typing.Iterator[tuple[int, int]]:
+    """Get the [start, end) of the long runs of a single byte in data."""
+    for match in _RUN_RE.finditer(data):
+        yield match.span()
+
+
+_IPS_EOF = int.from_bytes(b"EOF", "big")
+
+
+def get_ips_patch(
+        source: typing.ByteString,
+        target: typing.ByteString
+) -> bytes:
+    """Get an IPS patch which turns source into target."""
+    if len(target) < len(source):
+        raise ValueError("IPS patches can not shrink a rom")
+    if len(target) > 0x1000000:
+        raise ValueError("IPS patches can only address 16 MiB")
+
+    patch = bytearray(b"PATCH")
+
+    def add_record(start: int, end: int):
+        while start < end:
+            # An offset of 0x454F46 reads as "EOF".  Start a byte early.
+            if start == _IPS_EOF:
+                start -= 1
+            size = min(end - start, 0xFFFF)
+            patch.extend(start.to_bytes(3, "big"))
+            patch.extend(size.to_bytes(2, "big"))
+            patch.extend(target[start:start+size])
+            start += size
+
+    def add_run(start: int, end: int):
+        while start < end:
+            if start == _IPS_EOF:
+                add_record(start, start + 1)
+                start += 1
+                continue
+            size = min(end - start, 0xFFFF)
+            patch.extend(start.to_bytes(3, "big"))
+            patch.extend(b"\x00\x00")
+            patch.extend(size.to_bytes(2, "big"))
+            patch.append(target[start])
+            start += size
+
+    for start, end in get_changed_ranges(source, target):
+        pos = start
+        for run_start, run_end in _get_runs(target[start:end]):
+            add_record(pos, start + run_start)
+            add_run(start + run_start, start + run_end)
+            pos = start + run_end
+        add_record(pos, end)
+
+    patch.extend(b"EOF")
+    return bytes(patch)
+
+
+def _encode_bps_number(num: int, out: bytearray):
+    while True:
+        part = num & 0x7F
+        num >>= 7
+        if num == 0:
+            out.append(0x80 | part)
+            return
+        out.append(part)
+        num -= 1
+
+
+def _decode_bps_number(patch: typing.ByteString, pos: int) -> tuple[int, int]:
+    num, shift = 0, 1
+    while True:
+        part = patch[pos]
+        pos += 1
+        num += (part & 0x7F) * shift
+        if part & 0x80:
+            return num, pos
+        shift <<= 7
+        num += shift
+
+
+_BPS_SOURCE_READ = 0
+_BPS_TARGET_READ = 1
+_BPS_SOURCE_COPY = 2
+_BPS_TARGET_COPY = 3
+
+
+def get_bps_patch(
+        source: typing.ByteString,
+        target: typing.ByteString
+) -> bytes:
+    """Get a BPS patch which turns source into target."""
+    patch = bytearray(b"BPS1")
+    _encode_bps_number(len(source), patch)
+    _encode_bps_number(len(target), patch)
+    _encode_bps_number(0, patch)  # No metadata
+
+    def add_action(action: int, length: int):
+        _encode_bps_number((length - 1) << 2 | action, patch)
+
+    # Position in the target of the next target copy.
+    target_copy_pos = 0
+
+    def add_literal(start: int, end: int):
+        nonlocal target_copy_pos
+        pos = start
+        for run_start, run_end in _get_runs(target[start:end]):
+            # Write the first byte of the run, then copy it forward.
+            run_start += start
+            run_end += start
+            add_action(_BPS_TARGET_READ, run_start + 1 - pos)
+            patch.extend(target[pos:run_start+1])
+
+            add_action(_BPS_TARGET_COPY, run_end - run_start - 1)
+            offset = run_start - target_copy_pos
+            _encode_bps_number(abs(offset) << 1 | (offset < 0), patch)
+            target_copy_pos = run_end - 1
+            pos = run_end
+
+        if pos < end:
+            add_action(_BPS_TARGET_READ, end - pos)
+            patch.extend(target[pos:end])
+
+    pos = 0
+    for start, end in get_changed_ranges(source, target):
+        if pos < start:
+            add_action(_BPS_SOURCE_READ, start - pos)
+        add_literal(start, end)
+        pos = end
+
+    if pos < len(target):
+        add_action(_BPS_SOURCE_READ, len(target) - pos)
+
+    patch.extend(zlib.crc32(source).to_bytes(4, "little"))
+    patch.extend(zlib.crc32(target).to_bytes(4, "little"))
+    patch.extend(zlib.crc32(patch).to_bytes(4, "little"))
+    return bytes(patch)
+
+
+def apply_bps_patch(
+        source: typing.ByteString,
+        patch: typing.ByteString
+) -> bytearray:
+    """Apply a BPS patch to source.  Raises ValueError if a check fails."""
+    if patch[:4] != b"BPS1":
+        raise ValueError("Does not appear to be a bps patch.")
+    if zlib.crc32(patch[:-4]) != int.from_bytes(patch[-4:], "little"):
+        raise ValueError("Patch checksum mismatch")
+    if zlib.crc32(source) != int.from_bytes(patch[-12:-8], "little"):
+        raise ValueError("Source checksum mismatch")
+
+    source_size, pos = _decode_bps_number(patch, 4)
+    target_size, pos = _decode_bps_number(patch, pos)
+    metadata_size, pos = _decode_bps_number(patch, pos)
+    pos += metadata_size
+    if source_size != len(source):
+        raise ValueError("Source size mismatch")
+
+    target = bytearray(target_size)
+    out_pos = source_pos = target_pos = 0
+    while pos < len(patch) - 12:
+        data, pos = _decode_bps_number(patch, pos)
+        action, length = data & 3, (data >> 2) + 1
+
+        if action == _BPS_SOURCE_READ:
+            target[out_pos:out_pos+length] = source[out_pos:out_pos+length]
+        elif action == _BPS_TARGET_READ:
+            target[out_pos:out_pos+length] = patch[pos:pos+length]
+            pos += length
+        else:
+            data, pos = _decode_bps_number(patch, pos)
+            offset = -(data >> 1) if data & 1 else data >> 1
+            if action == _BPS_SOURCE_COPY:
+                source_pos += offset
+                target[out_pos:out_pos+length] = \
+                    source[source_pos:source_pos+length]
+                source_pos += length
+            else:
+                target_pos += offset
+                # The copy may overlap what it writes.
+                for ind in range(length):
+                    target[out_pos+ind] = target[target_pos+ind]
+                target_pos += length
+        out_pos += length
+
+    if zlib.crc32(target) != int.from_bytes(patch[-8:-4], "little"):
+        raise ValueError("Target checksum mismatch")
+
+    return target
@@ -0,0 +1,137 @@
+"""
+Tables of fixed-size records which are stored back to back on the rom.
+
+Enemy stats, item stats, and similar data are read one record at a time into
+separate objects, and whole-table passes then loop over those objects.  A
+RomTable instead reads all records with one slice and hands out views:
+
+- get_record gives a memoryview of one record.  Objects built on these views
+  read and write the table directly.
+- get_array gives a NumPy structured array over the same buffer, with one
+  named column per field.  Changes made through the array are seen by the
+  record views and the other way around, so whole-table transforms can be
+  vectorized.
+- write_to_rom/write_to_ctrom write every record with one write.
+
+NumPy is optional.  Without it HAS_NUMPY is False, get_array raises, and
+callers use their per-object paths.
+"""
+import functools
+import typing
+
+from ctrando.common import ctrom
+
+# NumPy is only used for array views.  If it's not present, everything else
+# still works.
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    np = None
+    HAS_NUMPY = False
+
+if typing.TYPE_CHECKING:
+    import numpy
+
+# A named field of a record: name, offset in the record, and NumPy format
+# (e.g. 'u1', '<u2').
+Field = tuple[str, int, str]
+WritableBytes = typing.Union[bytearray, memoryview]
+
+
+@functools.cache
+def get_dtype(fields: tuple[Field, ...], record_size: int) -> 'numpy.dtype':
+    """
+    Get a structured dtype with the given fields at their offsets in a record
+    of record_size bytes.  Bytes which are in no field are skipped.
+    """
+    if not HAS_NUMPY:
+        raise ValueError("NumPy is not installed")
+
+    return np.dtype({
+        "names": [name for name, _, _ in fields],
+        "formats": [fmt for _, _, fmt in fields],
+        "offsets": [offset for _, offset, _ in fields],
+        "itemsize": record_size
+    })
+
+
+def get_array(data: bytearray, fields: tuple[Field, ...],
+              record_size: int) -> 'numpy.ndarray':
+    """
+    Get a structured array over data without copying.  data must not be
+    resized while the array exists.
+    """
+    dtype = get_dtype(fields, record_size)
+    return np.frombuffer(data, dtype)
+
+
+def get_word_array(data: bytearray) -> 'numpy.ndarray':
+    """
+    Get the little-endian 16-bit words of data as an array without copying.
+    data must not be resized while the array exists.
+    """
+    if not HAS_NUMPY:
+        raise ValueError("NumPy is not installed")
+
+    return np.frombuffer(data, "<u2")
+
+
+class RomTable:
+    """
+    A table of num_records records of record_size bytes each.  The data is
+    owned by the table and is never resized, so views of it stay valid.
+    """
+    def __init__(self, data: typing.ByteString, record_size: int,
+                 fields: typing.Iterable[Field] = ()):
+        if len(data) % record_size != 0:
+            raise ValueError(
+                f"Table size {len(data)} is not a multiple of {record_size}"
+            )
+
+        self._data = bytearray(data)
+        self.record_size = record_size
+        self.fields: tuple[Field, ...] = tuple(fields)
+
+    @classmethod
+    def from_rom(cls, rom: typing.ByteString, start: int, record_size: int,
+                 num_records: int,
+                 fields: typing.Iterable[Field] = ()) -> 'RomTable':
+        """Read num_records records beginning at file address start."""
+        end = start + record_size*num_records
+        return cls(rom[start:end], record_size, fields)
+
+    def write_to_rom(self, rom: WritableBytes, start: int):
+        """Write every record beginning at file address start."""
+        rom[start:start+len(self._data)] = self._data
+
+    def write_to_ctrom(self, ct_rom: ctrom.CTRom, start: int):
+        """Write every record to a CTRom beginning at file address start."""
+        ct_rom.seek(start)
+        ct_rom.write(self._data)
+
+    def __len__(self) -> int:
+        return len(self._data) // self.record_size
+
+    def get_bytes(self) -> bytes:
+        """Get a copy of all records."""
+        return bytes(self._data)
+
+    def get_record(self, index: int) -> memoryview:
+        """Get a view of one record."""
+        if not 0 <= index < len(self):
+            raise IndexError(f"{index} not in range({len(self)})")
+
+        start = index*self.record_size
+        return memoryview(self._data)[start:start+self.record_size]
+
+    def set_record(self, index: int, data: typing.ByteString):
+        """Replace the contents of one record."""
+        self.get_record(index)[:] = data
+
+    def get_array(self) -> 'numpy.ndarray':
+        """
+        Get a structured array with one element per record and one column per
+        field.  Raises ValueError if NumPy is not installed.
+        """
+        return get_array(self._data, self.fields, self.record_size)
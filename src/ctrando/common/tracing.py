@@ -0,0 +1,214 @@
+"""
+Timing spans and counters for the generation pipeline.
+
+Code marks phases with nested spans and counts events of interest:
+
+    with tracing.span("treasure_fill"):
+        ...
+    tracing.count("maps_rejected")
+
+Nothing is recorded unless a Tracer is enabled.  The recorded run can be
+written as a JSON summary (time per span path and counter totals) or as a
+Chrome trace which chrome://tracing and Perfetto can display.
+"""
+from __future__ import annotations
+
+import functools
+import json
+import os
+import pathlib
+import threading
+import time
+import typing
+
+
+class Span:
+    """A named, timed section of a run.  Use span() to make one."""
+    __slots__ = ("name", "args", "start_ns", "end_ns", "path")
+
+    def __init__(self, name: str, args: dict[str, typing.Any]):
+        self.name = name
+        self.args = args
+        self.start_ns = 0
+        self.end_ns = 0
+        self.path = name
+
+    @property
+    def duration(self) -> float:
+        """Length of the span in seconds."""
+        return (self.end_ns - self.start_ns) / 1e9
+
+    def start(self) -> Span:
+        if _tracer is not None:
+            _tracer.push(self)
+        self.start_ns = time.perf_counter_ns()
+        return self
+
+    def stop(self):
+        self.end_ns = time.perf_counter_ns()
+        if _tracer is not None:
+            _tracer.pop(self)
+
+    def __enter__(self) -> Span:
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+
+class Tracer:
+    """Records the spans and counters of one run."""
+    def __init__(self):
+        self.spans: list[Span] = []
+        self.counters: dict[str, int] = {}
+        self.start_ns = time.perf_counter_ns()
+        self._stack: list[Span] = []
+        self._thread_id = threading.get_ident()
+
+    def push(self, span: Span):
+        # Spans from other threads are not nested properly.  Ignore them.
+        if threading.get_ident() != self._thread_id:
+            return
+        if self._stack:
+            span.path = f"{self._stack[-1].path}/{span.name}"
+        self._stack.append(span)
+
+    def pop(self, span: Span):
+        # Spans above this one were left open, e.g. by an exception.  End
+        # them with it so that later spans still nest properly.
+        if not any(x is span for x in self._stack):
+            return
+        while self._stack:
+            top = self._stack.pop()
+            if top is not span:
+                top.end_ns = span.end_ns
+            self.spans.append(top)
+            if top is span:
+                break
+
+    def count(self, name: str, amount: int = 1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def get_summary(self) -> dict[str, typing.Any]:
+        """
+        Get the total and self time of each span path, and the counter totals.
+        Self time excludes time spent in child spans.
+        """
+        span_stats: dict[str, dict[str, typing.Any]] = {}
+        for span in self.spans:
+            stats = span_stats.setdefault(
+                span.path, {"count": 0, "total": 0.0, "self": 0.0}
+            )
+            stats["count"] += 1
+            stats["total"] += span.duration
+            stats["self"] += span.duration
+
+        for span in self.spans:
+            parent, sep, _ = span.path.rpartition("/")
+            if sep and parent in span_stats:
+                span_stats[parent]["self"] -= span.duration
+
+        end_ns = max((span.end_ns for span in self.spans),
+                     default=self.start_ns)
+        return {
+            "total_seconds": (end_ns - self.start_ns) / 1e9,
+            "spans": dict(sorted(span_stats.items())),
+            "counters": dict(sorted(self.counters.items())),
+        }
+
+    def write_summary(self, path: pathlib.Path):
+        with open(path, "w") as outfile:
+            json.dump(self.get_summary(), outfile, indent=2)
+
+    def get_chrome_trace(self) -> dict[str, typing.Any]:
+        """Get the run in the Chrome trace event format."""
+        pid = os.getpid()
+        events: list[dict[str, typing.Any]] = [
+            {
+                "name": span.name, "cat": "ctrando", "ph": "X",
+                "ts": (span.start_ns - self.start_ns) / 1000,
+                "dur": (span.end_ns - span.start_ns) / 1000,
+                "pid": pid, "tid": 0,
+                "args": {key: str(val) for key, val in span.args.items()},
+            }
+            for span in sorted(self.spans, key=lambda x: x.start_ns)
+        ]
+
+        end_ns = max((span.end_ns for span in self.spans),
+                     default=self.start_ns)
+        events.extend(
+            {
+                "name": name, "cat": "ctrando", "ph": "C",
+                "ts": (end_ns - self.start_ns) / 1000,
+                "pid": pid, "tid": 0, "args": {name: value},
+            }
+            for name, value in sorted(self.counters.items())
+        )
+
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def write_chrome_trace(self, path: pathlib.Path):
+        with open(path, "w") as outfile:
+            json.dump(self.get_chrome_trace(), outfile)
+
+
+_tracer: Tracer | None = None
+
+
+def enable() -> Tracer:
+    """Start recording to a new tracer and return it."""
+    global _tracer
+    _tracer = Tracer()
+    return _tracer
+
+
+def disable() -> Tracer | None:
+    """Stop recording.  Returns the tracer which was recording, if any."""
+    global _tracer
+    tracer, _tracer = _tracer, None
+    return tracer
+
+
+def get_tracer() -> Tracer | None:
+    return _tracer
+
+
+def span(name: str, **args: typing.Any) -> Span:
+    """
+    Get a span to use as a context manager.  The span is timed even if
+    tracing is off, so its duration can be used for progress output.
+    """
+    return Span(name, args)
+
+
+def start_span(name: str, **args: typing.Any) -> Span:
+    """
+    Start a span which is ended with its stop() method.  For phases which
+    do not fit in a with block.
+    """
+    return Span(name, args).start()
+
+
+def count(name: str, amount: int = 1):
+    """Add amount to the named counter if tracing is on."""
+    if _tracer is not None:
+        _tracer.count(name, amount)
+
+
+_P = typing.ParamSpec("_P")
+_R = typing.TypeVar("_R")
+
+
+def traced(name: str) -> typing.Callable[
+    [typing.Callable[_P, _R]], typing.Callable[_P, _R]
+]:
+    """Decorator which runs every call of the function in a span."""
+    def decorator(func: typing.Callable[_P, _R]) -> typing.Callable[_P, _R]:
+        @functools.wraps(func)
+        def wrapper(*args: _P.args, **kwargs: _P.kwargs) -> _R:
+            if _tracer is None:
+                return func(*args, **kwargs)
+            with Span(name, {}):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
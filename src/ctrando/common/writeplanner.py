@@ -0,0 +1,163 @@
+"""
+Plan writes of many blobs into free space at once.
+
+Writing blobs one at a time places each with its own first-fit search, so the
+layout depends on the order of the writes and the expanded banks fragment.
+A WritePlanner collects the pending blobs, places all of them in one pass
+(bank-constrained blobs first, then largest first into the smallest piece
+which fits), and then writes the bytes.  Blobs which are written compressed
+are compressed together, in parallel, before they are placed.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+import typing
+
+from ctrando.common import freespace
+from ctrando.compression import ctcompression
+
+if typing.TYPE_CHECKING:
+    from ctrando.common import ctrom
+
+
+@dataclass
+class _PlannedWrite:
+    size: int
+    get_payload: typing.Callable[[int], typing.ByteString]
+    on_placed: typing.Callable[[ctrom.CTRom, int], None] | None
+    hint: int
+    bank: int | None
+
+
+@dataclass
+class _PlannedCompressedWrite:
+    data: bytes
+    on_placed: typing.Callable[[ctrom.CTRom, int], None] | None
+    hint: int
+    bank: int | None
+
+
+class WritePlanner:
+    """
+    Collects blobs to write to free space so that they can be placed together.
+
+    Each blob gives its size up front.  Once placed, get_payload is called
+    with the blob's address to build the bytes (so that pointer tables can be
+    made relative to the blob), and on_placed is called to update any
+    references.  An on_placed callback may add more blobs (e.g. data whose
+    size depends on where an earlier blob went).  These are placed in a
+    further round.
+
+    With optimal_compression, compressed blobs use the slower optimal parse
+    to save space.
+    """
+    def __init__(self, optimal_compression: bool = False):
+        self.optimal_compression = optimal_compression
+        self._pending: list[_PlannedWrite] = []
+        self._pending_compressed: list[_PlannedCompressedWrite] = []
+
+    def __len__(self):
+        return len(self._pending) + len(self._pending_compressed)
+
+    def add(
+            self,
+            size: int,
+            get_payload: typing.Callable[[int], typing.ByteString],
+            on_placed: typing.Callable[[ctrom.CTRom, int], None] | None = None,
+            hint: int = 0x410000,
+            bank: int | None = None
+    ):
+        """
+        Add a blob of the given size.  The blob is placed at or after hint.
+        If bank is given, the blob must be placed in that bank.
+        """
+        if size < 0:
+            raise ValueError("Negative size")
+        self._pending.append(
+            _PlannedWrite(size, get_payload, on_placed, hint, bank)
+        )
+
+    def add_compressed(
+            self,
+            data: typing.ByteString,
+            on_placed: typing.Callable[[ctrom.CTRom, int], None] | None = None,
+            hint: int = 0x410000,
+            bank: int | None = None
+    ):
+        """
+        Add data which is written with CT compression.  All compressed blobs
+        of a round are compressed in one call to ctcompression.compress_many
+        before the round is placed.
+        """
+        self._pending_compressed.append(
+            _PlannedCompressedWrite(bytes(data), on_placed, hint, bank)
+        )
+
+    def _compress_pending(self):
+        """Compress the pending compressed blobs and add them as plain blobs."""
+        writes, self._pending_compressed = self._pending_compressed, []
+        payloads = ctcompression.compress_many(
+            [write.data for write in writes],
+            optimal=self.optimal_compression
+        )
+
+        for write, payload in zip(writes, payloads):
+            self.add(len(payload), lambda _addr, payload=payload: payload,
+                     write.on_placed, write.hint, write.bank)
+
+    @staticmethod
+    def _place(space_manager: freespace.FreeSpace,
+               writes: list[_PlannedWrite]) -> list[int]:
+        """Find and mark an address for each write."""
+        # Blobs restricted to a bank have the fewest options, so they go
+        # first.  Otherwise, largest first.  Ties keep the order of addition.
+        order = sorted(
+            range(len(writes)),
+            key=lambda ind: (writes[ind].bank is None, -writes[ind].size, ind)
+        )
+
+        addrs = [0 for _ in writes]
+        for ind in order:
+            write = writes[ind]
+            if write.size == 0:
+                if write.bank is None:
+                    addrs[ind] = space_manager.get_free_addr(0, write.hint)
+                else:
+                    addrs[ind] = space_manager.get_best_fit_addr(
+                        0, write.hint, write.bank
+                    )
+                continue
+
+            addr = space_manager.get_best_fit_addr(
+                write.size, write.hint, write.bank
+            )
+            space_manager.mark_block((addr, addr+write.size),
+                                     freespace.FSWriteType.MARK_USED)
+            addrs[ind] = addr
+
+        return addrs
+
+    def write_to_ctrom(self, ct_rom: ctrom.CTRom):
+        """Place and write every pending blob, including ones added by callbacks."""
+        while self._pending or self._pending_compressed:
+            if self._pending_compressed:
+                self._compress_pending()
+            writes, self._pending = self._pending, []
+            addrs = self._place(ct_rom.space_manager, writes)
+
+            for ind in sorted(range(len(writes)), key=lambda x: addrs[x]):
+                write, addr = writes[ind], addrs[ind]
+                if write.size == 0:
+                    continue
+                payload = write.get_payload(addr)
+                if len(payload) != write.size:
+                    raise ValueError(
+                        f"Planned {write.size:04X} bytes at {addr:06X} but "
+                        f"got {len(payload):04X}"
+                    )
+                ct_rom.seek(addr)
+                ct_rom.write(payload, freespace.FSWriteType.MARK_USED)
+
+            for write, addr in zip(writes, addrs):
+                if write.on_placed is not None:
+                    write.on_placed(ct_rom, addr)
@@ -5,96 +5,101 @@
 #include <Python.h>
 #include <stdbool.h>
 #include <stdlib.h>
+#include <string.h>
+#include <limits.h>
 
 
-unsigned int get_le16(char* buf, unsigned int pos){
-    return (unsigned int)(unsigned char)(buf[pos]) + ((unsigned int)(unsigned char)(buf[pos+1]) << 8);
+static unsigned int get_le16(const unsigned char* buf, Py_ssize_t pos){
+    return (unsigned int)buf[pos] + ((unsigned int)buf[pos+1] << 8);
 }
 
 
-static PyObject* decompress(PyObject* self, PyObject* args)
-{
-    Py_buffer buffer;
-    PyObject* result;
-    char header = 0;
-    const char* source;
-    int i = 0;
-    int j = 0;
-    int len_source = 0;
-    int buf_pos = 0;
-    unsigned int out_pos = 0;
-    unsigned int end_pos = 0;
-    unsigned int src_pos = 0;
-    int add_byte = 0;
-    int main_len = 0;
-    int temp = 0;
-    unsigned char copy_size = 0;
-    unsigned int copy_offset = 0;
-    bool smallwidth = false;
-
-    char* out_buf = (char *)malloc(0x10000*sizeof(char));
-
-    if (out_buf == NULL)
-        return PyErr_NoMemory();
+// Decompressed data is at most 0x10000 bytes.
+#define MAX_DECOMPRESSED_SIZE 0x10000
 
-    if (!PyArg_ParseTuple(args, "y*i", &buffer, &buf_pos))
-        return NULL;
+// Error values returned by decompress_core.
+#define DECOMPRESS_OK 0
+#define DECOMPRESS_SOURCE_END -1
+#define DECOMPRESS_OUT_FULL -2
+#define DECOMPRESS_BAD_COPY -3
 
-    source = buffer.buf;
-    len_source = buffer.len;
 
-    if ((buf_pos + 2) >= len_source){
-        return NULL;
-    }
+// Decompress the packet at source[start] into out_buf, which holds out_size
+// bytes.  On success, *out_len gets the decompressed length and
+// *compressed_len the length of the packet.  Otherwise returns one of the
+// DECOMPRESS_ error values.
+//
+// This does not touch any Python objects, so it can run without the GIL.
+static int decompress_core(const unsigned char* source, Py_ssize_t len_source,
+                           Py_ssize_t start, unsigned char* out_buf,
+                           Py_ssize_t out_size, Py_ssize_t* out_len,
+                           Py_ssize_t* compressed_len)
+{
+    unsigned char header = 0;
+    Py_ssize_t out_pos = 0;
+    Py_ssize_t src_pos = 0;
+    Py_ssize_t end_pos = 0;
+    unsigned int copy_size = 0;
+    unsigned int copy_offset = 0;
+    bool smallwidth = false;
 
-    main_len = get_le16(source, buf_pos);
-    out_pos = 0;
-    src_pos = buf_pos + 2;
-    add_byte = src_pos + main_len;
-    if (add_byte >= len_source){
-        return NULL;
+    if (start < 0 || start + 2 >= len_source){
+        return DECOMPRESS_SOURCE_END;
     }
 
-    if (source[add_byte] & 0xC0)
-    {
-        smallwidth = true;
+    // First two bytes are the main body length.  The byte after the main
+    // body gives the copy width.
+    src_pos = start + 2;
+    end_pos = src_pos + get_le16(source, start);
+    if (end_pos >= len_source){
+        return DECOMPRESS_SOURCE_END;
     }
 
-    end_pos = add_byte;
-    if (end_pos >= len_source){return NULL;}
+    smallwidth = (source[end_pos] & 0xC0) != 0;
 
     while (true){
-//         fprintf(stderr, "state: %d, %d\n", src_pos, out_pos);
         if (src_pos == end_pos){
             if ((source[src_pos] & 0x3F) == 0){
-                // should return out_buf[0: out_pos]
                 break;
-            } else {
-                temp = get_le16(source, src_pos+1);
-                end_pos = buf_pos + temp;
-                if (end_pos >= len_source){
-                    return NULL;
-                }
+            }
 
-                src_pos += 3;
+            // Addendum, new end in next two bytes
+            if (src_pos + 2 >= len_source){
+                return DECOMPRESS_SOURCE_END;
             }
+            end_pos = start + get_le16(source, src_pos+1);
+            if (end_pos >= len_source){
+                return DECOMPRESS_SOURCE_END;
+            }
+            src_pos += 3;
         }
 
+        if (src_pos >= len_source){
+            return DECOMPRESS_SOURCE_END;
+        }
         header = source[src_pos];
         src_pos += 1;
-        // fprintf(stderr, "header: %u\n", (unsigned char)header);
 
-        for(i=0;i<8;i++){
-            if (src_pos == end_pos)
+        for (int i = 0; i < 8; i++){
+            if (src_pos == end_pos){
                 break;
-            else if ((header & (1 << i)) == 0){
-                if (out_pos >= 0x10000 || src_pos >= len_source){return NULL;}
+            }
+
+            if ((header & (1 << i)) == 0){
                 // Uncompressed, copy next byte
+                if (src_pos >= len_source){
+                    return DECOMPRESS_SOURCE_END;
+                }
+                if (out_pos >= out_size){
+                    return DECOMPRESS_OUT_FULL;
+                }
                 out_buf[out_pos] = source[src_pos];
                 out_pos += 1;
                 src_pos += 1;
             } else {
-                if (src_pos +2 >= len_source){return NULL;}
+                if (src_pos + 1 >= len_source){
+                    return DECOMPRESS_SOURCE_END;
+                }
                 copy_size = source[src_pos + 1];
                 copy_offset = get_le16(source, src_pos);
                 if (smallwidth){
@@ -105,13 +110,17 @@ static PyObject* decompress(PyObject* self, PyObject* args)
                     copy_size = copy_size >> 4;
                     copy_offset = copy_offset & 0x0FFF;
                 }
-
                 copy_size += 3;
-                if ((out_pos+copy_size > 0x10000) || (out_pos < copy_offset)){
-                    PyErr_SetString(PyExc_IndexError, "Copy range exceeds out buffer");
-                    return NULL;
+
+                if (out_pos + copy_size > out_size){
+                    return DECOMPRESS_OUT_FULL;
+                }
+                if (out_pos < copy_offset){
+                    return DECOMPRESS_BAD_COPY;
                 }
-                for(j=0; j< copy_size; j++){
+
+                // Copies may overlap their own output, so go byte by byte.
+                for (unsigned int j = 0; j < copy_size; j++){
                     out_buf[out_pos + j] = out_buf[out_pos - copy_offset + j];
                 }
 
@@ -119,30 +128,128 @@ static PyObject* decompress(PyObject* self, PyObject* args)
                 src_pos += 2;
             }
         }
+    }
+
+    *out_len = out_pos;
+    *compressed_len = end_pos - start + 1;
+    return DECOMPRESS_OK;
+}
 
+
+// Set the Python exception for a decompress_core error value.
+static void set_decompress_error(int error)
+{
+    if (error == DECOMPRESS_SOURCE_END){
+        PyErr_SetString(PyExc_IndexError,
+                        "Compressed packet runs past the end of the source");
+    } else if (error == DECOMPRESS_OUT_FULL){
+        PyErr_SetString(PyExc_IndexError, "Copy range exceeds out buffer");
+    } else {
+        PyErr_SetString(PyExc_ValueError,
+                        "Copy reaches before the start of the output");
+    }
+}
+
+
+static PyObject* decompress(PyObject* self, PyObject* args)
+{
+    Py_buffer buffer;
+    PyObject* result;
+    Py_ssize_t buf_pos = 0;
+    Py_ssize_t out_len = 0;
+    Py_ssize_t compressed_len = 0;
+    int error = 0;
+
+    if (!PyArg_ParseTuple(args, "y*n", &buffer, &buf_pos))
+        return NULL;
+
+    // Decompress straight into the result and shrink it after.
+    result = PyByteArray_FromStringAndSize(NULL, MAX_DECOMPRESSED_SIZE);
+    if (result == NULL){
+        PyBuffer_Release(&buffer);
+        return NULL;
     }
-    result = PyByteArray_FromStringAndSize(out_buf, out_pos);
-    free(out_buf);
+
+    Py_BEGIN_ALLOW_THREADS
+    error = decompress_core(buffer.buf, buffer.len, buf_pos,
+                            (unsigned char*)PyByteArray_AS_STRING(result),
+                            MAX_DECOMPRESSED_SIZE, &out_len, &compressed_len);
+    Py_END_ALLOW_THREADS
+
     PyBuffer_Release(&buffer);
+
+    if (error != DECOMPRESS_OK){
+        set_decompress_error(error);
+        Py_DECREF(result);
+        return NULL;
+    }
+
+    if (PyByteArray_Resize(result, out_len) < 0){
+        Py_DECREF(result);
+        return NULL;
+    }
+
     return result;
 }
 
 
-static PyObject* compress(PyObject* self, PyObject* args)
+static PyObject* decompress_into(PyObject* self, PyObject* args)
+{
+    Py_buffer buffer;
+    Py_buffer out_buffer;
+    Py_ssize_t buf_pos = 0;
+    Py_ssize_t out_len = 0;
+    Py_ssize_t compressed_len = 0;
+    int error = 0;
+
+    if (!PyArg_ParseTuple(args, "y*nw*", &buffer, &buf_pos, &out_buffer))
+        return NULL;
+
+    Py_BEGIN_ALLOW_THREADS
+    error = decompress_core(buffer.buf, buffer.len, buf_pos, out_buffer.buf,
+                            out_buffer.len, &out_len, &compressed_len);
+    Py_END_ALLOW_THREADS
+
+    PyBuffer_Release(&buffer);
+    PyBuffer_Release(&out_buffer);
+
+    if (error != DECOMPRESS_OK){
+        set_decompress_error(error);
+        return NULL;
+    }
+
+    return Py_BuildValue("nn", out_len, compressed_len);
+}
+
+
+// Compressed data (and so the main body length) must fit in 0x10000 bytes.
+#define MAX_COMPRESSED_SIZE 0x10000
+
+// A packet can run a few bytes past MAX_COMPRESSED_SIZE before the size is
+// checked, so the output buffer has some slack.
+#define COMPRESS_BUFFER_SIZE (MAX_COMPRESSED_SIZE + 0x20)
+
+// Error values returned by the compressors in place of a length.
+#define COMPRESS_TOO_LARGE -1
+#define COMPRESS_NO_MEMORY -2
+
+
+// Compress len_source bytes of source into compressed_data, which must hold
+// COMPRESS_BUFFER_SIZE bytes.  Returns the compressed length or
+// COMPRESS_TOO_LARGE if the result would be larger than MAX_COMPRESSED_SIZE.
+//
+// This does not touch any Python objects, so it can run without the GIL.
+static int compress_core(const char* source, int len_source,
+                         char* compressed_data)
 {
-  const char* source;
-  int len_source=0;
   int i=0;
   int lookback_range = 0;
   int max_copy_length = 0;
   int header_pos = 0;
   int src_pos = 0;
   int out_pos = 0;
-  bool done = false;
-  int best_size = 0x1000;
   int compr_stream = 0;
-  char compressed_data[2][0x10000];
-  int compressed_lengths[2];
+  int compressed_length = -1;
   int mask = 0;
   int addendum_size = 0;
   int lookback = 0;
@@ -151,180 +258,674 @@ static PyObject* compress(PyObject* self, PyObject* args)
   int cur_len = 0;
   int best_len = 0;
   int best_len_st = 0;
-  int ret_choice = 0;
-  PyObject* result;
-  Py_buffer buffer;
 
-  compressed_lengths[0] = compressed_lengths[1] = 0x10000;
+  // The game supports two widths for the copy range:
+  // i=0: use 0x07FF for the range, 0xF800 for the max copy length
+  // i=1: use 0x0FFF for the range, 0xF000 for the max copy length
+  // Only the first is used.
+  lookback_range = 0x07FF | (i << 11);
 
-  if (!PyArg_ParseTuple(args, "y*", &buffer))
-    return NULL;
+  // max_copy_length = 0xFFFF ^ lookback_range (bits used)
+  max_copy_length = (0xFFFF ^ lookback_range) >> (16-(5-i));
+  max_copy_length += 3;
 
-  // if (!PyObject_GetBuffer(arg1, &buffer, PyBUF_SIMPLE))
-  //   return NULL;
-  source = buffer.buf;
-  len_source = buffer.len;
-
-  for(i=0;i<1;i++){
-    // i=0: use 0x07FF for the range, 0xF800 for the max copy length
-    // i=1: use 0x0FFF for the range, 0xF000 for the max copy length
-    lookback_range = 0x07FF | (i << 11);
-
-    // max_copy_length = 0xFFFF ^ lookback_range (bits used)
-    max_copy_length = (0xFFFF ^ lookback_range) >> (16-(5-i));
-    max_copy_length += 3;
-
-    src_pos = 0;
-    
-    // First two bytes are main body length
-    // Next byte will be the first packet's header
-    out_pos = 2;
-    done = false;
-
-    while (!done){
-      if (out_pos >= best_size){
-	break;
-      }
-      header_pos = out_pos;
-
-      // compressed_data[][] was uninitialized.  This is no problem except that
-      // we need to make sure that the header bytes start off as 0s.
-      compressed_data[i][header_pos] = 0;
-      
-      out_pos += 1;
-
-      // printf("out_pos: %04X\n", out_pos);
-      for(int bit=0; bit<8; bit++){
-	
-	// While filling a packet we ran out of source.
-	if(src_pos == len_source){
-	  if(bit == 0){
-	    // If bit == 0, then we ran out after filling a packet.
-	    // This means no addendum.
-	    compressed_data[i][header_pos] = 0xC0*(1-i);
-
-	    // Record size
-	    compressed_lengths[i] = header_pos + 1;
-	  }
-	  else{
-	    // Otherwise, we're mid-packet.  The packet becomes the addendum
-	    // Set unused bits of header for addendum header
-	    mask = (0xFF << bit) & 0xFF;
-	    compressed_data[i][header_pos] |= mask;
-
-	    // shift the addendum packet down three bytes
-	    addendum_size = out_pos-header_pos;
-	    for(int j=addendum_size-1;j>=0;j--){
-	      compressed_data[i][header_pos+3+j] = \
-		compressed_data[i][header_pos+j];
-	    }
-		
-	    // copy range + addendum length
-	    compressed_data[i][header_pos] = 0xC0*(1-i) | bit;
-
-	    // total compressed length (remember shift by 3)
-	    // compressed_data[i][header_pos+1:header_pos+3] =	\
-	    //   to_little_endian(out_pos+3, 2);
-	    compressed_data[i][header_pos+1] = (out_pos+3) % 0x100;
-	    compressed_data[i][header_pos+2] = (int)((out_pos+3) / 0x100);
-
-	    // Truncate to used size
-	    compressed_data[i][out_pos+3] = 0xC0*(1-i);
-	    compressed_lengths[i] = out_pos+4;
-	  }
+  src_pos = 0;
 
-	  // compressed_data[i][0:2] =				\
-	  //   to_little_endian(header_pos-2, 2)
-	  compressed_data[i][0] = (header_pos-2) % 0x100;
-	  compressed_data[i][1] = (int)((header_pos-2) / 0x100);
+  // First two bytes are main body length
+  // Next byte will be the first packet's header
+  out_pos = 2;
 
-	  done = true;
-	  break;
-	}
+  while (compressed_length < 0){
+    if (out_pos >= MAX_COMPRESSED_SIZE){
+      return COMPRESS_TOO_LARGE;
+    }
+    header_pos = out_pos;
 
-	lookback_st = (src_pos - lookback_range) > 0? \
-	  (src_pos - lookback_range) : 0;
-	lookback_end = src_pos;
+    // The header bytes must start off as 0s.
+    compressed_data[header_pos] = 0;
 
-	best_len = 0;
-	best_len_st = 0;
+    out_pos += 1;
 
-	for(int start=lookback_st; start<lookback_end; start++){
-	  cur_len = 0;
+    for(int bit=0; bit<8; bit++){
 
-	  while((src_pos + cur_len < len_source) && \
-		(cur_len < max_copy_length) && \
-		source[start+cur_len] == source[src_pos+cur_len]){
-	    cur_len += 1;
-	  }
+      // While filling a packet we ran out of source.
+      if(src_pos == len_source){
+	if(bit == 0){
+	  // If bit == 0, then we ran out after filling a packet.
+	  // This means no addendum.
+	  compressed_data[header_pos] = 0xC0*(1-i);
 
-	  // Update best match if needed
-	  if(cur_len >= best_len){
-	    best_len = cur_len;
-	    best_len_st = start;
-	    if(cur_len == max_copy_length){
-	      break;
-	    }
-	  } 
+	  // Record size
+	  compressed_length = header_pos + 1;
 	}
+	else{
+	  // Otherwise, we're mid-packet.  The packet becomes the addendum
+	  // Set unused bits of header for addendum header
+	  mask = (0xFF << bit) & 0xFF;
+	  compressed_data[header_pos] |= mask;
+
+	  // shift the addendum packet down three bytes
+	  addendum_size = out_pos-header_pos;
+	  for(int j=addendum_size-1;j>=0;j--){
+	    compressed_data[header_pos+3+j] = compressed_data[header_pos+j];
+	  }
+
+	  // copy range + addendum length
+	  compressed_data[header_pos] = 0xC0*(1-i) | bit;
 
-	if(best_len > 2){
-	  // We matched at least 3 bytes, so we'll use compression
+	  // total compressed length (remember shift by 3)
+	  compressed_data[header_pos+1] = (out_pos+3) % 0x100;
+	  compressed_data[header_pos+2] = (int)((out_pos+3) / 0x100);
+
+	  // Truncate to used size
+	  compressed_data[out_pos+3] = 0xC0*(1-i);
+	  compressed_length = out_pos+4;
+	}
 
-	  // Mark the header to use compression for this bit
-	  compressed_data[i][header_pos] |= (1 << bit);
+	compressed_data[0] = (header_pos-2) % 0x100;
+	compressed_data[1] = (int)((header_pos-2) / 0x100);
+	break;
+      }
 
-	  lookback = src_pos - best_len_st;
-	  // # print(f"\tlookback: {lookback:04X}")
+      lookback_st = (src_pos - lookback_range) > 0? \
+	(src_pos - lookback_range) : 0;
+      lookback_end = src_pos;
 
-	  // length is encoded with a -3 because there are always at
-	  // least 3 bytes to copy.  The length is shifted to the most
-	  // significant bits.  The shift depends on i.
-	  // length = ((best_len-3) << (16-(5-i)));
+      best_len = 0;
+      best_len_st = 0;
 
-	  compr_stream = lookback | ((best_len-3) << (16-(5-i)));
+      for(int start=lookback_st; start<lookback_end; start++){
+	cur_len = 0;
 
-	  // compressed_data[i][out_pos:out_pos+2] =		\
-	  //   to_little_endian(compr_stream, 2)
-	  compressed_data[i][out_pos] = compr_stream % 0x100;
-	  compressed_data[i][out_pos+1] = (int)(compr_stream / 0x100);
-	  
-	  out_pos += 2;
-	  src_pos += best_len;
+	while((src_pos + cur_len < len_source) && \
+	      (cur_len < max_copy_length) && \
+	      source[start+cur_len] == source[src_pos+cur_len]){
+	  cur_len += 1;
 	}
-	else{
-	  // We failed to match 3 or more bytes, so just copy a byte
-	  compressed_data[i][out_pos] = source[src_pos];
-	  out_pos += 1;
-	  src_pos += 1;
+
+	// Update best match if needed
+	if(cur_len >= best_len){
+	  best_len = cur_len;
+	  best_len_st = start;
+	  if(cur_len == max_copy_length){
+	    break;
+	  }
 	}
       }
+
+      if(best_len > 2){
+	// We matched at least 3 bytes, so we'll use compression
+
+	// Mark the header to use compression for this bit
+	compressed_data[header_pos] |= (1 << bit);
+
+	lookback = src_pos - best_len_st;
+
+	// length is encoded with a -3 because there are always at
+	// least 3 bytes to copy.  The length is shifted to the most
+	// significant bits.  The shift depends on i.
+	compr_stream = lookback | ((best_len-3) << (16-(5-i)));
+
+	compressed_data[out_pos] = compr_stream % 0x100;
+	compressed_data[out_pos+1] = (int)(compr_stream / 0x100);
+
+	out_pos += 2;
+	src_pos += best_len;
+      }
+      else{
+	// We failed to match 3 or more bytes, so just copy a byte
+	compressed_data[out_pos] = source[src_pos];
+	out_pos += 1;
+	src_pos += 1;
+      }
+    }
+  }
+
+  if (compressed_length > MAX_COMPRESSED_SIZE){
+    return COMPRESS_TOO_LARGE;
+  }
+
+  return compressed_length;
+}
+
+
+// Optimal parse
+//
+// The greedy compressor takes the longest match at each position.  The
+// optimal parse instead picks the sequence of literals and copies which gives
+// the smallest output.  Every literal costs 1 byte and every copy 2 bytes, and
+// each packet of 8 items costs a header byte.  A final partial packet becomes
+// the addendum, which costs 3 more bytes than ending on a full packet.  Since
+// the cost of an item depends on its index mod 8, the shortest path is found
+// over states (source position, items in the current packet).
+
+#define HASH_SIZE 0x10000
+#define NO_POSITION -1
+
+// Copies reach back 0x7FF bytes with up to 34 bytes in the small width, or
+// 0xFFF bytes with up to 18 bytes in the large width.
+#define SMALL_RANGE 0x07FF
+#define SMALL_MAX_COPY 34
+#define LARGE_RANGE 0x0FFF
+#define LARGE_MAX_COPY 18
+
+typedef struct {
+  int* match_lens[2];     // longest match starting at each position
+  int* match_offsets[2];  // lookback of that match
+  int* prev;            // hash chain links
+  int* head;            // most recent position of each hash
+  int* costs;           // (len_source+1)*8 path costs
+  unsigned char* steps; // item length which reached each state
+  int* items;           // item lengths of the chosen parse
+} OptimalWork;
+
+
+static void free_optimal_work(OptimalWork* work)
+{
+  for (int i = 0; i < 2; i++){
+    free(work->match_lens[i]);
+    free(work->match_offsets[i]);
+  }
+  free(work->prev);
+  free(work->head);
+  free(work->costs);
+  free(work->steps);
+  free(work->items);
+}
+
+
+static bool alloc_optimal_work(OptimalWork* work, int len_source)
+{
+  size_t num_pos = (size_t)len_source + 1;
+
+  for (int i = 0; i < 2; i++){
+    work->match_lens[i] = (int *)malloc(num_pos*sizeof(int));
+    work->match_offsets[i] = (int *)malloc(num_pos*sizeof(int));
+  }
+  work->prev = (int *)malloc(num_pos*sizeof(int));
+  work->head = (int *)malloc(HASH_SIZE*sizeof(int));
+  work->costs = (int *)malloc(num_pos*8*sizeof(int));
+  work->steps = (unsigned char *)malloc(num_pos*8);
+  work->items = (int *)malloc(num_pos*sizeof(int));
+
+  if (work->match_lens[0] == NULL || work->match_offsets[0] == NULL ||
+      work->match_lens[1] == NULL || work->match_offsets[1] == NULL ||
+      work->prev == NULL || work->head == NULL || work->costs == NULL ||
+      work->steps == NULL || work->items == NULL){
+    free_optimal_work(work);
+    return false;
+  }
+
+  return true;
+}
+
+
+static unsigned int hash3(const unsigned char* source, int pos)
+{
+  return (((unsigned int)source[pos] << 8) ^
+          ((unsigned int)source[pos+1] << 4) ^
+          (unsigned int)source[pos+2]) & (HASH_SIZE-1);
+}
+
+
+// Fill match_lens and match_offsets with the longest match at each position
+// for both widths.  Any shorter copy (of at least 3 bytes) can use the same
+// offset.
+static void find_longest_matches(const unsigned char* source, int len_source,
+                                 OptimalWork* work)
+{
+  int pos = 0;
+  int cand = 0;
+  int cur_len = 0;
+  int max_len = 0;
+  int* small_lens = work->match_lens[0];
+  int* large_lens = work->match_lens[1];
+  unsigned int hash = 0;
+
+  for (int j = 0; j < HASH_SIZE; j++){
+    work->head[j] = NO_POSITION;
+  }
+
+  for (pos = 0; pos < len_source; pos++){
+    small_lens[pos] = large_lens[pos] = 0;
+    work->match_offsets[0][pos] = work->match_offsets[1][pos] = 0;
+    work->prev[pos] = NO_POSITION;
+
+    if (pos + 3 > len_source){
+      continue;
+    }
+
+    hash = hash3(source, pos);
+
+    // Chains are in decreasing position order, so stop once out of range.
+    for (cand = work->head[hash];
+         cand != NO_POSITION && pos - cand <= LARGE_RANGE;
+         cand = work->prev[cand]){
+      max_len = (pos - cand <= SMALL_RANGE) ? SMALL_MAX_COPY : LARGE_MAX_COPY;
+      if (max_len == LARGE_MAX_COPY && large_lens[pos] == LARGE_MAX_COPY){
+        break;
+      }
+
+      cur_len = 0;
+      while ((pos + cur_len < len_source) &&
+             (cur_len < max_len) &&
+             source[cand+cur_len] == source[pos+cur_len]){
+        cur_len += 1;
+      }
+
+      if (pos - cand <= SMALL_RANGE && cur_len > small_lens[pos]){
+        small_lens[pos] = cur_len;
+        work->match_offsets[0][pos] = pos - cand;
+      }
+
+      if (cur_len > LARGE_MAX_COPY){
+        cur_len = LARGE_MAX_COPY;
+      }
+      if (cur_len > large_lens[pos]){
+        large_lens[pos] = cur_len;
+        work->match_offsets[1][pos] = pos - cand;
+      }
+
+      if (small_lens[pos] == SMALL_MAX_COPY){
+        break;
+      }
+    }
+
+    work->prev[pos] = work->head[hash];
+    work->head[hash] = pos;
+  }
+}
+
+
+// Find the cheapest parse for the given width once find_longest_matches has
+// run.  Leaves the item lengths in work->items and returns the compressed
+// size.  *num_items gets the number of items.
+static int optimal_parse(int len_source, int i, OptimalWork* work,
+                         int* num_items)
+{
+  int* match_lens = work->match_lens[i];
+  int pos = 0;
+  int k = 0;
+  int next_k = 0;
+  int cost = 0;
+  int item_cost = 0;
+  int best_k = 0;
+  int best_cost = INT_MAX;
+  int* costs = work->costs;
+  int count = 0;
+
+  for (int j = 0; j < (len_source+1)*8; j++){
+    costs[j] = INT_MAX;
+  }
+  costs[0] = 0;
+
+  for (pos = 0; pos < len_source; pos++){
+    for (k = 0; k < 8; k++){
+      cost = costs[pos*8 + k];
+      if (cost == INT_MAX){
+        continue;
+      }
+
+      // Starting a packet costs its header byte.
+      if (k == 0){
+        cost += 1;
+      }
+      next_k = (k+1) % 8;
+
+      item_cost = cost + 1;
+      if (item_cost < costs[(pos+1)*8 + next_k]){
+        costs[(pos+1)*8 + next_k] = item_cost;
+        work->steps[(pos+1)*8 + next_k] = 1;
+      }
+
+      item_cost = cost + 2;
+      for (int copy_len = 3; copy_len <= match_lens[pos]; copy_len++){
+        if (item_cost < costs[(pos+copy_len)*8 + next_k]){
+          costs[(pos+copy_len)*8 + next_k] = item_cost;
+          work->steps[(pos+copy_len)*8 + next_k] = copy_len;
+        }
+      }
+    }
+  }
+
+  // Two bytes of main body length, then either the end byte or the addendum
+  // (end byte, addendum length, header which was already counted, items,
+  // final end byte).
+  for (k = 0; k < 8; k++){
+    cost = costs[len_source*8 + k];
+    if (cost == INT_MAX){
+      continue;
+    }
+    cost += 2 + ((k == 0) ? 1 : 4);
+    if (cost < best_cost){
+      best_cost = cost;
+      best_k = k;
+    }
+  }
+
+  // Walk back to recover the items.
+  pos = len_source;
+  k = best_k;
+  while (pos > 0){
+    work->items[count] = work->steps[pos*8 + k];
+    pos -= work->items[count];
+    k = (k + 7) % 8;
+    count += 1;
+  }
+  for (int j = 0; j < count/2; j++){
+    int temp = work->items[j];
+    work->items[j] = work->items[count-1-j];
+    work->items[count-1-j] = temp;
+  }
+
+  *num_items = count;
+  return best_cost;
+}
+
+
+static void write_optimal_item(const unsigned char* source, int i,
+                               const OptimalWork* work, int item_len, int bit,
+                               int* src_pos, int* out_pos, int* header,
+                               char* compressed_data)
+{
+  int compr_stream = 0;
+
+  if (item_len == 1){
+    compressed_data[*out_pos] = source[*src_pos];
+    *out_pos += 1;
+  } else {
+    *header |= (1 << bit);
+    compr_stream = work->match_offsets[i][*src_pos] |
+      ((item_len-3) << (16-(5-i)));
+    compressed_data[*out_pos] = compr_stream % 0x100;
+    compressed_data[*out_pos+1] = (int)(compr_stream / 0x100);
+    *out_pos += 2;
+  }
+  *src_pos += item_len;
+}
+
+
+// Write the items found by optimal_parse in the same layout that
+// compress_core uses.  Returns the compressed length.
+static int write_optimal_parse(const unsigned char* source, int i,
+                               const OptimalWork* work, int num_items,
+                               char* compressed_data)
+{
+  int width_bits = 0xC0*(1-i);
+  int num_full = num_items - (num_items % 8);
+  int remainder = num_items % 8;
+  int src_pos = 0;
+  int out_pos = 2;
+  int header_pos = 0;
+  int header = 0;
+  int main_end = 0;
+  int item = 0;
+
+  while (item < num_full){
+    header_pos = out_pos;
+    header = 0;
+    out_pos += 1;
+    for (int bit = 0; bit < 8; bit++, item++){
+      write_optimal_item(source, i, work, work->items[item], bit,
+                         &src_pos, &out_pos, &header, compressed_data);
     }
+    compressed_data[header_pos] = header;
+  }
+
+  main_end = out_pos;
+  compressed_data[0] = (main_end-2) % 0x100;
+  compressed_data[1] = (int)((main_end-2) / 0x100);
+
+  if (remainder == 0){
+    compressed_data[main_end] = width_bits;
+    return main_end + 1;
+  }
+
+  // The last partial packet is the addendum.  Its header comes after the
+  // addendum length, and its unused header bits are set.
+  header_pos = main_end + 3;
+  header = (0xFF << remainder) & 0xFF;
+  out_pos = main_end + 4;
+  for (int bit = 0; bit < remainder; bit++, item++){
+    write_optimal_item(source, i, work, work->items[item], bit,
+                       &src_pos, &out_pos, &header, compressed_data);
+  }
+  compressed_data[header_pos] = header;
+
+  compressed_data[main_end] = width_bits | remainder;
+  compressed_data[main_end+1] = out_pos % 0x100;
+  compressed_data[main_end+2] = (int)(out_pos / 0x100);
+  compressed_data[out_pos] = width_bits;
 
-    if (compressed_lengths[i] < best_size){
-      best_size = compressed_lengths[i];
+  return out_pos + 1;
+}
+
+
+// Compress with the optimal parse, trying both copy widths.  Returns the
+// compressed length or one of the COMPRESS_ error values.
+static int compress_optimal(const char* source, int len_source,
+                            char* compressed_data)
+{
+  const unsigned char* usource = (const unsigned char*)source;
+  OptimalWork work;
+  int best_size = COMPRESS_TOO_LARGE;
+  int size = 0;
+  int num_items = 0;
+
+  if (!alloc_optimal_work(&work, len_source)){
+    return COMPRESS_NO_MEMORY;
+  }
+
+  find_longest_matches(usource, len_source, &work);
+
+  // Ties go to the small width, like the greedy compressor.
+  for (int i = 0; i < 2; i++){
+    size = optimal_parse(len_source, i, &work, &num_items);
+    if (size <= MAX_COMPRESSED_SIZE &&
+        (best_size == COMPRESS_TOO_LARGE || size < best_size)){
+      best_size = write_optimal_parse(usource, i, &work, num_items,
+                                      compressed_data);
     }
   }
 
-  if(compressed_lengths[0] <= compressed_lengths[1]){
-    ret_choice = 0;
+  free_optimal_work(&work);
+  return best_size;
+}
+
+
+static int compress_source(const char* source, int len_source,
+                           char* compressed_data, bool optimal)
+{
+  if (optimal){
+    return compress_optimal(source, len_source, compressed_data);
+  }
+  return compress_core(source, len_source, compressed_data);
+}
+
+
+// Set the Python exception for a compressor error value.
+static void set_compress_error(int error)
+{
+  if (error == COMPRESS_NO_MEMORY){
+    PyErr_NoMemory();
+  } else {
+    PyErr_SetString(PyExc_ValueError,
+                    "Compressed data exceeds 0x10000 bytes");
+  }
+}
+
+
+static PyObject* compress(PyObject* self, PyObject* args, PyObject* kwargs)
+{
+  static char* kwlist[] = {"source", "optimal", NULL};
+  char* compressed_data;
+  int compressed_length = 0;
+  int optimal = 0;
+  PyObject* result;
+  Py_buffer buffer;
+
+  if (!PyArg_ParseTupleAndKeywords(args, kwargs, "y*|p", kwlist,
+                                   &buffer, &optimal))
+    return NULL;
+
+  if (buffer.len > INT_MAX){
+    PyBuffer_Release(&buffer);
+    PyErr_SetString(PyExc_ValueError, "Source is too large to compress");
+    return NULL;
+  }
+
+  compressed_data = (char *)malloc(COMPRESS_BUFFER_SIZE);
+  if (compressed_data == NULL){
+    PyBuffer_Release(&buffer);
+    return PyErr_NoMemory();
   }
-  else{
-    ret_choice = 1;
+
+  // The buffer stays exported until it is released, so other threads can
+  // not resize it while the GIL is released.
+  Py_BEGIN_ALLOW_THREADS
+  compressed_length = compress_source(buffer.buf, (int)buffer.len,
+                                      compressed_data, optimal);
+  Py_END_ALLOW_THREADS
+
+  if (compressed_length < 0){
+    set_compress_error(compressed_length);
+    result = NULL;
+  } else {
+    result = PyBytes_FromStringAndSize(compressed_data, compressed_length);
   }
-  
-  result = Py_BuildValue("y#",
-			 &compressed_data[ret_choice][0],
-			 compressed_lengths[ret_choice]);
+
+  free(compressed_data);
   PyBuffer_Release(&buffer);
   return result;
 }
 
 
+static PyObject* compress_many(PyObject* self, PyObject* args,
+                               PyObject* kwargs)
+{
+  static char* kwlist[] = {"sources", "optimal", NULL};
+  PyObject* sources;
+  PyObject* seq;
+  PyObject* result = NULL;
+  PyObject* item;
+  Py_buffer* buffers = NULL;
+  char** outputs = NULL;
+  int* output_lengths = NULL;
+  char* compressed_data = NULL;
+  Py_ssize_t num_sources = 0;
+  Py_ssize_t num_acquired = 0;
+  Py_ssize_t failed_index = -1;
+  Py_ssize_t i = 0;
+  int error = 0;
+  int optimal = 0;
+  bool no_memory = false;
+
+  if (!PyArg_ParseTupleAndKeywords(args, kwargs, "O|p", kwlist,
+                                   &sources, &optimal))
+    return NULL;
+
+  seq = PySequence_Fast(sources, "compress_many expects a sequence");
+  if (seq == NULL)
+    return NULL;
+
+  num_sources = PySequence_Fast_GET_SIZE(seq);
+  buffers = (Py_buffer *)calloc(num_sources + 1, sizeof(Py_buffer));
+  outputs = (char **)calloc(num_sources + 1, sizeof(char*));
+  output_lengths = (int *)calloc(num_sources + 1, sizeof(int));
+  compressed_data = (char *)malloc(COMPRESS_BUFFER_SIZE);
+  if (buffers == NULL || outputs == NULL || output_lengths == NULL ||
+      compressed_data == NULL){
+    PyErr_NoMemory();
+    goto done;
+  }
+
+  for (i = 0; i < num_sources; i++){
+    if (PyObject_GetBuffer(PySequence_Fast_GET_ITEM(seq, i), &buffers[i],
+                           PyBUF_SIMPLE) < 0)
+      goto done;
+    num_acquired += 1;
+
+    if (buffers[i].len > INT_MAX){
+      PyErr_SetString(PyExc_ValueError, "Source is too large to compress");
+      goto done;
+    }
+  }
+
+  Py_BEGIN_ALLOW_THREADS
+  for (i = 0; i < num_sources; i++){
+    output_lengths[i] = compress_source(buffers[i].buf, (int)buffers[i].len,
+                                        compressed_data, optimal);
+    if (output_lengths[i] < 0){
+      error = output_lengths[i];
+      failed_index = i;
+      break;
+    }
+
+    // Keep at least one byte so that malloc does not return NULL.
+    outputs[i] = (char *)malloc(output_lengths[i] + 1);
+    if (outputs[i] == NULL){
+      no_memory = true;
+      break;
+    }
+    memcpy(outputs[i], compressed_data, output_lengths[i]);
+  }
+  Py_END_ALLOW_THREADS
+
+  if (no_memory || error == COMPRESS_NO_MEMORY){
+    PyErr_NoMemory();
+    goto done;
+  }
+
+  if (failed_index >= 0){
+    PyErr_Format(PyExc_ValueError,
+                 "Compressed data of source %zd exceeds 0x10000 bytes",
+                 failed_index);
+    goto done;
+  }
+
+  result = PyList_New(num_sources);
+  if (result == NULL)
+    goto done;
+
+  for (i = 0; i < num_sources; i++){
+    item = PyBytes_FromStringAndSize(outputs[i], output_lengths[i]);
+    if (item == NULL){
+      Py_CLEAR(result);
+      goto done;
+    }
+    PyList_SET_ITEM(result, i, item);
+  }
+
+done:
+  for (i = 0; i < num_acquired; i++){
+    PyBuffer_Release(&buffers[i]);
+  }
+  if (outputs != NULL){
+    for (i = 0; i < num_sources; i++){
+      free(outputs[i]);
+    }
+  }
+  free(buffers);
+  free(outputs);
+  free(output_lengths);
+  free(compressed_data);
+  Py_DECREF(seq);
+  return result;
+}
+
+
 
 static PyMethodDef CompressMethods[] = {
-    {"compress", compress, METH_VARARGS, "compress an event."},
+    {"compress", (PyCFunction)(void(*)(void))compress,
+     METH_VARARGS | METH_KEYWORDS,
+     "compress an event.  optimal=True finds the smallest output."},
+    {"compress_many", (PyCFunction)(void(*)(void))compress_many,
+     METH_VARARGS | METH_KEYWORDS,
+     "compress a sequence of buffers without holding the GIL."},
     {"decompress", decompress, METH_VARARGS, "decompress bytes"},
+    {"decompress_into", decompress_into, METH_VARARGS,
+     "decompress into a writable buffer.  "
+     "Returns (decompressed length, compressed length)."},
     {NULL, NULL, 0, NULL}
 };
 
@@ -1,2 +1,9 @@
-def compress(source: bytearray) -> bytearray: ...
-def decompress(source: bytearray, start: int) -> bytearray: ...
\ No newline at end of file
+from collections.abc import Sequence
+from typing import ByteString
+
+def compress(source: ByteString, optimal: bool = False) -> bytes: ...
+def compress_many(sources: Sequence[ByteString],
+                  optimal: bool = False) -> list[bytes]: ...
+def decompress(source: ByteString, start: int) -> bytearray: ...
+def decompress_into(source: ByteString, start: int,
+                    out_buffer: bytearray | memoryview) -> tuple[int, int]: ...
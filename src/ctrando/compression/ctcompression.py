@@ -1,22 +1,132 @@
 # Copied from Gieger's (Michael Springer, evilpeer@hotmail.com) C version
-from typing import ByteString
+import collections
+from collections.abc import Sequence
+import concurrent.futures
+import os
+from typing import ByteString, Optional
+from ctrando.common import tracing
 from ctrando.common.byteops import to_little_endian
 
 # ctcompress is the fast C library.  If it's not present, use the python
 # implementation.
 try:
-    from ctrando.compression.ctcompress import compress, decompress
-    print('Using C compression implementation.')
+    from ctrando.compression.ctcompress import compress as _compress, \
+        compress_many as _compress_many, decompress, decompress_into
+    HAS_C_COMPRESSION = True
 except ImportError:
-    print('C compression module not found.  Falling back to python.')
-    def compress(source: bytearray) -> bytearray:
-        """Compress with CT compression"""
+    HAS_C_COMPRESSION = False
+
+    # The python implementation only has the greedy parse.
+    def _compress(source: bytearray, optimal: bool = False) -> bytearray:
         return compress_py_2(source)
 
+    def _compress_many(sources: Sequence[ByteString],
+                       optimal: bool = False) -> list[bytes]:
+        return [bytes(compress_py_2(source)) for source in sources]
+
     def decompress(source: bytearray, start: int) -> bytearray:
         """Decompress with CT decompression"""
         return decompress_py(source, start)
 
+    def decompress_into(source: ByteString, start: int,
+                        out_buffer: bytearray | memoryview) -> tuple[int, int]:
+        """
+        Decompress the packet at source[start] into out_buffer.  Returns the
+        decompressed length and the compressed length.
+        """
+        data = decompress_py(source, start)
+        if len(data) > len(out_buffer):
+            raise IndexError("Copy range exceeds out buffer")
+        out_buffer[:len(data)] = data
+        return len(data), get_compressed_length(source, start)
+
+
+def compress(source: bytearray, optimal: bool = False) -> bytearray:
+    """
+    Compress with CT compression.  By default, the longest match is taken at
+    each point.  With optimal, the C library finds the smallest possible
+    output, which is slower.
+    """
+    tracing.count("bytes_compressed", len(source))
+    return _compress(source, optimal=optimal)
+
+
+# The same data is often compressed many times (e.g. the same script mods are
+# applied for every seed in a batch), so compress_many remembers recent
+# results.
+_COMPRESS_CACHE_SIZE = 1024
+_compress_cache: collections.OrderedDict[tuple[bool, bytes], bytes] = \
+    collections.OrderedDict()
+
+
+def _compress_in_threads(sources: list[bytes],
+                         max_workers: Optional[int],
+                         optimal: bool) -> list[bytes]:
+    """
+    Split sources among threads.  The C library does not hold the GIL while
+    it compresses, so the threads run in parallel.
+    """
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+
+    num_chunks = min(max_workers, len(sources))
+    if not HAS_C_COMPRESSION or num_chunks <= 1:
+        return _compress_many(sources, optimal=optimal)
+
+    # Interleave the chunks so that each gets a mix of large and small data.
+    chunks = [sources[ind::num_chunks] for ind in range(num_chunks)]
+    with concurrent.futures.ThreadPoolExecutor(num_chunks) as executor:
+        chunk_results = list(executor.map(
+            lambda chunk: _compress_many(chunk, optimal=optimal), chunks
+        ))
+
+    results: list[bytes] = [b"" for _ in sources]
+    for ind, chunk_result in enumerate(chunk_results):
+        results[ind::num_chunks] = chunk_result
+
+    return results
+
+
+@tracing.traced("compress_many")
+def compress_many(sources: Sequence[ByteString],
+                  max_workers: Optional[int] = None,
+                  optimal: bool = False) -> list[bytes]:
+    """
+    Compress every source with CT compression.  Gives the same results as
+    calling compress on each, but the work is spread over max_workers threads
+    (default: one per cpu).
+    """
+    keys = [(optimal, bytes(source)) for source in sources]
+
+    todo = list(dict.fromkeys(
+        key for key in keys if key not in _compress_cache
+    ))
+    tracing.count("compress_cache_hits", len(keys) - len(todo))
+    tracing.count("bytes_compressed", sum(len(key[1]) for key in todo))
+
+    compressed = _compress_in_threads([key[1] for key in todo], max_workers,
+                                      optimal)
+    results = dict(zip(todo, compressed))
+    for key in keys:
+        if key in _compress_cache:
+            _compress_cache.move_to_end(key)
+            results[key] = _compress_cache[key]
+
+    for key, result in results.items():
+        _compress_cache[key] = result
+    while len(_compress_cache) > _COMPRESS_CACHE_SIZE:
+        _compress_cache.popitem(last=False)
+
+    return [results[key] for key in keys]
+
+
+def get_decompress_buffer() -> bytearray:
+    """
+    Get a buffer which holds any decompressed packet.  Readers of many packets
+    can decompress each into the same buffer with decompress_into.
+    """
+    return bytearray(0x10000)
+
 
 def decompress_py(rom: ByteString, start: int):
     out_buffer = bytearray([0 for i in range(0, 0x10000)])
@@ -104,9 +214,9 @@ def get_compressed_length(rom: ByteString, addr: int):
     # print(f"Start position: {addr:06X}")
     # print(f"Main body length = 0x{main_length:04X}")
 
-    # len main body + main body + addendum byte
-    compr_len = 2 + main_length + 1
-    add_byte_addr = addr + compr_len - 1
+    # Offset of the byte after the main body, which marks an addendum.
+    compr_len = 2 + main_length
+    add_byte_addr = addr + compr_len
 
     while rom[add_byte_addr] & 0x3F != 0:
         # print(f"Addendum byte: {rom[add_byte_addr]: 02X}")
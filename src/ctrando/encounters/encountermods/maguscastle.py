@@ -3,7 +3,7 @@ from ctrando.common import ctenums
 from ctrando.locations.scriptmanager import ScriptManager
 from ctrando.locations.locationevent import LocationEvent, FunctionID as FID, get_command
 from ctrando.locations.eventcommand import (
-    EventCommand as EC, Operation as OP, FuncSync as FS
+    EventCommand as EC, Operation as OP, FuncSync as FS, get_command_length
 )
 from ctrando.locations.eventfunction import EventFunction as EF
 
@@ -32,7 +32,7 @@ def unforce_hall_of_aggression(script_manager: ScriptManager):
         own_fn_pos, cmd = script.find_command([0x03], body_st)
         own_fn_end = own_fn_pos
         for _ in range(4):
-            own_fn_end += len(get_command(script.data, own_fn_end))
+            own_fn_end += get_command_length(script.data, own_fn_end)
         # own_fn_end, _ = script.find_command([0x12], own_fn_pos+len(cmd))
         own_fn = EF.from_bytearray(script.data[own_fn_pos:own_fn_end])
         own_fn.add(EC.return_cmd())
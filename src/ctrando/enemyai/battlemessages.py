@@ -2,7 +2,8 @@
 import io
 import typing
 
-from ctrando.common import byteops, cttypes as ctty, ctrom, freespace
+from ctrando.common import byteops, cttypes as ctty, ctrom, freespace, \
+    writeplanner
 from ctrando.common.cttypes import T, RomRW
 from ctrando.strings import ctstrings
 
@@ -203,9 +204,13 @@ class BattleMessageManager:
         self.message_dict[item] = BattleMessage.from_string(val)
 
 
-    def write_to_ct_rom(self, ct_rom: ctrom.CTRom, hint: int = 0x410000):
+    def write_to_ct_rom(
+            self, ct_rom: ctrom.CTRom, hint: int = 0x410000,
+            planner: typing.Optional[writeplanner.WritePlanner] = None
+    ):
         """
-        Write all battle messages to ct_rom and update references.
+        Write all battle messages to ct_rom and update references.  If a
+        planner is given, the messages are written when the planner is.
         """
         vanilla_num_ptrs = 0xE3
 
@@ -228,14 +233,21 @@ class BattleMessageManager:
         ptr_size = 2*num_ptrs
         total_size = ptr_size+len(out_buf.getbuffer())
 
-        new_start = ct_rom.space_manager.get_free_addr(total_size, hint)
-        offset = (new_start & 0xFFFF) + 2*num_ptrs
-        ptr_b = b"".join(
-            int.to_bytes(ptr+offset, 2, "little")
-            for ptr in ptrs
-        )
-        ct_rom.seek(new_start)
-        ct_rom.write(ptr_b, freespace.FSWriteType.MARK_USED)
-        ct_rom.write(out_buf.getbuffer(), freespace.FSWriteType.MARK_USED)
+        message_b = out_buf.getvalue()
+
+        def get_payload(new_start: int) -> bytes:
+            offset = (new_start & 0xFFFF) + 2*num_ptrs
+            ptr_b = b"".join(
+                int.to_bytes(ptr+offset, 2, "little")
+                for ptr in ptrs
+            )
+            return ptr_b + message_b
+
+        flush = planner is None
+        if planner is None:
+            planner = writeplanner.WritePlanner()
+
+        planner.add(total_size, get_payload, self._update_references, hint)
 
-        self._update_references(ct_rom, new_start)
\ No newline at end of file
+        if flush:
+            planner.write_to_ctrom(ct_rom)
@@ -4,7 +4,7 @@ Module for the class that will manage AI Scripts + BattleMessages
 import copy
 import typing
 
-from ctrando.common import ctrom, ctenums
+from ctrando.common import ctrom, ctenums, writeplanner
 from ctrando.enemyai import enemyaitypes as aity, battlemessages as bm
 
 
@@ -48,12 +48,30 @@ class EnemyAIManager:
 
         return ret_man
 
-    def write_to_ct_rom(self, ct_rom):
-        """Write all scripts and battle messages to CT Rom"""
+    def write_to_ct_rom(
+            self, ct_rom,
+            planner: typing.Optional[writeplanner.WritePlanner] = None
+    ):
+        """
+        Write all scripts and battle messages to CT Rom.  If a planner is
+        given, the data is written when the planner is.
+        """
+        flush = planner is None
+        if planner is None:
+            planner = writeplanner.WritePlanner()
+
         self.battle_msg_man.free_existing_battle_messages(ct_rom)
-        self.battle_msg_man.write_to_ct_rom(ct_rom)
+        self.battle_msg_man.write_to_ct_rom(ct_rom, planner=planner)
 
+        # Free every script before placing any so that the bank 0x0C space
+        # is packed as a whole.
         ai_ptr_start = aity.EnemyAIScript.get_script_ptr_start(ct_rom)
-        for enemy_id, script in self.script_dict.items():
+        for enemy_id in self.script_dict:
             aity.EnemyAIScript.free_script_on_ct_rom(ct_rom, enemy_id, ai_ptr_start)
-            script.write_script_to_ct_rom(ct_rom, enemy_id, ai_ptr_start)
+
+        for enemy_id, script in self.script_dict.items():
+            script.write_script_to_ct_rom(ct_rom, enemy_id, ai_ptr_start,
+                                          planner)
+
+        if flush:
+            planner.write_to_ctrom(ct_rom)
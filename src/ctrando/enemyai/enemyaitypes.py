@@ -10,7 +10,8 @@ from enum import IntEnum
 import typing
 from typing import Optional
 
-from ctrando.common import byteops, ctenums, ctrom, cttypes as cty, freespace
+from ctrando.common import byteops, ctenums, ctrom, cttypes as cty, freespace, \
+    writeplanner
 
 
 class StatOffset(IntEnum):
@@ -884,22 +885,30 @@ class EnemyAIScript:
 
     def write_script_to_ct_rom(
             self, ct_rom: ctrom.CTRom, enemy_id: ctenums.EnemyID,
-            ai_script_ptr_start: typing.Optional[int] = None
+            ai_script_ptr_start: typing.Optional[int] = None,
+            planner: typing.Optional[writeplanner.WritePlanner] = None
     ):
-        """Write a script to a given enemy's spot on the ct rom"""
+        """
+        Write a script to a given enemy's spot on the ct rom.  If a planner
+        is given, the script is written when the planner is.
+        """
         if ai_script_ptr_start is None:
             ai_script_ptr_start = self.get_script_ptr_start(ct_rom)
 
-        script_b = self.to_bytes()
-        new_addr = ct_rom.space_manager.get_free_addr(len(script_b), hint=0x0C0000)
+        flush = planner is None
+        if planner is None:
+            planner = writeplanner.WritePlanner()
 
-        if (new_addr & 0xFF0000) != 0x0C0000:
-            raise freespace.FreeSpaceError("Insufficient bank 0x0C space")
+        def set_ptr(ct_rom: ctrom.CTRom, new_addr: int):
+            ct_rom.seek(ai_script_ptr_start + 2*enemy_id)
+            ct_rom.write(int.to_bytes(new_addr & 0xFFFF, 2, "little"))
 
-        ct_rom.seek(new_addr)
-        ct_rom.write(script_b, freespace.FSWriteType.MARK_USED)
-        ct_rom.seek(ai_script_ptr_start + 2*enemy_id)
-        ct_rom.write(int.to_bytes(new_addr & 0xFFFF, 2, "little"))
+        script_b = self.to_bytes()
+        planner.add(len(script_b), lambda _: script_b, set_ptr,
+                    hint=0x0C0000, bank=0x0C)
+
+        if flush:
+            planner.write_to_ctrom(ct_rom)
 
     @staticmethod
     def _read_script_from_bytestring(
@@ -7,13 +7,53 @@ from enum import Enum, auto
 import typing
 from typing import ByteString, Optional, List
 
-from ctrando.common import ctenums, ctrom
+from ctrando.common import ctenums, ctrom, romtable
 from ctrando.strings import ctstrings
 from ctrando.items import itemdata
 
+if typing.TYPE_CHECKING:
+    import numpy
+
 WritableBytes = typing.Union[bytearray, memoryview]
 StatList = List[typing.Union[int, typing.Literal[""]]]
 
+# Each table has one record per EnemyID.
+_stat_start, _stat_size = 0x0C4700, 0x17
+_reward_start, _reward_size = 0x0C5E00, 7
+_name_start, _name_size = 0x0C6500, 0xB
+_hide_name_start = 0x21DE80
+
+# Byte-aligned fields of the stat and reward records for array views.  Flag
+# bytes are whole u1 fields.
+STAT_FIELDS: tuple[romtable.Field, ...] = (
+    ("hp", 0, "<u2"),
+    ("level", 2, "u1"),
+    ("status_immunities", 4, "u1"),
+    ("stamina", 8, "u1"),
+    ("speed", 9, "u1"),
+    ("magic", 0xA, "u1"),
+    ("hit", 0xB, "u1"),
+    ("evade", 0xC, "u1"),
+    ("mdef", 0xD, "u1"),
+    ("offense", 0xE, "u1"),
+    ("defense", 0xF, "u1"),
+    ("lightning_resistance", 0x10, "u1"),
+    ("shadow_resistance", 0x11, "u1"),
+    ("ice_resistance", 0x12, "u1"),
+    ("fire_resistance", 0x13, "u1"),
+    ("tech_immunities", 0x14, "u1"),
+    ("flags", 0x15, "u1"),
+    ("secondary_attack_id", 0x16, "u1"),
+)
+
+REWARD_FIELDS: tuple[romtable.Field, ...] = (
+    ("xp", 0, "<u2"),
+    ("gp", 2, "<u2"),
+    ("drop_item", 4, "u1"),
+    ("charm_item", 5, "u1"),
+    ("tp", 6, "u1"),
+)
+
 
 class EnemyStat(enum.Enum):
     CURRENT_HP = auto()
@@ -165,6 +205,10 @@ class EnemyStats:
         self._name_bytes: ctstrings.CTString  # TODO: Use CTNameString
         self._reward_data: bytearray
         self.hide_name = hide_name
+        # (stat table, reward table, index) when the data are views of table
+        # records.
+        self._tables: Optional[tuple[romtable.RomTable, romtable.RomTable,
+                                     int]] = None
 
         if stat_data is None:
             stat_data = bytes([0 for _ in range(0x17)])
@@ -249,20 +293,58 @@ class EnemyStats:
     @classmethod
     def from_rom(cls, rom: ByteString, enemy_id: ctenums.EnemyID):
         """Read enemy stats from rom."""
-        data_st = 0x0C4700 + 0x17*enemy_id
-        data = bytes(rom[data_st:data_st+0x17])
+        data_st = _stat_start + _stat_size*enemy_id
+        data = bytes(rom[data_st:data_st+_stat_size])
 
-        name_st = 0x0C6500 + 0xB*enemy_id
-        name = bytes(rom[name_st:name_st+0xB])
+        name_st = _name_start + _name_size*enemy_id
+        name = bytes(rom[name_st:name_st+_name_size])
 
-        rewards_st = 0x0C5E00 + 7*enemy_id
-        rewards = bytes(rom[rewards_st: rewards_st+7])
+        rewards_st = _reward_start + _reward_size*enemy_id
+        rewards = bytes(rom[rewards_st: rewards_st+_reward_size])
 
-        hide_name_st = 0x21DE80+enemy_id
+        hide_name_st = _hide_name_start+enemy_id
         hide_name = bool(rom[hide_name_st])
 
         return EnemyStats(data, name, rewards, hide_name)
 
+    @classmethod
+    def from_tables(cls, stat_table: romtable.RomTable,
+                    reward_table: romtable.RomTable,
+                    enemy_id: ctenums.EnemyID,
+                    name_bytes: ByteString,
+                    hide_name: bool) -> EnemyStats:
+        """
+        Make enemy stats whose stats and rewards are views of record enemy_id
+        of the tables.
+        """
+        # Skip __init__.  Its default data would be replaced anyway.
+        ret = cls.__new__(cls)
+        ret.hide_name = hide_name
+        ret._set_name(ctstrings.CTString(name_bytes))
+        ret._view_tables(stat_table, reward_table, int(enemy_id))
+        return ret
+
+    def _view_tables(self, stat_table: romtable.RomTable,
+                     reward_table: romtable.RomTable, index: int):
+        self._tables = (stat_table, reward_table, index)
+        self._stat_data = stat_table.get_record(index)
+        self._reward_data = reward_table.get_record(index)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        if self._tables is not None:
+            # Views can not be pickled.  They are rebuilt from the tables.
+            del state["_stat_data"], state["_reward_data"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        tables = state.get("_tables", None)
+        if tables is None:
+            self._tables = None
+        else:
+            self._view_tables(*tables)
+
     @classmethod
     def from_ctrom(cls, ct_rom: ctrom.CTRom, enemy_id: ctenums.EnemyID):
         """Read enemy stats from a CTRom."""
@@ -270,18 +352,18 @@ class EnemyStats:
 
     def write_to_ctrom(self, ct_rom: ctrom.CTRom, enemy_id: ctenums.EnemyID):
         """Write enemy stats to a CTRom."""
-        ct_rom.seek(0x0C4700 + 0x17*enemy_id)
+        ct_rom.seek(_stat_start + _stat_size*enemy_id)
         ct_rom.write(self._stat_data)
 
-        ct_rom.seek(0x0C6500 + 0xB*enemy_id)
+        ct_rom.seek(_name_start + _name_size*enemy_id)
         ct_rom.write(self._name_bytes)
 
-        ct_rom.seek(0x0C5E00 + 7*enemy_id)
+        ct_rom.seek(_reward_start + _reward_size*enemy_id)
         ct_rom.write(self._reward_data)
 
         # self.sprite_data.write_to_ctrom(ct_rom, enemy_id)
 
-        ct_rom.seek(0x21DE80+enemy_id)
+        ct_rom.seek(_hide_name_start+enemy_id)
         ct_rom.write(self.hide_name.to_bytes(1, 'little'))
 
     def _set_stats(self, stat_bytes: ByteString):
@@ -550,13 +632,142 @@ def get_sprite_dict_from_ctrom(
     return sprite_dict
 
 
+class EnemyStatDict(dict[ctenums.EnemyID, EnemyStats]):
+    """
+    Dictionary EnemyID -> EnemyStats where the stats and rewards of each
+    enemy are views of its record in stat_table and reward_table.
+
+    Stats assigned with d[enemy_id] = stats (or update, setdefault, |=) are
+    copied into enemy_id's records, and d[enemy_id] becomes a new EnemyStats
+    which views them.  The assigned object is not changed, so later changes
+    to it do not reach the dictionary.  get_stat_arrays gives array views
+    for whole-table passes.
+    """
+    def __init__(
+            self,
+            stat_table: romtable.RomTable,
+            reward_table: romtable.RomTable,
+            items: typing.Iterable[tuple[ctenums.EnemyID, EnemyStats]] = ()
+    ):
+        """Items must already be views of the tables."""
+        dict.__init__(self, items)
+        self.stat_table = stat_table
+        self.reward_table = reward_table
+
+    def __reduce__(self):
+        return (type(self),
+                (self.stat_table, self.reward_table, list(self.items())))
+
+    def __setitem__(self, enemy_id: ctenums.EnemyID, stats: EnemyStats):
+        index = int(enemy_id)
+        self.stat_table.set_record(index, stats._stat_data)
+        self.reward_table.set_record(index, stats._reward_data)
+        dict.__setitem__(self, enemy_id, type(stats).from_tables(
+            self.stat_table, self.reward_table, enemy_id,
+            stats._name_bytes, stats.hide_name
+        ))
+
+    # dict's own versions of these skip __setitem__.
+    def update(self, *args, **kwargs):
+        for enemy_id, stats in dict(*args, **kwargs).items():
+            self[enemy_id] = stats
+
+    def setdefault(self, enemy_id: ctenums.EnemyID,
+                   default: Optional[EnemyStats] = None) -> EnemyStats:
+        if enemy_id not in self:
+            self[enemy_id] = default
+        return self[enemy_id]
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def copy(self) -> EnemyStatDict:
+        """Shallow copy which shares the tables and EnemyStats."""
+        return type(self)(self.stat_table, self.reward_table, self.items())
+
+    def write_to_ctrom(self, ct_rom: ctrom.CTRom):
+        """
+        Write every enemy to a CTRom.  Each table is written at once if every
+        EnemyID is present.
+        """
+        if len(self) != len(ctenums.EnemyID):
+            for enemy_id, stats in self.items():
+                stats.write_to_ctrom(ct_rom, enemy_id)
+            return
+
+        self.stat_table.write_to_ctrom(ct_rom, _stat_start)
+        self.reward_table.write_to_ctrom(ct_rom, _reward_start)
+
+        enemy_ids = sorted(self)
+        ct_rom.seek(_name_start)
+        ct_rom.write(b''.join(self[enemy_id]._name_bytes
+                              for enemy_id in enemy_ids))
+
+        ct_rom.seek(_hide_name_start)
+        ct_rom.write(bytes(int(self[enemy_id].hide_name)
+                           for enemy_id in enemy_ids))
+
+
+def get_stat_arrays(
+        stat_dict: dict[ctenums.EnemyID, EnemyStats]
+) -> Optional[tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray]]:
+    """
+    Get (enemy ids, stat records, reward records) as arrays for a stat_dict
+    read by get_stat_dict_from_ctrom.  Records are indexed by EnemyID, and
+    changing them changes the EnemyStats.  The ids are the keys of stat_dict.
+
+    Returns None if NumPy is not installed or stat_dict is not an
+    EnemyStatDict.  Callers then loop over the EnemyStats instead.
+    """
+    if not romtable.HAS_NUMPY or not isinstance(stat_dict, EnemyStatDict):
+        return None
+
+    enemy_ids = romtable.np.fromiter(
+        (int(enemy_id) for enemy_id in stat_dict),
+        dtype=romtable.np.intp, count=len(stat_dict)
+    )
+    return (enemy_ids, stat_dict.stat_table.get_array(),
+            stat_dict.reward_table.get_array())
+
+
+def write_stat_dict_to_ctrom(
+        ct_rom: ctrom.CTRom,
+        stat_dict: dict[ctenums.EnemyID, EnemyStats]
+):
+    """Write every enemy in stat_dict to a CTRom."""
+    if isinstance(stat_dict, EnemyStatDict):
+        stat_dict.write_to_ctrom(ct_rom)
+    else:
+        for enemy_id, stats in stat_dict.items():
+            stats.write_to_ctrom(ct_rom, enemy_id)
+
+
 def get_stat_dict_from_ctrom(ct_rom: ctrom.CTRom) -> dict[ctenums.EnemyID,
                                                           EnemyStats]:
-    """Build a dictionary EnemyID -> EnemyStats from a CTRom."""
-    stat_dict = {
-        enemy_id: EnemyStats.from_ctrom(ct_rom, enemy_id)
+    """
+    Build a dictionary EnemyID -> EnemyStats from a CTRom.  Each table is
+    read with one slice, and the EnemyStats are views of it.
+    """
+    rom = ct_rom.getbuffer()
+    num_enemies = len(ctenums.EnemyID)
+    stat_table = romtable.RomTable.from_rom(
+        rom, _stat_start, _stat_size, num_enemies, STAT_FIELDS
+    )
+    reward_table = romtable.RomTable.from_rom(
+        rom, _reward_start, _reward_size, num_enemies, REWARD_FIELDS
+    )
+    names = bytes(rom[_name_start:_name_start + _name_size*num_enemies])
+    hide_names = bytes(rom[_hide_name_start:_hide_name_start+num_enemies])
+
+    stat_dict = EnemyStatDict(stat_table, reward_table, (
+        (enemy_id, EnemyStats.from_tables(
+            stat_table, reward_table, enemy_id,
+            names[_name_size*enemy_id:_name_size*(enemy_id+1)],
+            bool(hide_names[enemy_id])
+        ))
         for enemy_id in ctenums.EnemyID
-    }
+    ))
 
     return stat_dict
 
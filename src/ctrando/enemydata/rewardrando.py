@@ -4,7 +4,7 @@ from collections.abc import Sequence
 from ctrando.arguments import battlerewards, gearrandooptions
 from ctrando.bosses import bosstypes as bty
 from ctrando.characters import ctpcstats
-from ctrando.common import ctenums, distribution
+from ctrando.common import ctenums, distribution, romtable
 from ctrando.common.random import RNGType
 from ctrando.enemydata import enemystats
 from ctrando.enemyscaling.patchscaling import get_true_levels_bytes
@@ -151,22 +151,31 @@ def pre_reduce_xp_thresholds(
     Reduce all xp thresholds and xp rewards by a factor to shrink
     the range of possible xp values.
     """
+    stat_arrays = enemystats.get_stat_arrays(enemy_dict)
+    if stat_arrays is None:
+        for enemy_stats in enemy_dict.values():
+            xp = enemy_stats.xp
+            if xp == 0:
+                continue
+            xp = sorted([1, round(xp/base_scale_factor), 0xFFFF])[1]
+            enemy_stats.xp = xp
+
+        for level in range(99):
+            xp_req = xp_thresholds.get_xp_for_level(level)
+            xp_req = sorted([1, round(xp_req/base_scale_factor), 0xFFFF])[1]
+            xp_thresholds.set_xp_for_level(level, xp_req)
+        return
 
-    for enemy_stats in enemy_dict.values():
-        xp = enemy_stats.xp
-        if xp == 0:
-            continue
-        # print(xp, end=", ")
-        xp = sorted([1, round(xp/base_scale_factor), 0xFFFF])[1]
-        enemy_stats.xp = xp
-        # print(xp)
-
-    input
+    # rint rounds halves to even like round, so this matches the loop above.
+    np = romtable.np
+    enemy_ids, _, rewards = stat_arrays
+    enemy_ids = enemy_ids[rewards["xp"][enemy_ids] != 0]
+    rewards["xp"][enemy_ids] = np.clip(
+        np.rint(rewards["xp"][enemy_ids]/base_scale_factor), 1, 0xFFFF
+    )
 
-    for level in range(99):
-        xp_req = xp_thresholds.get_xp_for_level(level)
-        xp_req = sorted([1, round(xp_req/base_scale_factor), 0xFFFF])[1]
-        xp_thresholds.set_xp_for_level(level, xp_req)
+    thresholds = xp_thresholds.get_array()
+    thresholds[:] = np.clip(np.rint(thresholds/base_scale_factor), 1, 0xFFFF)
 
 def normalize_boss_xp(
         enemy_dict: dict[ctenums.EnemyID, enemystats.EnemyStats],
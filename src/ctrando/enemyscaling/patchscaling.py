@@ -13,7 +13,7 @@ from ctrando.locations.eventcommand import EventCommand as EC
 from ctrando.asm import instructions as inst, assemble
 from ctrando.asm.instructions import AddressingMode as AM  #, SpecialRegister as SR
 from ctrando.common import asmpatcher, byteops, ctenums, ctrom, memory, piecewiselinear as pwl
-from ctrando.entranceshuffler import regionmap, maptraversal
+from ctrando.entranceshuffler import logicanalysis, regionmap, maptraversal
 from ctrando.enemydata.enemystats import EnemyStats
 from ctrando.enemyscaling import scalingschemes
 from ctrando.treasures import treasuretypes as ttypes
@@ -1345,6 +1345,7 @@ def apply_full_scaling_patch(
         recruit_assignment: dict[ctenums.RecruitID, ctenums.CharID | None],
         starting_rewards: list[typing.Any],
         boss_scaling_settings: dict[bty.BossID, int| None],
+        logic_analysis: logicanalysis.LogicAnalysis | None = None
 ):
     if scaling_scheme_type == enemyscaling.DynamicScalingScheme.NONE:
         return
@@ -1361,9 +1362,12 @@ def apply_full_scaling_patch(
     slow_div_rt_rom_addr = byteops.to_rom_ptr(slow_div_rt_addr)
     slow_mult_rt_rom_addr = 0xC1FDBF
 
-    sphere_dict = maptraversal.get_sphere_dict(
-        region_map, treasure_assignment, recruit_assignment, starting_rewards
-    )
+    if logic_analysis is None:
+        sphere_dict = maptraversal.get_sphere_dict(
+            region_map, treasure_assignment, recruit_assignment, starting_rewards
+        )
+    else:
+        sphere_dict = logic_analysis.region_spheres
 
     if scaling_scheme_type == enemyscaling.DynamicScalingScheme.PROGRESSION:
         if not isinstance(scaling_scheme_options, enemyscaling.ProgressionScalingData):
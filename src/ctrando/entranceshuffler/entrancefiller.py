@@ -1,12 +1,15 @@
 """Fill with the entrance shuffler logic."""
+import typing
+
 from ctrando.arguments import entranceoptions, logicoptions
 from ctrando.logic import logictypes
 
 from ctrando.bosses import bosstypes as bty
-from ctrando.common import ctenums, distribution, memory
+from ctrando.common import ctenums, distribution, memory, tracing
 from ctrando.common.random import RNGType
 from ctrando.treasures import treasuretypes as ttypes
-from ctrando.entranceshuffler import regionmap, maptraversal, entrancerandomizer, portalshuffle
+from ctrando.entranceshuffler import regionmap, entrancerandomizer, portalshuffle
+from ctrando.entranceshuffler.reachability import RegionReachability
 
 
 def get_forced_key_items():
@@ -33,6 +36,7 @@ def update_starting_rewards(
         starting_rewards.append(memory.Flags.OW_LAVOS_HAS_FALLEN)
 
 
+@tracing.traced("key_item_fill")
 def get_key_item_fill(
         initial_treasure_assignment: dict[ctenums.TreasureID, ttypes.RewardType],
         boss_assignment: dict[bty.BossSpotID, bty.BossID],
@@ -64,86 +68,125 @@ def get_key_item_fill(
             possible_loose.append(item_id)
             normal_key_items.remove(item_id)
 
-    # Precompute BossSpots which have Nizbel or Retinite
+    # Only the exit connectors change between candidate maps.  Build the rest
+    # of the map once and patch the exits onto it for each candidate.
+    exit_placer = entrancerandomizer.get_exit_placer(entrance_options)
+    region_connectors = regionmap.get_default_region_connectors(recruit_assignment, logic_options)
+    region_graph = entrancerandomizer.get_region_graph(exit_placer.loc_exits, region_connectors)
+
+    # Find Regions with Nizbel/Retinite.  Entering them needs extra characters.
     # Only needed with element locks
-    nizbel_spots = {
-        spot for spot, boss in boss_assignment.items()
-        if boss in (bty.BossID.NIZBEL,)
-    }
-    nizbel_rule = logictypes.LogicRule([
-        [ctenums.CharID.CRONO],
-        [ctenums.CharID.ROBO, ctenums.CharID.MAGUS]
-    ])
-
-    retinite_spots = {
-        spot for spot, boss in boss_assignment.items()
-        if boss == bty.BossID.RETINITE
-    }
-    retinite_rule = logictypes.LogicRule([[ctenums.CharID.MARLE],
-                                          [ctenums.CharID.FROG]])
+    region_rules: dict[str, logictypes.LogicRule] = dict()
+    if not logic_options.disable_element_locks:
+        nizbel_spots = {
+            spot for spot, boss in boss_assignment.items()
+            if boss in (bty.BossID.NIZBEL,)
+        }
+        nizbel_rule = logictypes.LogicRule([
+            [ctenums.CharID.CRONO],
+            [ctenums.CharID.ROBO, ctenums.CharID.MAGUS]
+        ])
+
+        retinite_spots = {
+            spot for spot, boss in boss_assignment.items()
+            if boss == bty.BossID.RETINITE
+        }
+        retinite_rule = logictypes.LogicRule([[ctenums.CharID.MARLE],
+                                              [ctenums.CharID.FROG]])
+
+        for loc_region in region_graph.loc_regions:
+            if nizbel_spots.intersection(loc_region.reward_spots):
+                region_rules[loc_region.name] = nizbel_rule
+            elif retinite_spots.intersection(loc_region.reward_spots):
+                region_rules[loc_region.name] = retinite_rule
+
+    def get_region_map(
+            exit_connectors: list[regionmap.ExitConnector],
+            portal_assignment: dict[portalshuffle.PortalExits, portalshuffle.PortalExits] | None
+    ) -> regionmap.RegionMap:
+        region_map = region_graph.patch(exit_connectors)
+        if portal_assignment is not None:
+            portalshuffle.shuffle_map_portals(region_map, portal_assignment)
 
-    while True:
-        # Build a candidate map
-        exit_connectors = entrancerandomizer.get_random_exit_connectors(entrance_options, rng)
-        region_connectors = regionmap.get_default_region_connectors(recruit_assignment, logic_options)
-        region_map = entrancerandomizer.get_shuffled_map_from_connectors(
-            exit_connectors, region_connectors
+        # Update Nizbel/Retinite Rules
+        for connector_list in region_map.name_connector_dict.values():
+            for connector in connector_list:
+                if connector.to_region_name in region_rules:
+                    connector.rule &= region_rules[connector.to_region_name]
+
+        # Starting Rewards
+        region_map.loc_region_dict["starting_rewards"].region_rewards.extend(
+            logic_options.starter_rewards
         )
+        return region_map
 
+    while True:
+        # Build a candidate map.  The placer only returns exits which make a
+        # viable map, so is_map_viable is a final check.
+        tracing.count("maps_tried")
+        portal_assignment = None
         if entrance_options.shuffle_gates:
             portal_assignment = portalshuffle.get_random_portal_assignment(
                 entrance_options.separate_gate_eras, rng)
-            portalshuffle.shuffle_map_portals(region_map, portal_assignment)
 
-        # Find Regions with Nizbel/Retinite
-        if not logic_options.disable_element_locks:
-            nizbel_regions = {
-                region_name for region_name, loc_region in region_map.loc_region_dict.items()
-                if nizbel_spots.intersection(loc_region.reward_spots)
-            }
-
-            retinite_regions = {
-                region_name for region_name, loc_region in region_map.loc_region_dict.items()
-                if retinite_spots.intersection(loc_region.reward_spots)
-            }
-
-            # Update Nizbel/Retinite Rules
-            for connector_list in region_map.name_connector_dict.values():
-                for connector in connector_list:
-                    if connector.to_region_name in nizbel_regions:
-                        connector.rule &= nizbel_rule
-                    elif connector.to_region_name in retinite_regions:
-                        connector.rule &= retinite_rule
-
-        # Starting Rewards
-        region_map.loc_region_dict["starting_rewards"].region_rewards.extend(
-            logic_options.starter_rewards
+        exit_connectors = exit_placer.place(
+            get_region_map([], portal_assignment), rng, region_rules
         )
+        if exit_connectors is None:
+            tracing.count("maps_rejected")
+            continue
+        region_map = get_region_map(exit_connectors, portal_assignment)
+
+        if not entrancerandomizer.is_map_viable(region_map):
+            tracing.count("maps_rejected")
+            continue
+
+        excluded_spots = list(set(logic_options.forced_excluded_spots).union(logic_options.excluded_spots))
+        if logic_options.key_item_fill == logicoptions.KeyItemFillScheme.ASSUMED:
+            # Every assumed fill is completable, so there is nothing to retry
+            # unless the flight depth is too shallow.
+            rng.shuffle(normal_key_items)
+            rng.shuffle(possible_loose)
+            key_items = normal_key_items + possible_loose
+
+            with tracing.span("fill_attempt"):
+                treasure_assignment = assumed_fill_key_items(
+                    region_map, initial_treasure_assignment, recruit_assignment, key_items,
+                    excluded_spots, list(logic_options.forced_spots), list(logic_options.incentive_spots),
+                    logic_options.incentive_factor, logic_options.decay_factor, rng
+                )
+                is_valid_fill = treasure_assignment is not None and (
+                    logic_options.min_flight_depth == 0 or
+                    verify_fill(region_map, treasure_assignment,
+                                recruit_assignment, logic_options)
+                )
+            if not is_valid_fill:
+                tracing.count("maps_rejected_fill")
+                continue
+            break
 
-        if entrancerandomizer.is_map_viable(region_map):
-            excluded_spots = list(set(logic_options.forced_excluded_spots).union(logic_options.excluded_spots))
-            for _ in range(5):
-                # Shuffle KI list so that the possible loose ones are at the end in random order
-                rng.shuffle(normal_key_items)
-                rng.shuffle(possible_loose)
-                key_items = normal_key_items + possible_loose
+        for _ in range(5):
+            # Shuffle KI list so that the possible loose ones are at the end in random order
+            rng.shuffle(normal_key_items)
+            rng.shuffle(possible_loose)
+            key_items = normal_key_items + possible_loose
 
+            with tracing.span("fill_attempt"):
                 treasure_assignment = fill_key_items(
                     region_map, initial_treasure_assignment, recruit_assignment, key_items,
                     excluded_spots,list(logic_options.forced_spots), list(logic_options.incentive_spots),
                     logic_options.incentive_factor, logic_options.decay_factor, rng
                 )
-                if verify_fill(region_map, treasure_assignment, recruit_assignment,
-                               logic_options):
-                    break
-            else:
-                continue
-
-            break
+                is_valid_fill = verify_fill(region_map, treasure_assignment,
+                                            recruit_assignment, logic_options)
+            if is_valid_fill:
+                break
+            tracing.count("key_item_fill_retries")
         else:
-            pass
-            # print("not viable")
-            # input()
+            tracing.count("maps_rejected_fill")
+            continue
+
+        break
 
     entrance_assignment = entrancerandomizer.get_ow_exit_assign_dict(exit_connectors)
     return treasure_assignment, entrance_assignment, region_map
@@ -196,6 +239,108 @@ def fill_key_items(
     return working_treasure_dict
 
 
+def assumed_fill_key_items(
+        region_map: regionmap.RegionMap,
+        treasure_dict: dict[ctenums.TreasureID, ttypes.RewardType],
+        recruit_dict: dict[ctenums.RecruitID, list[ctenums.CharID]],
+        key_item_list: list[ctenums.ItemID],
+        prohibited_spots: list[ctenums.TreasureID],
+        forced_spots: list[ctenums.TreasureID],
+        incentive_spots: list[ctenums.TreasureID],
+        incentive_factor: float,
+        decay_factor: float,
+        rng: RNGType,
+) -> dict[ctenums.TreasureID, ttypes.RewardType] | None:
+    """
+    Put key items in key item spots like fill_key_items, but place every item
+    (forced spots included) in a spot which is reachable when all of the items
+    not yet placed are owned.  Such a fill is always completable.  Returns
+    None if the forced key items can not all be put in forced spots.
+    """
+    working_treasure_dict: dict[ctenums.TreasureID, ttypes.RewardType] = {
+        tid: ctenums.ItemID.NONE
+        for tid in ctenums.TreasureID
+        if tid not in prohibited_spots
+    }
+    working_treasure_dict.update(treasure_dict)
+
+    reachability = RegionReachability(
+        region_map, "starting_rewards", key_item_list, working_treasure_dict,
+        recruit_dict
+    )
+    reachability.maximize()
+    total_regions = set(region_map.name_connector_dict.keys())
+    if total_regions.difference(reachability.reached_regions):
+        return None
+
+    forced_keys = key_item_list[0: len(forced_spots)]
+    remaining_keys = key_item_list[len(forced_spots):]
+
+    # The forced spots are the smallest pool, so fill them while the most
+    # items are still assumed.
+    if not _place_forced_keys(reachability, forced_keys, forced_spots, rng):
+        tracing.count("assumed_fill_forced_dead_ends")
+        return None
+
+    if remaining_keys:
+        spot_weights: dict[ctenums.TreasureID, float] = {
+            spot: (incentive_factor if spot in incentive_spots else 1)
+            for spot in ctenums.TreasureID
+        }
+        remaining_keys = sorted(remaining_keys)
+        rng.shuffle(remaining_keys)
+        _fill_reachable_weighted_decay(
+            reachability, get_trimmed_region_dict(region_map, False),
+            remaining_keys, spot_weights, decay_factor, rng
+        )
+
+    return working_treasure_dict
+
+
+def _place_forced_keys(
+        reachability: RegionReachability,
+        forced_keys: list[ctenums.ItemID],
+        forced_spots: list[ctenums.TreasureID],
+        rng: RNGType,
+        max_restarts: int = 20
+) -> bool:
+    """
+    Put forced_keys, which the reachability holds as starting rewards, in
+    forced_spots.  Each key goes to a forced spot reachable without it while
+    the keys not yet placed are assumed.  When a key finds no such spot, the
+    placements are undone and the fill restarts with that key moved to the
+    front, where the most items are assumed.  Returns False, with nothing
+    placed, if every restart fails.
+    """
+    forced_keys = list(forced_keys)
+    for _ in range(max_restarts):
+        open_spots = sorted(forced_spots)
+        placed: list[tuple[ctenums.ItemID, ctenums.TreasureID]] = []
+        for key in forced_keys:
+            reachability.remove_reward(key)
+            available_spots = [
+                spot for spot in open_spots if reachability.is_spot_reachable(spot)
+            ]
+            if not available_spots:
+                break
+            spot = rng.choice(available_spots)
+            reachability.set_treasure(spot, key)
+            open_spots.remove(spot)
+            placed.append((key, spot))
+        else:
+            return True
+
+        tracing.count("assumed_fill_forced_restarts")
+        reachability.add_reward(key)
+        for placed_key, spot in reversed(placed):
+            reachability.set_treasure(spot, ctenums.ItemID.NONE)
+            reachability.add_reward(placed_key)
+        forced_keys.remove(key)
+        forced_keys.insert(0, key)
+
+    return False
+
+
 def get_trimmed_region_dict(
         region_map: regionmap.RegionMap,
         include_shops: bool = False,
@@ -217,37 +362,6 @@ def get_trimmed_region_dict(
     return trimmed_groups
 
 
-def _get_random_group(
-        group_weights: dict[str, float],
-        rng: RNGType
-) -> str:
-    """
-        Returns group name chosen randomly according to weights.
-        """
-    group_weight_pairs = [
-        (weight, name) for name, weight in group_weights.items() if weight != 0
-    ]
-
-    dist = distribution.Distribution(*group_weight_pairs)
-    return dist.get_random_item(rng)
-
-
-def _get_random_tid_from_group(
-        tids: list[ctenums.TreasureID],
-        spot_weights: dict[ctenums.TreasureID, float],
-        treasure_dict: dict[ctenums.TreasureID, ttypes.RewardType],
-        rng: RNGType
-):
-    weight_spot_pairs = [
-        (spot_weights[spot], spot)
-        for spot in tids
-        if spot in treasure_dict and treasure_dict[spot] == ctenums.ItemID.NONE
-    ]
-    dist = distribution.Distribution(*weight_spot_pairs)
-    tid = dist.get_random_item(rng)
-    return tid
-
-
 def fill_weighted_random_decay(
         region_map: regionmap.RegionMap,
         items_to_assign: list[ctenums.ItemID],
@@ -260,47 +374,90 @@ def fill_weighted_random_decay(
 ) -> dict[ctenums.TreasureID, ttypes.RewardType]:
 
 
-    groups = get_trimmed_region_dict(region_map, include_shops)
-    num_assignments = {name: 0 for name in groups}
-
     items_to_assign = sorted(items_to_assign)
     rng.shuffle(items_to_assign)
 
     ret_dict = dict(treasure_dict)
 
-    while items_to_assign:
-        next_item = items_to_assign.pop()
-        traverser = maptraversal.MapTraverser(
-            region_map, "starting_rewards", items_to_assign
-        )
+    # Each step only moves one item from the starting rewards to a spot, so
+    # update reachability instead of re-traversing the map.
+    reachability = RegionReachability(
+        region_map, "starting_rewards", items_to_assign, ret_dict, recruit_dict
+    )
+    reachability.maximize()
 
-        traverser.maximize(ret_dict, recruit_dict)
-        avail_spots = sorted(traverser.reached_regions)
-        available_groups = {
-            key: item for (key, item) in groups.items()
-            if key in traverser.reached_regions
-        }
+    _fill_reachable_weighted_decay(
+        reachability, get_trimmed_region_dict(region_map, include_shops),
+        items_to_assign, spot_weights, decay_factor, rng
+    )
+    return ret_dict
+
+
+def _fill_reachable_weighted_decay(
+        reachability: RegionReachability,
+        groups: dict[str, list[ctenums.TreasureID]],
+        items_to_assign: list[ctenums.ItemID],
+        spot_weights: dict[ctenums.TreasureID, float],
+        decay_factor: float,
+        rng: RNGType
+):
+    """
+    Place items_to_assign, which the reachability holds as starting rewards,
+    from the end of the list.  Each item goes to a spot reachable without it.
+    """
+    ret_dict = reachability.treasure_dict
+    num_assignments = {name: 0 for name in groups}
 
-        group_weights: dict[str, float] = dict()
-        for name, tids in available_groups.items():
-            trimmed_tids = [tid for tid in tids
-                            if tid in ret_dict and ret_dict[tid] == ctenums.ItemID.NONE]
-            weight = sum(spot_weights.get(tid, 0) for tid in trimmed_tids)
-            if weight != 0:
-                group_weights[name] = weight
+    def is_open(tid: ctenums.TreasureID) -> bool:
+        return tid in ret_dict and ret_dict[tid] == ctenums.ItemID.NONE
+
+    def get_group_weight(name: str) -> float:
+        if name not in reachability.reached_regions:
+            return 0
+        weight = sum(spot_weights.get(tid, 0) for tid in groups[name] if is_open(tid))
+        return weight*(decay_factor**num_assignments[name])
+
+    # Placing an item only changes the weights of the groups holding its spot
+    # and of regions which change reachability.  Keep the weights in samplers
+    # and update just those instead of rebuilding every weight.
+    group_names = list(groups)
+    group_indices = {name: ind for ind, name in enumerate(group_names)}
+    group_sampler = distribution.WeightedSampler(
+        *((get_group_weight(name), name) for name in group_names)
+    )
 
-        for name, weight in group_weights.items():
-            group_weights[name] = weight*(decay_factor**num_assignments[name])
+    spot_samplers: dict[str, distribution.WeightedSampler[ctenums.TreasureID]] = {}
+    spot_indices: dict[ctenums.TreasureID, list[tuple[str, int]]] = {}
+    for name, tids in groups.items():
+        spot_samplers[name] = distribution.WeightedSampler(
+            *((spot_weights.get(tid, 0) if is_open(tid) else 0, tid) for tid in tids)
+        )
+        for ind, tid in enumerate(tids):
+            spot_indices.setdefault(tid, []).append((name, ind))
 
-        group = _get_random_group(group_weights, rng)
-        tid = _get_random_tid_from_group(available_groups[group],
-                                         spot_weights, ret_dict, rng)
+    def update_groups(names: typing.Iterable[str]):
+        for name in names:
+            if name in group_indices:
+                group_sampler.set_weight(group_indices[name], get_group_weight(name))
+
+    while items_to_assign:
+        next_item = items_to_assign.pop()
+        delta = reachability.remove_reward(next_item)
+        update_groups(delta.lost_regions | delta.gained_regions)
+
+        group = group_sampler.get_random_item(rng)
+        tid = spot_samplers[group].get_random_item(rng)
         # print(f"Assign {next_item} to {tid} in group {group}")
         # input()
-        ret_dict[tid] = next_item
+        delta = reachability.set_treasure(tid, next_item)
         num_assignments[group] += 1
 
-    return ret_dict
+        for name, ind in spot_indices[tid]:
+            spot_samplers[name].set_weight(ind, 0)
+        update_groups(
+            delta.lost_regions | delta.gained_regions |
+            {name for name, _ in spot_indices[tid]}
+        )
 
 
 def verify_fill(
@@ -310,9 +467,9 @@ def verify_fill(
         logic_options: logicoptions.LogicOptions,
         starting_region: str = "starting_rewards",
 ) -> bool:
-    traverser = maptraversal.MapTraverser(
-        region_map,
-        starting_region
+    reachability = RegionReachability(
+        region_map, starting_region,
+        treasure_dict=dict(treasure_dict), recruit_dict=recruit_dict
     )
 
     sphere = 0
@@ -320,29 +477,26 @@ def verify_fill(
     # dark_ages_sphere: int | None = None
 
     while True:
-        orig_reached = set(traverser.reached_regions)
-        traverser.step(treasure_dict, recruit_dict)
+        new_regions = reachability.step()
         if (
                 flight_sphere is None and
-                logictypes.ScriptReward.FLIGHT in traverser.game.other_rewards
+                logictypes.ScriptReward.FLIGHT in reachability.game.other_rewards
         ):
             flight_sphere = sphere
 
         # if (
         #         dark_ages_sphere is None and
-        #         memory.Flags.HAS_DARK_AGES_TIMEGAUGE_ACCESS in traverser.game.other_rewards
+        #         memory.Flags.HAS_DARK_AGES_TIMEGAUGE_ACCESS in reachability.game.other_rewards
         # ):
         #     dark_ages_sphere = sphere
 
-        if traverser.reached_regions == orig_reached:
+        if not new_regions:
             break
 
         sphere += 1
 
-    # traverser.maximize(treasure_dict, recruit_dict)
-
     total_regions = set(region_map.name_connector_dict.keys())
-    missed_regions = total_regions.difference(traverser.reached_regions)
+    missed_regions = total_regions.difference(reachability.reached_regions)
     if missed_regions:
         # print("Missed:")
         # for region_name in missed_regions:
@@ -350,17 +504,14 @@ def verify_fill(
         # # input()
         # print("Collected:")
         # print("  Items:")
-        # for item in traverser.game.key_items:
+        # for item in reachability.game.key_items:
         #     print(f"\t{item}")
         # print("  Chars:")
-        # for char in traverser.game.characters:
+        # for char in reachability.game.characters:
         #     print(f"\t{char}")
         # print("  Flags:")
-        # for other in traverser.game.other_rewards:
+        # for other in reachability.game.other_rewards:
         #     print(f"\t{other}")
-        # print("Remaining Connections")
-        # for connection in traverser.available_connectors:
-        #     print(f"\t{connection.link_name}")
         return False
 
     if flight_sphere < logic_options.min_flight_depth:
@@ -392,9 +543,14 @@ def forward_fill_key_items(
         if tid not in prohibited_spots
     }
 
+    reachability = RegionReachability(
+        region_map, "starting_rewards",
+        treasure_dict=working_treasure_dict, recruit_dict=recruit_dict
+    )
+    reachability.maximize()
+
     forced_assignment = _forward_fill_forced_recursive(
-        region_map, groups, key_item_list, forced_spots,
-        working_treasure_dict, recruit_dict, rng
+        reachability, groups, key_item_list, forced_spots, rng
     )
     if forced_assignment is None:
         return None
@@ -423,26 +579,29 @@ def forward_fill_key_items(
 
 
 def _forward_fill_forced_recursive(
-        region_map: regionmap.RegionMap,
+        reachability: RegionReachability,
         group_tid_dict: dict[str, list[ctenums.TreasureID]],
         remaining_key_items: list[ctenums.ItemID],
         remaining_forced_spots: list[ctenums.TreasureID],
-        current_assignment: dict[ctenums.TreasureID, ctenums.ItemID],
-        recruit_dict: dict[ctenums.RecruitID, ctenums.CharID | None],
         rng: RNGType
 ) -> dict[ctenums.TreasureID, ctenums.ItemID] | None:
-
+    """
+    Place key items in the forced spots, only using spots which are reachable
+    with the items placed so far.  The assignment is made through (and undone
+    on) the reachability's treasure_dict.
+    """
+    current_assignment = reachability.treasure_dict
     if not remaining_forced_spots:
         return current_assignment
 
-    traverser = maptraversal.MapTraverser(region_map, "starting_rewards")
-    traverser.maximize(current_assignment, recruit_dict)
-
     available_forced_tids = [
         tid for (region_name, tids) in group_tid_dict.items()
+        if region_name in reachability.reached_regions
         for tid in tids
         if tid in remaining_forced_spots and current_assignment[tid] == ctenums.ItemID.NONE
     ]
+    if not available_forced_tids:
+        return None
 
     rng.shuffle(remaining_key_items)
 
@@ -452,18 +611,17 @@ def _forward_fill_forced_recursive(
         spot = rng.choice(available_forced_tids)
 
         # Try assigning key to spot
-        current_assignment[spot] = key
+        reachability.set_treasure(spot, key)
         result = _forward_fill_forced_recursive(
-            region_map, group_tid_dict,
+            reachability, group_tid_dict,
             remaining_key_items[:ind] + remaining_key_items[ind+1:],
             [x for x in remaining_forced_spots if x != spot],
-            current_assignment, recruit_dict,
             rng
         )
         if result is not None:
             return result
 
         # Undo assignment.
-        current_assignment[spot] = ctenums.ItemID.NONE
+        reachability.set_treasure(spot, ctenums.ItemID.NONE)
 
     return None
@@ -1,13 +1,16 @@
 """Actually Shuffle the Entrances"""
 from collections.abc import Iterable
+import dataclasses
+import typing
 from typing import Sequence
 
 from ctrando.arguments import entranceoptions
-from ctrando.common import ctenums, memory
+from ctrando.common import ctenums, memory, tracing
 from ctrando.common.random import RNGType
 from ctrando.entranceshuffler import regionmap, maptraversal
-from ctrando.entranceshuffler.locregions import LocExit, get_all_loc_regions
+from ctrando.entranceshuffler.locregions import LocExit, LocRegion, get_all_loc_regions
 from ctrando.entranceshuffler.owregions import OWExit, get_ow_regions
+from ctrando.logic import logictypes
 
 
 class MapGenerationException(Exception):
@@ -53,6 +56,18 @@ def get_shuffled_map(
         raise MapGenerationException("Failed to Generate Map")
 
 
+# Regions which is_map_viable needs to be reachable.  Two interesting regions
+# must be reachable with no items, and one flight region and Porre 1000 must be
+# reachable without flight.
+_interesting_regions = frozenset({
+    "snail_stop", "millennial_fair", "manoria_cathedral", "denadoro_mts",
+    "arris_dome", "giants_claw", "geno_dome", "reptite_lair",
+    "mt_woe",
+})
+_flight_regions = frozenset({"blackbird_scaffolding_epoch", "blackbird"})
+_walkable_epoch_region = "porre_1000_overworld"
+
+
 def is_map_viable(
         region_map: regionmap.RegionMap,
         pre_flight_percent: float = 0.5
@@ -61,12 +76,7 @@ def is_map_viable(
     Before items and recruits are placed, determine whether a map is viable.
     """
     rewards_to_skip = {memory.Flags.OBTAINED_EPOCH_FLIGHT}
-
-    interesting_regions = {
-        "snail_stop", "millennial_fair", "manoria_cathedral", "denadoro_mts",
-        "arris_dome", "giants_claw", "geno_dome", "reptite_lair",
-        "mt_woe",
-    }
+    interesting_regions = _interesting_regions
 
     traverser = maptraversal.MapTraverser(region_map, "starting_rewards")
     fake_treasure_dict = {tid: ctenums.ItemID.NONE for tid in ctenums.TreasureID}
@@ -89,7 +99,7 @@ def is_map_viable(
         # print(f"Failed Pre-Flight: {ow_coverage} < {pre_flight_percent}")
         return False
 
-    flight_regions = {"blackbird_scaffolding_epoch", "blackbird"}
+    flight_regions = _flight_regions
     if not flight_regions.intersection(traverser.reached_regions):
         # print("Flight unavailable.")
         return False
@@ -102,7 +112,7 @@ def is_map_viable(
     # input()
 
     # For return via reset, epoch needs to be walkable
-    if "porre_1000_overworld" not in traverser.reached_regions:
+    if _walkable_epoch_region not in traverser.reached_regions:
         # print("no porre 1000")
         return False
 
@@ -137,21 +147,45 @@ def get_ow_exit_assign_dict(
     return assign_dict
 
 
+def get_trimmed_loc_regions(
+        avail_loc_exits: Iterable[LocExit]
+) -> list[LocRegion]:
+    """
+    Get the loc regions which are either internal or have one of the given
+    exits.
+    """
+    avail_loc_exits = set(avail_loc_exits)
+    return [
+        x for x in get_all_loc_regions()
+        if not x.loc_exits or any(loc_exit in avail_loc_exits for loc_exit in x.loc_exits)
+    ]
+
+
+def get_region_graph(
+        avail_loc_exits: Iterable[LocExit],
+        region_connectors: Iterable[regionmap.RegionConnector]
+) -> regionmap.RegionGraph:
+    """
+    Get a RegionGraph which can be patched with any exit connectors whose
+    location exits are avail_loc_exits.
+    """
+    return regionmap.RegionGraph(
+        get_ow_regions(), get_trimmed_loc_regions(avail_loc_exits),
+        region_connectors
+    )
+
+
 def get_shuffled_map_from_connectors(
         exit_connectors: Iterable[regionmap.ExitConnector],
         region_connectors: Iterable[regionmap.RegionConnector]
 ):
-    loc_regions = get_all_loc_regions()
+    exit_connectors = list(exit_connectors)
     avail_loc_exits = {
         x.to_exit for x in exit_connectors
     }
-    trimmed_loc_regions = [
-        x for x in loc_regions
-        if not x.loc_exits or any(loc_exit in avail_loc_exits for loc_exit in x.loc_exits)
-    ]
 
     return regionmap.RegionMap(
-        get_ow_regions(), trimmed_loc_regions,
+        get_ow_regions(), get_trimmed_loc_regions(avail_loc_exits),
         exit_connectors, region_connectors
     )
 
@@ -358,6 +392,29 @@ def get_shuffled_group(
         return assign_dict
 
 
+def _get_base_assignment(
+        exit_connectors: Iterable[regionmap.ExitConnector],
+        default_lair_ruins_spot: OWExit
+) -> dict[OWExit, LocExit]:
+    """
+    Get the assignment which shuffling starts from.  exit_connectors should
+    not include the Tyrano Lair exit.
+    """
+    base_assignment: dict[OWExit, LocExit] = {
+        connector.from_exit: connector.to_exit
+        for connector in exit_connectors if connector.from_exit != OWExit.TYRANO_LAIR
+    }
+
+    # 1) Remove Tyrano Lair exit (always ruined)
+    # 2) Remove the LV version of the portal area.
+    base_assignment[OWExit.LAIR_RUINS] = LocExit.TYRANO_LAIR
+    repl_target = base_assignment[default_lair_ruins_spot]
+    base_assignment[default_lair_ruins_spot] = LocExit.LAIR_RUINS
+    base_assignment[OWExit.LAST_VILLAGE_PORTAL] = repl_target
+
+    return base_assignment
+
+
 def get_shuffled_exit_connectors(
         exit_connectors: list[regionmap.ExitConnector],
         preserve_groups: list[Sequence[OWExit]],
@@ -374,18 +431,8 @@ def get_shuffled_exit_connectors(
         connector for connector in exit_connectors
         if connector.from_exit != OWExit.TYRANO_LAIR
     ]
-
-    base_assignment: dict[OWExit, LocExit] = {
-        connector.from_exit: connector.to_exit
-        for connector in exit_connectors if connector.from_exit != OWExit.TYRANO_LAIR
-    }
-
-    # 1) Remove Tyrano Lair exit (always ruined)
-    # 2) Remove the LV version of the portal area.
-    base_assignment[OWExit.LAIR_RUINS] = LocExit.TYRANO_LAIR
-    repl_target = base_assignment[default_lair_ruins_spot]
-    base_assignment[default_lair_ruins_spot] = LocExit.LAIR_RUINS
-    base_assignment[OWExit.LAST_VILLAGE_PORTAL] = repl_target
+    base_assignment = _get_base_assignment(exit_connectors,
+                                           default_lair_ruins_spot)
 
     assign_dict: dict[OWExit, LocExit] = dict()
 
@@ -402,6 +449,639 @@ def get_shuffled_exit_connectors(
 
     return list(exit_connectors)
 
+def get_allowed_loc_exits(
+        ow_exit: OWExit,
+        loc_exits: Iterable[LocExit]
+) -> list[LocExit]:
+    """
+    Get the location exits among loc_exits which ow_exit may be assigned.
+    - Exits opened by a flag must lead to a dead end other than Crono's house.
+    - Desolate exits can not lead to Crono's house.
+    """
+    if ow_exit in _flag_ow_exits:
+        return [x for x in loc_exits
+                if x in _known_dead_ends_set and x != LocExit.CRONOS_HOUSE]
+    if ow_exit in _desolate_ow_exits:
+        return [x for x in loc_exits if x != LocExit.CRONOS_HOUSE]
+    return list(loc_exits)
+
+
+@dataclasses.dataclass
+class ExitPlacementStats:
+    """Running totals of the work done by an ExitPlacer."""
+    attempts: int = 0
+    failed_attempts: int = 0
+    placements: int = 0
+    rejected_placements: int = 0
+    backtracks: int = 0
+
+
+@dataclasses.dataclass
+class _ExitSlot:
+    """An overworld exit which is assigned a location exit from its group."""
+    connector: regionmap.ExitConnector
+    group: int
+    allowed: frozenset[LocExit]
+
+
+# (target region id, rule or None if the edge is always open)
+_Edge = tuple[int, logictypes.LogicRule | None]
+
+
+def _is_open_rule(rule: logictypes.LogicRule) -> bool:
+    return any(not alternative for alternative in rule.get_access_rule())
+
+
+def _combine_rules(
+        rule: logictypes.LogicRule | None,
+        other: logictypes.LogicRule | None
+) -> logictypes.LogicRule | None:
+    if rule is None:
+        return other
+    if other is None:
+        return rule
+    return rule & other
+
+
+class _MaskGame:
+    """
+    The parts of a logictypes.Game which LogicRules read.  Rewards are only
+    held as token bits, so adding a region's rewards is a single or.
+    """
+    def __init__(self):
+        self.token_mask = 0
+        self._multiples: dict[int, int] = dict()
+
+    def add(self, reward: typing.Any):
+        bit = logictypes.get_reward_bit(reward)
+        if self.token_mask & (1 << bit):
+            self._multiples[bit] = self._multiples.get(bit, 1) + 1
+        self.token_mask |= 1 << bit
+
+    def update(self, other: "_MaskGame"):
+        """Add all of other's rewards, counting tokens held by both twice."""
+        bits = set(other._multiples)
+        shared = self.token_mask & other.token_mask
+        while shared:
+            low_bit = shared & -shared
+            bits.add(low_bit.bit_length() - 1)
+            shared ^= low_bit
+
+        counts = {
+            bit: self.get_token_count(bit) + other.get_token_count(bit)
+            for bit in bits
+        }
+        self._multiples.update(counts)
+        self.token_mask |= other.token_mask
+
+    def get_token_count(self, bit: int) -> int:
+        return self._multiples.get(bit, (self.token_mask >> bit) & 1)
+
+
+class _RelaxedMap:
+    """
+    A map with some of its exits placed.  Each group has two hub nodes which
+    stand in for its unplaced exits.  Every unplaced overworld exit leads to
+    the first hub, which leads to every free location exit.  Every free
+    location exit leads to the second hub, which leads back to every unplaced
+    overworld exit.  Anything reachable in any completion of the placement is
+    reachable here.
+
+    Location exits into dead ends do not lead to the second hub.  A dead end
+    can only be left through the exit it was entered by.
+    """
+    def __init__(
+            self,
+            base_map: regionmap.RegionMap,
+            slots: Sequence[_ExitSlot],
+            fixed_connectors: Iterable[regionmap.ExitConnector],
+            group_loc_exits: Sequence[Sequence[LocExit]],
+            region_rules: dict[str, logictypes.LogicRule],
+    ):
+        names = list(base_map.name_connector_dict.keys())
+        self.region_ids = {name: ind for ind, name in enumerate(names)}
+        self.num_regions = len(names)
+        num_nodes = self.num_regions + 2*len(group_loc_exits)
+
+        self._edges: list[list[_Edge]] = [
+            [(self.region_ids[connector.to_region_name],
+              None if _is_open_rule(connector.rule) else connector.rule)
+             for connector in base_map.name_connector_dict[name]]
+            for name in names
+        ]
+        self._edges.extend([] for _ in range(num_nodes - self.num_regions))
+        self._exit_edges: list[list[_Edge]] = [[] for _ in range(num_nodes)]
+
+        # Region rewards as token masks, with and without the flight flag
+        # which is_map_viable holds back until the last check.
+        self._reward_masks: list[int] = []
+        self._early_reward_masks: list[int] = []
+        for name in names:
+            mask = early_mask = 0
+            if name in base_map.loc_region_dict:
+                for reward in base_map.loc_region_dict[name].region_rewards:
+                    bit = 1 << logictypes.get_reward_bit(reward)
+                    mask |= bit
+                    if reward != memory.Flags.OBTAINED_EPOCH_FLIGHT:
+                        early_mask |= bit
+            self._reward_masks.append(mask)
+            self._early_reward_masks.append(early_mask)
+        self._entry_rules: list[logictypes.LogicRule | None] = [
+            region_rules.get(name, None) for name in names
+        ]
+        self._entry_rules.extend(None for _ in range(num_nodes - self.num_regions))
+
+        self._ow_ids = [self.region_ids[name] for name in base_map.ow_region_dict]
+        self._interesting_ids = [self.region_ids[name] for name in _interesting_regions
+                                 if name in self.region_ids]
+        self._flight_ids = [self.region_ids[name] for name in _flight_regions
+                            if name in self.region_ids]
+        self._walkable_epoch_id = self.region_ids.get(_walkable_epoch_region, None)
+        self._start_id = self.region_ids["starting_rewards"]
+
+        useful_keys: set[ctenums.ItemID] = set()
+        rules = [connector.rule for connectors in base_map.name_connector_dict.values()
+                 for connector in connectors]
+        rules.extend(slot.connector.rule for slot in slots)
+        rules.extend(connector.rule for connector in fixed_connectors)
+        for rule in rules:
+            for alternative in rule.get_access_rule():
+                useful_keys.update(x for x in alternative if isinstance(x, ctenums.ItemID))
+        # As in is_map_viable, a second jerky is added.
+        self._useful_game = _MaskGame()
+        for reward in (*useful_keys, ctenums.ItemID.JERKY, *ctenums.CharID):
+            self._useful_game.add(reward)
+
+        self._ow_exit_ids = {
+            ow_exit: self.region_ids[name] for ow_exit, name in base_map.ow_exit_dict.items()
+        }
+        self._loc_exit_ids = {
+            loc_exit: self.region_ids[name] for loc_exit, name in base_map.loc_exit_dict.items()
+        }
+
+        for connector in fixed_connectors:
+            self._add_edges(self._get_exit_edges(connector, connector.to_exit))
+
+        self.slots = slots
+        self.unplaced: set[int] = set(range(len(slots)))
+        self._group_loc_exits = group_loc_exits
+        self._free_loc_exits: set[LocExit] = set().union(*group_loc_exits)
+        self._placed_edges: dict[int, list[tuple[int, _Edge]]] = dict()
+        self._slot_hub_edges: list[list[tuple[int, _Edge]]] = []
+        self._loc_hub_edges: dict[LocExit, list[tuple[int, _Edge]]] = dict()
+
+        for slot in slots:
+            ow_hub_id = self.num_regions + 2*slot.group
+            edges: list[tuple[int, _Edge]] = []
+            region_id = self._ow_exit_ids.get(slot.connector.from_exit, None)
+            if region_id is not None:
+                rule = None if _is_open_rule(slot.connector.rule) else slot.connector.rule
+                edges.append((region_id, (ow_hub_id, rule)))
+                if slot.connector.reversible:
+                    edges.append((ow_hub_id + 1, (region_id, rule)))
+            self._slot_hub_edges.append(edges)
+            self._add_edges(edges)
+
+        dead_end_ids = self._get_dead_end_ids()
+        for group, loc_exits in enumerate(group_loc_exits):
+            ow_hub_id = self.num_regions + 2*group
+            for loc_exit in loc_exits:
+                edges = []
+                region_id = self._loc_exit_ids.get(loc_exit, None)
+                if region_id is not None:
+                    edges.append((ow_hub_id, (region_id, self._entry_rules[region_id])))
+                    if region_id not in dead_end_ids:
+                        edges.append((region_id, (ow_hub_id + 1, None)))
+                self._loc_hub_edges[loc_exit] = edges
+                self._add_edges(edges)
+
+    def _get_dead_end_ids(self) -> set[int]:
+        """
+        Get the regions with one location exit which can only be entered or
+        left through it.  Region connectors from the region may lead to other
+        regions which are also cut off, but not to the start.
+        """
+        exit_counts: dict[int, int] = dict()
+        for region_id in self._loc_exit_ids.values():
+            exit_counts[region_id] = exit_counts.get(region_id, 0) + 1
+        ow_ids = set(self._ow_ids)
+
+        sources: list[list[int]] = [[] for _ in range(self.num_regions)]
+        for region_id in range(self.num_regions):
+            for target, _ in self._edges[region_id]:
+                sources[target].append(region_id)
+
+        dead_end_ids: set[int] = set()
+        for region_id, exit_count in exit_counts.items():
+            if exit_count != 1:
+                continue
+            reached = {region_id}
+            frontier = [region_id]
+            while frontier:
+                for target, _ in self._edges[frontier.pop()]:
+                    if target not in reached:
+                        reached.add(target)
+                        frontier.append(target)
+
+            if self._start_id in reached or any(
+                    x in ow_ids or (x != region_id and x in exit_counts) or
+                    any(source not in reached for source in sources[x])
+                    for x in reached
+            ):
+                continue
+            dead_end_ids.add(region_id)
+
+        return dead_end_ids
+
+    def _get_exit_edges(
+            self,
+            connector: regionmap.ExitConnector,
+            loc_exit: LocExit
+    ) -> list[tuple[int, _Edge]]:
+        """Get the edges an exit connector adds, as RegionGraph.patch would."""
+        ow_id = self._ow_exit_ids.get(connector.from_exit, None)
+        loc_id = self._loc_exit_ids.get(loc_exit, None)
+        if ow_id is None or loc_id is None:
+            return []
+
+        rule = None if _is_open_rule(connector.rule) else connector.rule
+        edges = [(ow_id, (loc_id, _combine_rules(rule, self._entry_rules[loc_id])))]
+        if connector.reversible:
+            edges.append((loc_id, (ow_id, _combine_rules(rule, self._entry_rules[ow_id]))))
+        return edges
+
+    def _add_edges(self, edges: Iterable[tuple[int, _Edge]]):
+        for from_id, edge in edges:
+            self._exit_edges[from_id].append(edge)
+
+    def _remove_edges(self, edges: Iterable[tuple[int, _Edge]]):
+        for from_id, edge in edges:
+            self._exit_edges[from_id].remove(edge)
+
+    def get_candidates(self, slot_ind: int) -> list[LocExit]:
+        slot = self.slots[slot_ind]
+        return [x for x in self._group_loc_exits[slot.group]
+                if x in self._free_loc_exits and x in slot.allowed]
+
+    def place(self, slot_ind: int, loc_exit: LocExit):
+        slot = self.slots[slot_ind]
+        self.unplaced.remove(slot_ind)
+        self._free_loc_exits.remove(loc_exit)
+        self._remove_edges(self._slot_hub_edges[slot_ind])
+        self._remove_edges(self._loc_hub_edges[loc_exit])
+        edges = self._get_exit_edges(slot.connector, loc_exit)
+        self._placed_edges[slot_ind] = edges
+        self._add_edges(edges)
+
+    def unplace(self, slot_ind: int, loc_exit: LocExit):
+        self._remove_edges(self._placed_edges.pop(slot_ind))
+        self._add_edges(self._slot_hub_edges[slot_ind])
+        self._add_edges(self._loc_hub_edges[loc_exit])
+        self._free_loc_exits.add(loc_exit)
+        self.unplaced.add(slot_ind)
+
+    def get_connected_slots(self) -> list[int]:
+        """
+        Get the unplaced slots whose overworld region is connected to the
+        start by region connectors and placed exits, ignoring logic.
+        """
+        reached = bytearray(len(self._edges))
+        reached[self._start_id] = 1
+        frontier = [self._start_id]
+        while frontier:
+            region_id = frontier.pop()
+            for edges in (self._edges[region_id], self._exit_edges[region_id]):
+                for target, _ in edges:
+                    if not reached[target] and target < self.num_regions:
+                        reached[target] = 1
+                        frontier.append(target)
+
+        connected_slots: list[int] = []
+        for slot_ind in sorted(self.unplaced):
+            region_id = self._ow_exit_ids.get(self.slots[slot_ind].connector.from_exit, None)
+            if region_id is not None and reached[region_id]:
+                connected_slots.append(slot_ind)
+
+        return connected_slots
+
+    def get_early_slots(self) -> list[int]:
+        """
+        Get the unplaced slots whose overworld region is reachable with no
+        items, or [] if two interesting regions already are.  Only placed
+        exits are used, so once this is [] the first condition of is_viable
+        holds for every completion.
+        """
+        reached = bytearray(len(self._edges))
+        reached[self._start_id] = 1
+        self._expand([self._start_id], reached, [], _MaskGame(),
+                     self._early_reward_masks, use_hubs=False)
+        if sum(reached[x] for x in self._interesting_ids) >= 2:
+            return []
+
+        early_slots: list[int] = []
+        for slot_ind in sorted(self.unplaced):
+            region_id = self._ow_exit_ids.get(self.slots[slot_ind].connector.from_exit, None)
+            if region_id is not None and reached[region_id]:
+                early_slots.append(slot_ind)
+
+        return early_slots
+
+    def _expand(
+            self,
+            frontier: list[int],
+            reached: bytearray,
+            waiting: list[_Edge],
+            game: _MaskGame,
+            reward_masks: list[int],
+            use_hubs: bool = True
+    ):
+        """Reach everything reachable from frontier and the waiting edges."""
+        num_nodes = len(self._edges) if use_hubs else self.num_regions
+        # Rewards held when the waiting edges were last tried.  Edges waiting
+        # since then were tried with these rewards or fewer.
+        retry_mask: int | None = None
+        while True:
+            while frontier:
+                region_id = frontier.pop()
+                if region_id < self.num_regions:
+                    game.token_mask |= reward_masks[region_id]
+
+                for edges in (self._edges[region_id], self._exit_edges[region_id]):
+                    for edge in edges:
+                        target, rule = edge
+                        if reached[target] or target >= num_nodes:
+                            continue
+                        if rule is None or rule(game):
+                            reached[target] = 1
+                            frontier.append(target)
+                        else:
+                            waiting.append(edge)
+
+            if game.token_mask == retry_mask:
+                return
+            retry_mask = game.token_mask
+
+            still_waiting: list[_Edge] = []
+            for edge in waiting:
+                target, rule = edge
+                if reached[target]:
+                    continue
+                if rule(game):
+                    reached[target] = 1
+                    frontier.append(target)
+                else:
+                    still_waiting.append(edge)
+            waiting[:] = still_waiting
+
+            if not frontier:
+                return
+
+    def is_viable(self, pre_flight_percent: float = 0.5) -> bool:
+        """
+        Check is_map_viable's conditions.  A failure means that no completion
+        of the current placement is viable.
+        """
+        game = _MaskGame()
+        reached = bytearray(len(self._edges))
+        reached[self._start_id] = 1
+        waiting: list[_Edge] = []
+
+        self._expand([self._start_id], reached, waiting, game,
+                     self._early_reward_masks)
+        if sum(reached[x] for x in self._interesting_ids) < 2:
+            return False
+
+        game.update(self._useful_game)
+        self._expand([], reached, waiting, game, self._early_reward_masks)
+        ow_coverage = sum(reached[x] for x in self._ow_ids)/len(self._ow_ids)
+        if ow_coverage < pre_flight_percent:
+            return False
+        if not any(reached[x] for x in self._flight_ids):
+            return False
+        if self._walkable_epoch_id is None or not reached[self._walkable_epoch_id]:
+            return False
+
+        game.add(memory.Flags.OBTAINED_EPOCH_FLIGHT)
+        self._expand([], reached, waiting, game, self._reward_masks)
+        return reached.count(1, 0, self.num_regions) == self.num_regions
+
+
+class ExitPlacer:
+    """
+    Assign location exits to overworld exits so that the resulting map passes
+    is_map_viable.
+
+    Exits are placed one at a time.  After each placement, the map with the
+    remaining exits joined to a hub per group is checked with is_map_viable's
+    conditions.  Every condition only asks that regions be reachable, and any
+    completion of the placement reaches a subset of what the hub map reaches,
+    so a failed check means the placement can not be completed and it is
+    undone.  With every exit placed the check is exact.
+
+    Exits next to the start are placed first until two interesting regions
+    are open.  Then exits in regions which are cut off from the start are
+    placed while there are still location exits which can connect them.
+    Checking a map whose isolated regions are left for last only fails once
+    the last few exits are placed.  If no location exit fits an overworld exit,
+    the previous placement is undone and its next candidate is tried.  An
+    attempt which has too many placements rejected is abandoned.
+    """
+    def __init__(
+            self,
+            exit_connectors: Iterable[regionmap.ExitConnector],
+            fixed_assignment: dict[OWExit, LocExit],
+            groups: Iterable[Sequence[OWExit]],
+            base_assignment: dict[OWExit, LocExit] | None = None,
+            max_rejections: int = 200
+    ):
+        """
+        Each group's overworld exits are shuffled among the location exits
+        base_assignment gives them.  The other exits keep fixed_assignment.
+        """
+        if base_assignment is None:
+            base_assignment = fixed_assignment
+
+        self.exit_connectors = list(exit_connectors)
+        self.fixed_assignment = dict(fixed_assignment)
+        self.max_rejections = max_rejections
+        self.stats = ExitPlacementStats()
+
+        connector_dict = {
+            connector.from_exit: connector for connector in self.exit_connectors
+        }
+        self.group_loc_exits: list[list[LocExit]] = []
+        self.slots: list[_ExitSlot] = []
+        for group in groups:
+            group_ow_exits = [x for x in OWExit if x in group]
+            if not group_ow_exits:
+                continue
+            group_ind = len(self.group_loc_exits)
+            group_targets = {base_assignment[x] for x in group_ow_exits}
+            loc_exits = [x for x in LocExit if x in group_targets]
+            self.group_loc_exits.append(loc_exits)
+            for ow_exit in group_ow_exits:
+                self.fixed_assignment.pop(ow_exit, None)
+                self.slots.append(
+                    _ExitSlot(connector_dict[ow_exit], group_ind,
+                              frozenset(get_allowed_loc_exits(ow_exit, loc_exits)))
+                )
+
+        slot_exits = {slot.connector.from_exit for slot in self.slots}
+        for connector in self.exit_connectors:
+            if (
+                    connector.from_exit not in slot_exits and
+                    connector.from_exit not in self.fixed_assignment
+            ):
+                raise ValueError(f"No assignment for {connector.from_exit}")
+
+        self.loc_exits: frozenset[LocExit] = frozenset(
+            self.fixed_assignment[connector.from_exit]
+            for connector in self.exit_connectors
+            if connector.from_exit in self.fixed_assignment
+        ).union(*self.group_loc_exits)
+
+    def _count(self, name: str, amount: int = 1):
+        setattr(self.stats, name, getattr(self.stats, name) + amount)
+        tracing.count(f"exit_placement_{name}", amount)
+
+    def _choose_slot(self, relaxed_map: _RelaxedMap, rng: RNGType) -> int | None:
+        if not relaxed_map.unplaced:
+            return None
+
+        unplaced = sorted(relaxed_map.unplaced)
+        # Flag exits can only take dead ends, so give them theirs first.
+        flag_slots = [
+            x for x in unplaced
+            if self.slots[x].connector.from_exit in _flag_ow_exits
+        ]
+        if flag_slots:
+            return rng.choice(flag_slots)
+
+        # Build out from the start until there is something to do without
+        # items.  Otherwise the exits near the start are placed last, when
+        # only uninteresting location exits are left.
+        early_slots = relaxed_map.get_early_slots()
+        if early_slots:
+            return rng.choice(early_slots)
+
+        # Exits in regions cut off from the start need location exits which
+        # lead somewhere.  Place them while there are still some left.
+        connected_slots = set(relaxed_map.get_connected_slots())
+        isolated_slots = [x for x in unplaced if x not in connected_slots]
+        if isolated_slots:
+            return rng.choice(isolated_slots)
+
+        return rng.choice(unplaced)
+
+    def place(
+            self,
+            base_map: regionmap.RegionMap,
+            rng: RNGType,
+            region_rules: dict[str, logictypes.LogicRule] | None = None,
+    ) -> list[regionmap.ExitConnector] | None:
+        """
+        Get exit connectors which make a viable map when patched onto the
+        graph base_map was patched from.  base_map should have no exit
+        connectors and any portal shuffle or starting rewards already applied.
+        region_rules are extra rules for entering regions, which are applied
+        to the exits leading into them.  Returns None if the attempt was
+        abandoned.
+        """
+        self._count("attempts")
+        if region_rules is None:
+            region_rules = dict()
+
+        fixed_connectors = [
+            regionmap.ExitConnector(connector.from_exit,
+                                    self.fixed_assignment[connector.from_exit],
+                                    connector.rule, connector.reversible)
+            for connector in self.exit_connectors
+            if connector.from_exit in self.fixed_assignment
+        ]
+        relaxed_map = _RelaxedMap(base_map, self.slots, fixed_connectors,
+                                  self.group_loc_exits, region_rules)
+
+        if not relaxed_map.is_viable():
+            self._count("failed_attempts")
+            return None
+
+        num_rejections = 0
+        # Placed slots and the candidates they have left to try.
+        placed: list[tuple[int, LocExit, list[LocExit]]] = []
+        candidates: list[LocExit] | None = None
+        slot_ind: int | None = None
+
+        while True:
+            if candidates is None:
+                slot_ind = self._choose_slot(relaxed_map, rng)
+                if slot_ind is None:
+                    break
+                candidates = relaxed_map.get_candidates(slot_ind)
+                rng.shuffle(candidates)
+
+            while candidates:
+                loc_exit = candidates.pop()
+                relaxed_map.place(slot_ind, loc_exit)
+                self._count("placements")
+                if relaxed_map.is_viable():
+                    placed.append((slot_ind, loc_exit, candidates))
+                    candidates = None
+                    break
+
+                relaxed_map.unplace(slot_ind, loc_exit)
+                self._count("rejected_placements")
+                num_rejections += 1
+                if num_rejections > self.max_rejections:
+                    self._count("failed_attempts")
+                    return None
+            else:
+                # Nothing fits here.  Move the previous exit to its next
+                # candidate.
+                if not placed:
+                    self._count("failed_attempts")
+                    return None
+                self._count("backtracks")
+                slot_ind, loc_exit, candidates = placed.pop()
+                relaxed_map.unplace(slot_ind, loc_exit)
+
+        assignment = dict(self.fixed_assignment)
+        for slot_ind, loc_exit, _ in placed:
+            assignment[self.slots[slot_ind].connector.from_exit] = loc_exit
+
+        return [
+            regionmap.ExitConnector(connector.from_exit,
+                                    assignment[connector.from_exit],
+                                    connector.rule, connector.reversible)
+            for connector in self.exit_connectors
+        ]
+
+
+def get_exit_placer(
+        entrance_options: entranceoptions.EntranceShufflerOptions
+) -> ExitPlacer:
+    """Get an ExitPlacer which follows the same rules as get_random_exit_connectors."""
+    exit_connectors = regionmap.get_default_exit_connectors()
+    if entrance_options.shuffle_entrances is False:
+        return ExitPlacer(
+            exit_connectors,
+            {connector.from_exit: connector.to_exit for connector in exit_connectors},
+            []
+        )
+
+    exit_connectors = [
+        connector for connector in exit_connectors
+        if connector.from_exit != OWExit.TYRANO_LAIR
+    ]
+    base_assignment = _get_base_assignment(
+        exit_connectors, entrance_options.lair_ruins_default_spot
+    )
+    fixed_assignment = {
+        ow_exit: base_assignment[ow_exit]
+        for ow_exit in entrance_options.vanilla_spots if ow_exit in base_assignment
+    }
+    return ExitPlacer(exit_connectors, fixed_assignment,
+                      entrance_options.preserve_groups, base_assignment)
+
 
 def main():
     ...
@@ -0,0 +1,211 @@
+"""
+Analyze the logic of a seed once its key items and map are final.
+
+Scaling and treasure assignment both want the sphere of every region, and the
+spoiler log wants to know which key items are needed and in what order.  All
+of these come from one LogicAnalysis which is stored on the ConfigState
+instead of each consumer walking the map again.
+
+Finishing the seed means reaching every region, the same as
+entrancefiller.verify_fill.
+
+Only items which appear in access rules matter.  These are mostly the key
+items, but the treasure fill can also place some (e.g. a spare Masamune), so
+the analysis is redone when get_logic_spots changes.
+"""
+import dataclasses
+import typing
+
+from ctrando.common import ctenums
+from ctrando.entranceshuffler import regionmap
+from ctrando.entranceshuffler.reachability import RegionReachability
+from ctrando.logic.logictypes import RewardType
+from ctrando.treasures import treasuretypes as ttypes
+
+
+# A reward gained in a playthrough and where it came from.
+PlaythroughEntry = tuple[ctenums.TreasureID | ctenums.RecruitID, RewardType]
+
+
+@dataclasses.dataclass
+class LogicAnalysis:
+    """
+    Logic data of a seed.
+      - region_spheres: Sphere of each reachable region, in traversal order.
+      - treasure_spheres/recruit_spheres: Sphere of each reachable spot.
+      - required_spots: Key item placements which are needed to finish.
+        Every other key item can be skipped (but not all at once, in general).
+      - playthrough: Rewards picked up in each sphere when only the required
+        key items are collected.
+      - unreached_regions: Regions which can not be reached at all.
+    """
+    region_spheres: dict[str, int]
+    treasure_spheres: dict[ctenums.TreasureID, int]
+    recruit_spheres: dict[ctenums.RecruitID, int]
+    required_spots: dict[ctenums.TreasureID, ctenums.ItemID]
+    playthrough: list[list[PlaythroughEntry]]
+    unreached_regions: set[str]
+
+    @property
+    def required_key_items(self) -> list[ctenums.ItemID]:
+        return sorted(self.required_spots.values())
+
+
+def get_logic_items(region_map: regionmap.RegionMap) -> set[ctenums.ItemID]:
+    """Get the items which appear in some access rule of the map."""
+    return {
+        requirement
+        for connectors in region_map.name_connector_dict.values()
+        for connector in connectors
+        for rule in connector.rule.get_access_rule()
+        for requirement in rule
+        if isinstance(requirement, ctenums.ItemID)
+    }
+
+
+def get_logic_spots(
+        region_map: regionmap.RegionMap,
+        treasure_dict: dict[ctenums.TreasureID, ttypes.RewardType]
+) -> dict[ctenums.TreasureID, ctenums.ItemID]:
+    """
+    Get the spots of treasure_dict which hold an item from an access rule.
+    Two assignments with the same logic spots have the same analysis.
+    """
+    logic_items = get_logic_items(region_map)
+    return {
+        spot: reward for spot, reward in treasure_dict.items()
+        if reward in logic_items
+    }
+
+
+def _get_region_spheres(
+        reachability: RegionReachability,
+        region_map: regionmap.RegionMap
+) -> dict[str, int]:
+    """Step the reachability until it stops and record each region's sphere."""
+    region_spheres: dict[str, int] = {}
+    sphere = 0
+    while True:
+        new_regions = [
+            name for name in reachability.step()
+            if name in region_map.name_connector_dict
+        ]
+        if not new_regions:
+            break
+
+        for name in new_regions:
+            region_spheres[name] = sphere
+        sphere += 1
+
+    return region_spheres
+
+
+def _get_playthrough(
+        region_spheres: dict[str, int],
+        region_map: regionmap.RegionMap,
+        treasure_dict: dict[ctenums.TreasureID, ttypes.RewardType],
+        recruit_dict: dict[ctenums.RecruitID, list[ctenums.CharID]],
+        treasures_to_list: typing.Container[ctenums.TreasureID],
+) -> list[list[PlaythroughEntry]]:
+    if not region_spheres:
+        return []
+
+    playthrough: list[list[PlaythroughEntry]] = [
+        [] for _ in range(max(region_spheres.values()) + 1)
+    ]
+    seen_spots: set[tuple[type, typing.Any]] = set()
+    for name, sphere in region_spheres.items():
+        region = region_map.loc_region_dict.get(name, None)
+        if region is None:
+            continue
+
+        for spot in region.reward_spots:
+            if (type(spot), spot) in seen_spots:
+                continue
+            seen_spots.add((type(spot), spot))
+
+            if isinstance(spot, ctenums.TreasureID):
+                if spot in treasures_to_list:
+                    playthrough[sphere].append((spot, treasure_dict[spot]))
+            elif isinstance(spot, ctenums.RecruitID):
+                for char_id in recruit_dict.get(spot, ()):
+                    if char_id is not None:
+                        playthrough[sphere].append((spot, char_id))
+
+    return playthrough
+
+
+def get_logic_analysis(
+        region_map: regionmap.RegionMap,
+        treasure_dict: dict[ctenums.TreasureID, ttypes.RewardType],
+        recruit_dict: dict[ctenums.RecruitID, list[ctenums.CharID]],
+        starting_rewards: typing.Iterable[RewardType] | None = None,
+        starting_region: str = "starting_rewards"
+) -> LogicAnalysis:
+    """
+    Analyze the logic of a seed.  Only the logic spots matter, so this can be
+    called as soon as the key items are placed.
+    """
+    starting_rewards = [] if starting_rewards is None else list(starting_rewards)
+
+    reachability = RegionReachability(
+        region_map, starting_region, starting_rewards,
+        dict(treasure_dict), recruit_dict
+    )
+    region_spheres = _get_region_spheres(reachability, region_map)
+    unreached_regions = set(region_map.name_connector_dict).difference(region_spheres)
+
+    treasure_spheres: dict[ctenums.TreasureID, int] = {}
+    recruit_spheres: dict[ctenums.RecruitID, int] = {}
+    for name, sphere in region_spheres.items():
+        region = region_map.loc_region_dict.get(name, None)
+        if region is None:
+            continue
+        for spot in region.reward_spots:
+            # Regions are in traversal order, so the first sphere is lowest.
+            if isinstance(spot, ctenums.TreasureID):
+                treasure_spheres.setdefault(spot, sphere)
+            elif isinstance(spot, ctenums.RecruitID):
+                recruit_spheres.setdefault(spot, sphere)
+
+    # Take key items out starting from the last sphere.  An item is required
+    # if some region is lost without it.  Removing more items never gains a
+    # region, so every item kept is still required at the end.
+    num_reached = len(reachability.reached_regions)
+    key_item_spots = sorted(
+        (
+            spot for spot, reward in treasure_dict.items()
+            if reward in reachability.useful_items and spot in treasure_spheres
+        ),
+        key=lambda spot: (treasure_spheres[spot], spot),
+        reverse=True
+    )
+    required_spots: dict[ctenums.TreasureID, ctenums.ItemID] = {}
+    for spot in key_item_spots:
+        reward = reachability.treasure_dict[spot]
+        reachability.set_treasure(spot, ctenums.ItemID.NONE)
+        if len(reachability.reached_regions) < num_reached:
+            # The spot itself can not have been lost, so this restores the
+            # removed regions.
+            reachability.set_treasure(spot, reward)
+            required_spots[spot] = reward
+
+    required_spots = {
+        spot: required_spots[spot]
+        for spot in sorted(required_spots, key=lambda x: (treasure_spheres[x], x))
+    }
+
+    # Walk again with only the required items for the playthrough.
+    playthrough_reachability = RegionReachability(
+        region_map, starting_region, starting_rewards,
+        dict(reachability.treasure_dict), recruit_dict
+    )
+    playthrough = _get_playthrough(
+        _get_region_spheres(playthrough_reachability, region_map),
+        region_map, treasure_dict, recruit_dict, required_spots
+    )
+
+    return LogicAnalysis(
+        region_spheres, treasure_spheres, recruit_spheres, required_spots,
+        playthrough, unreached_regions
+    )
@@ -1,4 +1,5 @@
 """Walk through a Map and collect rewards."""
+import bisect
 import typing
 from typing import Any
 
@@ -6,6 +7,7 @@ from ctrando.common import ctenums, memory
 from ctrando.entranceshuffler.regionmap import RegionConnector
 from ctrando.logic.logictypes import Game
 from ctrando.entranceshuffler import regionmap
+from ctrando.entranceshuffler.reachability import RegionReachability
 from ctrando.treasures import treasuretypes as ttypes
 
 
@@ -21,6 +23,9 @@ class MapTraverser:
         self.starting_rewards = [] if starting_rewards is None else list(starting_rewards)
         self.reached_regions: set[str] = set()
         self.available_connectors: set[RegionConnector] = set()
+        # available_connectors sorted by link_name.  Kept up to date as
+        # connectors are added so that step() does not need to re-sort.
+        self._sorted_connectors: list[RegionConnector] = []
 
         useful_items: set[typing.Any] = set()
         for name, connectors in self.region_map.name_connector_dict.items():
@@ -44,8 +49,13 @@ class MapTraverser:
     def add_region_connectors(self, region_name: str):
         connectors = self.region_map.name_connector_dict[region_name]
         for connector in connectors:
-            if connector.to_region_name not in self.reached_regions:
+            if (
+                    connector.to_region_name not in self.reached_regions and
+                    connector not in self.available_connectors
+            ):
                 self.available_connectors.add(connector)
+                bisect.insort(self._sorted_connectors, connector,
+                              key=lambda x: x.link_name)
 
     def add_region_rewards(
             self,
@@ -170,11 +180,17 @@ class MapTraverser:
 
         while True:
             new_regions = list()
-            connectors = sorted(self.available_connectors,
-                                key = lambda x:x.link_name)
-            for connector in connectors:  # list(self.available_connectors):
+            # Drop connectors which were removed on the last pass.
+            connectors = [
+                x for x in self._sorted_connectors if x in self.available_connectors
+            ]
+            self._sorted_connectors = connectors
+            for connector in connectors:
                 to_region_name = connector.to_region_name
-                has_region = to_region_name in self.reached_regions.union(new_regions)
+                has_region = (
+                    to_region_name in self.reached_regions or
+                    to_region_name in new_regions
+                )
 
                 if to_region_name in regions_to_skip:
                     self.available_connectors.remove(connector)
@@ -238,15 +254,16 @@ def get_sphere_dict(
     Return a dictionary of region name -> sphere number
     """
     sphere = 0
-    traverser = MapTraverser(region_map, "starting_rewards", starting_rewards)
+    reachability = RegionReachability(
+        region_map, "starting_rewards", starting_rewards,
+        dict(treasure_dict), recruit_dict
+    )
 
     total_regions = set(region_map.name_connector_dict.keys())
     ret_dict = {name: 0 for name in total_regions}
 
     while True:
-        traverser.step(treasure_dict, recruit_dict)
-        regions = traverser.reached_regions
-        regions.intersection_update(total_regions)
+        regions = total_regions.intersection(reachability.step())
 
         if not regions:
             raise ValueError
@@ -0,0 +1,428 @@
+"""
+Incrementally maintain the set of reachable regions in a RegionMap.
+
+MapTraverser walks the whole map every time it is asked for the reachable
+regions.  The fill code asks that question once per placed item while only
+changing a single reward between asks, so RegionReachability instead keeps the
+reached regions and held rewards around and updates them in response to
+reward deltas.
+
+  - Adding a reward only wakes connectors that were blocked on that reward.
+  - Removing a reward uses delete-and-rederive: regions whose access could
+    depend on the removed reward are over-deleted, then re-reached from the
+    regions that are known to be unaffected.
+"""
+from collections import deque
+from collections.abc import Iterable
+import dataclasses
+import enum
+import typing
+
+from ctrando.common import ctenums, memory
+from ctrando.entranceshuffler import regionmap
+from ctrando.entranceshuffler.regionmap import RegionConnector
+from ctrando.logic import logictypes
+from ctrando.logic.logictypes import Game, RewardType
+
+
+class _RewardKind(enum.Enum):
+    """Which collection of a Game a reward token is held in."""
+    OTHER = enum.auto()
+    KEY_ITEM = enum.auto()
+    CHARACTER = enum.auto()
+
+
+_Token = tuple[_RewardKind, RewardType]
+
+
+def _get_starting_token(reward: RewardType) -> _Token:
+    if isinstance(reward, ctenums.ItemID):
+        return _RewardKind.KEY_ITEM, reward
+    if isinstance(reward, ctenums.CharID):
+        return _RewardKind.CHARACTER, reward
+    return _RewardKind.OTHER, reward
+
+
+@dataclasses.dataclass
+class ReachabilityDelta:
+    """Regions and reward spots which changed reachability after an update."""
+    gained_regions: set[str] = dataclasses.field(default_factory=set)
+    lost_regions: set[str] = dataclasses.field(default_factory=set)
+    gained_spots: set[typing.Any] = dataclasses.field(default_factory=set)
+    lost_spots: set[typing.Any] = dataclasses.field(default_factory=set)
+
+    def __bool__(self):
+        return bool(self.gained_regions or self.lost_regions)
+
+
+class RegionReachability:
+    """
+    Keeps track of which regions of a RegionMap are reachable given a set of
+    starting rewards and an assignment of rewards to spots.
+
+    The treasure_dict given is owned by this object afterwards.  Use
+    set_treasure() to change it so that reachability stays current.
+    """
+
+    def __init__(
+            self,
+            region_map: regionmap.RegionMap,
+            starting_name: str,
+            starting_rewards: Iterable[RewardType] | None = None,
+            treasure_dict: dict[ctenums.TreasureID, typing.Any] | None = None,
+            recruit_dict: dict[ctenums.RecruitID, list[ctenums.CharID]] | None = None,
+            rewards_to_skip: Iterable[RewardType] | None = None,
+    ):
+        self.region_map = region_map
+        self.starting_name = starting_name
+        self.treasure_dict = {} if treasure_dict is None else treasure_dict
+        self.recruit_dict = {} if recruit_dict is None else recruit_dict
+        self.rewards_to_skip = set() if rewards_to_skip is None else set(rewards_to_skip)
+
+        self.game = Game()
+        self.reached_regions: set[str] = set()
+
+        self._token_sources: dict[_Token, int] = {}
+        self._starting_tokens: list[_Token] = []
+
+        # Static indices into the map.
+        self._incoming: dict[str, list[RegionConnector]] = {
+            name: [] for name in region_map.name_connector_dict
+        }
+        self._bit_connectors: dict[int, list[RegionConnector]] = {}
+        self._connector_bits: dict[RegionConnector, frozenset[int]] = {}
+        useful_items: set[ctenums.ItemID] = set()
+
+        for connectors in region_map.name_connector_dict.values():
+            for connector in connectors:
+                self._incoming.setdefault(connector.to_region_name, []).append(connector)
+                bits: set[int] = set()
+                for rule in connector.rule.get_access_rule():
+                    for requirement in rule:
+                        bits.add(logictypes.get_reward_bit(requirement))
+                        if isinstance(requirement, ctenums.ItemID):
+                            useful_items.add(requirement)
+                self._connector_bits[connector] = frozenset(bits)
+                for bit in bits:
+                    self._bit_connectors.setdefault(bit, []).append(connector)
+
+        self.useful_items = useful_items
+
+        # Spots of different types can compare equal (e.g. TreasureID and
+        # RecruitID are both IntEnums), so key on the type as well.
+        self._spot_regions: dict[tuple[type, typing.Any], list[str]] = {}
+        for name, region in region_map.loc_region_dict.items():
+            for spot in region.reward_spots:
+                self._spot_regions.setdefault((type(spot), spot), []).append(name)
+
+        # Connectors from reached regions to unreached ones, keyed by the bits
+        # of the tokens which could open them.
+        self._waiting: dict[int, set[RegionConnector]] = {}
+        # Connectors which need to be (re)checked.
+        self._queue: deque[RegionConnector] = deque()
+
+        # Tokens whose gain is held until the end of the current step().
+        self._deferred_tokens: list[_Token] | None = None
+
+        if starting_rewards is not None:
+            for reward in starting_rewards:
+                token = _get_starting_token(reward)
+                self._starting_tokens.append(token)
+                self._add_token(token)
+
+    # Token bookkeeping
+    def _add_token(self, token: _Token):
+        """Add one source of a token and wake connectors it may open."""
+        count = self._token_sources.get(token, 0)
+        self._token_sources[token] = count + 1
+
+        kind, reward = token
+        if kind == _RewardKind.KEY_ITEM:
+            self.game.key_items.append(reward)
+        elif count > 0:
+            # Set-like collections only hold one copy.
+            return
+        elif kind == _RewardKind.CHARACTER:
+            self.game.characters.add(reward)
+        else:
+            self.game.other_rewards.add(reward)
+
+        bit = logictypes.get_reward_bit(reward)
+        waiting = self._waiting.pop(bit, None)
+        if waiting:
+            self._queue.extend(waiting)
+
+    def _remove_token(self, token: _Token) -> bool:
+        """
+        Remove one source of a token.  Returns whether the Game changed.
+        """
+        count = self._token_sources[token] - 1
+        if count == 0:
+            del self._token_sources[token]
+        else:
+            self._token_sources[token] = count
+
+        kind, reward = token
+        if kind == _RewardKind.KEY_ITEM:
+            self.game.key_items.remove(reward)
+            return True
+        if count > 0:
+            return False
+        if kind == _RewardKind.CHARACTER:
+            self.game.characters.discard(reward)
+        else:
+            self.game.other_rewards.discard(reward)
+        return True
+
+    def _get_treasure_token(self, spot: typing.Any) -> _Token | None:
+        reward = self.treasure_dict.get(spot, None)
+        if reward in self.useful_items and reward not in self.rewards_to_skip:
+            return _RewardKind.KEY_ITEM, reward
+        return None
+
+    def _get_region_tokens(
+            self, region_name: str
+    ) -> tuple[list[_Token], list[_Token]]:
+        """
+        Get the tokens a region grants as (immediate, deferred).  MapTraverser
+        grants non-flag region rewards as soon as a region is reached and
+        everything else at the end of the sphere.
+        """
+        immediate: list[_Token] = []
+        deferred: list[_Token] = []
+
+        region = self.region_map.loc_region_dict.get(region_name, None)
+        if region is None:
+            return immediate, deferred
+
+        for reward in set(region.region_rewards).difference(self.rewards_to_skip):
+            if isinstance(reward, memory.Flags):
+                deferred.append((_RewardKind.OTHER, reward))
+            else:
+                immediate.append((_RewardKind.OTHER, reward))
+
+        for spot in region.reward_spots:
+            if isinstance(spot, ctenums.TreasureID):
+                token = self._get_treasure_token(spot)
+                if token is not None:
+                    deferred.append(token)
+            elif isinstance(spot, ctenums.RecruitID):
+                for recruit in self.recruit_dict.get(spot, ()):
+                    if recruit not in self.rewards_to_skip:
+                        deferred.append((_RewardKind.CHARACTER, recruit))
+
+        return immediate, deferred
+
+    # Traversal
+    def _reach_region(self, region_name: str):
+        self.reached_regions.add(region_name)
+        self._queue.extend(self.region_map.name_connector_dict[region_name])
+
+        immediate, deferred = self._get_region_tokens(region_name)
+        for token in immediate:
+            self._add_token(token)
+
+        if self._deferred_tokens is None:
+            for token in deferred:
+                self._add_token(token)
+        else:
+            self._deferred_tokens.extend(deferred)
+
+    def _wait_on(self, connector: RegionConnector):
+        for bit in self._connector_bits[connector]:
+            self._waiting.setdefault(bit, set()).add(connector)
+
+    def _propagate(self) -> list[str]:
+        """Follow connectors in the queue until nothing new is reached."""
+        new_regions: list[str] = []
+        reached = self.reached_regions
+        queue = self._queue
+        game = self.game
+
+        while queue:
+            connector = queue.popleft()
+            to_name = connector.to_region_name
+            if to_name in reached or connector.from_region_name not in reached:
+                continue
+
+            if connector.rule(game):
+                new_regions.append(to_name)
+                self._reach_region(to_name)
+            else:
+                self._wait_on(connector)
+
+        return new_regions
+
+    def _start(self) -> list[str]:
+        if self.reached_regions:
+            return []
+        self._reach_region(self.starting_name)
+        return [self.starting_name]
+
+    def maximize(self) -> ReachabilityDelta:
+        """Reach every region possible with the current rewards."""
+        new_regions = self._start()
+        new_regions.extend(self._propagate())
+        return self._make_delta(set(new_regions), set())
+
+    def step(self) -> list[str]:
+        """
+        Reach one more sphere, mirroring MapTraverser.step().  Returns the
+        newly reached regions in traversal order.
+        """
+        self._deferred_tokens = []
+        try:
+            new_regions = self._start()
+            new_regions.extend(self._propagate())
+            deferred = self._deferred_tokens
+        finally:
+            self._deferred_tokens = None
+
+        # Tokens gained at the end of the sphere only open connectors in the
+        # next step.
+        for token in deferred:
+            self._add_token(token)
+
+        return new_regions
+
+    # Updates
+    def _over_delete(self, suspect_bits: set[int]) -> set[str]:
+        """
+        Find every reached region which has an incoming connector that could
+        depend on a suspect token or on another deleted region.
+        """
+        deleted: set[str] = set()
+        reached = self.reached_regions
+        bit_queue = deque(suspect_bits)
+        region_queue: deque[str] = deque()
+        seen_bits = set(suspect_bits)
+
+        def delete(region_name: str):
+            if (
+                    region_name == self.starting_name or
+                    region_name in deleted or
+                    region_name not in reached
+            ):
+                return
+            deleted.add(region_name)
+            region_queue.append(region_name)
+
+            immediate, deferred = self._get_region_tokens(region_name)
+            for _, reward in immediate + deferred:
+                bit = logictypes.get_reward_bit(reward)
+                if bit not in seen_bits:
+                    seen_bits.add(bit)
+                    bit_queue.append(bit)
+
+        while bit_queue or region_queue:
+            while bit_queue:
+                bit = bit_queue.popleft()
+                for connector in self._bit_connectors.get(bit, ()):
+                    if (
+                            connector.from_region_name in reached and
+                            connector.from_region_name not in deleted
+                    ):
+                        delete(connector.to_region_name)
+
+            while region_queue:
+                region_name = region_queue.popleft()
+                for connector in self.region_map.name_connector_dict[region_name]:
+                    delete(connector.to_region_name)
+
+        return deleted
+
+    def _rederive(self, suspect_bits: set[int]) -> ReachabilityDelta:
+        if not self.reached_regions:
+            return ReachabilityDelta()
+
+        deleted = self._over_delete(suspect_bits)
+        for region_name in deleted:
+            self.reached_regions.remove(region_name)
+            immediate, deferred = self._get_region_tokens(region_name)
+            for token in immediate + deferred:
+                self._remove_token(token)
+
+        # Connectors into deleted regions from what is left are the only ways
+        # back in.  Anything else still blocked is already waiting.
+        for region_name in deleted:
+            for connector in self._incoming.get(region_name, ()):
+                if connector.from_region_name in self.reached_regions:
+                    self._queue.append(connector)
+
+        regained = set(self._propagate())
+        return self._make_delta(regained - deleted, deleted - regained)
+
+    def _make_delta(
+            self, gained_regions: set[str], lost_regions: set[str]
+    ) -> ReachabilityDelta:
+        delta = ReachabilityDelta(gained_regions, lost_regions)
+        for region_set, spot_set in ((gained_regions, delta.gained_spots),
+                                     (lost_regions, delta.lost_spots)):
+            for region_name in region_set:
+                region = self.region_map.loc_region_dict.get(region_name, None)
+                if region is not None:
+                    spot_set.update(region.reward_spots)
+        return delta
+
+    def add_reward(self, reward: RewardType) -> ReachabilityDelta:
+        """Add a starting reward and reach anything it opens."""
+        token = _get_starting_token(reward)
+        self._starting_tokens.append(token)
+        self._add_token(token)
+
+        if not self.reached_regions:
+            return ReachabilityDelta()
+        return self._make_delta(set(self._propagate()), set())
+
+    def remove_reward(self, reward: RewardType) -> ReachabilityDelta:
+        """Remove a starting reward and drop anything which needed it."""
+        token = _get_starting_token(reward)
+        self._starting_tokens.remove(token)
+        if not self._remove_token(token):
+            return ReachabilityDelta()
+
+        return self._rederive({logictypes.get_reward_bit(reward)})
+
+    def set_treasure(
+            self,
+            spot: ctenums.TreasureID,
+            reward: typing.Any
+    ) -> ReachabilityDelta:
+        """Assign a reward to a spot and update reachability."""
+        old_token = self._get_treasure_token(spot)
+        self.treasure_dict[spot] = reward
+        new_token = self._get_treasure_token(spot)
+
+        if old_token == new_token or not self.is_spot_reachable(spot):
+            return ReachabilityDelta()
+
+        delta = ReachabilityDelta()
+        if old_token is not None:
+            # Rederive with the spot empty so that regions lost along the way
+            # do not take the new reward with them.
+            self.treasure_dict[spot] = None
+            for _ in range(self._get_reached_spot_count(spot)):
+                self._remove_token(old_token)
+            delta = self._rederive({logictypes.get_reward_bit(old_token[1])})
+            self.treasure_dict[spot] = reward
+
+        if new_token is not None:
+            for _ in range(self._get_reached_spot_count(spot)):
+                self._add_token(new_token)
+            gained = self._make_delta(set(self._propagate()), set())
+            delta.gained_regions.update(gained.gained_regions)
+            delta.gained_spots.update(gained.gained_spots)
+
+        return delta
+
+    def _get_reached_spot_count(self, spot: typing.Any) -> int:
+        return sum(
+            1 for region_name in self._spot_regions.get((type(spot), spot), ())
+            if region_name in self.reached_regions
+        )
+
+    def is_spot_reachable(self, spot: typing.Any) -> bool:
+        return any(
+            region_name in self.reached_regions
+            for region_name in self._spot_regions.get((type(spot), spot), ())
+        )
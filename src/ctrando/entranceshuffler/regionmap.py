@@ -1,3 +1,4 @@
+import copy
 import typing
 from itertools import combinations, permutations
 
@@ -70,84 +71,205 @@ class MapConnector:
         self.link_name = link_name
 
 
-class RegionMap:
-    """Graph of all regions"""
+class RegionGraph:
+    """
+    Frozen, integer-indexed form of the parts of a RegionMap which do not
+    depend on how the overworld exits are assigned.
+
+    Regions get dense ids (OW regions first, then loc regions) and the region
+    connectors are kept in CSR form: the connectors leaving region i are
+    edge_connectors[edge_offsets[i]:edge_offsets[i+1]].  OW and location
+    exits are indexed to the region which holds them so that exit connectors
+    can be resolved without searching the regions.
+
+    A RegionGraph is meant to be built once and then patched with different
+    exit connectors to make each candidate RegionMap.
+    """
+    # edge_targets entry of a connector into a region not in the graph.
+    NO_REGION = -1
+
     def __init__(
             self,
             ow_regions: Iterable[owregions.OWRegion],
             loc_regions: Iterable[locregions.LocRegion],
-            exit_connectors: Iterable[ExitConnector],
             region_connectors: Iterable[RegionConnector],
     ):
-        self.ow_region_dict: dict[str, OWRegion] = dict()
-        self.ow_exit_dict: dict[OWExit, str] = dict()
+        self.ow_regions: tuple[OWRegion, ...] = tuple(ow_regions)
+        self.loc_regions: tuple[LocRegion, ...] = tuple(loc_regions)
 
-        for region in ow_regions:
-            if region.name in self.ow_region_dict:
+        region_names: list[str] = []
+        self.region_ids: dict[str, int] = dict()
+        self.ow_exit_regions: dict[OWExit, int] = dict()
+        self.loc_exit_regions: dict[LocExit, int] = dict()
+
+        for region in self.ow_regions:
+            if region.name in self.region_ids:
                 raise ValueError("Duplicate OW Region Name.")
-            self.ow_region_dict[region.name] = region
+            region_id = len(region_names)
+            self.region_ids[region.name] = region_id
+            region_names.append(region.name)
             for ow_exit in region.ow_exits:
-                self.ow_exit_dict[ow_exit] = region.name
+                self.ow_exit_regions[ow_exit] = region_id
 
-        self.loc_region_dict: dict[str, LocRegion] = dict()
-        for region in loc_regions:
-            if region.name in self.loc_region_dict or region.name in self.ow_region_dict:
+        for region in self.loc_regions:
+            if region.name in self.region_ids:
                 raise ValueError("Duplicate Loc Region Name: " + region.name)
-            self.loc_region_dict[region.name] = region
-
-        self.name_connector_dict: dict[str, list[RegionConnector]] = dict()
+            region_id = len(region_names)
+            self.region_ids[region.name] = region_id
+            region_names.append(region.name)
+            for loc_exit in region.loc_exits:
+                self.loc_exit_regions[loc_exit] = region_id
 
-        for x in list(self.ow_region_dict.keys())+list(self.loc_region_dict.keys()):
-            self.name_connector_dict[x] = []
-
-        for exit_connector in exit_connectors:
-            ow_exit = exit_connector.from_exit
-            loc_exit = exit_connector.to_exit
-            ow_name: str | None = None
-            loc_name: str | None = None
-
-            for name, ow_region in self.ow_region_dict.items():
-                if ow_exit in ow_region.ow_exits:
-                    ow_name = name
-
-            for name, loc_region in self.loc_region_dict.items():
-                if loc_exit in loc_region.loc_exits:
-                    loc_name = name
-
-            if ow_name is not None and loc_name is not None:
-                self.name_connector_dict[ow_name].append(
-                    RegionConnector(ow_name, loc_name,
-                                    f"{str(exit_connector.from_exit)}(loc)",
-                                    exit_connector.rule)
-                )
-                if exit_connector.reversible:
-                    self.name_connector_dict[loc_name].append(
-                        RegionConnector(
-                            loc_name, ow_name,
-                            str(exit_connector.from_exit),
-                            exit_connector.rule
-                        )
-                    )
-            else:
-                pass
-                # print(f"Warning: {exit_connector.from_exit}, [{ow_name}, {ow_exit}] [{loc_name}, {loc_exit}]")
+        self.region_names: tuple[str, ...] = tuple(region_names)
 
+        rows: list[list[RegionConnector]] = [[] for _ in region_names]
         for region_connector in region_connectors:
-            self.name_connector_dict[region_connector.from_region_name].append(
+            from_id = self.region_ids[region_connector.from_region_name]
+            rows[from_id].append(
                 RegionConnector(region_connector.from_region_name,
                                 region_connector.to_region_name,
                                 region_connector.link_name,
                                 region_connector.rule)
             )
             if region_connector.reversible:
-                self.name_connector_dict[region_connector.to_region_name].append(
+                to_id = self.region_ids[region_connector.to_region_name]
+                rows[to_id].append(
                     RegionConnector(region_connector.to_region_name,
                                     region_connector.from_region_name,
                                     region_connector.link_name,
                                     region_connector.rule)
                 )
 
-        # self.region_connectors = region_connectors
+        edge_offsets = [0]
+        edge_connectors: list[RegionConnector] = []
+        for row in rows:
+            edge_connectors.extend(row)
+            edge_offsets.append(len(edge_connectors))
+
+        self.edge_offsets: tuple[int, ...] = tuple(edge_offsets)
+        self.edge_connectors: tuple[RegionConnector, ...] = tuple(edge_connectors)
+        # Connectors into a region which is not in the graph are kept, like
+        # RegionMap does.  They can never be followed, so they target
+        # NO_REGION.
+        self.edge_targets: tuple[int, ...] = tuple(
+            self.region_ids.get(connector.to_region_name, self.NO_REGION)
+            for connector in edge_connectors
+        )
+
+    def get_region_edges(self, region_id: int) -> tuple[RegionConnector, ...]:
+        """Get the region connectors leaving a region."""
+        return self.edge_connectors[
+            self.edge_offsets[region_id]:self.edge_offsets[region_id+1]
+        ]
+
+    def get_exit_edges(
+            self,
+            exit_connectors: Iterable[ExitConnector]
+    ) -> list[tuple[int, RegionConnector]]:
+        """
+        Resolve exit connectors to (from region id, connector) pairs.  Exit
+        connectors with an exit that is not in the graph are dropped.
+        """
+        ret_list: list[tuple[int, RegionConnector]] = []
+        for exit_connector in exit_connectors:
+            ow_id = self.ow_exit_regions.get(exit_connector.from_exit, None)
+            loc_id = self.loc_exit_regions.get(exit_connector.to_exit, None)
+
+            if ow_id is None or loc_id is None:
+                continue
+
+            ow_name = self.region_names[ow_id]
+            loc_name = self.region_names[loc_id]
+            ret_list.append(
+                (ow_id,
+                 RegionConnector(ow_name, loc_name,
+                                 f"{str(exit_connector.from_exit)}(loc)",
+                                 exit_connector.rule))
+            )
+            if exit_connector.reversible:
+                ret_list.append(
+                    (loc_id,
+                     RegionConnector(loc_name, ow_name,
+                                     str(exit_connector.from_exit),
+                                     exit_connector.rule))
+                )
+
+        return ret_list
+
+    def patch(self, exit_connectors: Iterable[ExitConnector]) -> "RegionMap":
+        """
+        Make a new RegionMap from this graph and the given exit connectors.
+
+        The map gets its own copies of the regions and connectors so that it
+        can be modified (portal shuffle, element locks, starting rewards)
+        without changing the graph.
+        """
+        region_map = RegionMap.__new__(RegionMap)
+        region_map._init_from_graph(self, exit_connectors, copy_parts=True)
+        return region_map
+
+
+class RegionMap:
+    """Graph of all regions"""
+    def __init__(
+            self,
+            ow_regions: Iterable[owregions.OWRegion],
+            loc_regions: Iterable[locregions.LocRegion],
+            exit_connectors: Iterable[ExitConnector],
+            region_connectors: Iterable[RegionConnector],
+    ):
+        graph = RegionGraph(ow_regions, loc_regions, region_connectors)
+        self._init_from_graph(graph, exit_connectors, copy_parts=False)
+
+    def _init_from_graph(
+            self,
+            graph: RegionGraph,
+            exit_connectors: Iterable[ExitConnector],
+            copy_parts: bool
+    ):
+        ow_regions, loc_regions = graph.ow_regions, graph.loc_regions
+        if copy_parts:
+            ow_regions = [
+                OWRegion(region.name, region.ow_exits) for region in ow_regions
+            ]
+            loc_regions = [
+                LocRegion(region.name, region.loc_exits, region.reward_spots,
+                          region.region_rewards, region.region_loc_ids,
+                          region.is_combat_region)
+                for region in loc_regions
+            ]
+
+        self.ow_region_dict: dict[str, OWRegion] = {
+            region.name: region for region in ow_regions
+        }
+        self.loc_region_dict: dict[str, LocRegion] = {
+            region.name: region for region in loc_regions
+        }
+        self.ow_exit_dict: dict[OWExit, str] = {
+            ow_exit: graph.region_names[region_id]
+            for ow_exit, region_id in graph.ow_exit_regions.items()
+        }
+        self.loc_exit_dict: dict[LocExit, str] = {
+            loc_exit: graph.region_names[region_id]
+            for loc_exit, region_id in graph.loc_exit_regions.items()
+        }
+
+        rows: list[list[RegionConnector]] = [[] for _ in graph.region_names]
+        for region_id, connector in graph.get_exit_edges(exit_connectors):
+            rows[region_id].append(connector)
+
+        self.name_connector_dict: dict[str, list[RegionConnector]] = dict()
+        for region_id, name in enumerate(graph.region_names):
+            row = rows[region_id]
+            region_edges = graph.get_region_edges(region_id)
+            if copy_parts:
+                # Connectors are shallow-copied.  Code which changes rules
+                # (e.g. connector.rule &= ...) rebinds the attribute, so the
+                # graph's rules are not modified.
+                row.extend(copy.copy(connector) for connector in region_edges)
+            else:
+                row.extend(region_edges)
+            self.name_connector_dict[name] = row
 
     def get_treasure_group_dict(self) -> dict[str, list[ctenums.TreasureID]]:
         ret_dict: dict[str, list[ctenums.TreasureID]] = dict()
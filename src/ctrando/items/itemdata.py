@@ -9,10 +9,13 @@ import functools
 import typing
 from typing import ByteString, Optional, Self
 
-from ctrando.common import byteops, ctenums, ctrom
+from ctrando.common import byteops, ctenums, ctrom, romtable
 from ctrando.common.ctenums import WeaponEffects, ArmorEffects
 from ctrando.strings import ctstrings
 
+if typing.TYPE_CHECKING:
+    import numpy
+
 
 WritableBytes = typing.Union[bytearray, memoryview]
 
@@ -136,7 +139,40 @@ class BinaryData:
                 f'{self.SIZE} (given {len(data)}).'
             )
 
-        self._data = bytearray(data)
+        self._data: WritableBytes = bytearray(data)
+        # (table, index) when _data is a view of a table record.
+        self._table_record: Optional[tuple[romtable.RomTable, int]] = None
+
+    @classmethod
+    def from_table(cls, table: romtable.RomTable, index: int) -> Self:
+        """Make an object whose data is a view of a record of table."""
+        ret = cls.__new__(cls)
+        ret._view_table(table, index)
+        return ret
+
+    def _view_table(self, table: romtable.RomTable, index: int):
+        self._table_record = (table, index)
+        self._data = table.get_record(index)
+
+    def _attach_to_table(self, table: romtable.RomTable, index: int):
+        """Copy the data into a record of table and view it there."""
+        table.set_record(index, self._data)
+        self._view_table(table, index)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        if self._table_record is not None:
+            # Views can not be pickled.  They are rebuilt from the table.
+            del state["_data"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        table_record = state.get("_table_record", None)
+        if table_record is None:
+            self._table_record = None
+        else:
+            self._view_table(*table_record)
 
     def __eq__(self, other: object):
         if not hasattr(other, '_data'):
@@ -320,6 +356,28 @@ class ItemData(BinaryData):
     ROM_START = 0
     MIN_ID = 0
     MAX_ID = 0
+    # Byte-aligned fields for array views of the table.
+    TABLE_FIELDS: tuple[romtable.Field, ...] = ()
+
+    @classmethod
+    def read_table(cls, rom: ByteString) -> romtable.RomTable:
+        """Read the records for MIN_ID through MAX_ID from rom."""
+        return romtable.RomTable.from_rom(
+            rom, cls.ROM_START, cls.SIZE, cls.MAX_ID - cls.MIN_ID + 1,
+            cls.TABLE_FIELDS
+        )
+
+    @classmethod
+    def from_item_table(cls, table: romtable.RomTable,
+                        item_id: ctenums.ItemID) -> Self:
+        """Make ItemData which is a view of item_id's record of table."""
+        item_id = cls._validate_item_id(item_id)
+        return cls.from_table(table, item_id - cls.MIN_ID)
+
+    def _attach_to_item_table(self, table: romtable.RomTable,
+                              item_id: ctenums.ItemID):
+        item_id = self._validate_item_id(item_id)
+        self._attach_to_table(table, item_id - self.MIN_ID)
 
     @classmethod
     def _validate_item_id(cls, item_id: int) -> ctenums.ItemID:
@@ -364,6 +422,12 @@ class ItemSecondaryData(ItemData):
     Class for storing properties shared by many item types such as price,
     ability to sell, and ability to equip.
     """
+    TABLE_FIELDS = (
+        ("flags", 0, "u1"),
+        ("price", 1, "<u2"),
+        ("equipable_by", 3, "u1"),
+    )
+
     @property
     def price(self) -> int:
         return int.from_bytes(self._data[1:3], 'little')
@@ -431,6 +495,12 @@ class WeaponStats(ItemData):
     ROM_START = 0x0C0262
     MIN_ID = 0
     MAX_ID = int(ctenums.ItemID.WEAPON_END_5A)-1
+    TABLE_FIELDS = (
+        ("attack", 0, "u1"),
+        ("critical_rate", 2, "u1"),
+        ("effect_id", 3, "u1"),
+        ("has_effect", 4, "u1"),
+    )
 
     @property
     def attack(self) -> int:
@@ -491,6 +561,11 @@ class ArmorStats(ItemData):
     ROM_START = 0x0C047E
     MIN_ID = int(ctenums.ItemID.WEAPON_END_5A)
     MAX_ID = int(ctenums.ItemID.HELM_END_94)-1
+    TABLE_FIELDS = (
+        ("defense", 0, "u1"),
+        ("effect_id", 1, "u1"),
+        ("has_effect", 2, "u1"),
+    )
 
     @property
     def defense(self) -> int:
@@ -680,6 +755,8 @@ class AccessoryStats(ItemData):
     ROM_START = 0x0C052C
     MIN_ID = int(ctenums.ItemID.HELM_END_94)
     MAX_ID = int(ctenums.ItemID.PRISMSPECS)
+    # Every byte is shared by several properties.
+    TABLE_FIELDS = tuple((f"byte_{ind}", ind, "u1") for ind in range(4))
 
     @property
     def has_battle_buff(self) -> bool:
@@ -980,6 +1057,10 @@ class GearSecondaryStats(ItemSecondaryData):
     ROM_START = 0x0C06A4
     MIN_ID = 0
     MAX_ID = int(ctenums.ItemID.MERMAIDCAP)
+    TABLE_FIELDS = ItemSecondaryData.TABLE_FIELDS + (
+        ("stat_boost_index", 4, "u1"),
+        ("elemental_protection", 5, "u1"),
+    )
 
     elem_bit_dict = {
             ctenums.Element.LIGHTNING: 0x80,
@@ -1111,6 +1192,7 @@ class ConsumableKeySecondaryStats(ItemSecondaryData):
     ROM_START = 0x0C0ABC
     MIN_ID = 0xBC
     MAX_ID = 0xF1
+    TABLE_FIELDS = ItemSecondaryData.TABLE_FIELDS[:2]
 
     def get_equipable_by(self):
         raise TypeError("Consumables are not Equippable")
@@ -1127,6 +1209,8 @@ class ConsumableKeyEffect(ItemData):
     ROM_START = 0x0C05CC
     MIN_ID = int(ctenums.ItemID.ACCESSORY_END_BC)
     MAX_ID = 0xF1
+    # Every byte is shared by several properties.
+    TABLE_FIELDS = tuple((f"byte_{ind}", ind, "u1") for ind in range(4))
 
     @property
     def heals_in_menu(self):
@@ -1233,6 +1317,21 @@ SecStats = typing.Union[
 ]
 
 
+def _take_table_record(old: Optional[ItemData], new: ItemData):
+    """
+    If old is a view of a table record, move new into that record and detach
+    old.  Data which is already in a table is left where it is.
+    """
+    if old is None or old is new or old._table_record is None or \
+            new._table_record is not None or type(old) is not type(new):
+        return
+
+    table, index = old._table_record
+    old._data = bytearray(old._data)
+    old._table_record = None
+    new._attach_to_table(table, index)
+
+
 class Item:
     def __init__(self,
                  stats: typing.Union[WeaponStats, ArmorStats,
@@ -1247,6 +1346,37 @@ class Item:
         self.name = bytearray(name_bytes)
         self.desc = bytearray(desc_bytes)
 
+    # Replacing stats which are a view of a table record puts the new stats
+    # in that record.
+    @property
+    def stats(self) -> Stats:
+        return self._stats
+
+    @stats.setter
+    def stats(self, val: Stats):
+        _take_table_record(getattr(self, "_stats", None), val)
+        self._stats = val
+
+    @property
+    def secondary_stats(self) -> SecStats:
+        return self._secondary_stats
+
+    @secondary_stats.setter
+    def secondary_stats(self, val: SecStats):
+        _take_table_record(getattr(self, "_secondary_stats", None), val)
+        self._secondary_stats = val
+
+    def _attach_to_tables(
+            self,
+            stat_tables: dict[typing.Type[ItemData], romtable.RomTable],
+            item_id: ctenums.ItemID
+    ):
+        """Put stats which are not in a table into stat_tables."""
+        for stats in (self._stats, self._secondary_stats):
+            table = stat_tables.get(type(stats), None)
+            if table is not None and stats._table_record is None:
+                stats._attach_to_item_table(table, item_id)
+
     def _jot_json(self):
         return {
             'name': self.get_name_as_str(True),
@@ -1394,11 +1524,25 @@ class Item:
         return desc_b
 
     @classmethod
-    def from_rom(cls, rom: ByteString, item_id: ctenums.ItemID):
+    def from_rom(
+            cls, rom: ByteString, item_id: ctenums.ItemID,
+            stat_tables: Optional[dict[typing.Type[ItemData],
+                                       romtable.RomTable]] = None
+    ):
+        """
+        Read an item from rom.  If stat_tables is given, the stats are views
+        of item_id's records in the tables instead.
+        """
         Primary, Secondary = cls._determine_types(item_id)
 
-        stats = Primary.from_rom(rom, item_id)
-        secondary_stats = Secondary.from_rom(rom, item_id)
+        if stat_tables is None:
+            stats = Primary.from_rom(rom, item_id)
+            secondary_stats = Secondary.from_rom(rom, item_id)
+        else:
+            stats = Primary.from_item_table(stat_tables[Primary], item_id)
+            secondary_stats = Secondary.from_item_table(
+                stat_tables[Secondary], item_id
+            )
 
         name = cls.get_name_from_rom(rom, item_id)
         desc = cls.get_desc_from_rom(rom, item_id)
@@ -1413,11 +1557,24 @@ class Item:
         return ret_str
 
 
-class ItemDB:
-    def __init__(self,
-                 item_dict: Optional[dict[ctenums.ItemID, Item]] = None,
-                 stat_boosts: Optional[typing.Iterable[StatBoost]] = None):
+_stat_types: tuple[typing.Type[ItemData], ...] = (
+    WeaponStats, ArmorStats, AccessoryStats, ConsumableKeyEffect,
+    GearSecondaryStats, AccessorySecondaryStats, ConsumableKeySecondaryStats
+)
+
 
+class ItemDB:
+    def __init__(
+            self,
+            item_dict: Optional[dict[ctenums.ItemID, Item]] = None,
+            stat_boosts: Optional[typing.Iterable[StatBoost]] = None,
+            stat_tables: Optional[dict[typing.Type[ItemData],
+                                       romtable.RomTable]] = None
+    ):
+        """
+        stat_tables has a table for each stat type when the items' stats are
+        views of the tables (see from_rom).
+        """
         if item_dict is None:
             item_dict: dict[ctenums.ItemID, Item] = {}
         self.item_dict: dict[ctenums.ItemID, Item] = dict(item_dict)
@@ -1426,12 +1583,34 @@ class ItemDB:
             stat_boosts = []
         self.stat_boosts = list(stat_boosts)
 
+        if stat_tables is None:
+            stat_tables = {}
+        self.stat_tables = dict(stat_tables)
+
     def __getitem__(self, index) -> Item:
         return self.item_dict[index]
 
     def __setitem__(self, index, value):
+        value._attach_to_tables(self.stat_tables, index)
         self.item_dict[index] = value
 
+    def get_stat_array(
+            self,
+            stat_type: typing.Type[ItemData]
+    ) -> Optional[numpy.ndarray]:
+        """
+        Get the records of stat_type as an array with one column per field
+        of stat_type.TABLE_FIELDS.  Element i is item MIN_ID + i, and changing
+        the array changes the items' stats.
+
+        Returns None if NumPy is not installed or there is no table for
+        stat_type.
+        """
+        table = self.stat_tables.get(stat_type, None)
+        if table is None or not romtable.HAS_NUMPY:
+            return None
+        return table.get_array()
+
     @property
     def base_hp_healing(self):
         tonic = self.item_dict[ctenums.ItemID.TONIC]
@@ -1469,8 +1648,12 @@ class ItemDB:
 
     @classmethod
     def from_rom(cls, rom: typing.ByteString) -> Self:
+        # Each stat type is read with one slice, and items are views of it.
+        stat_tables = {
+            stat_type: stat_type.read_table(rom) for stat_type in _stat_types
+        }
         item_dict = {
-            item_id: Item.from_rom(rom, item_id)
+            item_id: Item.from_rom(rom, item_id, stat_tables)
             for item_id in list(ctenums.ItemID)
         }
 
@@ -1488,7 +1671,7 @@ class ItemDB:
         statboosts = [StatBoost.from_rom(rom, i)
                       for i in range(statboost_count)]
 
-        return cls(item_dict, statboosts)
+        return cls(item_dict, statboosts, stat_tables)
 
     def update_all_descriptions(self):
         for item_id in self.item_dict:
@@ -1,9 +1,9 @@
 from __future__ import annotations
 import copy
 import math
-from typing import Tuple, Literal
+from typing import ByteString, Sequence, Tuple, Literal
 
-from ctrando.common import ctenums
+from ctrando.common import ctenums, tracing
 from ctrando.common import memory
 from ctrando.common.memory import Memory as Mem
 from ctrando.common.byteops import to_little_endian
@@ -67,6 +67,19 @@ def get_offset(script_addr):
     return (script_addr - 0x7F0200) // 2
 
 
+class _CommandInfo:
+    """Metadata shared by all commands with the same opcode."""
+    __slots__ = ("num_args", "arg_lens", "arg_descs", "name", "desc")
+
+    def __init__(self, num_args: int, arg_lens: Sequence[int],
+                 arg_descs: Sequence[str], name: str, desc: str):
+        self.num_args = num_args
+        self.arg_lens = tuple(arg_lens)
+        self.arg_descs = tuple(arg_descs)
+        self.name = name
+        self.desc = desc
+
+
 class EventCommand:
 
     str_commands = [0xBB, 0xC0, 0xC1, 0xC2, 0xC3, 0xC4]
@@ -88,21 +101,52 @@ class EventCommand:
                             if x != 0x10]
     jump_commands = fwd_jump_commands + back_jump_commands
 
+    # Commands are made in bulk when scripts are read, so an instance holds
+    # only what differs between commands with the same opcode.  The rest is
+    # in a _CommandInfo shared by all of them.
+    __slots__ = ("command", "args", "arg_lens", "_info")
+
     def __init__(self, command, num_args,
                  arg_lens, arg_descs,
                  name, desc):
         self.command = command
-        self.num_args = num_args
         self.arg_lens = arg_lens
-        self.arg_descs = arg_descs
-        self.name = name
-        self.desc = desc
+        self._info = _CommandInfo(num_args, arg_lens, arg_descs, name, desc)
 
         # These are the actual arguments from the string of bytes in the script
         self.args = []
 
-        # These are the decoded args
-        self.logical_args = []
+    @classmethod
+    def _from_parts(cls, command: int, args: list, arg_lens: Sequence[int],
+                    info: _CommandInfo) -> EventCommand:
+        """Make a command without building new metadata."""
+        ret = cls.__new__(cls)
+        ret.command = command
+        ret.args = args
+        ret.arg_lens = arg_lens
+        ret._info = info
+        return ret
+
+    @property
+    def num_args(self) -> int:
+        return self._info.num_args
+
+    @property
+    def arg_descs(self) -> tuple[str, ...]:
+        return self._info.arg_descs
+
+    @property
+    def name(self) -> str:
+        return self._info.name
+
+    @property
+    def desc(self) -> str:
+        return self._info.desc
+
+    @desc.setter
+    def desc(self, value: str):
+        # Changes the description of every command with this opcode.
+        self._info.desc = value
 
     def __eq__(self, other):
         return self.command == other.command and self.args == other.args
@@ -1443,19 +1487,9 @@ class EventCommand:
         return EventCommand.generic_command(0xFD,pc_id | 0x80, get_offset(tech_level_addr))
 
     def copy(self) -> EventCommand:
-        # raise ValueError
-        ret_command = EventCommand(-1, 0, [], [], '', '')
-        ret_command.command = self.command
-        ret_command.num_args = self.num_args
-        ret_command.arg_lens = self.arg_lens[:]
-        ret_command.arg_descs = self.arg_descs[:]
-        ret_command.name = self.name
-        ret_command.desc = self.desc
-
-        ret_command.args = self.args[:]
-
-        return ret_command
-        # return copy.copy(self)
+        return EventCommand._from_parts(
+            self.command, self.args[:], list(self.arg_lens), self._info
+        )
 
     def __len__(self):
         return 1 + sum(self.arg_lens)
@@ -3131,72 +3165,101 @@ def get_blank_command(cmd_id: int) -> EventCommand:
     return event_commands[cmd_id].copy()
 
 
-def get_command(buf: bytes, offset: int = 0) -> EventCommand:
+# Opcodes whose argument lengths depend on the arguments.
+_variable_length_commands = (0x2E, 0x4E, 0x88, 0xF1, 0xFF)
 
-    command_id = buf[offset]
-    command = event_commands[command_id].copy()
-    # command = copy.copy(event_commands[command_id])
+# Length in bytes of each opcode's command, or 0 if it varies.
+_fixed_command_lengths = [
+    0 if cmd.command in _variable_length_commands else 1 + sum(cmd.arg_lens)
+    for cmd in event_commands
+]
 
-    # print(command)
-    # input()
+
+def _get_variable_arg_lens(buf: ByteString, offset: int) -> list[int]:
+    """Get the argument lengths of the variable length command at offset."""
+    command_id = buf[offset]
 
     if command_id == 0x2E:
         mode = buf[offset+1] >> 4
         if mode in [4, 5]:
-            command.arg_lens = [1, 1, 1, 1, 1]
+            return [1, 1, 1, 1, 1]
         elif mode == 8:
             data_len_b = buf[offset + 3: offset+5]
             data_len = int.from_bytes(data_len_b, "little") - 2
-            command.arg_lens = [1, 1, 2, data_len]
+            return [1, 1, 2, data_len]
         else:
             raise ValueError(f"{command_id:02X}: Error, Unknown Mode")
     elif command_id == 0x4E:
         # Data to copy follows command.  Shove data in last arg.
         data_len = int.from_bytes(buf[offset+4:offset+6], "little") - 2
-        command.arg_lens = [2, 1, 2, data_len]
+        return [2, 1, 2, data_len]
     elif command_id == 0x88:
         mode = buf[offset+1] >> 4
-        if mode == 0:
-            command.arg_lens = [1]
-        elif mode in [2, 3]:
-            command.arg_lens = [1, 1, 1]
+        if mode in [2, 3]:
+            return [1, 1, 1]
         elif mode in [4, 5]:
-            command.arg_lens = [1, 1, 1, 1]
+            return [1, 1, 1, 1]
         elif mode == 8:
             # bytes to copy follow command
             copy_len = buf[offset+2] - 2
-            command.arg_lens = [1, 1, 1, copy_len]
-        else:
-            print(f"{command_id:02X}: Error, Unknown Mode")
+            return [1, 1, 1, copy_len]
+        # Mode 0 and unknown modes have only the mode byte.
+        return [1]
     elif command_id == 0xF1:
         color = buf[offset+1]
         if color == 0:
-            command.arg_lens = [1]
+            return [1]
         else:
-            command.arg_lens = [1, 1]
+            return [1, 1]
     elif command_id == 0xFF:  # Mode7 scenes can be weird
         scene = buf[offset+1]
         if scene == 0x90:
-            command.arg_lens = [1, 1, 1, 1]
+            return [1, 1, 1, 1]
         if scene == 0x97:
-            command.arg_lens = [1, 1, 1]
+            return [1, 1, 1]
+        return [1]
+
+    return list(event_commands[command_id].arg_lens)
+
+
+def get_command_length(buf: ByteString, offset: int = 0) -> int:
+    """
+    Get the length of the command at offset without decoding it.  Use this
+    instead of len(get_command(...)) to skip over commands.
+    """
+    length = _fixed_command_lengths[buf[offset]]
+    if length:
+        return length
+
+    return 1 + sum(_get_variable_arg_lens(buf, offset))
+
+
+def get_command(buf: ByteString, offset: int = 0) -> EventCommand:
+    tracing.count("commands_decoded")
+    command_id = buf[offset]
+    info = event_commands[command_id]._info
+
+    if _fixed_command_lengths[command_id]:
+        # Shared with every command of this opcode.  Copies have their own.
+        arg_lens = info.arg_lens
+    else:
+        arg_lens = _get_variable_arg_lens(buf, offset)
 
     # Now we can use arg_lens to extract the args
     pos = offset + 1
-    command.args = []
+    args = []
 
-    if command.command == 0x4E:
-        for i in command.arg_lens[0:-1]:
-            command.args.append(int.from_bytes(buf[pos:pos+i], "little"))
+    if command_id == 0x4E:
+        for i in arg_lens[0:-1]:
+            args.append(int.from_bytes(buf[pos:pos+i], "little"))
             pos += i
 
-        command.args.append(
-            bytearray(buf[pos:pos+command.arg_lens[-1]])
+        args.append(
+            bytearray(buf[pos:pos+arg_lens[-1]])
         )
-        pos += command.arg_lens[-1]
     else:
-        for i in command.arg_lens:
-            command.args.append(int.from_bytes(buf[pos:pos+i], "little"))
+        for i in arg_lens:
+            args.append(int.from_bytes(buf[pos:pos+i], "little"))
             pos += i
 
-    return command
+    return EventCommand._from_parts(command_id, args, arg_lens, info)
@@ -2,13 +2,17 @@ from __future__ import annotations
 import bisect
 
 import enum
+import functools
+import hashlib
+import struct
 import typing
 from typing import ByteString, ClassVar, Optional, Tuple
 
-from ctrando.common import ctrom, ctenums
+from ctrando.common import ctrom, ctenums, writeplanner
 from ctrando.common.byteops import to_little_endian, to_file_ptr, to_rom_ptr
 from ctrando.compression import ctcompression as ctcomp
-from ctrando.locations.eventcommand import EventCommand as EC, get_command, get_blank_command
+from ctrando.locations.eventcommand import EventCommand as EC, get_command, \
+    get_command_length, get_blank_command
 from ctrando.locations.eventfunction import EventFunction as EF
 from ctrando.strings import ctstrings
 
@@ -114,6 +118,143 @@ def get_location_script(rom: ByteString, loc_id: int):
     return get_compressed_script(rom, loc_script_ind)    
 
 
+class _CommandIndex:
+    """
+    Positions of the commands in a script's data, bucketed by opcode.
+
+    snapshot is the data the index describes.  Scripts are often edited by
+    writing to .data directly, so the index compares itself against the
+    current data before use and re-decodes whatever changed.
+    """
+    __slots__ = ("start", "snapshot", "positions", "buckets")
+
+    def __init__(self, data: bytearray, start: int):
+        self.start = start
+        self.snapshot = bytes(data)
+        self.positions: list[int] = []
+        self.buckets: dict[int, list[int]] = {}
+        self._add_commands(data, start, len(data), 0)
+
+    def _add_commands(self, data: ByteString, start: int, end: int,
+                      ins_ind: int) -> int:
+        """
+        Decode the commands in data[start:end) and add them at index ins_ind
+        of positions.  Returns the position after the last command.
+        """
+        new_positions = []
+        pos = start
+        while pos < end:
+            new_positions.append(pos)
+            bucket = self.buckets.setdefault(data[pos], [])
+            bucket.insert(bisect.bisect_left(bucket, pos), pos)
+            pos += get_command_length(data, pos)
+
+        self.positions[ins_ind:ins_ind] = new_positions
+        return pos
+
+    def _remove_range(self, start: int, end: int, shift: int):
+        """
+        Remove the commands with positions in [start, end).  Shift positions
+        from end onwards by shift.
+        """
+        lo = bisect.bisect_left(self.positions, start)
+        hi = bisect.bisect_left(self.positions, end)
+        for pos in self.positions[lo:hi]:
+            bucket = self.buckets[self.snapshot[pos]]
+            del bucket[bisect.bisect_left(bucket, pos)]
+
+        self.positions[lo:] = [pos + shift for pos in self.positions[hi:]]
+
+        if shift != 0:
+            for bucket in self.buckets.values():
+                ind = bisect.bisect_left(bucket, end)
+                bucket[ind:] = [pos + shift for pos in bucket[ind:]]
+
+    def update_range(self, data: bytearray, start: int, end: int, shift: int):
+        """
+        Update after data[start:end) was replaced by shift more bytes (shift
+        may be negative) of whole commands.  Nothing else may have changed
+        except for arguments.
+        """
+        self._remove_range(start, end, shift)
+        if shift + end - start > 0:
+            ind = bisect.bisect_left(self.positions, start)
+            self._add_commands(data, start, end + shift, ind)
+        self.snapshot = bytes(data)
+
+    def sync(self, data: bytearray) -> bool:
+        """
+        Bring the index up to date with data after in-place edits.  Returns
+        False if the index should be rebuilt instead.
+        """
+        snapshot = self.snapshot
+        if len(data) != len(snapshot):
+            return False
+        if data == snapshot:
+            return True
+
+        # Find the first and last changed bytes.  Both are counted from the
+        # low end of the xor, which is the end of the data.
+        diff = int.from_bytes(data, "big") ^ int.from_bytes(snapshot, "big")
+        first = len(data) - 1 - (diff.bit_length() - 1) // 8
+        last = len(data) - 1 - ((diff & -diff).bit_length() - 1) // 8
+
+        if last < self.start:
+            # Only the object/function pointers changed.
+            self.snapshot = bytes(data)
+            return True
+
+        # Re-decode from the command containing the first change until the
+        # new commands line up with the old ones again.
+        lo = max(bisect.bisect_right(self.positions, first) - 1, 0)
+        pos = self.positions[lo] if self.positions else self.start
+        hi = lo
+        while pos < len(data):
+            if pos > last:
+                hi = bisect.bisect_left(self.positions, pos, lo)
+                if hi < len(self.positions) and self.positions[hi] == pos:
+                    break
+            pos += get_command_length(data, pos)
+        else:
+            hi = len(self.positions)
+
+        resync_pos = self.positions[hi] if hi < len(self.positions) \
+            else len(data)
+        start = self.positions[lo] if self.positions else self.start
+        self._remove_range(start, resync_pos, 0)
+        self._add_commands(data, start, resync_pos, lo)
+        self.snapshot = bytes(data)
+        return True
+
+    def is_command_start(self, pos: int) -> bool:
+        ind = bisect.bisect_left(self.positions, pos)
+        return ind < len(self.positions) and self.positions[ind] == pos
+
+    def find(self, cmd_ids: typing.Iterable[int],
+             start: int, end: int) -> Optional[int]:
+        """First position in [start, end) of a command with an id in cmd_ids."""
+        ret_pos = None
+        for cmd_id in cmd_ids:
+            bucket = self.buckets.get(cmd_id)
+            if not bucket:
+                continue
+            ind = bisect.bisect_left(bucket, start)
+            if ind < len(bucket) and bucket[ind] < end and \
+                    (ret_pos is None or bucket[ind] < ret_pos):
+                ret_pos = bucket[ind]
+
+        return ret_pos
+
+    def iter_positions(self, cmd_id: int,
+                       start: int, end: int) -> typing.Iterator[int]:
+        """Positions in [start, end) of commands with the given id."""
+        bucket = self.buckets.get(cmd_id, [])
+        ind = bisect.bisect_left(bucket, start)
+        while ind < len(bucket) and bucket[ind] < end:
+            yield bucket[ind]
+            ind += 1
+
+
 # The strategy is to handle the event very similarly to how the game does.
 # The event is just one big list of commands with pointers giving the starts
 # of relevant entities (objects, functions).
@@ -143,6 +284,42 @@ class LocationEvent:
             self.__init_strings(rom)
 
         self._jump_offsets = self._get_own_jump_offsets()
+        self._command_index: Optional[_CommandIndex] = None
+
+    def __getstate__(self):
+        # The command index is rebuilt on demand.  Do not copy or pickle it.
+        state = self.__dict__.copy()
+        state["_command_index"] = None
+        return state
+
+    def __setstate__(self, state):
+        state.setdefault("_command_index", None)
+        self.__dict__.update(state)
+
+    def _get_command_index(self) -> Optional[_CommandIndex]:
+        """
+        Get the command index, building it on first use.  Returns None if the
+        data does not decode as one stream of commands.
+        """
+        index = self._command_index
+        start = self.get_object_start(0)
+        try:
+            if index is None or index.start != start or not index.sync(self.data):
+                index = _CommandIndex(self.data, start)
+        except (ValueError, IndexError, KeyError):
+            index = None
+
+        self._command_index = index
+        return index
+
+    def _update_command_index(self, start: int, end: int, shift: int):
+        """Update a built command index after an insertion or deletion."""
+        if self._command_index is None:
+            return
+        try:
+            self._command_index.update_range(self.data, start, end, shift)
+        except (ValueError, IndexError, KeyError):
+            self._command_index = None
 
     def _merge_jump_offsets(self, new_sorted_offsets: list[int]):
         if not new_sorted_offsets:
@@ -177,12 +354,12 @@ class LocationEvent:
     ) -> list[int]:
         jump_offsets: list[int] = []
 
+        jump_commands = set(EC.jump_commands)
         pos = 0
         while pos < len(buf):
-            cmd = get_command(buf, pos)
-            if cmd.command in EC.jump_commands:
+            if buf[pos] in jump_commands:
                 jump_offsets.append(pos + init_offset)
-            pos += len(cmd)
+            pos += get_command_length(buf, pos)
         return jump_offsets
 
     def _get_own_jump_offsets(self) -> list[int]:
@@ -194,6 +371,20 @@ class LocationEvent:
 
     def get_bytearray(self) -> bytearray:
         return bytearray([self.num_objects]) + self.data
+
+    def get_fingerprint(self) -> bytes:
+        """
+        Get a digest of the script's contents (commands and strings).  Two
+        scripts with the same fingerprint write identical data to the rom.
+        """
+        hasher = hashlib.blake2b(digest_size=16)
+        hasher.update(bytes([self.num_objects]))
+        hasher.update(self.data)
+        hasher.update(len(self.strings).to_bytes(2, "little"))
+        for string in self.strings:
+            hasher.update(len(string).to_bytes(2, "little"))
+            hasher.update(string)
+        return hasher.digest()
     
     @staticmethod
     def from_rom_location(rom: ByteString, loc_id: int) -> LocationEvent:
@@ -284,10 +475,18 @@ class LocationEvent:
         return ret_script
 
     @classmethod
-    def from_rom(cls, rom: ByteString, ptr: int) -> LocationEvent:
-        ret_event = LocationEvent()
-
-        event = ctcomp.decompress(rom, ptr)
+    def from_rom(cls, rom: ByteString, ptr: int,
+                 decompress_buffer: Optional[bytearray] = None
+                 ) -> LocationEvent:
+        """
+        Read the script at ptr.  Readers of many scripts can pass the same
+        decompress_buffer (see ctcompression.get_decompress_buffer) each time.
+        """
+        if decompress_buffer is None:
+            event = ctcomp.decompress(rom, ptr)
+        else:
+            event_len, _ = ctcomp.decompress_into(rom, ptr, decompress_buffer)
+            event = decompress_buffer[:event_len]
 
         # Note: The game itself writes all pointers as offsets from the initial
         # byte that gives the number of objects.  So we're going to store the
@@ -303,6 +502,69 @@ class LocationEvent:
         # Build the strings up.
         return LocationEvent(event, rom)
 
+    # Header of get_parsed_bytes:
+    # num_objects, modified_strings, len(data), len(strings)
+    _PARSED_HEADER = struct.Struct("<BBIH")
+
+    def get_parsed_bytes(self) -> bytes:
+        """
+        Get the parsed script (data, strings and jump offsets) as bytes which
+        from_parsed_bytes turns back into a script without decompressing or
+        parsing anything.
+        """
+        parts = [
+            self._PARSED_HEADER.pack(self.num_objects, self.modified_strings,
+                                     len(self.data), len(self.strings)),
+            bytes(self.data)
+        ]
+        for string in self.strings:
+            parts.append(len(string).to_bytes(2, "little"))
+            parts.append(bytes(string))
+
+        parts.append(len(self._jump_offsets).to_bytes(4, "little"))
+        parts.append(
+            struct.pack(f"<{len(self._jump_offsets)}I", *self._jump_offsets)
+        )
+
+        return b"".join(parts)
+
+    @classmethod
+    def from_parsed_bytes(cls, buf: ByteString) -> LocationEvent:
+        """
+        Restore a script from the output of get_parsed_bytes.  Raises
+        ValueError if buf is truncated or too long.
+        """
+        num_objects, modified_strings, data_len, num_strings = \
+            cls._PARSED_HEADER.unpack_from(buf, 0)
+        pos = cls._PARSED_HEADER.size
+
+        def take(length: int) -> ByteString:
+            nonlocal pos
+            if pos + length > len(buf):
+                raise ValueError("Parsed script is truncated")
+            pos += length
+            return buf[pos-length:pos]
+
+        ret_event = cls.__new__(cls)
+        ret_event.num_objects = num_objects
+        ret_event.modified_strings = bool(modified_strings)
+        ret_event.data = bytearray(take(data_len))
+
+        ret_event.strings = []
+        for _ in range(num_strings):
+            string_len = int.from_bytes(take(2), "little")
+            ret_event.strings.append(bytearray(take(string_len)))
+
+        num_offsets = int.from_bytes(take(4), "little")
+        ret_event._jump_offsets = list(
+            struct.unpack_from(f"<{num_offsets}I", take(4*num_offsets))
+        )
+        if pos != len(buf):
+            raise ValueError("Parsed script has trailing data")
+        ret_event._command_index = None
+
+        return ret_event
+
 
     def print_fn_starts(self):
         for i in range(self.num_objects):
@@ -964,14 +1226,20 @@ class LocationEvent:
         if end_pos is None or end_pos > len(self.data):
             end_pos = len(self.data)
 
-        pos = start_pos
-        while pos < end_pos:
-            cmd = get_command(self.data, pos)
+        index = self._get_command_index()
+        if index is not None and index.is_command_start(start_pos):
+            pos = index.find(cmd_ids, start_pos, end_pos)
+            if pos is not None:
+                return (pos, get_command(self.data, pos))
+        else:
+            pos = start_pos
+            while pos < end_pos:
+                cmd = get_command(self.data, pos)
 
-            if cmd.command in cmd_ids:
-                return (pos, cmd)
+                if cmd.command in cmd_ids:
+                    return (pos, cmd)
 
-            pos += len(cmd)
+                pos += len(cmd)
 
         # returning colorcrash so mypy doesn't want Optional[Event]
         return (None, EC.get_blank_command(1))
@@ -1010,17 +1278,27 @@ class LocationEvent:
 
         jump_cmds = EC.fwd_jump_commands + EC.back_jump_commands
 
+        def is_match(cmd: EC) -> bool:
+            return cmd == find_cmd or (
+                cmd.command in jump_cmds and
+                cmd.command == find_cmd.command and
+                cmd.args[0:-1] == find_cmd.args[0:-1]
+            )
+
+        index = self._get_command_index()
+        if index is not None and index.is_command_start(start_pos):
+            # Both kinds of match need the same command id.
+            for pos in index.iter_positions(find_cmd.command,
+                                            start_pos, end_pos):
+                if is_match(get_command(self.data, pos)):
+                    return pos
+            return None
+
         pos = start_pos
         while pos < end_pos:
             cmd = get_command(self.data, pos)
 
-            if cmd == find_cmd:
-                return pos
-            if (
-                    cmd.command in jump_cmds and
-                    cmd.command == find_cmd.command and
-                    cmd.args[0:-1] == find_cmd.args[0:-1]
-            ):
+            if is_match(cmd):
                 return pos
 
             pos += len(cmd)
@@ -1221,6 +1499,8 @@ class LocationEvent:
 
     def _delete_range(self, del_start_pos, del_end_pos):
         delete_len = del_end_pos - del_start_pos
+        if self._command_index is not None:
+            self._get_command_index()
 
         self.__shift_jumps(before_pos=del_start_pos,
                            after_pos=del_end_pos,
@@ -1232,6 +1512,7 @@ class LocationEvent:
         del self.data[del_start_pos:del_end_pos]
 
         self._update_jump_offsets(del_start_pos, del_end_pos, -delete_len)
+        self._update_command_index(del_start_pos, del_end_pos, -delete_len)
         # try:
         #     assert self._jump_offsets == self._get_own_jump_offsets()
         # except AssertionError as exc:
@@ -1358,6 +1639,9 @@ class LocationEvent:
 
     def insert_commands(self, new_commands: bytearray, ins_position: int):
         """Insert commands (as bytes) at the given position."""
+        if self._command_index is not None:
+            self._get_command_index()
+
         self.__shift_jumps(ins_position, ins_position, len(new_commands))
         self.__shift_starts(ins_position, len(new_commands))
 
@@ -1366,6 +1650,8 @@ class LocationEvent:
         new_jumps = self.gather_jump_offsets(new_commands, ins_position)
         if new_jumps:
             self._merge_jump_offsets(new_jumps)
+        self._update_command_index(ins_position, ins_position,
+                                   len(new_commands))
 
 
 def free_script_on_ctrom(
@@ -1450,42 +1736,64 @@ def free_script_strings_on_ct_rom(
         free_script_string(ct_rom, ptr)
 
 
-def write_location_script_to_freespace(
+def _get_string_table_bytes(script: LocationEvent, addr: int) -> bytes:
+    """
+    Get the bytes of a script's string table (pointers followed by strings)
+    when it is placed at addr.
+    """
+    string_ptrs_len = 2 * len(script.strings)
+    string_data_pos = (addr & 0x00FFFF) + string_ptrs_len
+
+    ptrs = bytearray()
+    for string in script.strings:
+        ptrs.extend(int.to_bytes(string_data_pos, 2, 'little'))
+        string_data_pos += len(string)
+
+    return bytes(ptrs) + b''.join(script.strings)
+
+
+def plan_location_script_write(
         script: LocationEvent,
-        ct_rom: ctrom.CTRom,
+        planner: writeplanner.WritePlanner,
+        on_placed: typing.Callable[[ctrom.CTRom, int], None],
         hint: int = 0x410000
-) -> int:
-    """Returns addr where script was written"""
-    FSW = ctrom.freespace.FSWriteType
-
+):
+    """
+    Add a script to a write plan.  The string table is placed first.  The
+    compressed script depends on the string index, so it is added to the plan
+    once the strings are placed.  The scripts of every string table placed in
+    a round are compressed together.  on_placed gets the compressed script's
+    address.
+    """
     strings_len = sum(len(string) for string in script.strings)
     string_ptrs_len = 2 * len(script.strings)
     total_string_len = strings_len + string_ptrs_len
 
-    new_string_index = ct_rom.space_manager.get_free_addr(
-        total_string_len, hint=hint)
-    string_data_pos = (new_string_index & 0x00FFFF) + string_ptrs_len
+    def add_compressed_script(_: ctrom.CTRom, new_string_index: int):
+        script.set_string_index(to_rom_ptr(new_string_index))
+        planner.add_compressed(script.get_bytearray(), on_placed, hint)
 
-    # print(f"*** To: [{new_string_index:06X}, {new_string_index + total_string_len:06X}) (strings)***")
-    ct_rom.seek(new_string_index)
-    for string in script.strings:
-        ct_rom.write(int.to_bytes(string_data_pos, 2, 'little'),
-                     FSW.MARK_USED)
-        string_data_pos += len(string)
-
-    # Write the strings immediately after the pointers
-    for string in script.strings:
-        ct_rom.write(string, FSW.MARK_USED)
-
-    script.set_string_index(to_rom_ptr(new_string_index))
+    planner.add(total_string_len,
+                functools.partial(_get_string_table_bytes, script),
+                add_compressed_script, hint)
 
-    compr_script = ctcomp.compress(script.get_bytearray())
-    new_script_ptr = ct_rom.space_manager.get_free_addr(len(compr_script), hint)
-    # print(f"*** To: [{new_script_ptr:06X}, {new_script_ptr+len(compr_script):06X})***")
-    ct_rom.seek(new_script_ptr)
-    ct_rom.write(compr_script, FSW.MARK_USED)
 
-    return new_script_ptr
+def write_location_script_to_freespace(
+        script: LocationEvent,
+        ct_rom: ctrom.CTRom,
+        hint: int = 0x410000
+) -> int:
+    """Returns addr where script was written"""
+    planner = writeplanner.WritePlanner()
+    script_addrs: list[int] = []
+    plan_location_script_write(
+        script, planner,
+        lambda _, addr: script_addrs.append(addr),
+        hint
+    )
+    planner.write_to_ctrom(ct_rom)
+
+    return script_addrs[0]
 
 
 def write_location_script_to_ctrom(
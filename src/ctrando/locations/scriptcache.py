@@ -0,0 +1,177 @@
+"""
+On-disk cache of the parsed location scripts of a prepatched rom.
+
+Reading a script from the rom decompresses it, reads its strings and walks
+every command to find jump offsets.  The prepatched rom is the same for every
+seed, so its parsed scripts are stored in a compact binary file next to the
+prepatch cache.  Scripts are restored from it on first access without any
+decompression or parsing.
+"""
+from __future__ import annotations
+
+import pathlib
+import struct
+import typing
+import zlib
+
+from ctrando.common import ctenums, prepatchcache
+from ctrando.compression import ctcompression
+from ctrando.locations import locationevent
+from ctrando.locations.locationevent import LocationEvent
+
+# File layout (little endian):
+#   header: magic, version, number of entries
+#   entries: loc_id (u16), script ptr (u32), record offset (u32),
+#            record length (u32), record crc32 (u32)
+#   records: LocationEvent.get_parsed_bytes() of each distinct script
+_MAGIC = b"CTSC"
+_VERSION = 2
+_HEADER = struct.Struct("<4sHH")
+_ENTRY = struct.Struct("<HIIII")
+
+
+def get_script_cache_path(cache_directory: pathlib.Path, key: str) -> pathlib.Path:
+    return cache_directory / f"scripts-{key}.bin"
+
+
+def get_script_cache_bytes(rom: typing.ByteString) -> bytes:
+    """
+    Parse the script of every location on the rom and pack them in the cache
+    format.  Locations which share a script share a record.
+    """
+    scripts: list[tuple[int, int, LocationEvent]] = []
+    ptr_scripts: dict[int, LocationEvent | None] = {}
+    decompress_buffer = ctcompression.get_decompress_buffer()
+
+    for loc_id in ctenums.LocID:
+        ptr = locationevent.get_loc_event_ptr(rom, loc_id)
+        if ptr not in ptr_scripts:
+            try:
+                ptr_scripts[ptr] = LocationEvent.from_rom(rom, ptr, decompress_buffer)
+            except (ValueError, IndexError):
+                # Unused locations can point at garbage.  Leave them uncached.
+                ptr_scripts[ptr] = None
+
+        script = ptr_scripts[ptr]
+        if script is not None:
+            scripts.append((int(loc_id), ptr, script))
+
+    return pack_scripts(scripts)
+
+
+def pack_scripts(
+        scripts: typing.Iterable[tuple[int, int, LocationEvent]]
+) -> bytes:
+    """
+    Pack (loc_id, script ptr, script) triples in the cache format.  Entries
+    with the same script ptr share the record of the first one.
+    """
+    entries: list[tuple[int, int, int, int, int]] = []
+    records: list[bytes] = []
+    record_pos: dict[int, tuple[int, int, int]] = {}
+    records_len = 0
+
+    for loc_id, ptr, script in scripts:
+        if ptr not in record_pos:
+            record = script.get_parsed_bytes()
+            records.append(record)
+            record_pos[ptr] = (records_len, len(record), zlib.crc32(record))
+            records_len += len(record)
+
+        offset, length, crc = record_pos[ptr]
+        entries.append((loc_id, ptr, offset, length, crc))
+
+    records_start = _HEADER.size + _ENTRY.size*len(entries)
+    parts = [_HEADER.pack(_MAGIC, _VERSION, len(entries))]
+    parts.extend(
+        _ENTRY.pack(loc_id, ptr, records_start + offset, length, crc)
+        for loc_id, ptr, offset, length, crc in entries
+    )
+    parts.extend(records)
+
+    return b"".join(parts)
+
+
+class ScriptCache:
+    """
+    Parsed location scripts of one rom.  The file is read on first use and a
+    script is only decoded when it is requested.
+    """
+    def __init__(self, path: pathlib.Path | None, buf: bytes | None = None):
+        if path is None and buf is None:
+            raise ValueError("No path or data given")
+
+        self.path = path
+        self._buf = buf
+        self._entries: dict[int, tuple[int, int, int, int]] | None = None
+
+    def _load(self) -> dict[int, tuple[int, int, int, int]]:
+        if self._entries is not None:
+            return self._entries
+
+        self._entries = {}
+        try:
+            if self._buf is None:
+                self._buf = self.path.read_bytes()
+
+            magic, version, num_entries = _HEADER.unpack_from(self._buf, 0)
+            if magic != _MAGIC or version != _VERSION:
+                return self._entries
+
+            for loc_id, ptr, offset, length, crc in _ENTRY.iter_unpack(
+                    self._buf[_HEADER.size:_HEADER.size+_ENTRY.size*num_entries]
+            ):
+                self._entries[loc_id] = (ptr, offset, length, crc)
+        except (OSError, struct.error):
+            # Missing or truncated cache.  Everything is read from the rom.
+            self._entries = {}
+
+        return self._entries
+
+    def get_script(self, loc_id: int, script_ptr: int) -> LocationEvent | None:
+        """
+        Get a new copy of loc_id's script.  Returns None unless the cached
+        script was read from script_ptr, i.e. the rom has not been repointed.
+        A corrupt record is dropped, and its script is read from the rom.
+        """
+        entries = self._load()
+        entry = entries.get(int(loc_id))
+        if entry is None:
+            return None
+
+        ptr, offset, length, crc = entry
+        if ptr != script_ptr:
+            return None
+
+        record = memoryview(self._buf)[offset:offset+length]
+        try:
+            if len(record) != length or zlib.crc32(record) != crc:
+                raise ValueError("Corrupt script cache record")
+            return LocationEvent.from_parsed_bytes(record)
+        except (ValueError, IndexError, struct.error):
+            del entries[int(loc_id)]
+            return None
+
+
+def get_script_cache(
+        cache_directory: pathlib.Path,
+        key: str,
+        rom: typing.ByteString
+) -> ScriptCache:
+    """
+    Get the script cache for the rom with the given prepatch key.  If there
+    is none on disk, it is built from rom and stored.
+    """
+    path = get_script_cache_path(cache_directory, key)
+    if path.exists():
+        return ScriptCache(path)
+
+    buf = get_script_cache_bytes(rom)
+    try:
+        cache_directory.mkdir(parents=True, exist_ok=True)
+        with prepatchcache.open_atomic(path) as outfile:
+            outfile.write(buf)
+    except OSError:
+        pass
+
+    return ScriptCache(path, buf)
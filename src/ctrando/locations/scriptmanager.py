@@ -1,9 +1,11 @@
-from ctrando.common import ctrom, ctenums
+from ctrando.common import ctrom, ctenums, tracing, writeplanner
+from ctrando.compression import ctcompression
 import copy
 from dataclasses import dataclass
+import functools
 from typing import Optional
 
-from ctrando.locations import locationevent
+from ctrando.locations import locationevent, scriptcache
 from ctrando.locations.locationevent import LocationEvent
 
 
@@ -11,6 +13,14 @@ from ctrando.locations.locationevent import LocationEvent
 class _ScriptManagerEntry:
     script: locationevent.LocationEvent
     is_modified: bool = True
+    # Fingerprint of the script as read from the rom.  None if the script did
+    # not come from the rom at its location.
+    rom_fingerprint: Optional[bytes] = None
+
+    def needs_write(self) -> bool:
+        if self.is_modified or self.rom_fingerprint is None:
+            return True
+        return self.script.get_fingerprint() != self.rom_fingerprint
 
 
 class ScriptManager:
@@ -28,22 +38,62 @@ class ScriptManager:
         }
 
         self._ct_rom = ct_rom
+        self._script_cache: Optional[scriptcache.ScriptCache] = None
+        # Scripts read from the rom are all decompressed into this buffer.
+        self._decompress_buffer: Optional[bytearray] = None
+
+    def __getstate__(self):
+        # The script cache is tied to a file on disk.  Do not pickle it or the
+        # scratch buffer.
+        state = self.__dict__.copy()
+        state["_script_cache"] = None
+        state["_decompress_buffer"] = None
+        return state
+
+    def __setstate__(self, state):
+        state.setdefault("_decompress_buffer", None)
+        self.__dict__.update(state)
 
     def get_ctrom(self) -> ctrom.CTRom:
         return self._ct_rom
 
     def set_ctrom(self, ct_rom: ctrom.CTRom):
         self._ct_rom = ct_rom
+        self._script_cache = None
+
+    def get_script_cache(self) -> Optional[scriptcache.ScriptCache]:
+        return self._script_cache
+
+    def set_script_cache(self, script_cache: Optional[scriptcache.ScriptCache]):
+        """
+        Read scripts which are not yet loaded from script_cache instead of
+        decompressing them.  The cache must have been built from this
+        manager's rom.
+        """
+        self._script_cache = script_cache
 
     def __getitem__(self, key: ctenums.LocID) -> LocationEvent:
         # print(f'Reading {key}')
+        # Reading a script does not mark it as modified.  Scripts read from
+        # the rom remember a fingerprint, and are only written back if their
+        # contents change.
         if key in self._script_dict:
-            self._script_dict[key].is_modified = True
             return self._script_dict[key].script
 
-        script = LocationEvent.from_rom_location(
-            self._ct_rom.getbuffer(), key)
-        self._script_dict[key] = _ScriptManagerEntry(script, True)
+        rom = self._ct_rom.getbuffer()
+        script_ptr = locationevent.get_loc_event_ptr(rom, key)
+        script = None
+        if self._script_cache is not None:
+            script = self._script_cache.get_script(key, script_ptr)
+        if script is None:
+            if self._decompress_buffer is None:
+                self._decompress_buffer = ctcompression.get_decompress_buffer()
+            script = LocationEvent.from_rom(rom, script_ptr,
+                                            self._decompress_buffer)
+
+        self._script_dict[key] = _ScriptManagerEntry(
+            script, False, script.get_fingerprint()
+        )
         return script
 
     def __setitem__(self, key: ctenums.LocID, value: LocationEvent):
@@ -52,6 +102,35 @@ class ScriptManager:
     def __delitem__(self, key: ctenums.LocID):
         del self._script_dict[key]
 
+    def is_loaded(self, loc_id: ctenums.LocID) -> bool:
+        """Whether the script for loc_id has been read or set."""
+        return loc_id in self._script_dict
+
+    def get_rom_fingerprint(self, loc_id: ctenums.LocID) -> Optional[bytes]:
+        """
+        Get the fingerprint of loc_id's script as it was read from the rom, or
+        None if the script was set instead.
+        """
+        return self._script_dict[loc_id].rom_fingerprint
+
+    def set_rom_script(self, loc_id: ctenums.LocID, script: LocationEvent,
+                       rom_fingerprint: Optional[bytes]):
+        """
+        Store a script which was read from this manager's rom elsewhere (e.g.
+        another process) and possibly changed since.  Like a script read
+        here, it is only written back if it differs from the rom's version.
+        """
+        self._script_dict[loc_id] = _ScriptManagerEntry(
+            script, False, rom_fingerprint
+        )
+
+    def is_modified(self, loc_id: ctenums.LocID) -> bool:
+        """Whether the script for loc_id differs from what is on the rom."""
+        if loc_id not in self._script_dict:
+            return False
+        return self._script_dict[loc_id].needs_write()
+
+    @tracing.traced("script_manager.write_script")
     def write_script(self, loc_id: ctenums.LocID):
         if loc_id not in self._script_dict:
             raise KeyError
@@ -61,6 +140,32 @@ class ScriptManager:
             self._script_dict[loc_id].script, self._ct_rom, loc_id
         )
 
-    def write_all_scripts_to_ctrom(self):
-        for loc_id in self._script_dict:
-            self.write_script(loc_id)
\ No newline at end of file
+    @tracing.traced("script_manager.write_all_scripts")
+    def write_all_scripts_to_ctrom(
+            self,
+            planner: Optional[writeplanner.WritePlanner] = None
+    ):
+        """
+        Write every script which differs from the rom's version.  If a planner
+        is given, the scripts are only added to it and are written when the
+        planner is.
+        """
+        flush = planner is None
+        if planner is None:
+            planner = writeplanner.WritePlanner()
+
+        for loc_id, entry in self._script_dict.items():
+            if entry.needs_write():
+                locationevent.plan_location_script_write(
+                    entry.script, planner,
+                    functools.partial(self._set_script_ptr, loc_id)
+                )
+
+        if flush:
+            planner.write_to_ctrom(self._ct_rom)
+
+    @staticmethod
+    def _set_script_ptr(loc_id: ctenums.LocID, ct_rom: ctrom.CTRom,
+                        script_addr: int):
+        locationevent.set_loc_event_ptr(ct_rom.getbuffer(), loc_id,
+                                        script_addr)
@@ -27,6 +27,177 @@ RewardType = typing.Union[ItemID, CharID, OtherReward]
 SingleRule = list[RewardType]
 
 
+#
+# Rules and Games are evaluated against packed integer masks.  Every reward
+# token is interned once and given a bit position.  Tokens are keyed by
+# (type, value) because different IntEnums can compare equal.
+#
+
+_token_bit_dict: dict[tuple[type, typing.Any], int] = {}
+
+
+def get_reward_bit(reward: RewardType) -> int:
+    """Get the bit position assigned to a reward token, assigning if needed."""
+    key = (type(reward), reward)
+    bit = _token_bit_dict.get(key, None)
+    if bit is None:
+        bit = len(_token_bit_dict)
+        _token_bit_dict[key] = bit
+
+    return bit
+
+
+class _CompiledRule(typing.NamedTuple):
+    """
+    A single rule alternative as a bitmask of required tokens plus any
+    (bit, count) pairs for tokens which are required multiple times.
+    """
+    mask: int
+    multiples: tuple[tuple[int, int], ...]
+
+
+def _compile_single_rule(rule: SingleRule) -> _CompiledRule:
+    counts: dict[int, int] = {}
+    for requirement in rule:
+        bit = get_reward_bit(requirement)
+        counts[bit] = counts.get(bit, 0) + 1
+
+    mask = 0
+    for bit in counts:
+        mask |= 1 << bit
+
+    multiples = tuple(
+        (bit, count) for bit, count in counts.items() if count > 1
+    )
+    return _CompiledRule(mask, multiples)
+
+
+class _TrackedList(list):
+    """List of rewards which reports additions/removals to a Game."""
+    __slots__ = ("_game",)
+
+    def __init__(self, game: Game, iterable: typing.Iterable = ()):
+        list.__init__(self, iterable)
+        self._game = game
+
+    def __reduce__(self):
+        return list, (list(self),)
+
+    def append(self, item):
+        list.append(self, item)
+        self._game._add_token(item)
+
+    def extend(self, iterable):
+        items = list(iterable)
+        list.extend(self, items)
+        for item in items:
+            self._game._add_token(item)
+
+    def __iadd__(self, iterable):
+        self.extend(iterable)
+        return self
+
+    def insert(self, index, item):
+        list.insert(self, index, item)
+        self._game._add_token(item)
+
+    def remove(self, item):
+        ind = self.index(item)
+        removed = self[ind]
+        list.__delitem__(self, ind)
+        self._game._remove_token(removed)
+
+    def pop(self, index=-1):
+        item = list.pop(self, index)
+        self._game._remove_token(item)
+        return item
+
+    def clear(self):
+        list.clear(self)
+        self._game._rebuild_state()
+
+    def __setitem__(self, key, value):
+        list.__setitem__(self, key, value)
+        self._game._rebuild_state()
+
+    def __delitem__(self, key):
+        list.__delitem__(self, key)
+        self._game._rebuild_state()
+
+    def __imul__(self, value):
+        list.__imul__(self, value)
+        self._game._rebuild_state()
+        return self
+
+
+class _TrackedSet(set):
+    """Set of rewards which reports additions/removals to a Game."""
+    __slots__ = ("_game",)
+
+    def __init__(self, game: Game, iterable: typing.Iterable = ()):
+        set.__init__(self, iterable)
+        self._game = game
+
+    def __reduce__(self):
+        return set, (set(self),)
+
+    def add(self, item):
+        if item not in self:
+            set.add(self, item)
+            self._game._add_token(item)
+
+    def update(self, *iterables):
+        for iterable in iterables:
+            for item in iterable:
+                self.add(item)
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def discard(self, item):
+        if item in self:
+            set.discard(self, item)
+            self._game._remove_token(item)
+
+    def remove(self, item):
+        set.remove(self, item)
+        self._game._remove_token(item)
+
+    def pop(self):
+        item = set.pop(self)
+        self._game._remove_token(item)
+        return item
+
+    def clear(self):
+        set.clear(self)
+        self._game._rebuild_state()
+
+    def difference_update(self, *iterables):
+        set.difference_update(self, *iterables)
+        self._game._rebuild_state()
+
+    def intersection_update(self, *iterables):
+        set.intersection_update(self, *iterables)
+        self._game._rebuild_state()
+
+    def symmetric_difference_update(self, iterable):
+        set.symmetric_difference_update(self, iterable)
+        self._game._rebuild_state()
+
+    def __isub__(self, other):
+        self.difference_update(other)
+        return self
+
+    def __iand__(self, other):
+        self.intersection_update(other)
+        return self
+
+    def __ixor__(self, other):
+        self.symmetric_difference_update(other)
+        return self
+
+
 class Game:
     """
     The Game class is used to keep track of game state
@@ -35,6 +206,11 @@ class Game:
       - Tracks characters obtained
       - Keeps track of user selected flags
       - Provides logic convenience functions
+
+    Internally the held rewards are also kept as a packed bitmask with a
+    count for each token so that LogicRules can be checked with a few integer
+    operations.  The characters, key_items, and other_rewards collections
+    keep the packed state up to date as they are modified.
     """
 
     def __init__(
@@ -50,9 +226,83 @@ class Game:
         if other_rewards is None:
             other_rewards = list()
 
-        self.characters: set[CharID] = set(held_chars)
-        self.key_items: list[ItemID] = list(held_items)
-        self.other_rewards: set[OtherReward] = set(other_rewards)
+        self._token_counts: dict[int, int] = {}
+        self.token_mask: int = 0
+
+        self._characters = _TrackedSet(self, held_chars)
+        self._key_items = _TrackedList(self, held_items)
+        self._other_rewards = _TrackedSet(self, other_rewards)
+        self._rebuild_state()
+
+    @property
+    def characters(self) -> set[CharID]:
+        return self._characters
+
+    @characters.setter
+    def characters(self, value: typing.Iterable[CharID]):
+        self._characters = _TrackedSet(self, value)
+        self._rebuild_state()
+
+    @property
+    def key_items(self) -> list[ItemID]:
+        return self._key_items
+
+    @key_items.setter
+    def key_items(self, value: typing.Iterable[ItemID]):
+        self._key_items = _TrackedList(self, value)
+        self._rebuild_state()
+
+    @property
+    def other_rewards(self) -> set[OtherReward]:
+        return self._other_rewards
+
+    @other_rewards.setter
+    def other_rewards(self, value: typing.Iterable[OtherReward]):
+        self._other_rewards = _TrackedSet(self, value)
+        self._rebuild_state()
+
+    def __getstate__(self):
+        # Bit positions are only valid within one process, so pickle the
+        # plain collections and rebuild the packed state on load.
+        return {
+            "characters": set(self._characters),
+            "key_items": list(self._key_items),
+            "other_rewards": set(self._other_rewards),
+        }
+
+    def __setstate__(self, state):
+        self.__init__(state["characters"], state["key_items"],
+                      state["other_rewards"])
+
+    def _add_token(self, token: RewardType):
+        bit = get_reward_bit(token)
+        count = self._token_counts.get(bit, 0)
+        self._token_counts[bit] = count + 1
+        if count == 0:
+            self.token_mask |= 1 << bit
+
+    def _remove_token(self, token: RewardType):
+        bit = get_reward_bit(token)
+        count = self._token_counts.get(bit, 0) - 1
+        if count <= 0:
+            self._token_counts.pop(bit, None)
+            self.token_mask &= ~(1 << bit)
+        else:
+            self._token_counts[bit] = count
+
+    def _rebuild_state(self):
+        """Recompute the packed state from the reward collections."""
+        self._token_counts = {}
+        self.token_mask = 0
+
+        # Called during __init__ before all collections exist.
+        for attr in ("_other_rewards", "_key_items", "_characters"):
+            for token in getattr(self, attr, ()):
+                self._add_token(token)
+
+    def get_token_count(self, bit: int) -> int:
+        """Get the number of held copies of the token with the given bit."""
+        return self._token_counts.get(bit, 0)
 
     def __eq__(self, other: Game):
         """Do two games have the same rewards"""
@@ -155,13 +405,33 @@ class LogicRule:
         initial_rules: typing.Optional[SingleRule | typing.Iterable[SingleRule]] = None,
     ):
         self._rules: list[SingleRule]
+        self._compiled: tuple[_CompiledRule, ...] | None = None
 
         if initial_rules is None:
             self._rules = [[]]
         else:
             if all(isinstance(x,enum.Enum) for x in initial_rules):
                 initial_rules = [initial_rules]
-            self._rules = [rule for rule in initial_rules]
+            # Own copies, so add_requirement on another rule can not change
+            # these behind the compiled cache.
+            self._rules = [list(rule) for rule in initial_rules]
+
+    def __getstate__(self):
+        # Compiled masks depend on this process's token bits.
+        state = dict(self.__dict__)
+        state["_compiled"] = None
+        return state
+
+    def compile(self) -> tuple[_CompiledRule, ...]:
+        """
+        Get the rule alternatives as packed masks.  The result is cached until
+        the rule is modified.
+        """
+        if self._compiled is None:
+            self._compiled = tuple(
+                _compile_single_rule(rule) for rule in self._rules
+            )
+        return self._compiled
 
     def __or__(self, other: LogicRule) -> LogicRule:
         """Or this rule with another rule"""
@@ -192,7 +462,8 @@ class LogicRule:
         :param rule: List of items or characters needed to access a location
         :return: A reference to this object
         """
-        self._rules.append(rule)
+        self._rules.append(list(rule))
+        self._compiled = None
         return self
 
     def get_access_rule(self) -> list[SingleRule]:
@@ -201,7 +472,7 @@ class LogicRule:
 
         :return: List of access requirements
         """
-        return list(self._rules)
+        return [list(rule) for rule in self._rules]
 
     def get_forced_keys(self) -> list[RewardType]:
         """
@@ -236,6 +507,7 @@ class LogicRule:
         else:
             for rule in self._rules:
                 rule.extend(new_rule)
+            self._compiled = None
         return self
 
     def __call__(self, game: Game) -> bool:
@@ -245,10 +517,35 @@ class LogicRule:
         :param game: Game object with current game state
         :return: True if the location is accessible, false if not
         """
-        if len(self._rules) == 0:
+        compiled = self._compiled
+        if compiled is None:
+            compiled = self.compile()
+
+        if not compiled:
             # Empty rules list means this is a sphere 0 check
             return True
 
+        held_mask = game.token_mask
+        for mask, multiples in compiled:
+            if mask & held_mask != mask:
+                continue
+
+            for bit, count in multiples:
+                if game.get_token_count(bit) < count:
+                    break
+            else:
+                return True
+
+        return False
+
+    def evaluate_tokens(self, game: Game) -> bool:
+        """
+        Evaluate this set of rules by matching reward tokens directly.  This
+        is the original list-based check and is kept for reference/testing.
+        """
+        if len(self._rules) == 0:
+            return True
+
         for rule in self._rules:
 
             total_tokens = list(game.other_rewards) + list(game.key_items) + list(game.characters)
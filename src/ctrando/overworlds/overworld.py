@@ -1,7 +1,8 @@
 """Module to handle modification of CT Overworlds"""
 from __future__ import annotations
+from typing import Optional
 
-from ctrando.common import ctrom, cttypes
+from ctrando.common import ctrom, cttypes, writeplanner
 from ctrando.overworlds import owevent, owexits
 
 
@@ -119,13 +120,18 @@ class Overworld:
     @classmethod
     def read_from_ctrom(
             cls, ct_rom: ctrom.CTRom,
-            overworld_id: int) -> Overworld:
-        """Read an Overworld from a CTRom"""
+            overworld_id: int,
+            decompress_buffer: Optional[bytearray] = None) -> Overworld:
+        """
+        Read an Overworld from a CTRom.  Readers of many overworlds can pass
+        the same decompress_buffer each time.
+        """
         header = OverWorldHeader.read_from_ctrom(ct_rom, overworld_id)
         exits = owexits.OverworldExitPacket.read_from_ctrom(
-            ct_rom, overworld_id)
+            ct_rom, overworld_id, decompress_buffer)
         event_id = header.event_index
-        event = owevent.OverworldEvent.read_from_ctrom(ct_rom, event_id)
+        event = owevent.OverworldEvent.read_from_ctrom(ct_rom, event_id,
+                                                       decompress_buffer)
 
         return Overworld(header, exits, event)
 
@@ -138,12 +144,16 @@ class Overworld:
         owevent.OverworldEvent.free_data_on_ctrom(ct_rom, event_id)
 
     def write_to_ctrom(self, ct_rom: ctrom.CTRom, overworld_id: int,
-                       free_existing: bool = True):
-        """Write this Overworld to the CTRom."""
+                       free_existing: bool = True,
+                       planner: Optional[writeplanner.WritePlanner] = None):
+        """
+        Write this Overworld to the CTRom.  If a planner is given, the
+        compressed exits and event are written when the planner is.
+        """
         self.header.write_to_ctrom(ct_rom, overworld_id)
 
         self._update_code_pointers()
         self.exit_data.write_data_to_ct_rom(ct_rom, overworld_id,
-                                            free_existing)
+                                            free_existing, planner)
         event_id = self.header.event_index
-        self.event.write_to_ctrom(ct_rom, event_id, free_existing)
+        self.event.write_to_ctrom(ct_rom, event_id, free_existing, planner)
@@ -3,7 +3,7 @@ from __future__ import annotations
 from dataclasses import dataclass
 from typing import Optional, Type, NamedTuple
 
-from ctrando.common import ctrom, cttypes
+from ctrando.common import ctrom, cttypes, writeplanner
 from ctrando.overworlds import oweventcommand as owc
 
 
@@ -484,10 +484,14 @@ class OverworldEvent:
         return ret_str
 
     @classmethod
-    def read_from_ctrom(cls, ct_rom: ctrom.CTRom,
-                        event_index: int) -> OverworldEvent:
+    def read_from_ctrom(
+            cls, ct_rom: ctrom.CTRom,
+            event_index: int,
+            decompress_buffer: Optional[bytearray] = None
+    ) -> OverworldEvent:
         """Read an OverworldEvent from a CTRom"""
-        event_b = _ow_event_rw.read_data_from_ctrom(ct_rom, None, event_index)
+        event_b = _ow_event_rw.read_data_from_ctrom(ct_rom, None, event_index,
+                                                    decompress_buffer)
         return OverworldEvent(event_b)
 
     @classmethod
@@ -497,10 +501,18 @@ class OverworldEvent:
 
     def write_to_ctrom(self, ct_rom: ctrom.CTRom,
                        event_index: int,
-                       free_existing: bool = True):
-        """Write an OverWorldEvent to a CTrom"""
-        _ow_event_rw.write_data_to_ct_rom(ct_rom, self.get_bytes(),
-                                          event_index, free_existing)
+                       free_existing: bool = True,
+                       planner: Optional[writeplanner.WritePlanner] = None):
+        """
+        Write an OverWorldEvent to a CTrom.  If a planner is given, the event
+        is written (and compressed) when the planner is.
+        """
+        if planner is None:
+            _ow_event_rw.write_data_to_ct_rom(ct_rom, self.get_bytes(),
+                                              event_index, free_existing)
+        else:
+            _ow_event_rw.plan_data_write(ct_rom, self.get_bytes(),
+                                         event_index, planner, free_existing)
 
 
 def get_jump_target(
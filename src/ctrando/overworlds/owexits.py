@@ -2,7 +2,7 @@
 from __future__ import annotations
 from typing import Optional
 
-from ctrando.common import byteops, ctrom, cttypes, ctenums
+from ctrando.common import byteops, ctrom, cttypes, ctenums, writeplanner
 from ctrando.compression import ctcompression
 
 
@@ -156,12 +156,16 @@ class OverworldExitPacket:
         return ret_b
 
     @classmethod
-    def read_from_ctrom(cls, ct_rom: ctrom.CTRom,
-                        packet_id: int) -> OverworldExitPacket:
+    def read_from_ctrom(
+            cls, ct_rom: ctrom.CTRom,
+            packet_id: int,
+            decompress_buffer: Optional[bytearray] = None
+    ) -> OverworldExitPacket:
         """Read an OverworldExitPacket from CTRom."""
 
         return OverworldExitPacket(
-            _owexitpacket_rw.read_data_from_ctrom(ct_rom, None, packet_id)
+            _owexitpacket_rw.read_data_from_ctrom(ct_rom, None, packet_id,
+                                                  decompress_buffer)
         )
 
     @classmethod
@@ -173,11 +177,20 @@ class OverworldExitPacket:
     def write_data_to_ct_rom(
             self, ct_rom: ctrom.CTRom,
             packet_id: int,
-            free_existing: bool = True):
-        """Write this packet to the CTRom)."""
-        _owexitpacket_rw.write_data_to_ct_rom(
-            ct_rom, self.get_bytes(), packet_id, free_existing
-        )
+            free_existing: bool = True,
+            planner: Optional[writeplanner.WritePlanner] = None):
+        """
+        Write this packet to the CTRom.  If a planner is given, the packet is
+        written (and compressed) when the planner is.
+        """
+        if planner is None:
+            _owexitpacket_rw.write_data_to_ct_rom(
+                ct_rom, self.get_bytes(), packet_id, free_existing
+            )
+        else:
+            _owexitpacket_rw.plan_data_write(
+                ct_rom, self.get_bytes(), packet_id, planner, free_existing
+            )
 
     def __str__(self):
         ret_str = 'Exits:\n'
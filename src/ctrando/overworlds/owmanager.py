@@ -3,7 +3,8 @@ from typing import Optional
 
 from ctrando.common import byteops
 from ctrando.overworlds.overworld import Overworld
-from ctrando.common import ctenums, ctrom
+from ctrando.common import ctenums, ctrom, writeplanner
+from ctrando.compression import ctcompression
 from ctrando.strings import ctstrings
 
 class OWManager:
@@ -21,11 +22,14 @@ class OWManager:
             name_dict = {}
 
         self.overworld_dict: dict[ctenums.OverWorldID, Overworld] = {}
+        decompress_buffer = ctcompression.get_decompress_buffer()
         for ow_id in ctenums.OverWorldID:
             if ow_id in overworld_dict:
                 self.overworld_dict[ow_id] = copy.deepcopy(overworld_dict[ow_id])
             else:
-                self.overworld_dict[ow_id] = Overworld.read_from_ctrom(ct_rom, ow_id)
+                self.overworld_dict[ow_id] = Overworld.read_from_ctrom(
+                    ct_rom, ow_id, decompress_buffer
+                )
 
         num_names = 0x70
         self.name_dict = self._read_name_dict(ct_rom, num_names)
@@ -58,8 +62,11 @@ class OWManager:
         return ret_dict
 
     @staticmethod
-    def _write_exit_names_to_ctrom(name_dict: dict[int, str], ct_rom: ctrom.CTRom):
-        """Write names back to CT Rom and update pointers"""
+    def _plan_exit_names_write(
+            name_dict: dict[int, str], ct_rom: ctrom.CTRom,
+            planner: writeplanner.WritePlanner
+    ):
+        """Add the names to a write plan.  Pointers are updated when written."""
 
         # Free old
         num_names = 0x70
@@ -95,24 +102,25 @@ class OWManager:
         len_offsets = 0x70*2
         total_size = len_offsets + len(payload)
 
-        new_name_st = ct_rom.space_manager.get_free_addr(total_size, 0x410000)
-        cur_name_ptr = new_name_st + num_names*2
-        new_ptr_table_st = byteops.to_rom_ptr(new_name_st)
-        ct_rom.seek(new_name_st)
-        for offset in offsets[:-1]:
-            offset = (offset + cur_name_ptr) & 0xFFFF
-            ct_rom.write(int.to_bytes(offset, 2, "little"),
-                         ctrom.freespace.FSWriteType.MARK_USED)
-
-        ct_rom.write(payload, ctrom.freespace.FSWriteType.MARK_USED)
-
-        # C2567A  A2 00 F4       LDX #$F400
-        # C2567D  8E 0D 02       STX $020D
-        # C25680  A9 C6          LDA #$C6
-        # C25682  8D 0F 02       STA $020F
-        ct_rom.seek(0x02567B)
-        ct_rom.write(int.to_bytes(new_ptr_table_st & 0xFFFF, 2, "little"))
-        ct_rom.getbuffer()[0x025681] = new_ptr_table_st // 0x10000
+        def get_payload(new_name_st: int) -> bytes:
+            cur_name_ptr = new_name_st + num_names*2
+            ptr_b = b"".join(
+                int.to_bytes((offset + cur_name_ptr) & 0xFFFF, 2, "little")
+                for offset in offsets[:-1]
+            )
+            return ptr_b + payload
+
+        def set_ptr_table(ct_rom: ctrom.CTRom, new_name_st: int):
+            # C2567A  A2 00 F4       LDX #$F400
+            # C2567D  8E 0D 02       STX $020D
+            # C25680  A9 C6          LDA #$C6
+            # C25682  8D 0F 02       STA $020F
+            new_ptr_table_st = byteops.to_rom_ptr(new_name_st)
+            ct_rom.seek(0x02567B)
+            ct_rom.write(int.to_bytes(new_ptr_table_st & 0xFFFF, 2, "little"))
+            ct_rom.getbuffer()[0x025681] = new_ptr_table_st // 0x10000
+
+        planner.add(total_size, get_payload, set_ptr_table, 0x410000)
 
     def __getitem__(self, key: ctenums.OverWorldID) -> Overworld:
         if key in self.overworld_dict:
@@ -137,18 +145,37 @@ class OWManager:
 
         raise ValueError
 
-    def write_overworld(self, overworld_id: ctenums.OverWorldID):
+    def write_overworld(
+            self,
+            overworld_id: ctenums.OverWorldID,
+            planner: Optional[writeplanner.WritePlanner] = None
+    ):
         if overworld_id not in self.overworld_dict:
             raise KeyError
 
         ow_data = self.overworld_dict[overworld_id]
-        ow_data.write_to_ctrom(self._ct_rom, overworld_id)
+        ow_data.write_to_ctrom(self._ct_rom, overworld_id, planner=planner)
+
+    def write_all_overworlds_to_ctrom(
+            self,
+            planner: Optional[writeplanner.WritePlanner] = None
+    ):
+        """
+        Write all overworlds and exit names.  If a planner is given, the exit
+        names and the compressed overworld data are written when the planner
+        is.
+        """
+        flush = planner is None
+        if planner is None:
+            planner = writeplanner.WritePlanner()
 
-    def write_all_overworlds_to_ctrom(self):
         for overworld_id in self.overworld_dict:
-            self.write_overworld(overworld_id)
+            self.write_overworld(overworld_id, planner)
+
+        self._plan_exit_names_write(self.name_dict, self._ct_rom, planner)
 
-        self._write_exit_names_to_ctrom(self.name_dict, self._ct_rom)
+        if flush:
+            planner.write_to_ctrom(self._ct_rom)
 
     def set_ct_rom(self, ct_rom: ctrom.CTRom):
         self._ct_rom = ct_rom
\ No newline at end of file
@@ -1,11 +1,9 @@
 """The main randomizer."""
-import copy
 import enum
 import pathlib
 import pickle
 import random
 import sys
-import time
 import tomllib
 import typing
 from typing import TextIO
@@ -24,7 +22,9 @@ from ctrando.attacks import (
 from ctrando.base import basepatch, xptpmod, modifymaps, chesttext
 from ctrando.bosses import staticbossscaling, bossrando, bosstypes
 from ctrando.characters import characterwriter, charactermods
-from ctrando.common import ctrom, ctenums, randostate
+from ctrando.common import (
+    ctrom, ctenums, prepatchcache, randostate, romdiff, tracing
+)
 from ctrando.common.random import RNGType
 
 from ctrando import encounters
@@ -33,11 +33,12 @@ from ctrando.encounters import omenelevators
 from ctrando.enemyai import randofixes
 from ctrando.enemyscaling import patchscaling, enemyrebalance
 from ctrando.entranceshuffler import (
-    entrancefiller, entranceassign, regionmap, maptraversal, locregions,
+    entrancefiller, entranceassign, logicanalysis, regionmap, locregions,
     portalshuffle
 )
 from ctrando.entranceshuffler.entrancefiller import update_starting_rewards
 from ctrando.items import gearrando, itemdata
+from ctrando.locations import scriptcache
 from ctrando.locations.scriptmanager import ScriptManager
 from ctrando.objectives import objectivewriter, objectivelogic
 from ctrando.postrando import postrandowriter, flashreduce
@@ -58,6 +59,7 @@ def apply_dynamic_scaling(
         treasure_assignment: dict[ctenums.TreasureID, ttypes.RewardType],
         recruit_assignment: dict[ctenums.RecruitID, ctenums.CharID | None],
         settings: arguments.Settings,
+        logic_analysis: logicanalysis.LogicAnalysis | None = None
 ):
     scaling_opts = settings.scaling_options
     if scaling_opts.dynamic_scaling_scheme == enemyscaling.DynamicScalingScheme.NONE:
@@ -95,6 +97,7 @@ def apply_dynamic_scaling(
         starting_rewards=settings.logic_options.starter_rewards,
         enemy_stat_dict=enemy_data_dict,
         boss_scaling_settings=settings.boss_scaling_options.boss_level_dict,
+        logic_analysis=logic_analysis
     )
 
 
@@ -169,6 +172,7 @@ def extract_settings(*in_args: str) -> arguments.Settings:
     return settings
 
 
+@tracing.traced("get_random_config")
 def get_random_config(
         settings: arguments.Settings,
         input_rom: ctrom.CTRom
@@ -177,199 +181,229 @@ def get_random_config(
     Test: Try to do everyting EXCEPT rom changes (incl. scripts).  Then combine all rom changes.
     """
 
-    config = randostate.ConfigState.get_default_config_from_ctrom(input_rom)
+    # Fork before reading.  A fork of a RomImage which has not been read
+    # through getbuffer() can be forked again without a copy.
+    working_rom = input_rom.fork()
+
+    with tracing.span("default_config"):
+        config = randostate.ConfigState.get_default_config_from_ctrom(input_rom)
 
-    # noinspection PyTypeChecker
-    rng: RNGType = random.Random()
-    rng.seed(settings.general_options.seed, version=2)
+        # noinspection PyTypeChecker
+        rng: RNGType = random.Random()
+        rng.seed(settings.general_options.seed, version=2)
 
-    working_rom = ctrom.CTRom(input_rom.getvalue())
-    basepatch.mark_initial_free_space(working_rom)
-    basepatch.apply_mauron_player_tech_patch(working_rom)
+        basepatch.mark_initial_free_space(working_rom)
+        basepatch.apply_mauron_player_tech_patch(working_rom)
 
-    if settings.tech_options.normalize_techs:
-        techrebalance.rebalance_vanilla_tech_man(config.pctech_manager)
+        if settings.tech_options.normalize_techs:
+            techrebalance.rebalance_vanilla_tech_man(config.pctech_manager)
 
-    if settings.character_options.use_phys_marle:
-        charactermods.make_phys_marle(
-            config.pcstat_manager, config.pctech_manager,
-            config.animation_script_manager, working_rom
+        if settings.character_options.use_phys_marle:
+            charactermods.make_phys_marle(
+                config.pcstat_manager, config.pctech_manager,
+                config.animation_script_manager, working_rom
+            )
+        if settings.character_options.use_haste_all:
+            charactermods.make_haste_all(config.pctech_manager,
+                                         config.animation_script_manager, working_rom)
+        if settings.character_options.use_phys_lucca:
+            charactermods.make_phys_lucca(config.pcstat_manager, config.pctech_manager,
+                                          config.animation_script_manager, working_rom)
+        if settings.character_options.use_protect_all:
+            charactermods.make_prot_all(config.pctech_manager,
+                                        config.animation_script_manager, working_rom)
+        if settings.character_options.use_reraise:
+            charactermods.make_reraise(config.pctech_manager,
+                                       config.animation_script_manager, working_rom)
+        if settings.character_options.use_daltonized_magus:
+            charactermods.add_daltonized_magus_techs(config.pctech_manager,
+                                                     config.animation_script_manager,
+                                                     working_rom)
+            staticbossscaling.modify_poison_immunity(config.enemy_data_dict)
+
+    with tracing.span("techs"):
+        ### Techs
+        elementrando.apply_full_tech_rando(
+            config.pctech_manager, config.animation_script_manager,
+            config.item_db,
+            working_rom, settings.character_options,
+            config.pcstat_manager, rng
+        )
+        pctechrandomizer.modify_all_single_tech_powers(
+            config.pctech_manager, settings.tech_options,
+            settings.tech_options.custom_damage_mps, rng
         )
-    if settings.character_options.use_haste_all:
-        charactermods.make_haste_all(config.pctech_manager,
-                                     config.animation_script_manager, working_rom)
-    if settings.character_options.use_phys_lucca:
-        charactermods.make_phys_lucca(config.pcstat_manager, config.pctech_manager,
-                                      config.animation_script_manager, working_rom)
-    if settings.character_options.use_protect_all:
-        charactermods.make_prot_all(config.pctech_manager,
-                                    config.animation_script_manager, working_rom)
-    if settings.character_options.use_reraise:
-        charactermods.make_reraise(config.pctech_manager,
-                                   config.animation_script_manager, working_rom)
-    if settings.character_options.use_daltonized_magus:
-        charactermods.add_daltonized_magus_techs(config.pctech_manager,
-                                                 config.animation_script_manager,
-                                                 working_rom)
-        staticbossscaling.modify_poison_immunity(config.enemy_data_dict)
-
-    ### Techs
-    elementrando.apply_full_tech_rando(
-        config.pctech_manager, config.animation_script_manager,
-        config.item_db,
-        working_rom, settings.character_options,
-        config.pcstat_manager, rng
-    )
-    pctechrandomizer.modify_all_single_tech_powers(
-        config.pctech_manager, settings.tech_options,
-        settings.tech_options.custom_damage_mps, rng
-    )
 
-    techdescriptions.update_all_tech_descs(config.pctech_manager,
-                                           settings.tech_options.black_hole_factor,
-                                           settings.tech_options.black_hole_min)
-    permutation_dict = pctechrandomizer.randomize_tech_order(
-        config.pctech_manager,
-        settings.tech_options.tech_order,
-        settings.tech_options.preserve_magic,
-        rng
-    )
+        techdescriptions.update_all_tech_descs(config.pctech_manager,
+                                               settings.tech_options.black_hole_factor,
+                                               settings.tech_options.black_hole_min)
+        permutation_dict = pctechrandomizer.randomize_tech_order(
+            config.pctech_manager,
+            settings.tech_options.tech_order,
+            settings.tech_options.preserve_magic,
+            rng
+        )
 
-    ### Shops
-    shoprando.apply_shop_settings(config.item_db, config.shop_manager,
-                                  settings.shop_options,
-                                  settings.gear_rando_options.ds_item_pool,
-                                  rng)
-
-    ### Recruits
-    config.recruit_dict = recruitwriter.get_random_recruit_assignment_dict(
-        settings.plando_options.recruit_assignment, rng)
-
-    ### Boss/Midboss
-    config.boss_assignment_dict = bossrando.get_random_boss_assignment(settings.boss_rando_options, rng)
-    midboss_assignment = bossrando.get_random_midboss_assignment(settings.boss_rando_options, rng)
-    config.boss_assignment_dict.update(midboss_assignment)
-    bossrando.resolve_character_conflicts(config.boss_assignment_dict,
-                                          config.recruit_dict,
-                                          settings.boss_rando_options,
-                                          rng)
-
-    ### Objectives
-    # After bosses to avoid double dipping.
-    # Before map to allow objectives in logic
-    config.objectives = objectivewriter.get_random_objectives_from_settings(
-        settings.objective_options,
-        config.boss_assignment_dict,
-        rng
-    )
+    with tracing.span("shops"):
+        ### Shops
+        shoprando.apply_shop_settings(config.item_db, config.shop_manager,
+                                      settings.shop_options,
+                                      settings.gear_rando_options.ds_item_pool,
+                                      rng)
+
+    with tracing.span("recruits"):
+        ### Recruits
+        config.recruit_dict = recruitwriter.get_random_recruit_assignment_dict(
+            settings.plando_options.recruit_assignment, rng)
+
+    with tracing.span("bosses"):
+        ### Boss/Midboss
+        config.boss_assignment_dict = bossrando.get_random_boss_assignment(settings.boss_rando_options, rng)
+        midboss_assignment = bossrando.get_random_midboss_assignment(settings.boss_rando_options, rng)
+        config.boss_assignment_dict.update(midboss_assignment)
+        bossrando.resolve_character_conflicts(config.boss_assignment_dict,
+                                              config.recruit_dict,
+                                              settings.boss_rando_options,
+                                              rng)
+
+    with tracing.span("objectives"):
+        ### Objectives
+        # After bosses to avoid double dipping.
+        # Before map to allow objectives in logic
+        config.objectives = objectivewriter.get_random_objectives_from_settings(
+            settings.objective_options,
+            config.boss_assignment_dict,
+            rng
+        )
 
-    ### Enemy Charm/Drop
-    rewardrando.apply_reward_rando(
-        settings.battle_rewards, config.enemy_data_dict,
-        settings.gear_rando_options.ds_item_pool,
-        rng
-    )
+    with tracing.span("enemy_rewards"):
+        ### Enemy Charm/Drop
+        rewardrando.apply_reward_rando(
+            settings.battle_rewards, config.enemy_data_dict,
+            settings.gear_rando_options.ds_item_pool,
+            rng
+        )
 
-    ### Enemy Reshuffle
-    config.enemy_assign_dict = enemyrando.get_enemy_shuffle(settings.enemy_options.shuffle_enemies, rng)
+    with tracing.span("enemy_shuffle"):
+        ### Enemy Reshuffle
+        config.enemy_assign_dict = enemyrando.get_enemy_shuffle(settings.enemy_options.shuffle_enemies, rng)
+
+    with tracing.span("xp_tp"):
+        ### XP modifications depending on enemy type
+        # Reduce the xp values so that we don't get so close to 0xFFFF
+        rewardrando.pre_reduce_xp_thresholds(config.enemy_data_dict,
+                                             config.pcstat_manager.xp_thresholds)
+
+        # This needs to be BEFORE adaptive scale, which changes xp requirements
+        if settings.battle_rewards.xp_tp_rewards.normalize_boss_xp:
+            rewardrando.normalize_boss_xp(
+                config.enemy_data_dict,
+                settings.boss_scaling_options.boss_level_dict,
+                config.pcstat_manager.xp_thresholds
+            )
 
-    ### XP modifications depending on enemy type
-    # Reduce the xp values so that we don't get so close to 0xFFFF
-    rewardrando.pre_reduce_xp_thresholds(config.enemy_data_dict,
-                                         config.pcstat_manager.xp_thresholds)
+        rewardrando.modify_boss_midboss_xp_tp(
+            config.enemy_data_dict,
+            settings.battle_rewards.xp_tp_rewards.midboss_reward_factor,
+            settings.battle_rewards.xp_tp_rewards.boss_xp_factor,
+            settings.battle_rewards.xp_tp_rewards.boss_tp_factor
+        )
 
-    # This needs to be BEFORE adaptive scale, which changes xp requirements
-    if settings.battle_rewards.xp_tp_rewards.normalize_boss_xp:
-        rewardrando.normalize_boss_xp(
+        ### XP/TP Mod
+        characterwriter.adaptive_scale_xp(
+            config.pcstat_manager,
+            settings.battle_rewards.xp_tp_rewards.xp_scale,
+            settings.battle_rewards.xp_tp_rewards.xp_penalty_level,
+            settings.battle_rewards.xp_tp_rewards.xp_penalty_percent,
+            settings.battle_rewards.xp_tp_rewards.level_cap
+        )
+        characterwriter.scale_tp(
+            config.pcstat_manager,
             config.enemy_data_dict,
-            settings.boss_scaling_options.boss_level_dict,
-            config.pcstat_manager.xp_thresholds
+            settings.battle_rewards.xp_tp_rewards.tp_scale)
+        characterwriter.apply_mdef_restrictions(
+            config.pcstat_manager,
+            settings.character_options.mdef_cap,
+            settings.character_options.mdef_levelup_cap,
+            settings.character_options.mdef_growth_scale_factor
+        )
+        recruitwriter.write_recruit_stats(settings.recruit_options,
+                                          config.recruit_dict,
+                                          config.pcstat_manager)
+
+    with tracing.span("logic"):
+        ### Logic (KI Fill, Entrances)
+        entrancefiller.update_starting_rewards(settings.logic_options.starter_rewards,
+                                               settings.entrance_options)
+        config.starting_rewards = list(settings.logic_options.starter_rewards)
+        for reward in settings.logic_options.out_of_logic_starter_rewards:
+            if isinstance(reward, ctenums.ItemID):
+                config.starting_rewards.append(reward)
+            elif reward not in config.starting_rewards:
+                config.starting_rewards.append(reward)
+
+        treasure_assignment, entrance_assignment, region_map = entrancefiller.get_key_item_fill(
+            dict(),
+            config.boss_assignment_dict,
+            config.recruit_dict,
+            settings.logic_options,
+            settings.entrance_options,
+            rng
         )
 
-    rewardrando.modify_boss_midboss_xp_tp(
-        config.enemy_data_dict,
-        settings.battle_rewards.xp_tp_rewards.midboss_reward_factor,
-        settings.battle_rewards.xp_tp_rewards.boss_xp_factor,
-        settings.battle_rewards.xp_tp_rewards.boss_tp_factor
-    )
+        objectivelogic.add_objectives_to_map(config.objectives, config.boss_assignment_dict,
+                                             settings.objective_options, region_map)
 
-    ### XP/TP Mod
-    characterwriter.adaptive_scale_xp(
-        config.pcstat_manager,
-        settings.battle_rewards.xp_tp_rewards.xp_scale,
-        settings.battle_rewards.xp_tp_rewards.xp_penalty_level,
-        settings.battle_rewards.xp_tp_rewards.xp_penalty_percent,
-        settings.battle_rewards.xp_tp_rewards.level_cap
-    )
-    characterwriter.scale_tp(
-        config.pcstat_manager,
-        config.enemy_data_dict,
-        settings.battle_rewards.xp_tp_rewards.tp_scale)
-    characterwriter.apply_mdef_restrictions(
-        config.pcstat_manager,
-        settings.character_options.mdef_cap,
-        settings.character_options.mdef_levelup_cap,
-        settings.character_options.mdef_growth_scale_factor
-    )
-    recruitwriter.write_recruit_stats(settings.recruit_options,
-                                      config.recruit_dict,
-                                      config.pcstat_manager)
-
-    ### Logic (KI Fill, Entrances)
-    entrancefiller.update_starting_rewards(settings.logic_options.starter_rewards,
-                                           settings.entrance_options)
-    config.starting_rewards = list(settings.logic_options.starter_rewards)
-    for reward in settings.logic_options.out_of_logic_starter_rewards:
-        if isinstance(reward, ctenums.ItemID):
-            config.starting_rewards.append(reward)
-        elif reward not in config.starting_rewards:
-            config.starting_rewards.append(reward)
-
-    treasure_assignment, entrance_assignment, region_map = entrancefiller.get_key_item_fill(
-        dict(),
-        config.boss_assignment_dict,
-        config.recruit_dict,
-        settings.logic_options,
-        settings.entrance_options,
-        rng
-    )
+        config.ow_exit_assignment_dict = entrance_assignment
+        config.region_map = region_map
+        config.logic_analysis = logicanalysis.get_logic_analysis(
+            region_map, treasure_assignment, config.recruit_dict,
+            settings.logic_options.starter_rewards
+        )
 
-    objectivelogic.add_objectives_to_map(config.objectives, config.boss_assignment_dict,
-                                         settings.objective_options, region_map)
+    with tracing.span("treasure_fill"):
+        ### Treasure Fill
+        exclude_pool = [
+            x for x in settings.logic_options.starter_rewards
+            if isinstance(x, ctenums.ItemID)
+        ]
+        if settings.gear_rando_options.bronze_fist_policy == gearrandooptions.BronzeFistPolicy.REMOVE:
+            exclude_pool += ctenums.ItemID.BRONZEFIST
+
+        config.treasure_assignment = treasureassign.default_assignment(
+            treasure_assignment,
+            settings.treasure_options,
+            settings.gear_rando_options.ds_item_pool,
+            exclude_pool,
+            config.region_map,
+            config.recruit_dict,
+            settings.logic_options.starter_rewards,
+            settings.recruit_options,
+            rng,
+            config.logic_analysis)
+
+        # The fill may add items which open up the map (e.g. a spare Masamune).
+        # Treasure placement above went by the key item spheres, but scaling and
+        # the spoilers need the spheres of the final assignment.
+        if logicanalysis.get_logic_spots(region_map, config.treasure_assignment) != \
+                logicanalysis.get_logic_spots(region_map, treasure_assignment):
+            config.logic_analysis = logicanalysis.get_logic_analysis(
+                region_map, config.treasure_assignment, config.recruit_dict,
+                settings.logic_options.starter_rewards
+            )
 
-    config.ow_exit_assignment_dict = entrance_assignment
-    config.region_map = region_map
+    with tracing.span("gear_rando"):
+        ### Gear Rando
+        gearrando.randomize_good_accessory_effects(
+            config.item_db, settings.gear_rando_options, rng)
+        gearrando.randomize_gear(config.item_db, settings.gear_rando_options, rng)
+        config.item_db.update_all_descriptions()
 
-    ### Treasure Fill
-    exclude_pool = [
-        x for x in settings.logic_options.starter_rewards
-        if isinstance(x, ctenums.ItemID)
-    ]
-    if settings.gear_rando_options.bronze_fist_policy == gearrandooptions.BronzeFistPolicy.REMOVE:
-        exclude_pool += ctenums.ItemID.BRONZEFIST
-
-    config.treasure_assignment = treasureassign.default_assignment(
-        treasure_assignment,
-        settings.treasure_options,
-        settings.gear_rando_options.ds_item_pool,
-        exclude_pool,
-        config.region_map,
-        config.recruit_dict,
-        settings.logic_options.starter_rewards,
-        settings.recruit_options,
-        rng)
-
-    ### Gear Rando
-    gearrando.randomize_good_accessory_effects(
-        config.item_db, settings.gear_rando_options, rng)
-    gearrando.randomize_gear(config.item_db, settings.gear_rando_options, rng)
-    config.item_db.update_all_descriptions()
-
-    objectivewriter.update_objective_names_descriptions(
-        config.objectives, config.item_db
-    )
+        objectivewriter.update_objective_names_descriptions(
+            config.objectives, config.item_db
+        )
 
-    config.omen_elevator_data = omenelevators.assign_random_elevators(rng)
+        config.omen_elevator_data = omenelevators.assign_random_elevators(rng)
 
     return config
 
@@ -408,35 +442,50 @@ def clean_scripts_for_tf(
             script.delete_commands(pos, 1)
 
 
+@tracing.traced("get_ctrom_from_config")
 def get_ctrom_from_config(
         input_rom: ctrom.CTRom,
         settings: arguments.Settings,
         config: randostate.ConfigState,
         post_config_load_path: pathlib.Path | None = None,
         prepatched_rom_load_path: pathlib.Path | None = None,
-        make_tf_friendly: bool = False
+        make_tf_friendly: bool = False,
+        cache_directory: pathlib.Path | None = None,
+        jobs: int | None = None,
 ) -> ctrom.CTRom:
-    """Generate the rom specified by the settings and config"""
+    """
+    Generate the rom specified by the settings and config.
+
+    If cache_directory is given (and no explicit load paths are), the
+    settings-free patched rom and openworld post-config are read from or
+    written to the prepatch cache there.  If the openworld scripts have to be
+    applied, they are applied in jobs processes.
+    """
 
     # There is some division between generating the post-config state and actually
     # writing the rom, but it's hard to separate.  Will do if there's need.
 
-    ct_rom = ctrom.CTRom(input_rom.getbuffer())
     print("Applying Base Patch...", end="")
-    a=time.time()
-    if prepatched_rom_load_path is not None:
-        try:
-            infile = open(prepatched_rom_load_path, "rb")
-            ct_rom = pickle.load(infile)
-        except (OSError, pickle.PickleError):
+    with tracing.span("base_patch") as phase:
+        post_config: randostate.PostConfigState | None = None
+        if (
+                cache_directory is not None and
+                prepatched_rom_load_path is None and
+                post_config_load_path is None
+        ):
+            ct_rom, post_config = get_prepatched_state(input_rom, cache_directory,
+                                                       jobs)
+        elif prepatched_rom_load_path is not None:
+            try:
+                with open(prepatched_rom_load_path, "rb") as infile:
+                    ct_rom = pickle.load(infile)
+            except (OSError, pickle.PickleError):
+                ct_rom = input_rom.fork()
+                apply_settings_free_patches(ct_rom)
+        else:
+            ct_rom = input_rom.fork()
             apply_settings_free_patches(ct_rom)
-        finally:
-            infile.close()
-    else:
-        apply_settings_free_patches(ct_rom)
-
-    b=time.time()
-    print(f"({b-a})")
+    print(f"({phase.duration})")
     basepatch.add_set_level_command(ct_rom, config.pcstat_manager)
     basepatch.set_level_cap(ct_rom, settings.battle_rewards.xp_tp_rewards.level_cap)
 
@@ -449,204 +498,233 @@ def get_ctrom_from_config(
     )
 
     print("Applying Openworld Scripts...", end="")
-    a = time.time()
-    post_config = get_openworld_post_config(ct_rom, post_config_load_path)
-    encounters.apply_all_encounter_mods(post_config.script_manager)
-    b = time.time()
-    print(f"({b-a})")
+    with tracing.span("openworld_scripts") as phase:
+        if post_config is None:
+            post_config = get_openworld_post_config(ct_rom, post_config_load_path,
+                                                    jobs=jobs)
+        encounters.apply_all_encounter_mods(post_config.script_manager)
+    print(f"({phase.duration})")
 
     print("Setting Random Data...", end="")
-    a = time.time()
-
-    # The lock was probably caused by bad tile copying
-    # randofixes.fix_movement_locks(post_config.enemy_ai_manager)
-    # Slash AI
-    for tech_id in range(1, 9):
-        if config.pctech_manager.get_tech(tech_id).name == "Slash":
-            randofixes.fix_dino_slash_scripts(post_config.enemy_ai_manager, tech_id)
-            break
-    else:
-        raise IndexError
-    randofixes.add_dream_devourer_ai(post_config.enemy_ai_manager)
-    ct_rom.seek(0x24F023 +0xCD*5 + 2)  # "Kid" palette for cutscene Schala
-    ct_rom.write(b'\x36')
-
-    modifymaps.make_heckran_boss_map(post_config.script_manager,
-                                     post_config.loc_exit_dict,
-                                     post_config.loc_data_dict)
-    modifymaps.make_zenan_boss_map(post_config.script_manager,
-                                   post_config.loc_exit_dict,
-                                   post_config.loc_data_dict)
-    modifymaps.make_dream_devourer_map(post_config.script_manager,
-                                       post_config.loc_exit_dict,
-                                       post_config.loc_data_dict)
-    modifymaps.make_nr_600_map(post_config.script_manager,
-                               post_config.loc_exit_dict,
-                               post_config.loc_data_dict)
-    modifymaps.add_giants_claw_vertigo(post_config.script_manager,
+    with tracing.span("random_data") as phase:
+        # The lock was probably caused by bad tile copying
+        # randofixes.fix_movement_locks(post_config.enemy_ai_manager)
+        # Slash AI
+        for tech_id in range(1, 9):
+            if config.pctech_manager.get_tech(tech_id).name == "Slash":
+                randofixes.fix_dino_slash_scripts(post_config.enemy_ai_manager, tech_id)
+                break
+        else:
+            raise IndexError
+        randofixes.add_dream_devourer_ai(post_config.enemy_ai_manager)
+        ct_rom.seek(0x24F023 +0xCD*5 + 2)  # "Kid" palette for cutscene Schala
+        ct_rom.write(b'\x36')
+
+        modifymaps.make_heckran_boss_map(post_config.script_manager,
+                                         post_config.loc_exit_dict,
+                                         post_config.loc_data_dict)
+        modifymaps.make_zenan_boss_map(post_config.script_manager,
                                        post_config.loc_exit_dict,
                                        post_config.loc_data_dict)
+        modifymaps.make_dream_devourer_map(post_config.script_manager,
+                                           post_config.loc_exit_dict,
+                                           post_config.loc_data_dict)
+        modifymaps.make_nr_600_map(post_config.script_manager,
+                                   post_config.loc_exit_dict,
+                                   post_config.loc_data_dict)
+        modifymaps.add_giants_claw_vertigo(post_config.script_manager,
+                                           post_config.loc_exit_dict,
+                                           post_config.loc_data_dict)
 
-    enemyrando.apply_enemy_shuffle(
-        config.enemy_assign_dict, post_config.script_manager, post_config.enemy_sprite_dict
-    )
-    enemyrando.fix_npc_graphics(ct_rom, config.enemy_assign_dict,
-                                post_config.enemy_sprite_dict)
-    enemyrando.nerf_phys_immune(config.enemy_data_dict)
-
-    apply_dynamic_scaling(ct_rom,
-                          post_config.script_manager,
-                          config.enemy_data_dict,
-                          config.region_map,
-                          config.treasure_assignment,
-                          config.recruit_dict,
-                          settings)
-
-    bossrando.fix_boss_sprites_given_assignment(config.boss_assignment_dict,
-                                                post_config.enemy_sprite_dict)
-    bossrando.update_boss_names(config.boss_assignment_dict,
-                                post_config.script_manager,
-                                config.enemy_data_dict,
-                                post_config.overworld_manager)
-    bossrando.fix_atropos_ribbon_buff(config.boss_assignment_dict,
-                                      post_config.script_manager,
-                                      settings.character_options.mdef_levelup_cap)
-    bossrando.bass.add_r_series_boss_defeat_check(config.boss_assignment_dict,
-                                                  post_config.script_manager)
-
-    xptpmod.apply_xptp_mods(
-        ct_rom,
-        settings.battle_rewards.xp_tp_rewards.split_xp,
-        settings.battle_rewards.xp_tp_rewards.split_tp,
-        settings.battle_rewards.xp_tp_rewards.fix_tp_doubling
-    )
-
-    if settings.logic_options.disable_element_locks:
-        staticbossscaling.remove_element_softlocks(config.enemy_data_dict)
+        enemyrando.apply_enemy_shuffle(
+            config.enemy_assign_dict, post_config.script_manager, post_config.enemy_sprite_dict
+        )
+        enemyrando.fix_npc_graphics(ct_rom, config.enemy_assign_dict,
+                                    post_config.enemy_sprite_dict)
+        enemyrando.nerf_phys_immune(config.enemy_data_dict)
+
+        apply_dynamic_scaling(ct_rom,
+                              post_config.script_manager,
+                              config.enemy_data_dict,
+                              config.region_map,
+                              config.treasure_assignment,
+                              config.recruit_dict,
+                              settings,
+                              config.logic_analysis)
+
+        bossrando.fix_boss_sprites_given_assignment(config.boss_assignment_dict,
+                                                    post_config.enemy_sprite_dict)
+        bossrando.update_boss_names(config.boss_assignment_dict,
+                                    post_config.script_manager,
+                                    config.enemy_data_dict,
+                                    post_config.overworld_manager)
+        bossrando.fix_atropos_ribbon_buff(config.boss_assignment_dict,
+                                          post_config.script_manager,
+                                          settings.character_options.mdef_levelup_cap)
+        bossrando.bass.add_r_series_boss_defeat_check(config.boss_assignment_dict,
+                                                      post_config.script_manager)
+
+        xptpmod.apply_xptp_mods(
+            ct_rom,
+            settings.battle_rewards.xp_tp_rewards.split_xp,
+            settings.battle_rewards.xp_tp_rewards.split_tp,
+            settings.battle_rewards.xp_tp_rewards.fix_tp_doubling
+        )
 
-    staticbossscaling.scale_boss_hp(
-        config.enemy_data_dict, post_config.enemy_ai_manager,
-        settings.scaling_options.static_scaling_options.static_boss_hp_scale,
-        settings.scaling_options.static_scaling_options.static_hp_scale_lavos
-    )
-    staticbossscaling.set_element_safety_level(post_config.enemy_ai_manager,
-                                               settings.scaling_options.static_scaling_options.element_safety_level)
+        if settings.logic_options.disable_element_locks:
+            staticbossscaling.remove_element_softlocks(config.enemy_data_dict)
 
-    if settings.enemy_options.normalize_enemies:
-        enemyrebalance.normalize_bosses(
-            config.enemy_data_dict,
-            post_config.enemy_ai_manager,
-            post_config.enemy_attack_manager
+        staticbossscaling.scale_boss_hp(
+            config.enemy_data_dict, post_config.enemy_ai_manager,
+            settings.scaling_options.static_scaling_options.static_boss_hp_scale,
+            settings.scaling_options.static_scaling_options.static_hp_scale_lavos
         )
+        staticbossscaling.set_element_safety_level(post_config.enemy_ai_manager,
+                                                   settings.scaling_options.static_scaling_options.element_safety_level)
+
+        if settings.enemy_options.normalize_enemies:
+            enemyrebalance.normalize_bosses(
+                config.enemy_data_dict,
+                post_config.enemy_ai_manager,
+                post_config.enemy_attack_manager
+            )
 
-    enemystats.set_enemy_sightscope_settings(
-        ct_rom, config.enemy_data_dict,
-        settings.enemy_options.sightscope_all,
-        settings.enemy_options.forced_sightscope
-    )
+        enemystats.set_enemy_sightscope_settings(
+            ct_rom, config.enemy_data_dict,
+            settings.enemy_options.sightscope_all,
+            settings.enemy_options.forced_sightscope
+        )
 
-    objectivewriter.write_test_objectives(post_config.script_manager,
-                                          config.boss_assignment_dict,
-                                          config.item_db,
-                                          settings.objective_options, config.objectives)
-    objectivewriter.write_quest_counters(post_config.script_manager)
-    gearrando.normalize_ayla_fist(ct_rom)
-    entranceassign.apply_entrance_rando(
-        settings.entrance_options,
-        post_config.overworld_manager,
-        post_config.script_manager,
-        config.ow_exit_assignment_dict,
-        post_config.loc_exit_dict
-    )
+        objectivewriter.write_test_objectives(post_config.script_manager,
+                                              config.boss_assignment_dict,
+                                              config.item_db,
+                                              settings.objective_options, config.objectives)
+        objectivewriter.write_quest_counters(post_config.script_manager)
+        gearrando.normalize_ayla_fist(ct_rom)
+        entranceassign.apply_entrance_rando(
+            settings.entrance_options,
+            post_config.overworld_manager,
+            post_config.script_manager,
+            config.ow_exit_assignment_dict,
+            post_config.loc_exit_dict
+        )
 
-    if settings.entrance_options.shuffle_gates:
-        portalshuffle.modify_all_portal_scripts(
-            config.region_map, post_config.script_manager)
+        if settings.entrance_options.shuffle_gates:
+            portalshuffle.modify_all_portal_scripts(
+                config.region_map, post_config.script_manager)
 
-    ### Replace rstate.update_ct_rom()
-    start = chesttext.write_desc_strings(ct_rom, config.item_db)
-    chesttext.update_desc_str_start(ct_rom, start)
-    chesttext.ugly_hack_chest_str(ct_rom)
-    config.item_db.write_to_ctrom(ct_rom)
+        ### Replace rstate.update_ct_rom()
+        start = chesttext.write_desc_strings(ct_rom, config.item_db)
+        chesttext.update_desc_str_start(ct_rom, start)
+        chesttext.ugly_hack_chest_str(ct_rom)
+        config.item_db.write_to_ctrom(ct_rom)
 
-    replacement_dict = basepatch.get_progressive_base_dict()
-    for tid, treasure in post_config.treasure_data_dict.items():
-        assigned_treasure = config.treasure_assignment[tid]
+        replacement_dict = basepatch.get_progressive_base_dict()
+        for tid, treasure in post_config.treasure_data_dict.items():
+            assigned_treasure = config.treasure_assignment[tid]
 
-        if isinstance(assigned_treasure, ctenums.ItemID):
-            if assigned_treasure in replacement_dict:
-                pass
-            assigned_treasure = replacement_dict.get(assigned_treasure, assigned_treasure)
+            if isinstance(assigned_treasure, ctenums.ItemID):
+                if assigned_treasure in replacement_dict:
+                    pass
+                assigned_treasure = replacement_dict.get(assigned_treasure, assigned_treasure)
 
-        treasure.reward = assigned_treasure
+            treasure.reward = assigned_treasure
 
-    treasureassign.update_trading_post_strings(
-        config.treasure_assignment, post_config.script_manager,
-        config.item_db
-    )
-    treasureassign.update_trading_post_costs(
-        settings.treasure_options.trading_post_base_cost,
-        settings.treasure_options.trading_post_upgrade_cost,
-        settings.treasure_options.trading_post_special_cost,
-        post_config.script_manager
-    )
-    treasureassign.write_johnny_rewards(
-        post_config.script_manager,
-        settings.treasure_options
-    )
-    randostate.write_initial_rewards(config.starting_rewards, post_config.script_manager)
+        treasureassign.update_trading_post_strings(
+            config.treasure_assignment, post_config.script_manager,
+            config.item_db
+        )
+        treasureassign.update_trading_post_costs(
+            settings.treasure_options.trading_post_base_cost,
+            settings.treasure_options.trading_post_upgrade_cost,
+            settings.treasure_options.trading_post_special_cost,
+            post_config.script_manager
+        )
+        treasureassign.write_johnny_rewards(
+            post_config.script_manager,
+            settings.treasure_options
+        )
+        randostate.write_initial_rewards(config.starting_rewards, post_config.script_manager)
 
-    recruitwriter.write_recruits_to_ct_rom(
-        config.recruit_dict, post_config.script_manager, settings
-    )
-    bossrando.write_bosses_to_ct_rom(config.boss_assignment_dict,
-                                     post_config.script_manager)
+        recruitwriter.write_recruits_to_ct_rom(
+            config.recruit_dict, post_config.script_manager, settings
+        )
+        bossrando.write_bosses_to_ct_rom(config.boss_assignment_dict,
+                                         post_config.script_manager)
 
-    config.pcstat_manager.write_to_ct_rom(ct_rom)
-    config.pctech_manager.write_to_ctrom(ct_rom,
-                                         settings.tech_options.black_hole_factor,
-                                         settings.tech_options.black_hole_min)
+        config.pcstat_manager.write_to_ct_rom(ct_rom)
+        config.pctech_manager.write_to_ctrom(ct_rom,
+                                             settings.tech_options.black_hole_factor,
+                                             settings.tech_options.black_hole_min)
 
-    if settings.tech_options.show_full_tech_list:
-        techmenu.show_all_single_techs_in_menu(ct_rom)
-        techmenu.write_cumulative_tp_in_menu(ct_rom)
-        techmenu.show_all_combo_techs_in_menu(ct_rom)  # Needs to be after techs are on rom
+        if settings.tech_options.show_full_tech_list:
+            techmenu.show_all_single_techs_in_menu(ct_rom)
+            techmenu.write_cumulative_tp_in_menu(ct_rom)
+            techmenu.show_all_combo_techs_in_menu(ct_rom)  # Needs to be after techs are on rom
 
-    elementrando.write_menu_element_graphics(ct_rom, config.pctech_manager,
-                                             settings.character_options.tech_rando_scheme)
-    config.animation_script_manager.write_to_ctrom(ct_rom)
+        elementrando.write_menu_element_graphics(ct_rom, config.pctech_manager,
+                                                 settings.character_options.tech_rando_scheme)
+        config.animation_script_manager.write_to_ctrom(ct_rom)
 
-    for enemy_id, enemy_stats in config.enemy_data_dict.items():
-        enemy_stats.write_to_ctrom(ct_rom, enemy_id)
+        enemystats.write_stat_dict_to_ctrom(ct_rom, config.enemy_data_dict)
 
-    config.shop_manager.write_to_ctrom(ct_rom)
+        config.shop_manager.write_to_ctrom(ct_rom)
 
-    omenelevators.write_omen_elevators(post_config.script_manager, config.omen_elevator_data)
-    ### Logic Tweaks
-    logictweaks.apply_logic_tweaks(settings.logic_options, post_config.script_manager,
-                                   post_config.overworld_manager, ct_rom)
-    b=time.time()
-    print(f"({b-a})")
+        omenelevators.write_omen_elevators(post_config.script_manager, config.omen_elevator_data)
+        ### Logic Tweaks
+        logictweaks.apply_logic_tweaks(settings.logic_options, post_config.script_manager,
+                                       post_config.overworld_manager, ct_rom)
+    print(f"({phase.duration})")
 
     print("Writing Post-Randomization Personalizations...", end="")
-    a = time.time()
-    postrandowriter.write_post_rando_options(settings.post_random_options, post_config.script_manager,
-                                             post_config.overworld_manager)
-    b = time.time()
-    print(f"({b-a})")
+    with tracing.span("post_rando_options") as phase:
+        postrandowriter.write_post_rando_options(settings.post_random_options, post_config.script_manager,
+                                                 post_config.overworld_manager)
+    print(f"({phase.duration})")
 
     if make_tf_friendly:
         clean_scripts_for_tf(post_config.script_manager)
 
     print("Writing to Rom...", end="")
-    a = time.time()
-    post_config.write_to_ctrom(ct_rom, clean = make_tf_friendly)
-    b = time.time()
-    print(f"({b-a})")
+    with tracing.span("write_rom") as phase:
+        post_config.write_to_ctrom(
+            ct_rom, clean = make_tf_friendly,
+            optimal_compression=settings.general_options.optimal_compression
+        )
+    print(f"({phase.duration})")
     ### End replace rstate.update_ct_rom()
     return ct_rom
 
 
+def write_output_rom(
+        out_rom: ctrom.CTRom,
+        vanilla_rom: typing.ByteString,
+        output_format: arguments.OutputFormat,
+        path_stem: pathlib.Path
+) -> pathlib.Path:
+    """
+    Write out_rom to path_stem with the suffix of output_format.  Patches are
+    against vanilla_rom.  Returns the path written.
+    """
+    OF = arguments.OutputFormat
+    if output_format == OF.ROM:
+        data = out_rom.getbuffer()
+        suffix = ".sfc"
+    elif output_format == OF.BPS:
+        data = romdiff.get_bps_patch(vanilla_rom, out_rom.getbuffer())
+        suffix = ".bps"
+    elif output_format == OF.IPS:
+        data = romdiff.get_ips_patch(vanilla_rom, out_rom.getbuffer())
+        suffix = ".ips"
+    else:
+        raise ValueError(f"Unknown output format {output_format}")
+
+    path = path_stem.with_name(path_stem.name + suffix)
+    path.write_bytes(data)
+
+    return path
+
+
 def write_rjust_dict(
             in_dict: dict,
             heading: str | None,
@@ -774,13 +852,10 @@ def write_spoilers_to_file(
                 for key, val in  config.ow_exit_assignment_dict.items()
             }
             write_rjust_dict(printable_entrance_dict, "Entrance Assignment", outfile)
-        # get_proof(
-        #     config.ow_exit_assignment_dict,
-        #     config.recruit_dict,
-        #     config.treasure_assignment,
-        #     key_items,
-        #     config.starting_rewards,
-        # )
+
+        if config.logic_analysis is not None:
+            outfile.write("\n")
+            outfile.write(get_proof(config.logic_analysis, treasure_str_dict))
 
 
 def write_spoilers(
@@ -794,25 +869,41 @@ def write_spoilers(
 
 
 def get_proof(
-        entrance_assignment: dict[regionmap.OWExit, regionmap.OWExit],
-        recruit_assignment: dict[ctenums.RecruitID, ctenums.CharID | None],
-        treasure_assignment: dict[ctenums.TreasureID, logictypes.RewardType],
-        key_items: list[ctenums.ItemID],
-        starting_rewards: list[logictypes.RewardType],
-        starting_region: str = "starting_rewards"
+        logic_analysis: logicanalysis.LogicAnalysis,
+        treasure_str_dict: dict[ctenums.TreasureID, str] | None = None
 ) -> str:
-    region_map = regionmap.get_map_from_assignment(recruit_assignment, entrance_assignment)
-    region_map.loc_region_dict[starting_region].region_rewards = list(starting_rewards)
+    """
+    Get a playthrough which only collects the required key items.  Rewards are
+    named with treasure_str_dict when it has them.
+    """
+    if treasure_str_dict is None:
+        treasure_str_dict = {}
 
-    traverser = maptraversal.MapTraverser(region_map, starting_region, starting_rewards)
+    heading = "Playthrough"
+    lines = [heading, "-"*len(heading)]
+    for sphere, entries in enumerate(logic_analysis.playthrough):
+        if not entries:
+            continue
 
-    ret_str = "Proof:"
-    ret_str += "------"
+        # A recruit spot can give more than one character.
+        entry_strs = [
+            (str(spot), treasure_str_dict.get(spot, str(reward)))
+            if isinstance(spot, ctenums.TreasureID) else (str(spot), str(reward))
+            for spot, reward in entries
+        ]
+        max_len = max(len(key) for key, _ in entry_strs)
+        lines.append(f"Sphere {sphere}")
+        lines.extend(
+            f"{key.rjust(max_len+4)}: {val}" for key, val in entry_strs
+        )
 
-    regions = set(traverser.reached_regions)
-    sphere = 0
+    if logic_analysis.unreached_regions:
+        lines.append("Unreachable Regions")
+        lines.extend(
+            f"    {name}" for name in sorted(logic_analysis.unreached_regions)
+        )
 
-    return ret_str
+    return "\n".join(lines) + "\n"
 
 
 def main():
@@ -822,22 +913,28 @@ def main():
     #     raise ValueError
     # builtins.print = f
 
+    # Settings say whether to trace, so record until they are read.
+    tracing.enable()
     print("Getting Settings...", end = "")
-    a = time.time()
-    try:
-        settings = extract_settings(*sys.argv[1:])
-    except ValueError as exc:
-        print(exc, file=sys.stderr)
-        sys.exit(-2)
+    with tracing.span("settings") as phase:
+        try:
+            settings = extract_settings(*sys.argv[1:])
+        except ValueError as exc:
+            print(exc, file=sys.stderr)
+            sys.exit(-2)
 
-    x = settings.get_argument_spec()
+        x = settings.get_argument_spec()
 
-    list_type = settings.general_options.list_keys
+        list_type = settings.general_options.list_keys
 
-    if list_type is not None:
-        list_keys(list_type)
-        sys.exit()
-    b = time.time()
+        if list_type is not None:
+            list_keys(list_type)
+            sys.exit()
+
+    general_options = settings.general_options
+    if general_options.trace_file is None and \
+            general_options.trace_summary_file is None:
+        tracing.disable()
 
     # Do generation
     if settings.general_options.input_file is None:
@@ -848,32 +945,65 @@ def main():
         settings.general_options.output_directory = \
             settings.general_options.input_file.parent
 
-    ct_rom = ctrom.CTRom.from_file(str(settings.general_options.input_file))
-    print(f"({b - a})")
+    if (
+            settings.general_options.batch is not None or
+            settings.general_options.seed_list is not None
+    ):
+        from ctrando import batchrandomizer
+        print(f"({phase.duration})")
+        seeds = batchrandomizer.get_batch_seeds(settings.general_options)
+        results = batchrandomizer.run_batch(
+            settings, seeds, settings.general_options.jobs
+        )
+        if any(result.error is not None for result in results):
+            sys.exit(-1)
+        return
+
+    vanilla_image = ctrom.CTRom.from_file(
+        str(settings.general_options.input_file)
+    ).get_image()
+    print(f"({phase.duration})")
 
     print("Getting Random Data...", end="")
-    a = time.time()
-    config = get_random_config(settings, ct_rom)
-    b = time.time()
-    print(f"({b-a})")
+    with tracing.span("random_config") as phase:
+        config = get_random_config(settings, vanilla_image.fork())
+    print(f"({phase.duration})")
 
     # import time
     # x = time.time()
-    out_rom = get_ctrom_from_config(ct_rom, settings, config, make_tf_friendly=True)
+    out_rom = get_ctrom_from_config(
+        vanilla_image.fork(), settings, config, make_tf_friendly=True,
+        cache_directory=settings.general_options.get_cache_directory(),
+        jobs=settings.general_options.jobs
+    )
     # y = time.time()
     # print(y-x)
 
 
-    output_path = settings.general_options.output_directory / "ct-mod.sfc"
-    output_path.write_bytes(out_rom.getbuffer())
+    write_output_rom(
+        out_rom, vanilla_image.getbuffer(),
+        settings.general_options.output_format,
+        settings.general_options.output_directory / "ct-mod"
+    )
 
     spoiler_path = settings.general_options.output_directory / "ct-mod-spoilers.txt"
-    write_spoilers(settings, config, spoiler_path)
+
+    with tracing.span("spoilers"):
+        write_spoilers(settings, config, spoiler_path)
+
+    tracer = tracing.disable()
+    if tracer is not None:
+        if general_options.trace_summary_file is not None:
+            tracer.write_summary(general_options.trace_summary_file)
+        if general_options.trace_file is not None:
+            tracer.write_chrome_trace(general_options.trace_file)
 
 
 def get_openworld_post_config(
         cur_ct_rom: ctrom.CTRom,
         load_path: pathlib.Path | None = None,
+        script_cache: scriptcache.ScriptCache | None = None,
+        jobs: int | None = None
 ) -> randostate.PostConfigState:
 
     if load_path is not None:
@@ -888,6 +1018,7 @@ def get_openworld_post_config(
         return post_config
 
     post_config = randostate.PostConfigState.get_default_state_from_ctrom(cur_ct_rom)
+    post_config.script_manager.set_script_cache(script_cache)
 
     lavos_sprite = post_config.enemy_sprite_dict[ctenums.EnemyID.LAVOS_1].get_copy()
     post_config.enemy_sprite_dict[ctenums.EnemyID.DREAM_DEVOURER] = lavos_sprite
@@ -899,7 +1030,8 @@ def get_openworld_post_config(
     schala_sprite.animation_id = 0x3B
     schala_sprite.sprite_size = 0x00
 
-    basepatch.apply_openworld.apply_openworld(post_config.script_manager)
+    basepatch.apply_openworld.apply_openworld(post_config.script_manager,
+                                              jobs=jobs)
     basepatch.apply_openworld_ow.update_all_overworlds(post_config.overworld_manager)
 
     # Location Data
@@ -914,6 +1046,42 @@ def get_openworld_post_config(
     return post_config
 
 
+def get_prepatched_state(
+        input_rom: ctrom.CTRom,
+        cache_directory: pathlib.Path,
+        jobs: int | None = None
+) -> tuple[ctrom.CTRom, randostate.PostConfigState]:
+    """
+    Get the settings-free patched rom and the openworld post-config built on
+    it.  They are loaded from the cache in cache_directory if present and
+    stored there otherwise (applying the openworld scripts in jobs processes).
+    The post-config's script manager reads scripts from the parsed script
+    cache in the same directory.
+    """
+    key = prepatchcache.get_cache_key(input_rom.getbuffer())
+    cached_state = prepatchcache.load(cache_directory, key)
+    if cached_state is not None:
+        ct_rom, post_config = cached_state
+        # Scripts are only written to the rom at the very end, so the cached
+        # rom still has the scripts the script cache was built from.
+        script_cache = scriptcache.get_script_cache(
+            cache_directory, key, ct_rom.getbuffer()
+        )
+        post_config.script_manager.set_script_cache(script_cache)
+        return ct_rom, post_config
+
+    ct_rom = input_rom.fork()
+    apply_settings_free_patches(ct_rom)
+    script_cache = scriptcache.get_script_cache(
+        cache_directory, key, ct_rom.getbuffer()
+    )
+    post_config = get_openworld_post_config(ct_rom, script_cache=script_cache,
+                                            jobs=jobs)
+    prepatchcache.store(cache_directory, key, ct_rom, post_config)
+
+    return ct_rom, post_config
+
+
 def dump_openworld_post_config(
         vanilla_rom: ctrom.CTRom,
         dump_path: pathlib.Path
@@ -940,7 +1108,7 @@ def dump_prepatched_ctrom(
     """
     Dump a settings-free patched rom
     """
-    copy_rom = copy.deepcopy(vanilla_rom)
+    copy_rom = vanilla_rom.fork()
     apply_settings_free_patches(copy_rom)
 
     with open(dump_path, "wb") as outfile:
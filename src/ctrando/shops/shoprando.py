@@ -258,15 +258,16 @@ def get_random_shop_items(
         capacity: int,
         rng: RNGType
 ):
+    # Remove each item from a sampler as it is chosen instead of building a
+    # restricted distribution every time.
+    sampler = distribution.WeightedSampler(*shop_dist.get_weight_object_pairs())
     chosen_items: set[ctenums.ItemID] = set()
     while len(chosen_items) < capacity:
-        next_item = shop_dist.get_random_item(rng)
-        if next_item not in chosen_items:
-            chosen_items.add(next_item)
+        next_item = sampler.get_random_item(rng)
+        chosen_items.add(next_item)
 
-        try:
-            shop_dist = shop_dist.get_restricted_distribution(chosen_items)
-        except distribution.ZeroWeightException:
+        sampler.remove_values((next_item,))
+        if sampler.get_total_weight() <= 0:
             break
 
     return list(chosen_items)
@@ -17,7 +17,7 @@ from ctrando.common import ctenums, ctrom, distribution, piecewiselinear as pwl
 from ctrando.common.ctenums import TreasureID as TID
 from ctrando.common.random import RNGType
 from ctrando.items import itemdata
-from ctrando.entranceshuffler import entrancefiller, maptraversal, regionmap
+from ctrando.entranceshuffler import entrancefiller, logicanalysis, maptraversal, regionmap
 from ctrando.shops import shoprando
 from ctrando.treasures import treasuretypes as ttypes, itemtiers, treasurespottiers
 from ctrando.strings import ctstrings
@@ -439,12 +439,15 @@ def default_assignment(
         recruit_assignment: dict[ctenums.RecruitID, list[ctenums.CharID]],
         starter_rewards: list[typing.Any],
         recruit_options: recruitoptions.RecruitOptions,
-        rng: RNGType
+        rng: RNGType,
+        logic_analysis: logicanalysis.LogicAnalysis | None = None
 ) -> dict[ctenums.TreasureID, ttypes.RewardType]:
     """
     Call after KIs are in.
     1) Fill chargeable chests before those items are taken out of the pool.
     2)
+    If the seed's logic_analysis is given, its spheres are used instead of
+    traversing the map.
     """
 
     # This could be hardcoded
@@ -522,9 +525,12 @@ def default_assignment(
         for tid, reward in zip(spot_pool, item_pool):
             final_assignment[tid] = reward
     elif treasure_options.loot_assignment_scheme == treasureoptions.TreasureScheme.LOGIC_DEPTH:
-        sphere_dict = maptraversal.get_sphere_dict(
-            region_map, existing_assignment, recruit_assignment, starter_rewards
-        )
+        if logic_analysis is None:
+            sphere_dict = maptraversal.get_sphere_dict(
+                region_map, existing_assignment, recruit_assignment, starter_rewards
+            )
+        else:
+            sphere_dict = logic_analysis.region_spheres
         max_sphere = max(sphere_dict.values())
         sphere_tid_dict: dict[int, list[TID]] = {
             ind: [] for ind in range(max_sphere+1)
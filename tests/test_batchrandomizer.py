@@ -0,0 +1,39 @@
+"""A worker which dies must only fail its own seed."""
+import os
+import pathlib
+
+from ctrando import batchrandomizer
+from ctrando.batchrandomizer import SeedResult
+
+_CRASH_SEED = "crash"
+
+
+def _fake_generate_seed(seed: str, stem: str) -> SeedResult:
+    """Write a stand-in rom for the seed, or kill the worker."""
+    if seed == _CRASH_SEED:
+        os._exit(1)
+
+    state = batchrandomizer._worker_state
+    rom_path = state.output_directory / f"ct-mod-{stem}.sfc"
+    rom_path.write_bytes(seed.encode())
+    return SeedResult(seed, rom_path=rom_path, total_time=0.0)
+
+
+def test_dead_worker_only_fails_its_seed(tmp_path: pathlib.Path):
+    seeds = [f"seed-{index}" for index in range(10)]
+    seeds.insert(3, _CRASH_SEED)
+    stems = batchrandomizer.get_seed_file_stems(seeds)
+    state = batchrandomizer._BatchState(None, None, tmp_path, tmp_path)
+
+    results: list[SeedResult] = []
+    batchrandomizer.run_seeds(seeds, stems, 2, state, results.append,
+                              _fake_generate_seed)
+
+    assert sorted(result.seed for result in results) == sorted(seeds)
+    for result in results:
+        if result.seed == _CRASH_SEED:
+            assert "BrokenProcessPool" in result.error
+            assert result.rom_path is None
+        else:
+            assert result.error is None
+            assert result.rom_path.read_bytes() == result.seed.encode()
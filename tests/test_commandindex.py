@@ -0,0 +1,129 @@
+"""
+Check LocationEvent's opcode index against a linear scan of the commands
+while scripts are edited.
+"""
+import random
+
+import pytest
+
+from ctrando.locations import eventcommand
+from ctrando.locations.eventcommand import EventCommand as EC
+from ctrando.locations.locationevent import LocationEvent
+
+_JUMP_COMMANDS = set(EC.fwd_jump_commands + EC.back_jump_commands)
+# Jumps would need valid targets.  Everything else can have random args.
+_OPCODES = [
+    opcode for opcode in range(0x100)
+    if eventcommand._fixed_command_lengths[opcode] and
+    opcode not in _JUMP_COMMANDS
+]
+
+
+def _get_random_commands(rng: random.Random, num_commands: int) -> bytearray:
+    ret = bytearray()
+    for _ in range(num_commands):
+        opcode = rng.choice(_OPCODES)
+        length = eventcommand._fixed_command_lengths[opcode]
+        ret.append(opcode)
+        ret.extend(rng.randbytes(length - 1))
+    return ret
+
+
+def _get_random_script(rng: random.Random) -> LocationEvent:
+    num_objects = 3
+    data = bytearray([num_objects])
+    data.extend(b"\x00" * (32*num_objects))
+    pos = 32*num_objects
+    for ptr_ind in range(16*num_objects):
+        data[1+2*ptr_ind:3+2*ptr_ind] = pos.to_bytes(2, "little")
+        commands = _get_random_commands(rng, rng.randrange(0, 6))
+        data.extend(commands)
+        pos += len(commands)
+
+    return LocationEvent(data)
+
+
+def _get_positions(script: LocationEvent) -> list[int]:
+    positions = []
+    pos = script.get_object_start(0)
+    while pos < len(script.data):
+        positions.append(pos)
+        pos += eventcommand.get_command_length(script.data, pos)
+    return positions
+
+
+def _linear_find(script: LocationEvent, cmd_ids: list[int],
+                 start: int, end: int) -> int | None:
+    for pos in _get_positions(script):
+        if start <= pos < end and script.data[pos] in cmd_ids:
+            return pos
+    return None
+
+
+def _linear_find_exact(script: LocationEvent, cmd: EC,
+                       start: int, end: int) -> int | None:
+    for pos in _get_positions(script):
+        if start <= pos < end and eventcommand.get_command(script.data, pos) == cmd:
+            return pos
+    return None
+
+
+def _check_finds(script: LocationEvent, rng: random.Random):
+    positions = _get_positions(script)
+    if not positions:
+        return
+
+    for _ in range(10):
+        start = rng.choice(positions)
+        end = rng.randrange(start, len(script.data) + 2)
+        cmd_ids = [script.data[rng.choice(positions)]
+                   for _ in range(rng.randrange(1, 4))]
+
+        pos, cmd = script.find_command_opt(cmd_ids, start, end)
+        assert pos == _linear_find(script, cmd_ids, start, min(end, len(script.data)))
+        if pos is not None:
+            assert cmd == eventcommand.get_command(script.data, pos)
+
+        find_cmd = eventcommand.get_command(script.data, rng.choice(positions))
+        assert script.find_exact_command_opt(find_cmd, start, end) == \
+            _linear_find_exact(script, find_cmd, start, min(end, len(script.data)))
+
+    # The checks above must have gone through the index.
+    assert script._command_index is not None
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_index_matches_linear_scan(seed):
+    rng = random.Random(seed)
+    script = _get_random_script(rng)
+    _check_finds(script, rng)
+
+    for _ in range(60):
+        positions = _get_positions(script)
+        action = rng.randrange(4)
+        if action == 0 or not positions:
+            ins_pos = rng.choice(positions + [len(script.data)])
+            script.insert_commands(
+                _get_random_commands(rng, rng.randrange(1, 4)), ins_pos
+            )
+        elif action == 1:
+            ind = rng.randrange(len(positions))
+            num = rng.randrange(1, min(3, len(positions) - ind) + 1)
+            script.delete_commands(positions[ind], num)
+        elif action == 2:
+            # Edit arguments in place.
+            pos = rng.choice(positions)
+            length = eventcommand.get_command_length(script.data, pos)
+            script.data[pos+1:pos+length] = rng.randbytes(length - 1)
+        else:
+            # Swap a command for another of the same length in place.  The
+            # index has to notice the opcode change.
+            pos = rng.choice(positions)
+            length = eventcommand.get_command_length(script.data, pos)
+            same_length = [
+                opcode for opcode in _OPCODES
+                if eventcommand._fixed_command_lengths[opcode] == length
+            ]
+            script.data[pos] = rng.choice(same_length)
+
+        _check_finds(script, rng)
@@ -0,0 +1,33 @@
+"""
+Check the generated BytesProp accessors against the generic byteops path.
+
+The checks are shared with benchmarks/cttypesbench.py, which also times both.
+"""
+import importlib.util
+import pathlib
+import random
+
+import pytest
+
+_BENCH_PATH = pathlib.Path(__file__).resolve().parents[1] / "benchmarks" / \
+    "cttypesbench.py"
+
+
+def _load_bench():
+    spec = importlib.util.spec_from_file_location("cttypesbench", _BENCH_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+cttypesbench = _load_bench()
+
+
+@pytest.mark.parametrize(
+    "cls", cttypesbench.get_binary_data_classes(),
+    ids=lambda cls: cls.__qualname__
+)
+def test_accessors_match_byteops(cls):
+    rng = random.Random(cls.__qualname__)
+    records = cttypesbench._make_records(cls, 20, rng)
+    assert cttypesbench.check_class(cls, records, rng) > 0
@@ -0,0 +1,83 @@
+"""
+Check Distribution and WeightedSampler against the linear-scan sampling
+that Distribution used to do, so that fixed seeds keep their results.
+"""
+import random
+
+import pytest
+
+from ctrando.common import distribution
+
+
+def _old_get_random_item(pairs, rng: random.Random):
+    """The original Distribution.get_random_item."""
+    total_weight = sum(weight for weight, _ in pairs)
+    target = rng.random()*total_weight
+
+    cum_weight = 0
+    for weight, obj in pairs:
+        cum_weight += weight
+        if cum_weight > target:
+            return rng.choice(obj)
+
+    raise ValueError('No choice made.')
+
+
+def _get_random_pairs(rng: random.Random, num_pairs: int, integer: bool):
+    pairs = []
+    for ind in range(num_pairs):
+        weight = rng.randrange(1, 20) if integer else rng.uniform(0.1, 20)
+        pairs.append((weight, [(ind, val) for val in range(rng.randrange(1, 5))]))
+    return pairs
+
+
+@pytest.mark.parametrize("integer", [True, False])
+@pytest.mark.parametrize("seed", range(5))
+def test_same_draws_as_linear_scan(seed, integer):
+    pairs = _get_random_pairs(random.Random(seed), 37, integer)
+    dist = distribution.Distribution(*pairs)
+    sampler = distribution.WeightedSampler(*pairs)
+
+    old_rng, dist_rng, sampler_rng = (random.Random(seed) for _ in range(3))
+    for _ in range(5000):
+        item = _old_get_random_item(pairs, old_rng)
+        assert dist.get_random_item(dist_rng) == item
+        assert sampler.get_random_item(sampler_rng) == item
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_changing_weights(seed):
+    rng = random.Random(seed)
+    pairs = _get_random_pairs(rng, 50, True)
+    sampler = distribution.WeightedSampler(*pairs)
+
+    old_rng, sampler_rng = random.Random(seed), random.Random(seed)
+    for _ in range(2000):
+        index = rng.randrange(len(pairs))
+        weight = rng.choice([0, rng.randrange(1, 20)])
+        pairs[index] = (weight, pairs[index][1])
+        sampler.set_weight(index, weight)
+        if not any(weight for weight, _ in pairs):
+            continue
+
+        assert sampler.get_random_item(sampler_rng) == \
+            _old_get_random_item(pairs, old_rng)
+
+
+@pytest.mark.parametrize("remove_weight", [True, False])
+def test_remove_values_matches_restricted_distribution(remove_weight):
+    rng = random.Random(1)
+    pairs = _get_random_pairs(rng, 30, True)
+    dist = distribution.Distribution(*pairs)
+    sampler = distribution.WeightedSampler(*pairs)
+
+    old_rng, sampler_rng = random.Random(2), random.Random(2)
+    values = dist.get_all_items_multiplicity()
+    for _ in range(len(values) - 1):
+        remove = [rng.choice(dist.get_all_items_multiplicity())]
+        dist = dist.get_restricted_distribution(remove, remove_weight)
+        sampler.remove_values(remove, remove_weight)
+
+        for _ in range(20):
+            assert sampler.get_random_item(sampler_rng) == \
+                _old_get_random_item(dist.get_weight_object_pairs(), old_rng)
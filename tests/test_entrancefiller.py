@@ -0,0 +1,58 @@
+"""Key item fills on shuffled entrance and gate maps."""
+import random
+
+import pytest
+
+import ctrando.randomizer as randomizer
+from ctrando.arguments import logicoptions
+from ctrando.bosses import bossrando
+from ctrando.common import tracing
+from ctrando.entranceshuffler import entrancefiller
+from ctrando.recruits import recruitwriter
+
+
+def _get_fill(seed: str, key_item_fill: logicoptions.KeyItemFillScheme):
+    settings = randomizer.extract_settings(
+        "--seed", seed, "--shuffle-entrances", "--shuffle-gates",
+        "--key-item-fill", str(key_item_fill)
+    )
+    logic_options = settings.logic_options
+    logic_options.starter_rewards = list(logic_options.starter_rewards)
+
+    rng = random.Random()
+    rng.seed(seed, version=2)
+    recruit_assignment = recruitwriter.get_random_recruit_assignment_dict(
+        settings.plando_options.recruit_assignment, rng)
+    boss_assignment = bossrando.get_random_boss_assignment(
+        settings.boss_rando_options, rng)
+    entrancefiller.update_starting_rewards(
+        logic_options.starter_rewards, settings.entrance_options)
+
+    treasure_assignment, _, region_map = entrancefiller.get_key_item_fill(
+        dict(), boss_assignment, recruit_assignment, logic_options,
+        settings.entrance_options, rng
+    )
+    return treasure_assignment, region_map, recruit_assignment, logic_options
+
+
+def test_default_fill_is_weighted_decay():
+    assert logicoptions.LogicOptions().key_item_fill == \
+        logicoptions.KeyItemFillScheme.WEIGHTED_DECAY
+
+
+@pytest.mark.parametrize("seed", [f"assumed{ind}" for ind in range(8)])
+def test_assumed_fill_has_no_forced_dead_ends(seed):
+    tracer = tracing.enable()
+    try:
+        treasure_assignment, region_map, recruit_assignment, logic_options = \
+            _get_fill(seed, logicoptions.KeyItemFillScheme.ASSUMED)
+    finally:
+        tracing.disable()
+
+    assert "assumed_fill_forced_dead_ends" not in tracer.counters
+    key_items = set(entrancefiller.get_forced_key_items())
+    for spot in logic_options.forced_spots:
+        assert treasure_assignment[spot] in key_items
+    assert entrancefiller.verify_fill(
+        region_map, treasure_assignment, recruit_assignment, logic_options
+    )
@@ -0,0 +1,77 @@
+"""
+Cold-start import budget for the randomizer.
+
+Every CLI run imports ctrando.randomizer, so importing it must stay cheap.
+In particular the openworld EventMods are listed in a generated manifest and
+imported only when their location is modified.
+"""
+import os
+import pathlib
+import subprocess
+import sys
+
+_SRC_DIR = pathlib.Path(__file__).resolve().parents[1] / "src"
+
+# Cumulative import time budget for ctrando.randomizer.  This is several
+# times the measured cold import so that slow machines pass, but eagerly
+# importing every mod or another large dependency does not.
+_IMPORT_BUDGET_US = 1_500_000
+_NUM_RUNS = 3
+
+
+def _get_import_times(module: str) -> dict[str, int]:
+    """
+    Import module in a fresh interpreter with -X importtime.  Returns the
+    cumulative import time in microseconds of every module imported.
+    """
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        x for x in (str(_SRC_DIR), env.get("PYTHONPATH", "")) if x
+    )
+
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        env=env, capture_output=True, text=True, check=True
+    )
+
+    times: dict[str, int] = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not cumulative.strip().isdigit():  # The header line
+            continue
+        times[name.strip()] = int(cumulative)
+
+    return times
+
+
+def _get_loaded_mods(times: dict[str, int]) -> set[str]:
+    prefix = "ctrando.base.openworld."
+    return {name[len(prefix):] for name in times if name.startswith(prefix)}
+
+
+def test_apply_openworld_does_not_import_mods():
+    times = _get_import_times("ctrando.base.apply_openworld")
+    assert "ctrando.base.openworld_manifest" in times
+    assert not _get_loaded_mods(times)
+
+
+def test_randomizer_imports_few_mods():
+    # A few mods are imported directly by other modules for their helpers.
+    times = _get_import_times("ctrando.randomizer")
+    mod_dir = _SRC_DIR / "ctrando" / "base" / "openworld"
+    num_mods = sum(1 for path in mod_dir.glob("*.py")
+                   if path.name != "__init__.py")
+    loaded_mods = _get_loaded_mods(times)
+    assert len(loaded_mods) < num_mods // 10, sorted(loaded_mods)
+
+
+def test_randomizer_import_budget():
+    # Best of several runs, since one run can be slowed by other processes.
+    best = min(
+        _get_import_times("ctrando.randomizer")["ctrando.randomizer"]
+        for _ in range(_NUM_RUNS)
+    )
+    assert best < _IMPORT_BUDGET_US, \
+        f"import ctrando.randomizer took {best/1000:.0f} ms"
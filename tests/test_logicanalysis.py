@@ -0,0 +1,103 @@
+"""
+Spheres of the logic analysis against maptraversal.get_sphere_dict, which is
+what scaling used on the final treasure assignment.
+"""
+import random
+
+import pytest
+
+import ctrando.randomizer as randomizer
+from ctrando.bosses import bossrando
+from ctrando.common import ctenums
+from ctrando.entranceshuffler import entrancefiller, logicanalysis, maptraversal
+from ctrando.recruits import recruitwriter
+from ctrando.treasures import treasureassign
+
+
+def _get_fills(seed: str):
+    """Get the key item assignment and the filled one the way the randomizer does."""
+    settings = randomizer.extract_settings("--seed", seed)
+    logic_options = settings.logic_options
+    logic_options.starter_rewards = list(logic_options.starter_rewards)
+
+    rng = random.Random()
+    rng.seed(seed, version=2)
+    recruit_assignment = recruitwriter.get_random_recruit_assignment_dict(
+        settings.plando_options.recruit_assignment, rng)
+    boss_assignment = bossrando.get_random_boss_assignment(
+        settings.boss_rando_options, rng)
+    entrancefiller.update_starting_rewards(
+        logic_options.starter_rewards, settings.entrance_options)
+
+    key_assignment, _, region_map = entrancefiller.get_key_item_fill(
+        dict(), boss_assignment, recruit_assignment, logic_options,
+        settings.entrance_options, rng
+    )
+    analysis = logicanalysis.get_logic_analysis(
+        region_map, key_assignment, recruit_assignment,
+        logic_options.starter_rewards
+    )
+    final_assignment = treasureassign.default_assignment(
+        key_assignment, settings.treasure_options,
+        settings.gear_rando_options.ds_item_pool, [], region_map,
+        recruit_assignment, logic_options.starter_rewards,
+        settings.recruit_options, rng, analysis
+    )
+    return (key_assignment, final_assignment, region_map, recruit_assignment,
+            logic_options.starter_rewards, analysis)
+
+
+@pytest.mark.parametrize("seed", [f"spheres{ind}" for ind in range(4)])
+def test_non_logic_treasure_keeps_spheres(seed):
+    key_assignment, final_assignment, region_map, recruit_assignment, \
+        starting_rewards, analysis = _get_fills(seed)
+
+    # Fill every open spot with something no access rule asks for.
+    logic_items = logicanalysis.get_logic_items(region_map)
+    filler = [item for item in ctenums.ItemID
+              if item not in logic_items and item != ctenums.ItemID.NONE]
+    rng = random.Random(seed)
+    filled = {
+        spot: key_assignment.get(spot, ctenums.ItemID.NONE)
+        for spot in ctenums.TreasureID
+    }
+    for spot, reward in filled.items():
+        if reward == ctenums.ItemID.NONE:
+            filled[spot] = rng.choice(filler)
+
+    assert logicanalysis.get_logic_spots(region_map, filled) == \
+        logicanalysis.get_logic_spots(region_map, key_assignment)
+    assert analysis.region_spheres == maptraversal.get_sphere_dict(
+        region_map, filled, recruit_assignment, starting_rewards
+    )
+
+
+@pytest.mark.parametrize("seed", [f"spheres{ind}" for ind in range(4)])
+def test_analysis_matches_final_assignment(seed):
+    key_assignment, final_assignment, region_map, recruit_assignment, \
+        starting_rewards, analysis = _get_fills(seed)
+    final_spheres = maptraversal.get_sphere_dict(
+        region_map, final_assignment, recruit_assignment, starting_rewards
+    )
+
+    if logicanalysis.get_logic_spots(region_map, final_assignment) == \
+            logicanalysis.get_logic_spots(region_map, key_assignment):
+        assert analysis.region_spheres == final_spheres
+
+    # What the randomizer uses when the fill added logic items.
+    final_analysis = logicanalysis.get_logic_analysis(
+        region_map, final_assignment, recruit_assignment, starting_rewards
+    )
+    assert final_analysis.region_spheres == final_spheres
+
+
+def test_logic_item_from_fill_changes_spheres():
+    """The fill can place a spare Masamune, which opens up the map early."""
+    key_assignment, final_assignment, region_map, recruit_assignment, \
+        starting_rewards, analysis = _get_fills("seedx0")
+
+    assert logicanalysis.get_logic_spots(region_map, final_assignment) != \
+        logicanalysis.get_logic_spots(region_map, key_assignment)
+    assert analysis.region_spheres != maptraversal.get_sphere_dict(
+        region_map, final_assignment, recruit_assignment, starting_rewards
+    )
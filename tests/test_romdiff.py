@@ -0,0 +1,116 @@
+"""Round trips of the BPS and IPS patches made by romdiff."""
+import random
+
+import pytest
+
+from ctrando.common import romdiff
+
+_EOF_OFFSET = 0x454F46
+
+
+def _iter_ips_records(patch: bytes):
+    """Get (offset, data) of each record, stopping at EOF like a patcher."""
+    assert patch[:5] == b"PATCH"
+    pos = 5
+    while True:
+        offset = int.from_bytes(patch[pos:pos+3], "big")
+        if patch[pos:pos+3] == b"EOF":
+            assert pos + 3 == len(patch)
+            return
+        size = int.from_bytes(patch[pos+3:pos+5], "big")
+        pos += 5
+        if size == 0:
+            size = int.from_bytes(patch[pos:pos+2], "big")
+            yield offset, patch[pos+2:pos+3] * size
+            pos += 3
+        else:
+            yield offset, patch[pos:pos+size]
+            pos += size
+
+
+def _apply_ips_patch(source: bytes, patch: bytes) -> bytes:
+    target = bytearray(source)
+    for offset, data in _iter_ips_records(patch):
+        if offset + len(data) > len(target):
+            target.extend(bytes(offset + len(data) - len(target)))
+        target[offset:offset+len(data)] = data
+    return bytes(target)
+
+
+def _get_roms(size: int, grow: int = 0) -> tuple[bytes, bytes]:
+    rng = random.Random(size)
+    source = rng.randbytes(size)
+    target = bytearray(source)
+
+    # Scattered single bytes and short edits
+    for _ in range(200):
+        pos = rng.randrange(size - 0x20)
+        length = rng.randrange(1, 0x20)
+        target[pos:pos+length] = rng.randbytes(length)
+        target[pos] ^= 0xFF
+    # Changes more than 0xFFFF bytes long: random data and a single-byte run
+    target[0x100000:0x118000] = rng.randbytes(0x18000)
+    target[0x200000:0x214000] = b"\xEE" * 0x14000
+    # Changes at the offset which reads as "EOF"
+    if size > _EOF_OFFSET + 0x100:
+        target[_EOF_OFFSET] ^= 0xFF
+        target[_EOF_OFFSET+0x10:_EOF_OFFSET+0x30] = b"\x55" * 0x20
+        target[_EOF_OFFSET+0x40:_EOF_OFFSET+0x80] = bytes(0x40)
+
+    target.extend(rng.randbytes(grow))
+    return source, bytes(target)
+
+
+@pytest.mark.parametrize("size,grow", [(0x400000, 0), (0x600000, 0),
+                                       (0x600000, 0x200000)])
+def test_ips_round_trip(size, grow):
+    source, target = _get_roms(size, grow)
+    patch = romdiff.get_ips_patch(source, target)
+
+    assert _apply_ips_patch(source, patch) == target
+    assert all(offset != _EOF_OFFSET for offset, _ in _iter_ips_records(patch))
+
+
+def test_ips_run_at_eof_offset():
+    source = bytes(_EOF_OFFSET + 0x100)
+    target = bytearray(source)
+    target[_EOF_OFFSET:_EOF_OFFSET+0x40] = b"\x11" * 0x40
+    target = bytes(target)
+
+    patch = romdiff.get_ips_patch(source, target)
+    assert _apply_ips_patch(source, patch) == target
+    assert all(offset != _EOF_OFFSET for offset, _ in _iter_ips_records(patch))
+
+
+def test_ips_limits():
+    with pytest.raises(ValueError):
+        romdiff.get_ips_patch(bytes(0x100), bytes(0x80))
+    with pytest.raises(ValueError):
+        romdiff.get_ips_patch(bytes(0x100), bytes(0x1000001))
+
+
+@pytest.mark.parametrize("size,grow", [(0x400000, 0), (0x600000, 0x200000)])
+def test_bps_round_trip(size, grow):
+    source, target = _get_roms(size, grow)
+    patch = romdiff.get_bps_patch(source, target)
+
+    assert romdiff.apply_bps_patch(source, patch) == target
+
+
+def test_bps_shrink_and_identity():
+    source, target = _get_roms(0x400000)
+    patch = romdiff.get_bps_patch(source, target[:0x300000])
+    assert romdiff.apply_bps_patch(source, patch) == target[:0x300000]
+
+    patch = romdiff.get_bps_patch(source, source)
+    assert romdiff.apply_bps_patch(source, patch) == source
+
+
+def test_bps_rejects_wrong_source():
+    source, target = _get_roms(0x400000)
+    patch = romdiff.get_bps_patch(source, target)
+
+    with pytest.raises(ValueError):
+        romdiff.apply_bps_patch(target, patch)
+    with pytest.raises(ValueError):
+        romdiff.apply_bps_patch(source, patch[:-5] + b"\x00" + patch[-4:])
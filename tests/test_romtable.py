@@ -0,0 +1,147 @@
+"""
+Stat table passes give the same results with NumPy and with the per-object
+fallback used when NumPy is not installed.
+"""
+import random
+import types
+
+import pytest
+
+import ctrando.randomizer  # noqa: F401  Loads the modules in a working order
+from ctrando.bosses import staticbossscaling
+from ctrando.characters import characterwriter, ctpcstats
+from ctrando.common import ctenums, ctrom, romtable
+from ctrando.enemydata import enemystats, rewardrando
+
+_ROM = random.Random(1).randbytes(0x400000)
+
+
+def _get_rom() -> ctrom.CTRom:
+    return ctrom.CTRom(_ROM, ignore_checksum=True)
+
+
+def _get_stat_dict() -> dict[ctenums.EnemyID, enemystats.EnemyStats]:
+    stat_dict = enemystats.get_stat_dict_from_ctrom(_get_rom())
+    # Son of Sun's eye has hp scaled from 10000.
+    stat_dict[ctenums.EnemyID.SON_OF_SUN_EYE].hp = 12345
+    return stat_dict
+
+
+def _get_stat_bytes(stat_dict) -> dict[ctenums.EnemyID, tuple[bytes, bytes]]:
+    return {
+        enemy_id: (bytes(stats._stat_data), bytes(stats._reward_data))
+        for enemy_id, stats in stat_dict.items()
+    }
+
+
+class _FakeAIManager:
+    """Boss scaling only needs scripts without hp conditions."""
+    def __init__(self):
+        self.script_dict = {
+            enemy_id: types.SimpleNamespace(action_script=[],
+                                            reaction_script=[])
+            for enemy_id in ctenums.EnemyID
+        }
+
+
+def _run_both(monkeypatch, run):
+    """Get run()'s result with NumPy and with the fallback."""
+    pytest.importorskip("numpy")
+    with_numpy = run()
+    monkeypatch.setattr(romtable, "HAS_NUMPY", False)
+    without_numpy = run()
+    monkeypatch.undo()
+    return with_numpy, without_numpy
+
+
+def test_stat_dict_matches_single_reads():
+    stat_dict = enemystats.get_stat_dict_from_ctrom(_get_rom())
+    for enemy_id, stats in stat_dict.items():
+        single = enemystats.EnemyStats.from_rom(_ROM, enemy_id)
+        assert bytes(stats._stat_data) == bytes(single._stat_data)
+        assert bytes(stats._reward_data) == bytes(single._reward_data)
+        assert bytes(stats._name_bytes) == bytes(single._name_bytes)
+        assert stats.hide_name == single.hide_name
+
+
+def test_fallback_has_no_arrays(monkeypatch):
+    monkeypatch.setattr(romtable, "HAS_NUMPY", False)
+    assert enemystats.get_stat_arrays(_get_stat_dict()) is None
+
+
+@pytest.mark.parametrize("factor", [0.3, 0.5, 1.5, 2.0, 2.5, 7.3])
+def test_scale_boss_hp(monkeypatch, factor):
+    def run():
+        stat_dict = _get_stat_dict()
+        for include_lavos in (True, False):
+            staticbossscaling.scale_boss_hp(
+                stat_dict, _FakeAIManager(), factor,
+                include_lavos, not include_lavos
+            )
+        return _get_stat_bytes(stat_dict)
+
+    with_numpy, without_numpy = _run_both(monkeypatch, run)
+    assert with_numpy == without_numpy
+
+
+@pytest.mark.parametrize("factor", [0.3, 0.5, 1.5, 2.0, 7.3])
+def test_pre_reduce_xp_thresholds(monkeypatch, factor):
+    threshold_bytes = random.Random(2).randbytes(ctpcstats.XPThreshholds.SIZE)
+
+    def run():
+        stat_dict = _get_stat_dict()
+        thresholds = ctpcstats.XPThreshholds(threshold_bytes)
+        rewardrando.pre_reduce_xp_thresholds(stat_dict, thresholds, factor)
+        return _get_stat_bytes(stat_dict), bytes(thresholds)
+
+    with_numpy, without_numpy = _run_both(monkeypatch, run)
+    assert with_numpy == without_numpy
+
+
+@pytest.mark.parametrize("factor", [0.1, 0.3, 0.7, 1.0, 2.0, 3.3])
+def test_scale_tp(monkeypatch, factor):
+    rng = random.Random(3)
+    # Keep thresholds small enough that scaling stays in range.
+    tp_bytes = {
+        char_id: bytes(x & 0x3F if ind % 2 else x
+                       for ind, x in enumerate(rng.randbytes(0x10)))
+        for char_id in ctenums.CharID
+    }
+
+    def run():
+        stat_dict = _get_stat_dict()
+        pc_stat_man = types.SimpleNamespace(pc_stat_dict={
+            char_id: types.SimpleNamespace(
+                tp_thresholds=ctpcstats.TPThresholds(tp_bytes[char_id])
+            )
+            for char_id in ctenums.CharID
+        })
+        characterwriter.scale_tp(pc_stat_man, stat_dict, factor)
+        return _get_stat_bytes(stat_dict), {
+            char_id: bytes(stats.tp_thresholds)
+            for char_id, stats in pc_stat_man.pc_stat_dict.items()
+        }
+
+    with_numpy, without_numpy = _run_both(monkeypatch, run)
+    assert with_numpy == without_numpy
+
+
+def test_table_write_matches_single_writes():
+    stat_dict = _get_stat_dict()
+    stat_dict[ctenums.EnemyID.NU].xp = 77
+    stat_dict[ctenums.EnemyID.NU].hide_name = True
+    stat_dict[ctenums.EnemyID.MASA] = stat_dict[ctenums.EnemyID.MUD_IMP]
+    stat_dict[ctenums.EnemyID.MASA].hp = 999
+    plain_dict = {
+        enemy_id: stats.get_copy() for enemy_id, stats in stat_dict.items()
+    }
+
+    table_rom, plain_rom = _get_rom(), _get_rom()
+    enemystats.write_stat_dict_to_ctrom(table_rom, stat_dict)
+    enemystats.write_stat_dict_to_ctrom(plain_rom, plain_dict)
+    assert bytes(table_rom.getbuffer()) == bytes(plain_rom.getbuffer())
+
+
+def test_numpy_has_arrays():
+    pytest.importorskip("numpy")
+    assert enemystats.get_stat_arrays(_get_stat_dict()) is not None
@@ -0,0 +1,75 @@
+"""Reading location scripts back from the script cache."""
+import pytest
+
+from ctrando.locations import scriptcache
+from ctrando.locations.locationevent import LocationEvent
+
+
+def _make_script(text: str) -> LocationEvent:
+    script = LocationEvent()
+    script.append_empty_object()
+    script.append_empty_object()
+    script.add_py_string(text)
+    return script
+
+
+@pytest.fixture
+def scripts() -> list[tuple[int, int, LocationEvent]]:
+    shared = _make_script("Shared script")
+    return [
+        (1, 0x1000, shared),
+        (2, 0x1000, shared),
+        (3, 0x2000, _make_script("Last script in the file")),
+    ]
+
+
+def _write_cache(tmp_path, buf: bytes) -> scriptcache.ScriptCache:
+    path = tmp_path / "scripts.bin"
+    path.write_bytes(buf)
+    return scriptcache.ScriptCache(path)
+
+
+def test_round_trip(tmp_path, scripts):
+    cache = _write_cache(tmp_path, scriptcache.pack_scripts(scripts))
+
+    for loc_id, ptr, script in scripts:
+        cached = cache.get_script(loc_id, ptr)
+        assert cached is not None
+        assert cached.get_parsed_bytes() == script.get_parsed_bytes()
+
+    # Repointed script or unknown location
+    assert cache.get_script(1, 0x2000) is None
+    assert cache.get_script(4, 0x1000) is None
+
+
+def test_corrupt_record_is_dropped(tmp_path, scripts):
+    buf = bytearray(scriptcache.pack_scripts(scripts))
+    last_record = scripts[-1][2].get_parsed_bytes()
+    buf[len(buf) - len(last_record) + 8] ^= 0xFF
+
+    cache = _write_cache(tmp_path, bytes(buf))
+    assert cache.get_script(3, 0x2000) is None
+    assert cache.get_script(1, 0x1000) is not None
+    assert cache.get_script(2, 0x1000) is not None
+
+
+def test_truncated_file(tmp_path, scripts):
+    buf = scriptcache.pack_scripts(scripts)
+    last_record = scripts[-1][2].get_parsed_bytes()
+
+    cache = _write_cache(tmp_path, buf[:len(buf) - len(last_record)//2])
+    assert cache.get_script(3, 0x2000) is None
+    assert cache.get_script(1, 0x1000) is not None
+
+    # Cut inside the entry table: nothing is read from the cache.
+    cache = _write_cache(tmp_path, buf[:20])
+    assert all(cache.get_script(loc_id, ptr) is None
+               for loc_id, ptr, _ in scripts)
+
+
+def test_from_parsed_bytes_rejects_bad_lengths(scripts):
+    record = scripts[0][2].get_parsed_bytes()
+    with pytest.raises(ValueError):
+        LocationEvent.from_parsed_bytes(record[:-1])
+    with pytest.raises(ValueError):
+        LocationEvent.from_parsed_bytes(record + b"\x00")
@@ -0,0 +1,68 @@
+"""Span nesting in the tracer."""
+import pytest
+
+import ctrando.randomizer as randomizer
+from ctrando.common import tracing
+
+
+@pytest.fixture
+def tracer():
+    tracer = tracing.enable()
+    yield tracer
+    tracing.disable()
+
+
+def test_spans_nest(tracer):
+    with tracing.span("outer"):
+        with tracing.span("inner"):
+            pass
+        tracing.count("events", 2)
+
+    assert [span.path for span in tracer.spans] == ["outer/inner", "outer"]
+    assert tracer.get_summary()["counters"] == {"events": 2}
+
+
+def test_pop_unwinds_spans_left_open(tracer):
+    with tracing.span("outer") as outer:
+        # Left open, as when an exception skips a stop().
+        tracing.start_span("leaked")
+        tracing.start_span("leaked_child")
+
+    with tracing.span("after"):
+        pass
+
+    paths = [span.path for span in tracer.spans]
+    assert paths == ["outer/leaked/leaked_child", "outer/leaked", "outer",
+                     "after"]
+    assert all(span.end_ns == outer.end_ns for span in tracer.spans[:3])
+
+
+def test_pop_ignores_unknown_span(tracer):
+    stray = tracing.span("stray")
+    with tracing.span("outer"):
+        stray.stop()
+
+    assert [span.path for span in tracer.spans] == ["outer"]
+
+
+def test_traced_span_closes_on_exception(tracer):
+    @tracing.traced("fails")
+    def fails():
+        tracing.start_span("inner")
+        raise ValueError
+
+    with pytest.raises(ValueError):
+        fails()
+    with tracing.span("after"):
+        pass
+
+    assert [span.path for span in tracer.spans] == ["fails/inner", "fails",
+                                                    "after"]
+
+
+@pytest.mark.parametrize("trace_arg", ["--trace-file", "--trace-summary"])
+def test_trace_flags_rejected_in_batch_mode(trace_arg, tmp_path):
+    with pytest.raises(ValueError):
+        randomizer.extract_settings(
+            "--batch", "2", trace_arg, str(tmp_path / "trace.json")
+        )
@@ -0,0 +1,117 @@
+"""Placement of planned free space writes."""
+import random
+
+import pytest
+
+from ctrando.common import ctrom, freespace, writeplanner
+
+_ROM_SIZE = 0x600000
+
+
+def _get_rom(free_blocks: list[tuple[int, int]]) -> ctrom.CTRom:
+    rom = ctrom.CTRom(bytes(_ROM_SIZE), ignore_checksum=True)
+    rom.space_manager = freespace.FreeSpace(_ROM_SIZE, False)
+    for block in free_blocks:
+        rom.space_manager.mark_block(block, freespace.FSWriteType.MARK_FREE)
+    return rom
+
+
+def _add_blob(planner: writeplanner.WritePlanner,
+              placed: dict[int, int], blob_id: int, size: int,
+              bank: int | None = None):
+    def on_placed(_rom: ctrom.CTRom, addr: int):
+        placed[blob_id] = addr
+
+    planner.add(size, lambda _addr: bytes([blob_id]) * size, on_placed,
+                bank=bank)
+
+
+def test_bank_blobs_placed_first():
+    # Both pieces are the same size.  The unrestricted blob would take the
+    # bank 0x41 piece if it were placed first.
+    rom = _get_rom([(0x410000, 0x410100), (0x420000, 0x420100)])
+    planner = writeplanner.WritePlanner()
+    placed: dict[int, int] = {}
+    _add_blob(planner, placed, 1, 0x100)
+    _add_blob(planner, placed, 2, 0x100, bank=0x41)
+
+    planner.write_to_ctrom(rom)
+
+    assert placed == {1: 0x420000, 2: 0x410000}
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_placements_do_not_overlap(seed):
+    rng = random.Random(seed)
+    free_blocks = []
+    for bank in range(0x41, 0x60):
+        start = (bank << 16) + rng.randrange(0x8000)
+        free_blocks.append((start, start + rng.randrange(0x2000, 0x8000)))
+    rom = _get_rom(free_blocks)
+
+    planner = writeplanner.WritePlanner()
+    placed: dict[int, int] = {}
+    blobs: dict[int, tuple[int, int | None]] = {}
+    for blob_id in range(1, 200):
+        if rng.random() < 0.25:
+            size, bank = rng.randrange(0, 0x100), rng.randrange(0x41, 0x60)
+        else:
+            size, bank = rng.randrange(0, 0x800), None
+        blobs[blob_id] = (size, bank)
+        _add_blob(planner, placed, blob_id, size, bank)
+
+    planner.write_to_ctrom(rom)
+
+    assert placed.keys() == blobs.keys()
+    blocks = []
+    for blob_id, (size, bank) in blobs.items():
+        addr = placed[blob_id]
+        if bank is not None:
+            assert addr >> 16 == bank
+        if size == 0:
+            continue
+        assert addr >> 16 == (addr + size - 1) >> 16
+        assert any(start <= addr and addr + size <= end
+                   for start, end in free_blocks)
+        assert rom.getbuffer()[addr:addr+size] == bytes([blob_id]) * size
+        blocks.append((addr, addr + size))
+
+    blocks.sort()
+    for (_, end), (next_start, _) in zip(blocks, blocks[1:]):
+        assert end <= next_start
+
+
+def test_planner_fails_without_space():
+    rom = _get_rom([(0x410000, 0x410100)])
+    planner = writeplanner.WritePlanner()
+    placed: dict[int, int] = {}
+    _add_blob(planner, placed, 1, 0x80)
+    _add_blob(planner, placed, 2, 0x81)
+
+    with pytest.raises(freespace.FreeSpaceError):
+        planner.write_to_ctrom(rom)
+
+
+def test_bank_blob_fails_outside_its_bank():
+    rom = _get_rom([(0x410000, 0x410100)])
+    planner = writeplanner.WritePlanner()
+    _add_blob(planner, {}, 1, 0x10, bank=0x42)
+
+    with pytest.raises(freespace.FreeSpaceError):
+        planner.write_to_ctrom(rom)
+
+
+def test_callback_blobs_placed_in_later_round():
+    rom = _get_rom([(0x410000, 0x410100)])
+    planner = writeplanner.WritePlanner()
+    placed: dict[int, int] = {}
+
+    def on_placed(_rom: ctrom.CTRom, addr: int):
+        placed[1] = addr
+        _add_blob(planner, placed, 2, 0x20)
+
+    planner.add(0x40, lambda _addr: bytes(0x40), on_placed)
+    planner.write_to_ctrom(rom)
+
+    assert placed[2] >= placed[1] + 0x40 or placed[2] + 0x20 <= placed[1]
+    assert len(planner) == 0